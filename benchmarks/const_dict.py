@@ -0,0 +1,112 @@
+"""
+Constant dict lookup: perfect-hash table vs a linear strcmp chain
+
+Compiles a register-name -> address lookup over N names twice: once as a
+constant dict (perfect-hash tables and one strcmp per lookup) and once as
+the if/strcmp chain it replaces.  Both programs look up every name plus
+some misses and must print the same checksum.
+
+Run it with a cross toolchain and an emulator (or a board runner) to get
+numbers for a target core, e.g.:
+
+    python benchmarks/const_dict.py --target rp2040 \\
+        --cc arm-none-eabi-gcc --cflags "-mcpu=cortex-m0plus -O2 --specs=rdimon.specs" \\
+        --run "qemu-arm -cpu cortex-m0"
+"""
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from py2mcu.compiler import Compiler  # noqa: E402
+
+RUNTIME_DIR = os.path.join(os.path.dirname(__file__), '..', 'runtime')
+
+KERNEL = """
+ROUNDS = {rounds}
+COUNT = {count}
+
+REGISTERS = {{{entries}}}
+
+def lookup_linear(name: str) -> int:
+    \"\"\"Linear strcmp chain
+
+    __C_CODE__
+{chain}
+    return -1;
+    \"\"\"
+    return REGISTERS.get(name, -1)
+
+def main():
+    names: list[str] = [{names}]
+    total = 0
+    n = 0
+    while n < ROUNDS:
+        k = 0
+        while k < COUNT:
+            total = total + {lookup}
+            k = k + 1
+        n = n + 1
+    print(total)
+"""
+
+
+def kernel_source(size: int, rounds: int, lookup: str) -> str:
+    registers = {f"REG_{i:03d}_{'CTRL' if i % 2 else 'DATA'}": 0x4000 + 4 * i for i in range(size)}
+    misses = [f"REG_{i:03d}_NONE" for i in range(0, size, 4)]
+    names = list(registers) + misses
+    entries = ", ".join(f'"{name}": {address}' for name, address in registers.items())
+    chain = "\n".join(f'    if (strcmp(name, "{name}") == 0) return {address};'
+                      for name, address in registers.items())
+    return KERNEL.format(rounds=rounds, count=len(names), entries=entries, chain=chain,
+                         names=", ".join(f'"{name}"' for name in names), lookup=lookup)
+
+
+def build(source: str, args, workdir: str, name: str) -> str:
+    c_file = os.path.join(workdir, f"{name}.c")
+    with open(c_file, 'w') as f:
+        f.write(Compiler(target=args.target, optimize='3').compile_string(source))
+    exe = os.path.join(workdir, name)
+    subprocess.run([args.cc, *shlex.split(args.cflags), '-I', RUNTIME_DIR, c_file,
+                    os.path.join(RUNTIME_DIR, 'gc_runtime.c'), '-o', exe, '-lm'], check=True)
+    return exe
+
+
+def run(exe: str, args) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([*shlex.split(args.run), exe], capture_output=True, text=True, check=True)
+    return result.stdout.strip(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='pc')
+    parser.add_argument('--cc', default='gcc')
+    parser.add_argument('--cflags', default='-O2')
+    parser.add_argument('--run', default='', help='command prefix, e.g. "qemu-arm -cpu cortex-m0"')
+    parser.add_argument('--rounds', type=int, default=100_000)
+    parser.add_argument('--sizes', default='8,32,128')
+    args = parser.parse_args()
+
+    variants = {'perfect hash': 'REGISTERS.get(names[k], -1)', 'strcmp chain': 'lookup_linear(names[k])'}
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{args.rounds} rounds over all names plus 25% misses, {args.cc} {args.cflags}")
+        for size in (int(size) for size in args.sizes.split(',')):
+            outputs = set()
+            for i, (label, lookup) in enumerate(variants.items()):
+                source = kernel_source(size, args.rounds, lookup)
+                output, elapsed = run(build(source, args, workdir, f"dict_{size}_{i}"), args)
+                outputs.add(output)
+                lookups = args.rounds * (size + (size + 3) // 4)
+                print(f"  {size:4d} keys, {label:>12}: {lookups / elapsed / 1e6:8.2f} Mlookups/s")
+            if len(outputs) != 1:
+                sys.exit(f"checksums differ for {size} keys: {sorted(outputs)}")
+
+
+if __name__ == '__main__':
+    main()
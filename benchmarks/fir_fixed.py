@@ -0,0 +1,116 @@
+"""
+FIR kernel throughput: q15 fixed point vs float
+
+Compiles the same 16-tap FIR filter twice (q15 and float), builds both with a
+C compiler and reports samples per second.  The q15 result is checked
+against the Python simulation first, so the numbers are for code that is
+bit-exact with what runs on the PC.
+
+Floats only turn into soft-float library calls on an FPU-less core, so run
+this with a cross toolchain and an emulator (or a board runner) to get the
+numbers that matter, e.g.:
+
+    python benchmarks/fir_fixed.py --target rp2040 \\
+        --cc arm-none-eabi-gcc --cflags "-mcpu=cortex-m0plus -O2 --specs=rdimon.specs" \\
+        --run "qemu-arm -cpu cortex-m0"
+
+With the defaults (host gcc, hardware floating point) the comparison only
+shows the cost of saturation.
+"""
+import argparse
+import contextlib
+import io
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from py2mcu import q15  # noqa: E402
+from py2mcu.compiler import Compiler  # noqa: E402
+
+RUNTIME_DIR = os.path.join(os.path.dirname(__file__), '..', 'runtime')
+
+TAPS = [0.01, 0.02, 0.04, 0.06, 0.08, 0.1, 0.12, 0.13, 0.13, 0.12, 0.1, 0.08, 0.06, 0.04, 0.02, 0.01]
+
+KERNEL = """
+SAMPLES = {samples}
+TAPS = {ntaps}
+
+def main():
+    taps: list[{T}] = [{taps}]
+    history: Array[{T}, {ntaps}] = [{T}(0.0)] * {ntaps}
+    acc = {T}(0.0)
+    n = 0
+    while n < SAMPLES:
+        k = TAPS - 1
+        while k > 0:
+            history[k] = history[k - 1]
+            k = k - 1
+        history[0] = {T}(0.001) * (n % 500) - {T}(0.25)
+        acc = {T}(0.0)
+        k = 0
+        while k < TAPS:
+            acc = acc + history[k] * taps[k]
+            k = k + 1
+        n = n + 1
+    print(acc)
+"""
+
+
+def kernel_source(c_type: str, samples: int) -> str:
+    taps = ", ".join(f"{c_type}({t})" for t in TAPS)
+    return KERNEL.format(T=c_type, taps=taps, ntaps=len(TAPS), samples=samples)
+
+
+def build(source: str, args, workdir: str, name: str) -> str:
+    c_file = os.path.join(workdir, f"{name}.c")
+    with open(c_file, 'w') as f:
+        f.write(Compiler(target=args.target, optimize='3').compile_string(source))
+    exe = os.path.join(workdir, name)
+    subprocess.run([args.cc, *shlex.split(args.cflags), '-I', RUNTIME_DIR, c_file,
+                    os.path.join(RUNTIME_DIR, 'gc_runtime.c'), '-o', exe, '-lm'], check=True)
+    return exe
+
+
+def run(exe: str, args) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([*shlex.split(args.run), exe], capture_output=True, text=True, check=True)
+    return result.stdout.strip(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='pc')
+    parser.add_argument('--cc', default='gcc')
+    parser.add_argument('--cflags', default='-O2')
+    parser.add_argument('--run', default='', help='command prefix, e.g. "qemu-arm -cpu cortex-m0"')
+    parser.add_argument('--samples', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Bit-exactness against the Python simulation on a short run
+        check_source = kernel_source('q15', 1000)
+        namespace = {'q15': q15}
+        exec(check_source, namespace)
+        expected = io.StringIO()
+        with contextlib.redirect_stdout(expected):
+            namespace['main']()
+        output, _ = run(build(check_source, args, workdir, 'fir_check'), args)
+        if output != expected.getvalue().strip():
+            sys.exit(f"q15 output {output} does not match the Python simulation {expected.getvalue().strip()}")
+
+        print(f"{len(TAPS)}-tap FIR, {args.samples} samples, {args.cc} {args.cflags}")
+        for c_type in ('q15', 'float'):
+            source = kernel_source(c_type, args.samples)
+            if c_type == 'float':
+                source = source.replace('float(', '(')
+            output, elapsed = run(build(source, args, workdir, f"fir_{c_type}"), args)
+            print(f"  {c_type:>5}: {args.samples / elapsed / 1e6:8.2f} Msamples/s  (last output {output})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Fixed-capacity Dict lookups: throughput and probe length by load factor
+
+Fills a Dict[uint32_t, uint32_t, N] table (N = 75% of its slots) to 25%,
+50% and 75% of the slots with pseudo-random keys, then times lookups that
+hit and lookups that miss.  Average and longest probe lengths come from
+the Python model of the table (py2mcu.containers), which uses the same
+hash and probing as runtime/py2mcu_map.h.  The C checksum is checked
+against a Python dict.
+
+Run it with a cross toolchain and an emulator (or a board runner) for
+numbers on a target core, e.g.:
+
+    python benchmarks/hash_tables.py --target rp2040 \\
+        --cc arm-none-eabi-gcc --cflags "-mcpu=cortex-m0plus -O2 --specs=rdimon.specs" \\
+        --run "qemu-arm -cpu cortex-m0"
+"""
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from py2mcu.compiler import Compiler  # noqa: E402
+from py2mcu.containers import fill_slots, probe_length, table_bits  # noqa: E402
+
+RUNTIME_DIR = os.path.join(os.path.dirname(__file__), '..', 'runtime')
+
+MISS = 0x55555555
+
+KERNEL = """
+TABLE: Dict[uint32_t, uint32_t, {capacity}] = {{}}
+
+def main():
+    seed: uint32_t = 1
+    i = 0
+    while i < {fill}:
+        seed = (seed * 1664525 + 1013904223) % 4294967296
+        TABLE[seed] = i
+        i = i + 1
+    total: uint32_t = 0
+    n = 0
+    while n < {rounds}:
+        seed = 1
+        i = 0
+        while i < {fill}:
+            seed = (seed * 1664525 + 1013904223) % 4294967296
+            total = total + TABLE.get(seed, 0) + TABLE.get(seed ^ {miss}, 1)
+            i = i + 1
+        n = n + 1
+    print(total)
+"""
+
+
+def keys(fill: int) -> list:
+    seed, result = 1, []
+    for _ in range(fill):
+        seed = (seed * 1664525 + 1013904223) % 2 ** 32
+        result.append(seed)
+    return result
+
+
+def expected_total(fill: int, rounds: int) -> int:
+    table = {key: i for i, key in enumerate(keys(fill))}
+    per_round = sum(table.get(key, 0) + table.get(key ^ MISS, 1) for key in keys(fill))
+    return per_round * rounds % 2 ** 32
+
+
+def build(source: str, args, workdir: str, name: str) -> str:
+    c_file = os.path.join(workdir, f"{name}.c")
+    with open(c_file, 'w') as f:
+        f.write(Compiler(target=args.target, optimize='3').compile_string(source))
+    exe = os.path.join(workdir, name)
+    subprocess.run([args.cc, *shlex.split(args.cflags), '-I', RUNTIME_DIR, c_file,
+                    os.path.join(RUNTIME_DIR, 'gc_runtime.c'), '-o', exe, '-lm'], check=True)
+    return exe
+
+
+def run(exe: str, args) -> tuple:
+    start = time.perf_counter()
+    result = subprocess.run([*shlex.split(args.run), exe], capture_output=True, text=True, check=True)
+    return result.stdout.strip(), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='pc')
+    parser.add_argument('--cc', default='gcc')
+    parser.add_argument('--cflags', default='-O2')
+    parser.add_argument('--run', default='', help='command prefix, e.g. "qemu-arm -cpu cortex-m0"')
+    parser.add_argument('--capacity', type=int, default=768)
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    bits = table_bits(args.capacity)
+    slot_count = 1 << bits
+    print(f"Dict[uint32_t, uint32_t, {args.capacity}]: {slot_count} slots, {args.cc} {args.cflags}")
+    print("  load   hit probes avg/max   miss probes avg/max   Mlookups/s")
+    with tempfile.TemporaryDirectory() as workdir:
+        for load in (0.25, 0.5, 0.75):
+            fill = min(args.capacity, int(slot_count * load))
+            table_keys = keys(fill)
+            slots = fill_slots(table_keys, 'uint32_t', bits)
+            hits = [probe_length(slots, key, 'uint32_t', bits) for key in table_keys]
+            misses = [probe_length(slots, key ^ MISS, 'uint32_t', bits) for key in table_keys]
+
+            source = KERNEL.format(capacity=args.capacity, fill=fill, rounds=args.rounds, miss=MISS)
+            output, elapsed = run(build(source, args, workdir, f"table_{fill}"), args)
+            if int(output) != expected_total(fill, args.rounds):
+                sys.exit(f"checksum {output} does not match the Python dict at {fill} entries")
+            lookups = 2 * fill * args.rounds
+            print(f"  {100 * fill / slot_count:3.0f}%   {sum(hits) / fill:8.2f} / {max(hits):<3d}"
+                  f"        {sum(misses) / fill:8.2f} / {max(misses):<3d}        "
+                  f"{lookups / elapsed / 1e6:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ py2mcu - Python to MCU C Compiler
 
 __version__ = "0.1.0"
 
-from py2mcu.decorators import inline_c, arena, static_alloc
+from py2mcu.decorators import inline_c, arena, static_alloc, lut, comptime, unroll, pure
+from py2mcu.types import Array, Dict, Fixed, Mat, Set, Vec, View, q15, q31
 
-__all__ = ['inline_c', 'arena', 'static_alloc']
+__all__ = ['inline_c', 'arena', 'static_alloc', 'lut', 'comptime', 'unroll', 'pure', 'Array', 'Dict', 'Fixed', 'Mat', 'Set', 'Vec', 'View', 'q15', 'q31']
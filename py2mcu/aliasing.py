@@ -0,0 +1,260 @@
+"""
+Interprocedural alias analysis of array parameters
+
+A list or ``Array[T, N]`` parameter is a plain ``T*``, and GCC must assume
+it overlaps every other pointer and global array the function touches.
+That keeps loads inside loops and blocks vectorization.  This pass uses
+every call site in the module to qualify the parameters:
+
+    const      the function, and every function it passes the array on
+               to, only reads elements through the parameter
+    restrict   at every call the argument is an object that no other
+               argument (unless neither is written) and no module array
+               the function uses can refer to
+
+Arguments are traced to their object: a list the caller allocates, a
+module array, or a parameter of the caller that is itself restrict.
+Anything else (slices, lists returned by calls, renamed pointers) could
+point anywhere.  Functions called from C code, used as values or not
+called in the module keep plain pointers because their callers are
+unknown.
+"""
+import ast
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from py2mcu.analysis import build_call_graph, c_snippets, function_has_c_body, module_functions, reachable_from
+
+Param = Tuple[str, str]  # (function, parameter)
+Root = Tuple[str, ...]   # ('local', function, name), ('global', name) or ('param', function, name)
+
+
+class CallSite(NamedTuple):
+    caller: Optional[str]       # None at module level
+    node: ast.Call
+    args: Dict[str, ast.AST]    # parameter -> argument
+
+
+def _scope(node: ast.AST):
+    """Nodes of a function or module body, not entering nested functions"""
+    yield node
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            yield from _scope(child)
+
+
+def _is_allocation(value: Optional[ast.AST]) -> bool:
+    """A new list: ``[...]`` or ``[v] * n``"""
+    if isinstance(value, ast.List):
+        return True
+    return (isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mult)
+            and (isinstance(value.left, ast.List) or isinstance(value.right, ast.List)))
+
+
+class AliasAnalysis:
+    """const and restrict qualifiers of the module's pointer parameters"""
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.functions = module_functions(tree)
+        self.pointers: Dict[str, List[str]] = {}     # function -> pointer parameters
+        self.calls: Dict[str, List[CallSite]] = {}   # callee -> its call sites
+        self.written: Set[Param] = set()             # parameters stored through (or escaping)
+        self.restrict: Set[Param] = set()
+        self.reasons: Dict[Param, str] = {}          # why a parameter is not restrict
+        self.global_arrays: Set[str] = set()
+        self.local_arrays: Dict[str, Set[str]] = {}
+
+    def run(self) -> 'AliasAnalysis':
+        codegen = self.codegen
+        for name, func in self.functions.items():
+            if function_has_c_body(func):
+                continue  # what the C body does with its pointers is unknown
+            params = [param for c_type, param in codegen._param_list(func) if self._is_pointer(c_type)]
+            if params:
+                self.pointers[name] = params
+        if not self.pointers:
+            return self
+        self.global_arrays = {name for name, c_type in codegen.types.globals.items() if self._is_pointer(c_type)}
+        self.local_arrays = {name: self._local_arrays(name, func) for name, func in self.functions.items()}
+        self._collect_calls()
+        self._find_writes()
+        self._prove_restrict()
+        return self
+
+    def qualifiers(self, function: str, param: str) -> List[str]:
+        """'const' and/or 'restrict' for a parameter"""
+        if param not in self.pointers.get(function, ()):
+            return []
+        quals = [] if (function, param) in self.written else ['const']
+        return quals + (['restrict'] if (function, param) in self.restrict else [])
+
+    def report_lines(self) -> List[str]:
+        lines = []
+        for name, params in sorted(self.pointers.items()):
+            restrict = [p for p in params if (name, p) in self.restrict]
+            const = [p for p in params if (name, p) not in self.written]
+            parts = [f"restrict {', '.join(restrict)}"] if restrict else []
+            parts += [f"const {', '.join(const)}"] if const else []
+            if parts:
+                lines.append(f"{name}(): {'; '.join(parts)}")
+            for p in params:
+                if (name, p) in self.reasons:
+                    lines.append(f"{name}(): '{p}' may alias: {self.reasons[name, p]}")
+        return lines
+
+    def _is_pointer(self, c_type: Optional[str]) -> bool:
+        return (bool(c_type) and c_type.endswith('*') and c_type not in ('const char*', 'char*')
+                and c_type[:-1] not in self.codegen.containers)
+
+    def _local_arrays(self, name: str, func: ast.FunctionDef) -> Set[str]:
+        """Lists func allocates that no other binding renames"""
+        local_types = self.codegen.types.locals.get(name, {})
+        params = {arg.arg for arg in func.args.args}
+        declared_global = {n for node in _scope(func) if isinstance(node, ast.Global) for n in node.names}
+        allocations = {}  # id(target) -> name
+        for node in _scope(func):
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                length = (self.codegen._array_annotation(node.annotation) or (None, None))[1]
+                if _is_allocation(node.value) or (node.value is None and length is not None):
+                    allocations[id(node.target)] = node.target.id
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                    and _is_allocation(node.value):
+                allocations[id(node.targets[0])] = node.targets[0].id
+        other = {node.id for node in _scope(func) if isinstance(node, ast.Name)
+                 and isinstance(node.ctx, (ast.Store, ast.Del)) and id(node) not in allocations}
+        allocated = set(allocations.values())
+        return {n for n in allocated - other - params - declared_global if self._is_pointer(local_types.get(n))}
+
+    def _collect_calls(self):
+        scopes = [(None, self.tree)] + list(self.functions.items())
+        for caller, scope in scopes:
+            for node in _scope(scope):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                        and node.func.id in self.pointers):
+                    continue
+                params = [arg.arg for arg in self.functions[node.func.id].args.args]
+                args = dict(zip(params, node.args))
+                args.update({kw.arg: kw.value for kw in node.keywords if kw.arg})
+                if any(isinstance(arg, ast.Starred) for arg in node.args):
+                    args = {}
+                self.calls.setdefault(node.func.id, []).append(CallSite(caller, node, args))
+
+    def _find_writes(self):
+        """Parameters stored through, or used other than by element reads and len(); to a fixpoint"""
+        flows: List[Tuple[Param, Param]] = []
+        for name, params in self.pointers.items():
+            func = self.functions[name]
+            parents = {id(child): node for node in _scope(func) for child in ast.iter_child_nodes(node)}
+            for node in _scope(func):
+                if not (isinstance(node, ast.Name) and node.id in params):
+                    continue
+                parent = parents.get(id(node))
+                if isinstance(node.ctx, ast.Load) and isinstance(parent, ast.Subscript) and parent.value is node \
+                        and isinstance(parent.ctx, ast.Load) and not isinstance(parent.slice, ast.Slice):
+                    continue  # p[i]
+                if isinstance(parent, ast.Call) and isinstance(parent.func, ast.Name) and node in parent.args:
+                    callee = parent.func.id
+                    if callee == 'len':
+                        continue
+                    position = parent.args.index(node)
+                    callee_params = self.functions[callee].args.args if callee in self.pointers else []
+                    if position < len(callee_params) and callee_params[position].arg in self.pointers[callee] \
+                            and not any(isinstance(arg, ast.Starred) for arg in parent.args):
+                        flows.append(((name, node.id), (callee, callee_params[position].arg)))
+                        continue
+                self.written.add((name, node.id))
+        changed = True
+        while changed:
+            changed = False
+            for source, target in flows:
+                if target in self.written and source not in self.written:
+                    self.written.add(source)
+                    changed = True
+
+    def _unknown_callers(self) -> Dict[str, str]:
+        """Functions whose callers are not all visible, with the reason"""
+        called = {id(node.func) for node in ast.walk(self.tree) if isinstance(node, ast.Call)}
+        unknown = {}
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Name) and node.id in self.pointers and id(node) not in called:
+                unknown.setdefault(node.id, f"used as a value at line {node.lineno}")
+        for snippet in c_snippets(self.tree):
+            for name in self.pointers:
+                if re.search(rf'\b{re.escape(name)}\s*\(', snippet.value):
+                    unknown.setdefault(name, "called from C code")
+        for name in self.pointers:
+            if name not in self.calls:
+                unknown.setdefault(name, "no calls in this module")
+        return unknown
+
+    def _globals_used(self, name: str, graph: Dict[str, Set[str]]) -> Set[str]:
+        """Module arrays name and the functions it calls refer to"""
+        used = set()
+        for function in reachable_from(graph, name) | {name}:
+            func = self.functions[function]
+            used.update(node.id for node in ast.walk(func) if isinstance(node, ast.Name) and node.id in self.global_arrays)
+            for snippet in c_snippets(func):
+                used.update(g for g in self.global_arrays if re.search(rf'\b{re.escape(g)}\b', snippet.value))
+        return used
+
+    def _root(self, caller: Optional[str], node: ast.AST) -> Optional[Root]:
+        """The object an argument refers to, None if it could be anything"""
+        if not isinstance(node, ast.Name):
+            return None
+        if caller is not None:
+            func = self.functions[caller]
+            if node.id in {arg.arg for arg in func.args.args}:
+                return ('param', caller, node.id) if (caller, node.id) in self.restrict else None
+            if node.id in self.local_arrays[caller]:
+                return ('local', caller, node.id)
+            declared_global = any(isinstance(child, ast.Global) and node.id in child.names for child in _scope(func))
+            if not declared_global and any(isinstance(child, ast.Name) and child.id == node.id
+                                           and isinstance(child.ctx, ast.Store) for child in _scope(func)):
+                return None  # a local bound to something else
+        return ('global', node.id) if node.id in self.global_arrays else None
+
+    def _alias_reason(self, name: str, param: str, used: Set[str]) -> Optional[str]:
+        for site in self.calls[name]:
+            line = site.node.lineno
+            arg = site.args.get(param)
+            root = self._root(site.caller, arg) if arg is not None else None
+            if root is None:
+                text = self.codegen._source_text(arg) if arg is not None else param
+                return f"line {line}: '{text}' could point anywhere"
+            if root[0] == 'global' and root[1] in used:
+                return f"line {line}: '{root[1]}' is a module array {name}() also uses"
+            for other in self.pointers[name]:
+                if other == param or other not in site.args:
+                    continue
+                if (name, param) not in self.written and (name, other) not in self.written:
+                    continue  # reads only: sharing is harmless
+                other_root = self._root(site.caller, site.args[other])
+                if other_root == root:
+                    return f"line {line}: '{param}' and '{other}' both get '{root[-1]}'"
+                if other_root is None:
+                    return f"line {line}: '{self.codegen._source_text(site.args[other])}' for '{other}' " \
+                           f"could point anywhere"
+        return None
+
+    def _prove_restrict(self):
+        """Largest set of restrict parameters consistent with every call site"""
+        unknown = self._unknown_callers()
+        graph = build_call_graph(self.tree)
+        used = {name: self._globals_used(name, graph) for name in self.pointers}
+        for name, params in self.pointers.items():
+            for param in params:
+                if name in unknown:
+                    self.reasons[name, param] = unknown[name]
+                else:
+                    self.restrict.add((name, param))
+        changed = True
+        while changed:
+            changed = False
+            for name, param in sorted(self.restrict):
+                reason = self._alias_reason(name, param, used[name])
+                if reason is not None:
+                    self.restrict.discard((name, param))
+                    self.reasons[name, param] = reason
+                    changed = True
@@ -0,0 +1,234 @@
+"""
+Whole-module AST analyses shared by the optimization passes
+"""
+import ast
+import re
+from typing import Dict, List, Optional, Set
+
+_C_ALLOC_RE = re.compile(r'\b(gc_malloc_at|gc_malloc|malloc|calloc|realloc)\s*\(')
+
+
+def function_has_c_body(node: ast.FunctionDef) -> bool:
+    """True if codegen replaces the Python body with inline C
+
+    Mirrors ``CCodeGenerator``: a docstring containing ``__C_CODE__`` or an
+    ``@inline_c`` decorator.
+    """
+    for decorator in node.decorator_list:
+        if (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name)
+                and decorator.func.id == 'inline_c'):
+            return True
+    docstring = ast.get_docstring(node, clean=False)
+    return bool(docstring) and '__C_CODE__' in docstring
+
+
+def c_snippets(node: ast.AST) -> List[ast.Constant]:
+    """Return the inline C string constants under node
+
+    These are strings carrying ``__C_CODE__`` plus literal ``@inline_c(...)``
+    arguments.
+    """
+    snippets = []
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Constant) and isinstance(child.value, str)
+                and '__C_CODE__' in child.value):
+            snippets.append(child)
+        elif isinstance(child, ast.FunctionDef):
+            for decorator in child.decorator_list:
+                if (isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name)
+                        and decorator.func.id == 'inline_c' and decorator.args
+                        and isinstance(decorator.args[0], ast.Constant)
+                        and isinstance(decorator.args[0].value, str)):
+                    snippets.append(decorator.args[0])
+    return snippets
+
+
+def find_c_allocations(node: ast.AST) -> List[tuple]:
+    """Find heap allocation calls inside inline C snippets
+
+    Returns:
+        List of (function_name, lineno) tuples, lineno pointing at the Python
+        source line that holds the C call.
+    """
+    found = []
+    for snippet in c_snippets(node):
+        for offset, line in enumerate(snippet.value.split('\n')):
+            match = _C_ALLOC_RE.search(line)
+            if match:
+                found.append((match.group(1), snippet.lineno + offset))
+    return found
+
+
+def global_names(tree: ast.Module) -> Set[str]:
+    """Names rebound through a ``global`` statement in any function"""
+    names: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Global):
+            names.update(node.names)
+    return names
+
+
+def collect_module_constants(tree: ast.Module) -> Dict[str, int]:
+    """Collect module-level names that hold compile-time integer constants
+
+    Includes ``@#define`` constants and plain module assignments whose value
+    folds to an int and that no function rebinds with ``global``.
+    """
+    constants: Dict[str, int] = {}
+    rebound = global_names(tree)
+
+    for d in getattr(tree, 'py2mcu_defines', None) or []:
+        try:
+            value_node = ast.parse(d['value'], mode='eval').body
+        except SyntaxError:
+            continue
+        value = eval_const_int(value_node, constants)
+        if value is not None:
+            constants[d['name']] = value
+
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value:
+            targets = [node.target]
+        elif isinstance(node, ast.Assign):
+            targets = [t for t in node.targets if isinstance(t, ast.Name)]
+        else:
+            continue
+        value = eval_const_int(node.value, constants)
+        if value is None:
+            continue
+        for target in targets:
+            if target.id not in rebound:
+                constants[target.id] = value
+
+    return constants
+
+
+_CONST_BINOPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.LShift: lambda a, b: a << b,
+    ast.RShift: lambda a, b: a >> b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitXor: lambda a, b: a ^ b,
+}
+
+
+def eval_const_int(node: ast.AST, constants: Dict[str, int]) -> Optional[int]:
+    """Fold an integer expression built from literals and known constants
+
+    Returns None when the value is not known at compile time.
+    """
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, int) and not isinstance(node.value, bool):
+            return node.value
+        return None
+    if isinstance(node, ast.Name):
+        return constants.get(node.id)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = eval_const_int(node.operand, constants)
+        if value is None:
+            return None
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in _CONST_BINOPS:
+        left = eval_const_int(node.left, constants)
+        right = eval_const_int(node.right, constants)
+        if left is None or right is None:
+            return None
+        try:
+            return _CONST_BINOPS[type(node.op)](left, right)
+        except (ZeroDivisionError, ValueError):
+            return None
+    return None
+
+
+def module_functions(tree: ast.Module) -> Dict[str, ast.FunctionDef]:
+    """Map function name to its definition for top-level functions"""
+    return {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+
+
+def build_call_graph(tree: ast.Module) -> Dict[str, Set[str]]:
+    """Build caller -> callees edges between the module's functions
+
+    Calls are taken from the Python body and, for functions implemented in
+    C, from identifiers followed by ``(`` inside their ``__C_CODE__`` text.
+    """
+    functions = module_functions(tree)
+    graph: Dict[str, Set[str]] = {name: set() for name in functions}
+
+    for name, func in functions.items():
+        if not function_has_c_body(func):
+            for node in ast.walk(func):
+                if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                    if node.func.id in functions:
+                        graph[name].add(node.func.id)
+        for snippet in c_snippets(func):
+            for callee in functions:
+                if re.search(rf'\b{re.escape(callee)}\s*\(', snippet.value):
+                    graph[name].add(callee)
+    return graph
+
+
+def reachable_from(graph: Dict[str, Set[str]], root: str) -> Set[str]:
+    """Functions reachable from root (root included if it exists)"""
+    if root not in graph:
+        return set()
+    seen = {root}
+    stack = [root]
+    while stack:
+        for callee in graph[stack.pop()]:
+            if callee not in seen:
+                seen.add(callee)
+                stack.append(callee)
+    return seen
+
+
+def recursive_functions(graph: Dict[str, Set[str]]) -> Set[str]:
+    """Functions that can reach themselves through the call graph"""
+    result = set()
+    for name in graph:
+        for callee in graph[name]:
+            if name in reachable_from(graph, callee):
+                result.add(name)
+                break
+    return result
+
+
+def returned_names(func: ast.FunctionDef) -> Set[str]:
+    """Names that appear directly in a ``return`` statement of func"""
+    names = set()
+    for node in ast.walk(func):
+        if isinstance(node, ast.Return) and isinstance(node.value, ast.Name):
+            names.add(node.value.id)
+    return names
+
+
+def list_is_read_only(func: ast.FunctionDef, name: str) -> bool:
+    """True if the local list ``name`` is bound once and only ever read
+
+    Reads are ``name[i]`` loads and ``len(name)``.  Passing the list to a
+    call, returning it, storing through it or rebinding the name all count
+    as potential mutation.
+    """
+    readers = set()
+    for node in ast.walk(func):
+        if (isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load)
+                and isinstance(node.value, ast.Name) and node.value.id == name
+                and not isinstance(node.slice, ast.Slice)):  # a slice is a writable view
+            readers.add(id(node.value))
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id == 'len' and len(node.args) == 1
+                and isinstance(node.args[0], ast.Name) and node.args[0].id == name):
+            readers.add(id(node.args[0]))
+
+    bindings = 0
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name) and node.id == name:
+            if isinstance(node.ctx, ast.Store):
+                bindings += 1
+            elif isinstance(node.ctx, ast.Del) or id(node) not in readers:
+                return False
+    return bindings == 1
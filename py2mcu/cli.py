@@ -16,13 +16,19 @@ def main():
 @click.option('--target', default='pc', help='Target platform (pc, stm32f4, esp32, rp2040)')
 @click.option('--output', '-o', default='build', help='Output directory')
 @click.option('--optimize', '-O', default='2', help='Optimization level (0-3)')
-def compile(source, target, output, optimize):
+@click.option('--no-heap', is_flag=True, help='Forbid dynamic allocation; place all lists in static storage')
+@click.option('--ram-budget', type=int, default=None, help='RAM budget in bytes (overrides the target default)')
+@click.option('--report', is_flag=True, help='Print the optimization/resource report')
+@click.option('--double-promotion', type=click.Choice(['warn', 'error', 'ignore']), default='warn',
+              help='How to treat implicit float-to-double promotion')
+def compile(source, target, output, optimize, no_heap, ram_budget, report, double_promotion):
     """Compile Python source to C code"""
     click.echo(f"Compiling {source} for {target}...")
 
     from py2mcu.compiler import Compiler
 
-    compiler = Compiler(target=target, optimize=optimize)
+    compiler = Compiler(target=target, optimize=optimize, no_heap=no_heap, ram_budget=ram_budget,
+                        double_promotion=double_promotion)
 
     try:
         c_code = compiler.compile_file(source)
@@ -35,6 +41,14 @@ def compile(source, target, output, optimize):
 
         click.echo(f"✓ Generated: {output_file}")
 
+        for warning in compiler.report.warnings:
+            click.echo(warning, err=True)
+
+        if report or no_heap:
+            text = compiler.report.format()
+            if text:
+                click.echo(text)
+
     except Exception as e:
         click.echo(f"✗ Error: {e}", err=True)
         sys.exit(1)
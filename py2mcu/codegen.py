@@ -2,16 +2,51 @@
 C code generator from Python AST
 """
 import ast
+import contextlib
 import json
-from typing import List, Dict
-from .parser import extract_variable_modifiers
+import math
+from typing import List, Dict, Optional, Tuple
+from .parser import extract_unroll_pragma, extract_variable_modifiers
+from .aliasing import AliasAnalysis
+from .analysis import (collect_module_constants, eval_const_int, function_has_c_body, global_names,
+                       list_is_read_only, module_functions, returned_names)
+from .comptime import CompileTimeEvaluator, ConstantFolder
+from .constdict import ConstDictBuilder, Handler
+from .containers import METHODS, container_annotation
+from .dispatch import (SWITCH_MIN_VALUES, constant_values, contains_loop_break, first_match_only,
+                       if_chain_cases, match_cases, membership_mask)
+from .elementwise import (array_elem, cmsis_function, cmsis_pattern, is_array_expr, is_array_leaf,
+                          operand_names, rewrite_numpy)
+from .errors import CompileError
+from .fixed import NAMED_FORMATS, annotation_format, format_of_c_type
+from .idioms import KERNEL_TYPES, find_loop_idioms, short_name
+from .loopopt import LoopOptimizer
+from .purity import CommonSubexpressions, PurityAnalysis
+from .specialize import Specializer
+from .matrices import (MAX_INVERSE, NUMPY_FILLS, MatrixType, fill_value, inverse_body, is_element_type,
+                       matrix_annotation, matrix_call, result_shape)
+from .unrolling import find_unrolls
+from .floats import (FLOAT_MAX, MATH_CONSTANTS, MATH_FUNCTIONS, MATH_MACROS, exact_reciprocal,
+                     fits_float, float_literal, suffix_float_literals)
+from .inference import INT_TYPES, TypeInference, is_fixed_type, is_float_type, is_int_type, printf_conversion
+from .tables import VALUES_PER_LINE, LutBuilder
+from .views import BYTE_TYPES, bytes_literal, constant_slice, nominal_length, view_annotation, view_name
+from .memory import MemoryPlanner, c_sizeof
+from .ranges import TYPE_RANGES, RangeAnalysis, format_interval, is_power_of_two, narrow_int_type
+from .report import Report
+from .structs import (constant_format, from_bytes, is_from_bytes, load, parse_format, store,
+                      struct_call, values)
+from .simd import (LANE_TYPES, VECTOR_BYTES, SimdLoop, dsp_pattern, elementwise_nodes, guaranteed_alignment,
+                   lane_type, saturating_pattern, scalar_operands, simd_operands, vector_name)
+from .targets import get_target_info
 
 class CCodeGenerator(ast.NodeVisitor):
     """
     Generate C code from Python AST
     """
 
-    def __init__(self, target: str = 'pc'):
+    def __init__(self, target: str = 'pc', no_heap: bool = False, ram_budget: Optional[int] = None,
+                 optimize: int = 2, double_promotion: str = 'warn'):
         # Accept either "pc" or the macro name "TARGET_PC" etc.  Normalize to the
         # short lowercase form for internal logic but keep a canonical macro
         # string for emitting #define directives later.
@@ -25,25 +60,135 @@ class CCodeGenerator(ast.NodeVisitor):
         self.indent_level = 0
         # PC target needs time.h for nanosleep and stdlib.h for rand
         if self.target == 'pc':
-            self.includes = set(['<stdint.h>', '<stdbool.h>', '<stdio.h>', '<time.h>', '<stdlib.h>'])
+            self.includes = set(['<stdint.h>', '<stdbool.h>', '<stdio.h>', '<string.h>', '<time.h>', '<stdlib.h>'])
         else:
-            self.includes = set(['<stdint.h>', '<stdbool.h>', '<stdio.h>'])
+            self.includes = set(['<stdint.h>', '<stdbool.h>', '<stdio.h>', '<string.h>'])
         self.in_function = False  # Track if we're inside a function
         self.local_vars = set()  # Track declared local variables
         self.defined_names = set(['printf', 'print'])  # Track names defined in C
         self.define_names = set()  # Names from @#define
         self.string_vars = set()   # Track variables that are strings
+        self.current_function: Optional[str] = None
+        self.static_alloc = False  # Current function is decorated @static_alloc
+        self.const_lists = set()   # Read-only constant lists of the current function
+        self._returned_names = set()
+        self.array_elem_types: Dict[str, str] = {}         # Arrays visible in the current scope
+        self.global_array_elem_types: Dict[str, str] = {}  # Module-level arrays
+        self.module_int_constants: Dict[str, int] = {}
+        self.function_defs: Dict[str, ast.FunctionDef] = {}
+        self.types: Optional[TypeInference] = None
+        self.return_type: Optional[str] = None   # C return type of the current function
+        self.fixed_formats = {}                  # C type -> FixedFormat used in the module
+        self.luts = {}                           # @lut function name -> LookupTable
+        self.const_dicts = {}                    # module-level constant dict name -> ConstDict
+        self.containers = {}                     # C type -> ContainerType of Dict[K, V, N] / Set[K, N]
+        self.container_params = set()            # container parameters (pointers) of the current function
+        self.views: Dict[str, str] = {}          # view C type -> element C type
+        self.matrices: Dict[str, MatrixType] = {}  # Mat/Vec C type -> its MatrixType
+        self.matrix_helpers: Dict[str, List[str]] = {}  # np.linalg.inv() helper -> its lines
+        self.matrix_products = 0                # multiply-adds unrolled for the current statement
+        self.array_lengths: Dict[str, int] = {}  # constant lengths of arrays in the current scope
+        self.global_array_lengths: Dict[str, int] = {}
+        self.view_lengths: Dict[str, int] = {}   # views of the current function with a constant length
+        self.global_view_lengths: Dict[str, int] = {}  # module bytes objects of constant length
+        self.evaluator: Optional[CompileTimeEvaluator] = None
+        self.comptime_functions = set()          # @comptime functions (folded, not emitted)
+        self.local_types: Dict[str, str] = {}  # inferred locals of the current function
+
+        # Value-range analysis (-O1 and above)
+        self.optimize_level = optimize
+        self.narrow_types: Dict[str, str] = {}  # int locals of the current function
+        self.nonneg_ops = set()                 # ids of // and % nodes with left >= 0
+        self.safe_indexes = set()               # ids of view subscripts proven in range
+        self.loop_idioms = {}                   # id(while) -> recognized fill/copy/reduction loop
+        self.loop_plans = {}                    # id(while) -> LoopPlan (hoisting, strength reduction)
+        self.loop_unrolls = {}                  # id(while) -> Unroll
+        self.cse_temps = {}                     # id(statement) -> common subexpressions computed before it
+        self.fresh_arrays = set()               # arrays allocated by the current function
+        self.loop_kernels: Dict[str, str] = {}  # py2mcu_loops.h kernel -> its DEFINE line
+        self.array_helpers: List[str] = []      # fused reductions of array expressions
+        self.array_reductions: Dict[int, str] = {}  # id(call) -> its helper function
+        self.uses_cmsis_dsp = False
+        self.simd_arrays = set()                # names worth aligned storage (-O2, SIMD targets)
+        self.aligned_arrays: Dict[str, int] = {}  # arrays in scope declared aligned -> bytes
+        self.global_aligned_arrays: Dict[str, int] = {}
+        self.simd_vectors: Dict[str, str] = {}  # vector typedef -> its DEFINE line
+        self.uses_simd = False
+
+        # Float discipline: 'warn', 'error' or 'ignore' implicit double promotion
+        self.double_promotion = double_promotion
+        self.fpu = get_target_info(self.target)['fpu']
+
+        # --no-heap: every list gets static storage planned by MemoryPlanner
+        self.no_heap = no_heap
+        self.ram_budget = ram_budget
+        self.memory_plan: Optional[MemoryPlanner] = None
+        self.aliasing: Optional[AliasAnalysis] = None  # const/restrict of pointer parameters (-O1 and above)
+        self.purity: Optional[PurityAnalysis] = None   # const/pure functions (-O1 and above)
+        self.specializer: Optional[Specializer] = None  # clones for constant arguments (-O2 and above)
+        self.report = Report()
 
     def generate(self, tree: ast.Module) -> str:
         """Generate C code from AST"""
         # Store source code for modifier extraction
         if hasattr(tree, '_source'):
             self._source_code = tree._source
-        
+        self._source_file = getattr(tree, '_filename', '<string>')
+        self.numpy_names = rewrite_numpy(tree)
+        self.simd_arrays = simd_operands(tree) if self._simd_mode() else set()
+
         self.code = []
+        self.report.clear()
+        self.array_elem_types = {}
+        self.global_array_elem_types = {}
         
         # First pass: collect all defined names (functions, global variables)
         self._collect_defined_names(tree)
+        self._collect_fixed_formats(tree)
+        self.module_int_constants = collect_module_constants(tree)
+        self._collect_containers(tree)
+        self.views = {}
+        self.matrices = {}
+        self.global_array_lengths = self._array_lengths(tree.body)
+        self.global_view_lengths = self._global_bytes_lengths(tree)
+        self.uses_byte_access = any(struct_call(node, 'unpack', 'unpack_from', 'pack_into') or is_from_bytes(node)
+                                    for node in ast.walk(tree))
+        self.function_defs = module_functions(tree)
+        self.const_dicts = ConstDictBuilder(self, tree).run()
+        self.types = TypeInference(self, tree).run()
+        self.evaluator = CompileTimeEvaluator(tree, self._source_file, map_type=self._map_type)
+        self.luts = LutBuilder(self, tree).run()
+        for table in self.luts.values():
+            self.report.add('Lookup tables', self._lut_summary(table))
+        for table in self.const_dicts.values():
+            self.report.add('Constant dicts', self._const_dict_summary(table))
+        for container in sorted(self.containers.values(), key=lambda c: c.name):
+            self.report.add('Hash tables', self._container_summary(container))
+        if (self.luts or self.const_dicts) and self.target == 'arduino':
+            self.includes.add('<avr/pgmspace.h>')
+        self.comptime_functions = ConstantFolder(self, tree).run().comptime
+        self.specializer = Specializer(self, tree).run()
+        for line in self.specializer.report_lines():
+            self.report.add('Specialization', line)
+        self.function_defs = module_functions(tree)
+        self.aliasing = None
+        if self.optimize_level >= 1:
+            self.aliasing = AliasAnalysis(self, tree).run()
+            for line in self.aliasing.report_lines():
+                self.report.add('Aliasing', line)
+        self.purity = None
+        if self.optimize_level >= 1:
+            self.purity = PurityAnalysis(self, tree).run()
+            for line in self.purity.report_lines():
+                self.report.add('Purity', line)
+        self._scan_library_usage(tree)
+
+        # Whole-program static storage assignment (raises CompileError)
+        self.memory_plan = None
+        if self.no_heap:
+            self.memory_plan = MemoryPlanner(self, tree, self.ram_budget).plan()
+            for line in self.memory_plan.report_lines():
+                self.report.add('RAM footprint', line)
 
         # Add includes
         self._add_includes()
@@ -66,9 +211,78 @@ class CCodeGenerator(ast.NodeVisitor):
         self.emit('#include "gc_runtime.h"')
         self.emit("")
 
+        if self.fixed_formats:
+            self.emit('#include "py2mcu_fixed.h"')
+            for fmt in sorted(self.fixed_formats.values(), key=lambda f: f.name):
+                limits = f"INT{fmt.bits}_MIN, INT{fmt.bits}_MAX"
+                self.emit(f"PY2MCU_FIXED_DEFINE({fmt.name}, {fmt.storage_type}, {fmt.wide_type}, "
+                          f"{fmt.frac_bits}, {limits})")
+            self.emit("")
+
+        if self.const_dicts:
+            self.emit('#include "py2mcu_hash.h"')
+            self.emit("")
+
+        if self.containers:
+            self.emit('#include "py2mcu_map.h"')
+            for container in sorted(self.containers.values(), key=lambda c: c.name):
+                self.emit(container.define())
+            self.emit("")
+
+        if self.views:
+            self.emit('#include "py2mcu_view.h"')
+            for c_type, elem_type in sorted(self.views.items()):
+                self.emit(f"PY2MCU_VIEW_DEFINE({c_type[:-2]}, {elem_type})")
+            self.emit("")
+
+        if self.uses_byte_access:
+            self.emit('#include "py2mcu_bytes.h"')
+            self.emit("")
+
+        # Kernels are registered while the functions are generated
+        self.loop_kernels = {}
+        self.array_helpers = []
+        self.array_reductions = {}
+        self.uses_cmsis_dsp = False
+        self.simd_vectors = {}
+        self.uses_simd = False
+        self.matrix_helpers = {}
+        self.global_aligned_arrays = {}
+        self.aligned_arrays = {}
+        kernels_at = len(self.code)
+
+        if self._uses_membership_mask(tree):
+            self.emit("// x in (constants below 32) is a single bit test")
+            self.emit("static inline bool py2mcu_in_mask(uint32_t value, uint32_t mask) {")
+            self.emit("    return value < 32u && ((mask >> value) & 1u);")
+            self.emit("}")
+            self.emit("")
+
+        if self.memory_plan and self.memory_plan.overlay_size:
+            self.emit("// Overlay region shared by buffers of functions that are never live together")
+            self.emit(f"static union {{ uint8_t bytes[{self.memory_plan.overlay_size}]; uint64_t align; }} py2mcu_overlay;")
+            self.emit("")
+
         # Visit all nodes and generate their code
         self.visit(tree)
 
+        helpers = list(self.array_helpers)
+        if self.matrices:
+            defines = [matrix.define() for _, matrix in sorted(self.matrices.items())]
+            inverses = [line for _, lines in sorted(self.matrix_helpers.items()) for line in lines]
+            helpers[:0] = ['#include "py2mcu_matrix.h"'] + defines + [""] + inverses
+        if self.uses_simd:
+            vectors = [f"{line};" for _, line in sorted(self.simd_vectors.items())]
+            if vectors:
+                vectors = ["#if PY2MCU_SIMD_VECTOR"] + vectors + ["#endif"]
+            helpers[:0] = ['#include "py2mcu_simd.h"'] + vectors + [""]
+        if self.uses_cmsis_dsp:
+            helpers[:0] = ["#ifdef PY2MCU_USE_CMSIS_DSP", '#include "arm_math.h"', "#endif", ""]
+        if self.loop_kernels:
+            defines = [line for _, line in sorted(self.loop_kernels.items()) if line]
+            helpers[:0] = ['#include "py2mcu_loops.h"'] + defines + [""]
+        self.code[kernels_at:kernels_at] = helpers
+
         # produce final string, guaranteeing trailing newline
         result = '\n'.join(self.code)
         if not result.endswith('\n'):
@@ -139,6 +353,8 @@ class CCodeGenerator(ast.NodeVisitor):
             
             # Convert Python values to C format
             c_value = self._python_value_to_c(value)
+            if c_type != 'double' and not c_value.startswith('"'):
+                c_value = suffix_float_literals(c_value)
             
             if c_type:
                 # Typed constant: #define LED_PIN ((uint8_t)13)
@@ -182,6 +398,11 @@ class CCodeGenerator(ast.NodeVisitor):
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
         """Generate C function from Python function"""
+        if node.name in self.luts:
+            self._emit_lut(self.luts[node.name])
+            return
+        if node.name in self.comptime_functions:
+            return
 
         # Special handling for main() function
         if node.name == "main":
@@ -193,7 +414,13 @@ class CCodeGenerator(ast.NodeVisitor):
                 self.emit("void main(void) {")
             self.indent_level += 1
             self.in_function = True
-            self.local_vars.clear()
+            self.current_function = node.name
+            self.local_types = self.types.locals.get(node.name, {})
+            self._begin_array_scope(node)
+            self.static_alloc = False
+            self.const_lists = self._find_const_lists(node)
+            self._returned_names = returned_names(node)
+            self.local_vars = set(global_names(node))
 
             # Check for inline C in the main docstring.  This mirrors the
             # behaviour of non-main functions: if present, the C snippet replaces
@@ -208,6 +435,9 @@ class CCodeGenerator(ast.NodeVisitor):
                         self.emit(stripped)
             else:
                 # Generate function body from Python statements
+                self._analyze_ranges(node)
+                self._float_report(node)
+                self._plan_cse(node)
                 for stmt in node.body:
                     self.visit(stmt)
 
@@ -215,15 +445,20 @@ class CCodeGenerator(ast.NodeVisitor):
             # if self.target == "pc":
             #     self.emit("return 0;")
 
+            self._end_cse()
             self.in_function = False
+            self.current_function = None
+            self.narrow_types = {}
+            self.nonneg_ops = set()
+            self.safe_indexes = set()
+            self.local_types = {}
             self.local_vars.clear()
             self.indent_level -= 1
             self.emit("}")
             self.emit("")
             return
 
-        # Get return type
-        return_type = self._map_type(node.returns) if node.returns else "void"
+        return_type = self._function_return_type(node)
 
         # Check for decorators
         inline_c_text = None
@@ -248,19 +483,24 @@ class CCodeGenerator(ast.NodeVisitor):
                 elif decorator.id == 'static_alloc':
                     is_static = True
 
-        # Generate parameter list
-        params = []
-        for arg in node.args.args:
-            arg_type = self._map_type(arg.annotation) if arg.annotation else "int32_t"
-            params.append(f"{arg_type} {arg.arg}")
-
+        params = [f"{arg_type} {arg_name}" for arg_type, arg_name in self._param_list(node)]
         params_str = ", ".join(params) if params else "void"
 
         # Function signature
-        self.emit(f"{return_type} {node.name}({params_str}) {{")
+        self.return_type = return_type
+        attribute = self.purity.attribute(node, return_type) if self.purity else None
+        self.emit(f"{attribute + ' ' if attribute else ''}{return_type} {node.name}({params_str}) {{")
         self.indent_level += 1
         self.in_function = True
-        self.local_vars.clear()  # Reset local variables for this function
+        self.current_function = node.name
+        self.local_types = self.types.locals.get(node.name, {})
+        self._begin_array_scope(node)
+        self.static_alloc = is_static
+        self.const_lists = self._find_const_lists(node)
+        self._returned_names = returned_names(node)
+        # Parameters and globals are declared already; assigning them declares nothing
+        self.local_vars = {name for _, name in self._param_list(node)} | global_names(node)
+        self.container_params = {name for c_type, name in self._param_list(node) if c_type[:-1] in self.containers}
 
         if use_arena:
             self.emit("// Using arena allocation (placeholder)")
@@ -281,19 +521,622 @@ class CCodeGenerator(ast.NodeVisitor):
                     self.emit(stripped)
         else:
             # Generate from Python body
+            self._analyze_ranges(node)
+            self._float_report(node)
+            self._plan_loops(node)
+            self._plan_cse(node)
             for stmt in node.body:
                 self.visit(stmt)
 
+        self._end_cse()
         self.in_function = False
+        self.current_function = None
+        self.container_params = set()
+        self.narrow_types = {}
+        self.nonneg_ops = set()
+        self.safe_indexes = set()
+        self.loop_plans = {}
+        self.loop_unrolls = {}
+        self.local_types = {}
+        self.return_type = None
         self.local_vars.clear()
         self.indent_level -= 1
         self.emit("}")
         self.emit("")
 
+    def _function_return_type(self, node: ast.FunctionDef) -> str:
+        if node.returns:
+            return self._map_type(node.returns)
+        return self.types.returns.get(node.name, "void")
+
+    def _param_list(self, node: ast.FunctionDef) -> List[tuple]:
+        """(C type, name) of each parameter"""
+        params = []
+        for arg in node.args.args:
+            c_type = self._map_type(arg.annotation) if arg.annotation else "int32_t"
+            if c_type in self.containers:
+                c_type += "*"  # tables are passed by reference
+            qualifiers = self.aliasing.qualifiers(node.name, arg.arg) if self.aliasing else []
+            if 'const' in qualifiers:
+                c_type = f"const {c_type}"
+            if 'restrict' in qualifiers:
+                c_type = f"{c_type} restrict"
+            params.append((c_type, arg.arg))
+        return params
+
+    def _analyze_ranges(self, node: ast.FunctionDef):
+        """Pick narrow types for int locals and find // and % safe to shift/mask"""
+        if self.optimize_level < 1 or function_has_c_body(node):
+            return
+        analysis = RangeAnalysis(self, node, self.module_int_constants).run()
+        word_bits = get_target_info(self.target)['word_bits']
+        self.nonneg_ops = analysis.nonneg_ops
+        self.safe_indexes = analysis.safe_indexes
+        for name in sorted(analysis.ranges):
+            interval = analysis.ranges[name]
+            arith = analysis.arith_ranges.get(name)
+            c_type = narrow_int_type(interval, word_bits, arith)
+            if c_type:
+                self.narrow_types[name] = c_type
+                self.report.add('Integer ranges', f"{node.name}: {name} {format_interval(interval)} -> {c_type}")
+            elif narrow_int_type(interval, word_bits):
+                self.report.add('Integer ranges',
+                                f"{node.name}: {name} {format_interval(interval)} kept as int32_t "
+                                f"(used in arithmetic reaching {format_interval(arith)}, wider than 16-bit int)")
+            else:
+                self.report.add('Integer ranges',
+                                f"{node.name}: {name} {format_interval(interval)} kept as int32_t (bound not proven)")
+        for op in ast.walk(node):
+            if (isinstance(op, ast.BinOp) and isinstance(op.op, (ast.FloorDiv, ast.Mod))
+                    and self._power_of_two_divisor(op) and id(op) not in self.nonneg_ops):
+                self.report.add('Integer ranges',
+                                f"{node.name}: line {op.lineno}: '{self._expr_to_c(op)}' kept as division "
+                                f"(left operand not proven non-negative)")
+        accesses = [op for op in ast.walk(node) if isinstance(op, ast.Subscript) and self._is_view(op.value)
+                    and not isinstance(op.slice, ast.Slice)]
+        if accesses:
+            checked = [op for op in accesses if id(op) not in self.safe_indexes]
+            self.report.add('Bounds checks', f"{node.name}: {len(accesses) - len(checked)} of {len(accesses)} "
+                                             f"view accesses unchecked (index proven in range)")
+            for op in checked:
+                self.report.add('Bounds checks', f"{node.name}: line {op.lineno}: "
+                                                 f"'{self._expr_to_c(op.value)}[{self._expr_to_c(op.slice)}]' checked "
+                                                 f"(index not proven in range)")
+
+    def _power_of_two_divisor(self, node: ast.BinOp) -> Optional[int]:
+        """Constant right operand of node if it is a power of two"""
+        value = eval_const_int(node.right, self.module_int_constants)
+        return value if is_power_of_two(value) else None
+
+    def _local_int_type(self, var_name: str, var_type: str) -> str:
+        """Narrowed type for an int local declaration, else var_type"""
+        if var_type == 'int32_t':
+            return self.narrow_types.get(var_name, var_type)
+        return var_type
+
+    def _printf_arg(self, node: ast.AST, spec: Optional[str] = None) -> tuple:
+        """Return (conversion, argument) to print node with printf
+
+        The conversion follows the inferred C type; spec is an f-string
+        format spec such as ``.2f``.  Narrowed locals are passed as int.
+        """
+        expr = self._expr_to_c(node)
+        if isinstance(node, ast.Name) and node.id in self.narrow_types:
+            return (f"%{spec}" if spec else "%d"), f"(int){expr}"
+        if isinstance(node, ast.Name) and node.id in self.string_vars:
+            return "%s", expr
+        c_type = getattr(node, 'c_type', None)
+        fixed = format_of_c_type(c_type)
+        if fixed is not None:
+            return (f"%{spec}" if spec else "%g"), f"(double){fixed.name}_to_float({expr})"
+        fmt, cast = printf_conversion(c_type)
+        if spec:
+            return f"%{spec}", (f"(double){expr}" if c_type == 'float' else expr)
+        return fmt, (f"({cast}){expr}" if cast else expr)
+
+    def _format_spec(self, part: ast.FormattedValue) -> Optional[str]:
+        """printf-compatible spec of ``{x:.2f}``, or None"""
+        spec = part.format_spec
+        if not (isinstance(spec, ast.JoinedStr) and len(spec.values) == 1
+                and isinstance(spec.values[0], ast.Constant)):
+            return None
+        text = str(spec.values[0].value)
+        if text and text[-1] in 'diuxXeEfgGcs' and all(c in '0123456789.-+ #' for c in text[:-1]):
+            return text
+        return None
+
+    def _scan_library_usage(self, tree: ast.Module):
+        """Add <math.h>/<stdlib.h> when math.*, abs() or inf/nan literals are used"""
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'math':
+                self.includes.add('<math.h>')
+            elif (isinstance(node, ast.Constant) and isinstance(node.value, float)
+                    and not math.isfinite(node.value)):
+                self.includes.add('<math.h>')  # INFINITY / NAN
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'abs' and node.args:
+                arg_type = getattr(node.args[0], 'c_type', None)
+                self.includes.add('<math.h>' if is_float_type(arg_type) else '<stdlib.h>')
+
+    def _numeric_call(self, node: ast.Call) -> Optional[str]:
+        """Lower math.*, abs(), float() and int() to C; None for other calls"""
+        func = node.func
+        args = [self._expr_to_c(arg) for arg in node.args]
+        arg_types = [getattr(arg, 'c_type', None) for arg in node.args]
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'math':
+            if func.attr in MATH_MACROS:
+                return f"{MATH_MACROS[func.attr]}({', '.join(args)})"
+            if func.attr not in MATH_FUNCTIONS:
+                return None
+            double = 'double' in arg_types
+            c_func = MATH_FUNCTIONS[func.attr][:-1] if double else MATH_FUNCTIONS[func.attr]
+            call = f"{c_func}({', '.join(args)})"
+            if func.attr in ('floor', 'ceil', 'trunc'):
+                return f"((int32_t){call})"  # these return int in Python
+            return call
+        fmt = annotation_format(func) if isinstance(func, ast.Subscript) else None
+        if isinstance(func, ast.Name) and func.id in NAMED_FORMATS:
+            fmt = NAMED_FORMATS[func.id]
+        if fmt is not None and len(node.args) == 1:
+            return self._fixed_operand(node.args[0], fmt)  # q15(x), Fixed[16, 16](x)
+        arg_fmt = format_of_c_type(arg_types[0]) if arg_types else None
+        if arg_fmt is not None and isinstance(func, ast.Name) and func.id in ('abs', 'float', 'int'):
+            suffix = {'abs': 'abs', 'float': 'to_float', 'int': 'to_int'}[func.id]
+            return f"{arg_fmt.name}_{suffix}({args[0]})"
+        if isinstance(func, ast.Name) and func.id not in self.function_defs and len(args) == 1:
+            if func.id == 'abs':
+                if is_float_type(arg_types[0]):
+                    return f"{'fabs' if arg_types[0] == 'double' else 'fabsf'}({args[0]})"
+                return f"abs({args[0]})"
+            if func.id == 'float':
+                return f"((float)({args[0]}))"
+            if func.id == 'int':
+                return f"((int32_t)({args[0]}))"
+        return None
+
+    def _lut_summary(self, table) -> str:
+        size = table.count * c_sizeof(table.c_type)
+        sampling = f", every {table.step}" if table.step != 1 else ""
+        if table.interpolated:
+            sampling += " interpolated"
+        line = (f"{table.func.name}: {table.count} x {table.c_type}{sampling} = {size} bytes flash, "
+                f"max error {table.max_error:.4g}")
+        if table.value_span:
+            line += f" ({100 * table.max_error / table.value_span:.2g}% of range)"
+        return line
+
+    # AVR reads from flash through pgm_read_*(), by element size
+    PGM_READ = {1: 'pgm_read_byte', 2: 'pgm_read_word', 4: 'pgm_read_dword'}
+
+    def _flash_load(self, c_type: str, array: str, index: str) -> str:
+        """Read one element of a table placed in flash"""
+        if self.target != 'arduino':
+            return f"{array}[{index}]"
+        if c_type == 'float':
+            read = 'pgm_read_float'
+        elif c_type.endswith(('*', '_fn')):
+            read = 'pgm_read_ptr'
+        else:
+            read = self.PGM_READ[c_sizeof(c_type)]
+        return f"(({c_type}){read}(&{array}[{index}]))"
+
+    def _lut_load(self, table, index: str) -> str:
+        """Read one element of an @lut table"""
+        return self._flash_load(table.c_type, table.name, index)
+
+    def _emit_lut(self, table):
+        """Emit the flash table of an @lut function (and its interpolating accessor)"""
+        self.emit(f"// {table.func.name}(x) for x in {table.domain_text}")
+        progmem = " PROGMEM" if self.target == 'arduino' else ""
+        self.emit(f"static const {table.c_type} {table.name}[{table.count}]{progmem} = {{")
+        self.indent_level += 1
+        for i in range(0, table.count, VALUES_PER_LINE):
+            self.emit(", ".join(table.literals[i:i + VALUES_PER_LINE]) + ",")
+        self.indent_level -= 1
+        self.emit("};")
+        self.emit("")
+        if not table.interpolated:
+            return
+
+        x = table.func.args.args[0].arg
+        self.emit(f"static inline {table.c_type} {table.func.name}({table.param_type} {x}) {{")
+        self.indent_level += 1
+        self.emit(f"if ({x} <= {table.start}) return {self._lut_load(table, '0')};")
+        self.emit(f"if ({x} >= {table.last}) return {self._lut_load(table, str(table.count - 1))};")
+        self.emit(f"int32_t offset = (int32_t){table.offset_expr(x)};")
+        self.emit(f"int32_t i = offset / {table.step};")
+        self.emit(f"int32_t frac = offset % {table.step};")
+        if table.c_type in ('float', 'double'):
+            step = float_literal(float(table.step), double=table.c_type == 'double')
+            self.emit(f"{table.c_type} low = {self._lut_load(table, 'i')};")
+            self.emit(f"return low + ({self._lut_load(table, 'i + 1')} - low) * frac / {step};")
+        else:
+            self.emit(f"int64_t low = {self._lut_load(table, 'i')};")
+            self.emit(f"return ({table.c_type})(low + (({self._lut_load(table, 'i + 1')} - low) * frac) / {table.step});")
+        self.indent_level -= 1
+        self.emit("}")
+        self.emit("")
+
+    def _const_dict_summary(self, table) -> str:
+        size = len(table.seeds) * c_sizeof(table.seed_type)
+        size += table.count * (c_sizeof(table.key_storage) + c_sizeof(table.value_storage))
+        if table.key_kind == 'str':
+            size += sum(len(key.encode('utf-8')) + 1 for key in table.keys)
+        return f"{table.name}: {table.count} keys, {len(table.seeds)} hash buckets, {size} bytes flash"
+
+    def _emit_const_dict(self, table):
+        """Emit the perfect-hash tables of a constant dict and its lookup functions"""
+        name = table.name
+        buckets = len(table.seeds)
+        self.emit(f"// {name}: {table.count} keys, minimal perfect hash over {buckets} "
+                  f"bucket{'s' if buckets != 1 else ''}")
+        if table.value_kind == 'handler':
+            self._emit_handler_type(table)
+        self._emit_flash_array(table.seed_type, f"{name}_seeds", [str(seed) for seed in table.seeds])
+        self._emit_flash_array(table.key_storage, f"{name}_keys", [self._const_dict_literal(key) for key in table.keys])
+        self._emit_flash_array(table.value_storage, f"{name}_values",
+                               [self._const_dict_literal(value) for value in table.values])
+        self.emit("")
+
+        key_type = table.key_type
+        self.emit(f"static int32_t {name}_find({key_type} key) {{")
+        self.indent_level += 1
+        if table.key_kind == 'str':
+            self.emit("uint32_t h = py2mcu_hash_str(key);")
+        else:
+            self.emit("uint32_t h = (uint32_t)key;")
+        bucket = f"py2mcu_hash_reduce(py2mcu_hash_mix(h), {len(table.seeds)})"
+        self.emit(f"uint32_t seed = {self._flash_load(table.seed_type, f'{name}_seeds', bucket)};")
+        self.emit(f"uint32_t i = py2mcu_hash_reduce(py2mcu_hash_seeded(h, seed), {table.count});")
+        stored = self._flash_load(table.key_storage, f"{name}_keys", 'i')
+        match = f"strcmp(key, {stored}) == 0" if table.key_kind == 'str' else f"key == {stored}"
+        self.emit(f"return {match} ? (int32_t)i : -1;")
+        self.indent_level -= 1
+        self.emit("}")
+        self.emit("")
+
+        value_type = table.value_storage if table.value_kind == 'handler' else table.c_type
+        self.emit(f"static {value_type} {name}_get({key_type} key, {value_type} fallback) {{")
+        self.indent_level += 1
+        self.emit(f"int32_t i = {name}_find(key);")
+        self.emit(f"return i < 0 ? fallback : {self._flash_load(table.value_storage, f'{name}_values', 'i')};")
+        self.indent_level -= 1
+        self.emit("}")
+        self.emit("")
+
+    def _emit_flash_array(self, c_type: str, name: str, literals: List[str]):
+        progmem = " PROGMEM" if self.target == 'arduino' else ""
+        qualified = f"{c_type} const" if c_type.endswith('*') else f"const {c_type}"
+        self.emit(f"static {qualified} {name}[{len(literals)}]{progmem} = {{")
+        self.indent_level += 1
+        for i in range(0, len(literals), VALUES_PER_LINE):
+            self.emit(", ".join(literals[i:i + VALUES_PER_LINE]) + ",")
+        self.indent_level -= 1
+        self.emit("};")
+
+    def _emit_handler_type(self, table):
+        """Function pointer typedef and prototypes for a dict of functions"""
+        signatures = {}
+        for handler in dict.fromkeys(table.values):
+            func = self.function_defs[handler]
+            signatures[handler] = (self._function_return_type(func), [t for t, _ in self._param_list(func)])
+        first = table.values[0]
+        for handler, signature in signatures.items():
+            if signature != signatures[first]:
+                raise CompileError(f"dict '{table.name}': '{handler}' and '{first}' have different signatures",
+                                   table.node.lineno, getattr(self, '_source_file', '<string>'))
+        return_type, param_types = signatures[first]
+        self.emit(f"typedef {return_type} (*{table.name}_fn)({', '.join(param_types) or 'void'});")
+        for handler in signatures:
+            if self.function_defs[handler].lineno < table.node.lineno:
+                continue  # already defined above the dict
+            params = ", ".join(f"{t} {n}" for t, n in self._param_list(self.function_defs[handler]))
+            self.emit(f"{return_type} {handler}({params or 'void'});")
+
+    def _const_dict_literal(self, value) -> str:
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, float):
+            return float_literal(value)
+        if isinstance(value, Handler):
+            return str(value)
+        if isinstance(value, str):
+            return f'"{self._escape_c_string(value)}"'
+        return str(value)
+
+    def _const_dict_zero(self, table) -> str:
+        return {'int': "0", 'bool': "false", 'float': "0.0f"}.get(table.value_kind, "NULL")
+
+    def _const_dict_key(self, table, node: ast.AST):
+        """Compile-time key for node, or None if it is only known at run time"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        return eval_const_int(node, self.module_int_constants)
+
+    def _const_dict_call(self, node: ast.Call) -> Optional[str]:
+        """len(d) and d.get(key[, default]) on a constant dict"""
+        func = node.func
+        if (isinstance(func, ast.Name) and func.id == 'len' and len(node.args) == 1
+                and isinstance(node.args[0], ast.Name) and node.args[0].id in self.const_dicts):
+            return str(self.const_dicts[node.args[0].id].count)
+        if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name)
+                and func.value.id in self.const_dicts):
+            return None
+        table = self.const_dicts[func.value.id]
+        if func.attr != 'get' or not 1 <= len(node.args) <= 2:
+            raise CompileError(f"constant dict '{table.name}' supports only [key], .get(), 'in' and len()",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        fallback = self._expr_to_c(node.args[1]) if len(node.args) == 2 else self._const_dict_zero(table)
+        return self._const_dict_lookup(table, node.args[0], fallback)
+
+    def _const_dict_lookup(self, table, key_node: ast.AST, fallback: Optional[str]) -> str:
+        """table[key] (fallback None) or table.get(key, fallback)"""
+        key = self._const_dict_key(table, key_node)
+        if key is not None:
+            if key in table.items:
+                return self._const_dict_literal(table.items[key])
+            if fallback is None:
+                raise CompileError(f"KeyError: {key!r} is not a key of '{table.name}'",
+                                   key_node.lineno, getattr(self, '_source_file', '<string>'))
+            return fallback
+        key_c_type = getattr(key_node, 'c_type', None)
+        if key_c_type is not None and (key_c_type in ('const char*', 'char*')) != (table.key_kind == 'str'):
+            raise CompileError(f"'{table.name}' has {table.key_kind} keys, not {key_c_type}",
+                               key_node.lineno, getattr(self, '_source_file', '<string>'))
+        return f"{table.name}_get({self._expr_to_c(key_node)}, {fallback or self._const_dict_zero(table)})"
+
+    def _condition_to_c(self, node: ast.AST) -> str:
+        """C expression for node used as a truth value (if/while tests, not, and/or)"""
+        if isinstance(node, ast.BoolOp):
+            op = ' && ' if isinstance(node.op, ast.And) else ' || '
+            return f"({op.join(self._condition_to_c(value) for value in node.values)})"
+        return self._expr_to_c(node)
+
+    def _boolop_to_c(self, node: ast.BoolOp) -> str:
+        """and/or as a value: Python yields an operand, not 0/1"""
+        if getattr(node, 'c_type', None) == 'bool':
+            return self._condition_to_c(node)
+        # a or b -> a ? a : b; a and b -> a ? b : a (a is read twice)
+        result = self._expr_to_c(node.values[-1])
+        for value in reversed(node.values[:-1]):
+            if not self._is_simple_operand(value):
+                raise CompileError(f"'{'and' if isinstance(node.op, ast.And) else 'or'}' on non-bool values "
+                                   "needs variables or constants as operands (use an if statement)",
+                                   node.lineno, getattr(self, '_source_file', '<string>'))
+            operand = self._expr_to_c(value)
+            if isinstance(node.op, ast.Or):
+                result = f"({operand} ? {operand} : {result})"
+            else:
+                result = f"({operand} ? {result} : {operand})"
+        return result
+
+    def _is_simple_operand(self, node: ast.AST) -> bool:
+        """True if evaluating node twice is cheap and has no side effects"""
+        if isinstance(node, (ast.Constant, ast.Name)):
+            return True
+        if isinstance(node, ast.Attribute):
+            return self._is_simple_operand(node.value)
+        if isinstance(node, ast.Subscript):
+            index = node.slice.value if hasattr(ast, 'Index') and isinstance(node.slice, ast.Index) else node.slice
+            return self._is_simple_operand(node.value) and isinstance(index, (ast.Constant, ast.Name))
+        return False
+
+    def _mixed_signedness(self, a: ast.AST, b: ast.AST) -> bool:
+        """True if comparing a and b in C would convert a negative value to uint32_t"""
+        types = [getattr(a, 'c_type', None), getattr(b, 'c_type', None)]
+        if 'uint32_t' not in types:
+            return False
+        other = types[1] if types[0] == 'uint32_t' else types[0]
+        if other not in ('int8_t', 'int16_t', 'int32_t'):
+            return False
+        signed = a if types[0] == other else b
+        value = eval_const_int(signed, self.module_int_constants)
+        return value is None or value < 0  # non-negative literals convert safely
+
+    def _shift_operand(self, node: ast.BinOp, left: str) -> str:
+        """Check a shift with a constant count; widen literal left operands that would overflow int"""
+        count = eval_const_int(node.right, self.module_int_constants)
+        if count is None:
+            return left
+        left_type = getattr(node, 'c_type', None) or 'int32_t'
+        width = 64 if left_type in ('int64_t', 'uint64_t') else 32
+        if not 0 <= count < width:
+            raise CompileError(f"shift count {count} is outside 0..{width - 1} for {left_type}",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        value = eval_const_int(node.left, self.module_int_constants)
+        if isinstance(node.op, ast.LShift) and isinstance(node.left, ast.Constant) and value is not None:
+            shifted = value << count
+            if shifted >= 2 ** 32:
+                return f"{left}ULL"
+            if shifted >= 2 ** 31:
+                return f"{left}u"  # 1 << 31 overflows int; Python means 2147483648
+        return left
+
+    def _target_type(self, target: ast.AST) -> Optional[str]:
+        """C type of an assignment target"""
+        if isinstance(target, ast.Name):
+            func = self.function_defs.get(self.current_function) if self.current_function else None
+            for arg in (func.args.args if func is not None else []):
+                if arg.arg == target.id and arg.annotation is not None:
+                    return self._map_type(arg.annotation)
+            return self.local_types.get(target.id) or self.types.globals.get(target.id)
+        return self._infer_type_from_value(target)
+
+    def _collect_fixed_formats(self, tree: ast.Module):
+        """Find the fixed-point formats the module uses (annotations and constructors)"""
+        self.fixed_formats = {}
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Name, ast.Subscript)):
+                fmt = annotation_format(node)  # widths were validated by the TypeChecker
+                if fmt is not None:
+                    self.fixed_formats[fmt.c_type] = fmt
+
+    def _coerce(self, node: ast.AST, c_type: Optional[str]) -> str:
+        """C expression for node converted to c_type where the conversion is implicit"""
+        if c_type in self.containers:
+            container = self._container_of(node)
+            if container is not None:
+                return container[1]  # by reference
+        if c_type in self.matrices:
+            return self._matrix_value(node, self.matrices[c_type])
+        value_type = getattr(node, 'c_type', None)
+        if value_type in self.views and c_type and c_type.endswith('*'):
+            return f"{self._view_ref(node)}.data"  # a view passed to a list parameter
+        if c_type in self.views and value_type and value_type.endswith('*') and value_type not in self.views:
+            length = self._sequence_length(node)
+            if length is None:
+                raise CompileError(f"the length of '{self._expr_to_c(node)}' is not known; pass a slice",
+                                   getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+            return f"(({c_type}){{{self._expr_to_c(node)}, {length}}})"  # a whole array as a view
+        fmt = format_of_c_type(c_type)
+        if fmt is not None:
+            return self._fixed_operand(node, fmt)
+        return self._expr_to_c(node)
+
+    def _param_types(self, node: ast.Call) -> List[Optional[str]]:
+        """C types of the parameters receiving node's arguments (None if unknown)"""
+        func = self.function_defs.get(node.func.id) if isinstance(node.func, ast.Name) else None
+        params = func.args.args if func is not None else []
+        types = [self._map_type(p.annotation) if p.annotation else None for p in params]
+        return types + [None] * (len(node.args) - len(types))
+
+    def _constant_number(self, node: ast.AST):
+        """Value of an int/float literal, optionally negated; None otherwise"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value = self._constant_number(node.operand)
+            return -value if value is not None else None
+        if (isinstance(node, ast.Constant) and isinstance(node.value, (int, float))
+                and not isinstance(node.value, bool)):
+            return node.value
+        return None
+
+    def _fixed_operand(self, node: ast.AST, fmt) -> str:
+        """node converted to fixed-point format fmt; constants are converted here"""
+        value = self._constant_number(node)
+        if value is not None:
+            raw = fmt.from_int(value) if isinstance(value, int) else fmt.from_float(value)
+            return f"(({fmt.c_type}){raw})"
+        c_type = getattr(node, 'c_type', None)
+        expr = self._expr_to_c(node)
+        if c_type == fmt.c_type:
+            return expr
+        other = format_of_c_type(c_type)
+        if other is not None:
+            return f"{fmt.name}_from_float({other.name}_to_float({expr}))"
+        if is_float_type(c_type):
+            return f"{fmt.name}_from_float({expr})"
+        return f"{fmt.name}_from_int({expr})"
+
+    def _fixed_binop(self, node: ast.BinOp, fmt) -> str:
+        """Saturating fixed-point arithmetic through the py2mcu_fixed.h helpers"""
+        names = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mul', ast.Div: 'div'}
+        op_name = names.get(type(node.op))
+        if op_name is None:
+            raise CompileError(f"operator '{self._op_to_c(node.op)}' is not supported on {fmt.name}",
+                               getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+        left_type = getattr(node.left, 'c_type', None)
+        right_type = getattr(node.right, 'c_type', None)
+        # An int factor or divisor scales the raw value instead of being converted
+        if op_name in ('mul', 'div') and is_int_type(right_type) and left_type == fmt.c_type:
+            return f"{fmt.name}_{op_name}_int({self._expr_to_c(node.left)}, {self._expr_to_c(node.right)})"
+        if op_name == 'mul' and is_int_type(left_type) and right_type == fmt.c_type:
+            return f"{fmt.name}_mul_int({self._expr_to_c(node.right)}, {self._expr_to_c(node.left)})"
+        left = self._fixed_operand(node.left, fmt)
+        right = self._fixed_operand(node.right, fmt)
+        return f"{fmt.name}_{op_name}({left}, {right})"
+
+    def _mark_double_literals(self, *nodes: ast.AST):
+        """Float literals used in double arithmetic are emitted without 'f'"""
+        for node in nodes:
+            if isinstance(node, ast.UnaryOp):
+                node = node.operand
+            if isinstance(node, ast.Constant) and isinstance(node.value, float):
+                node.c_type = 'double'
+
+    def _float_reciprocal(self, divisor: ast.AST) -> Optional[float]:
+        """Reciprocal to multiply by instead of dividing by a constant
+
+        Power-of-two divisors are always exact.  Without an FPU every
+        division is a library call, so at -O3 any constant is replaced
+        (the result may differ from the division by one ulp).
+        """
+        negate = isinstance(divisor, ast.UnaryOp) and isinstance(divisor.op, ast.USub)
+        value_node = divisor.operand if negate else divisor
+        if not (isinstance(value_node, ast.Constant) and isinstance(value_node.value, (int, float))
+                and not isinstance(value_node.value, bool)):
+            return None
+        value = -float(value_node.value) if negate else float(value_node.value)
+        reciprocal = exact_reciprocal(value)
+        if reciprocal is None and self.fpu is None and self.optimize_level >= 3 and value != 0:
+            reciprocal = 1.0 / value
+        return reciprocal
+
+    def _check_double_promotion(self, node: ast.AST, types: List[Optional[str]]):
+        """Diagnose float operands that C promotes to double"""
+        if 'float' in types and 'double' in types:
+            self._float_diagnostic(node, f"'{self._source_text(node)}' promotes float to double")
+
+    def _check_call_promotion(self, node: ast.Call):
+        if not (isinstance(node.func, ast.Name) and node.func.id in self.function_defs):
+            return
+        params = self.function_defs[node.func.id].args.args
+        for arg, param in zip(node.args, params):
+            if (param.annotation is not None and self._map_type(param.annotation) == 'double'
+                    and getattr(arg, 'c_type', None) == 'float'):
+                self._float_diagnostic(arg, f"float argument '{self._source_text(arg)}' promoted to double "
+                                            f"parameter '{param.arg}' of '{node.func.id}'")
+
+    def _source_text(self, node: ast.AST) -> str:
+        """Python source of node for diagnostics"""
+        text = ast.get_source_segment(getattr(self, '_source_code', ''), node)
+        return text if text else '<expression>'
+
+    def _float_diagnostic(self, node: ast.AST, message: str):
+        if self.double_promotion == 'ignore':
+            return
+        filename = getattr(self, '_source_file', '<string>')
+        if self.double_promotion == 'error':
+            raise CompileError(message, getattr(node, 'lineno', None), filename)
+        self.report.warn(f"{filename}:{getattr(node, 'lineno', 0)}: warning: {message}")
+
+    def _float_report(self, node: ast.FunctionDef):
+        """Count float operations that the target does in software"""
+        soft, emulated = 0, 0
+        for child in ast.walk(node):
+            if isinstance(child, (ast.BinOp, ast.AugAssign)):
+                c_type = getattr(child, 'c_type', None) if isinstance(child, ast.BinOp) else \
+                    getattr(child.value, 'c_type', None)
+            elif isinstance(child, ast.Compare):
+                c_type = getattr(child.left, 'c_type', None)
+            else:
+                continue
+            if c_type == 'float':
+                soft += self.fpu is None
+            elif c_type == 'double':
+                soft += self.fpu is None
+                emulated += self.fpu == 'single'
+        if soft:
+            self.report.add('Float', f"{node.name}: {soft} soft-float operations (library calls on "
+                                     f"{self.target}); consider fixed point")
+        if emulated:
+            self.report.add('Float', f"{node.name}: {emulated} double operations emulated in software "
+                                     f"(the {self.target} FPU is single precision)")
+
+    def visit(self, node: ast.AST):
+        """Visit node; statements on Mat/Vec values first compute shared operands into temporaries"""
+        if self.cse_temps and id(node) in self.cse_temps:
+            self._emit_cse_temps(node)
+        if (self.matrices and self.in_function and getattr(node, 'value', None) is not None
+                and isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Return, ast.Expr))):
+            with self._matrix_temporaries(node):
+                return super().visit(node)
+        return super().visit(node)
+
     def visit_Return(self, node: ast.Return):
         """Generate return statement"""
-        if node.value:
-            expr = self._expr_to_c(node.value)
+        if node.value and self.return_type in self.matrices:
+            self._emit_matrix_value("return ", node.value, self.matrices[self.return_type], cast=True)
+        elif node.value:
+            expr = self._coerce(node.value, self.return_type)
             self.emit(f"return {expr};")
         else:
             self.emit("return;")
@@ -321,6 +1164,10 @@ class CCodeGenerator(ast.NodeVisitor):
             # otherwise it's a regular string literal/docstring; skip it.
             return
         
+        if struct_call(node.value, 'pack_into'):
+            self._emit_pack_into(node.value)
+            return
+
         # Skip expression statements that reference undefined names
         # This is useful for skipping Python-specific code like GUI calls
         if not self._expr_uses_defined_names(node.value):
@@ -335,8 +1182,11 @@ class CCodeGenerator(ast.NodeVisitor):
         if self._is_main_guard(node.test):
             # Don't generate anything - we have main() function already
             return
-        
-        condition = self._expr_to_c(node.test)
+        self._predeclare_block_locals(node, [node.body, node.orelse])
+        if self._emit_dispatch_chain(node):
+            return
+
+        condition = self._condition_to_c(node.test)
         self.emit(f"if ({condition}) {{")
         self.indent_level += 1
 
@@ -354,19 +1204,1104 @@ class CCodeGenerator(ast.NodeVisitor):
 
         self.emit("}")
 
+    def _emit_dispatch_chain(self, node: ast.If) -> bool:
+        """Emit an if/elif chain comparing one integer against constants as a switch"""
+        chain = if_chain_cases(node, self.module_int_constants)
+        if chain is None:
+            return False
+        subject, cases, default = chain
+        # The chain reads the subject once per test; only repeat-safe subjects may be read once
+        if not is_int_type(getattr(subject, 'c_type', None)) or not self._is_simple_operand(subject):
+            return False
+        cases = self._reachable_cases(subject, cases)
+        if sum(len(values) for values, _ in cases) < SWITCH_MIN_VALUES:
+            return False
+        # break inside a C switch would leave the switch, not the loop
+        if any(contains_loop_break(body) for _, body in cases) or contains_loop_break(default):
+            return False
+        self._emit_switch(self._expr_to_c(subject), cases, default)
+        return True
+
+    def visit_Match(self, node: ast.AST):
+        """Generate a switch for match on integer constants"""
+        filename = getattr(self, '_source_file', '<string>')
+        c_type = getattr(node.subject, 'c_type', None)
+        if not is_int_type(c_type):
+            raise CompileError(f"match needs an integer subject, got {c_type or 'an unknown type'}",
+                               node.lineno, filename)
+        try:
+            cases, default = match_cases(node, self.module_int_constants)
+        except ValueError as e:
+            raise CompileError(str(e), node.lineno, filename)
+        cases = self._reachable_cases(node.subject, cases)
+        self._predeclare_block_locals(node, [case.body for case in node.cases])
+        subject = self._expr_to_c(node.subject)
+        if not (any(contains_loop_break(body) for _, body in cases) or contains_loop_break(default or [])):
+            self._emit_switch(subject, cases, default)
+            return
+
+        # break has to reach the enclosing loop: test the values one after another
+        self.emit("{")
+        self.indent_level += 1
+        self.emit(f"{c_type} match_subject = {subject};")
+        keyword = "if"
+        for values, body in cases:
+            tests = " || ".join(f"(match_subject == {self._case_label(value, source)})" for value, source in values)
+            self.emit(f"{keyword} ({tests}) {{")
+            self._emit_block(body)
+            keyword = "} else if"
+        if default:
+            self.emit("} else {" if cases else "{")
+            self._emit_block(default)
+        if cases or default:
+            self.emit("}")
+        self.indent_level -= 1
+        self.emit("}")
+
+    def _reachable_cases(self, subject: ast.AST, cases: list) -> list:
+        """Drop values taken by an earlier case or outside the subject's type"""
+        low, high = TYPE_RANGES.get(getattr(subject, 'c_type', None), (None, None))
+        if low is not None:
+            cases = [([(v, s) for v, s in values if low <= v <= high], body) for values, body in cases]
+        return first_match_only(cases)
+
+    def _emit_switch(self, subject: str, cases: list, default: Optional[list]):
+        self.emit(f"switch ({subject}) {{")
+        self.indent_level += 1
+        for values, body in cases:
+            for value, source in values[:-1]:
+                self.emit(f"case {self._case_label(value, source)}:")
+            self.emit(f"case {self._case_label(*values[-1])}: {{")
+            self._emit_block(body, terminate=True)
+            self.emit("}")
+        if default:
+            self.emit("default: {")
+            self._emit_block(default, terminate=True)
+            self.emit("}")
+        self.indent_level -= 1
+        self.emit("}")
+
+    def _emit_block(self, stmts: List[ast.stmt], terminate: bool = False):
+        """Emit stmts one level deeper; terminate adds the switch case's break"""
+        self.indent_level += 1
+        for stmt in stmts:
+            self.visit(stmt)
+        if terminate and not (stmts and isinstance(stmts[-1], (ast.Return, ast.Continue, ast.Raise))):
+            self.emit("break;")
+        self.indent_level -= 1
+
+    def _case_label(self, value: int, source: ast.AST) -> str:
+        """Case label text: @#define names stay symbolic, other constants are folded"""
+        if isinstance(source, ast.Name) and source.id in self.define_names:
+            return source.id
+        label = str(value)
+        if isinstance(source, ast.Name):
+            label += f" /* {source.id} */"
+        return label
+
+    def _membership_to_c(self, node: ast.Compare) -> str:
+        """x in (constants) as a bit test or an equality chain"""
+        subject, container = node.left, node.comparators[0]
+        negate = isinstance(node.ops[0], ast.NotIn)
+        table = self._container_of(container)
+        if table is not None:
+            test = f"{table[0].name}_contains({table[1]}, {self._expr_to_c(subject)})"
+            return f"!{test}" if negate else test
+        if isinstance(container, ast.Name) and container.id in self.const_dicts:
+            table = self.const_dicts[container.id]
+            key = self._const_dict_key(table, subject)
+            if key is not None:
+                return "true" if (key in table.items) != negate else "false"
+            return f"({table.name}_find({self._expr_to_c(subject)}) {'<' if negate else '>='} 0)"
+        values = constant_values(container, self.module_int_constants)
+        if values is None or not is_int_type(getattr(subject, 'c_type', None)):
+            raise CompileError("'in' is only supported for integers against a constant tuple, list or set",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        low, high = TYPE_RANGES.get(subject.c_type, (-2 ** 63, 2 ** 64 - 1))
+        unique = sorted({value for value, _ in values if low <= value <= high})
+        mask = membership_mask(unique)
+        if not unique:
+            test = "0"  # no value fits the subject's type
+        elif mask is not None and subject.c_type not in ('int64_t', 'uint64_t'):
+            test = f"py2mcu_in_mask({self._expr_to_c(subject)}, 0x{mask:X}u)"
+        elif self._is_simple_operand(subject):
+            operand = self._expr_to_c(subject)
+            test = f"({' || '.join(f'({operand} == {value})' for value in unique)})"
+        else:
+            raise CompileError("'in' against values outside 0..31 needs a variable or constant on the left",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        return f"!{test}" if negate else test
+
+    def _uses_membership_mask(self, tree: ast.AST) -> bool:
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Compare) and len(node.ops) == 1
+                    and isinstance(node.ops[0], (ast.In, ast.NotIn))):
+                values = constant_values(node.comparators[0], self.module_int_constants)
+                if values is not None and membership_mask([value for value, _ in values]) is not None:
+                    return True
+        return False
+
     def visit_While(self, node: ast.While):
         """Generate while loop"""
-        condition = self._expr_to_c(node.test)
-        self.emit(f"while ({condition}) {{")
-        self.indent_level += 1
+        idiom = self.loop_idioms.get(id(node))
+        if idiom is not None and self._emit_loop_idiom(node, idiom):
+            return
+        self._predeclare_block_locals(node, [node.body, node.orelse])
+        plan = self.loop_plans.get(id(node))
+        unroll = self.loop_unrolls.get(id(node))
+        if unroll is not None and not self._predeclare_loop_locals(node):
+            unroll = None
+        steps = self._begin_loop_plan(node, plan) if plan is not None else []
+        start = rolled = len(self.code)
+        if unroll is not None and unroll.factor == 0:
+            for _ in range(unroll.trips):
+                self._emit_loop_body(node, plan, steps)
+        else:
+            if unroll is not None:
+                self.emit(f"while ({self._unrolled_condition(node, unroll)}) {{")
+                self.indent_level += 1
+                for _ in range(unroll.factor):
+                    self._emit_loop_body(node, plan, steps)
+                self.indent_level -= 1
+                self.emit("}")
+            rolled = len(self.code)
+            condition = self._condition_to_c(node.test)
+            self.emit(f"while ({condition}) {{")
+            self.indent_level += 1
+            self._emit_loop_body(node, plan, steps)
+            self.indent_level -= 1
+            self.emit("}")
+        if unroll is not None:
+            self._report_unroll(node, unroll, start, rolled)
+        if plan is not None:
+            self._end_loop_plan(plan)
 
+    def _emit_loop_body(self, node: ast.While, plan, steps: List[str]):
         for stmt in node.body:
             self.visit(stmt)
+            if plan is not None and stmt is plan.increment:
+                for step in steps:
+                    self.emit(step)
+
+    def _plan_loops(self, node: ast.FunctionDef):
+        """Find the loops to unroll (-O1) and what moves out of each loop (-O2)"""
+        if self.optimize_level < 1 or function_has_c_body(node):
+            return
+        source = getattr(self, '_source_code', '')
+        self.loop_unrolls, notes = find_unrolls(node, self._unroll_factor(node),
+                                                lambda lineno: extract_unroll_pragma(source, lineno),
+                                                self.module_int_constants, auto=self.optimize_level >= 2)
+        for note in notes:
+            self.report.add('Loop unrolling', f"{node.name}: {note}")
+        if self.optimize_level >= 2:
+            self.loop_plans = LoopOptimizer(self, node, self.module_int_constants).run().plans
+
+    def _plan_cse(self, node: ast.FunctionDef):
+        """Find the repeated pure calls and arithmetic of a function (-O2)"""
+        self.cse_temps = {}
+        if self.optimize_level >= 2 and self.purity is not None:
+            self.cse_temps = CommonSubexpressions(self, node, self.purity).run().temps
+
+    def _emit_cse_temps(self, stmt: ast.stmt):
+        """Declare the common subexpressions first used by stmt; later uses read the variable"""
+        temps = self.cse_temps[id(stmt)]
+        for k, temp in enumerate(temps):
+            name = f"cse{stmt.lineno}" + (f"_{k}" if len(temps) > 1 else "")
+            value = self._expr_to_c(temp.expr)
+            self.emit(f"const {temp.expr.c_type} {name} = {value};")
+            for use in temp.uses:
+                use.loop_c = name
+            self.report.add('Common subexpressions', f"{self.current_function}: line {stmt.lineno}: "
+                                                     f"'{self._source_text(temp.expr)}' evaluated once as "
+                                                     f"{name} ({len(temp.uses)} uses)")
+
+    def _end_cse(self):
+        for temps in self.cse_temps.values():
+            for use in (use for temp in temps for use in temp.uses):
+                if hasattr(use, 'loop_c'):
+                    del use.loop_c
+        self.cse_temps = {}
+
+    def _unroll_factor(self, node: ast.FunctionDef) -> Optional[int]:
+        """n of ``@unroll(n)`` on node, else None"""
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name) and decorator.func.id == 'unroll':
+                factor = eval_const_int(decorator.args[0], self.module_int_constants) if len(decorator.args) == 1 else None
+                if factor is None or factor < 1:
+                    raise CompileError("@unroll() takes one positive constant", decorator.lineno,
+                                       getattr(self, '_source_file', '<string>'))
+                return factor
+        return None
+
+    def _predeclare_block_locals(self, node: ast.stmt, blocks: List[List[ast.stmt]]):
+        """Declare ahead the locals first assigned inside node but used beyond one block
+
+        A C declaration is visible only in its block.  A local assigned in
+        two branches, or read after the statement, is declared before it
+        with its joined type and only assigned inside.
+        """
+        function = self.function_defs.get(self.current_function)
+        if function is None:
+            return
+        inside = {id(child) for child in ast.walk(node)}
+        annotated = {stmt.target.id for stmt in ast.walk(function)
+                     if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name)}
+        names = []
+        for child in ast.walk(node):
+            if isinstance(child, ast.Assign):
+                for target in child.targets:
+                    if (isinstance(target, ast.Name) and target.id not in self.local_vars
+                            and target.id not in annotated and target.id not in names):
+                        names.append(target.id)
+        for name in names:
+            c_type = self.local_types.get(name)
+            if not (self._is_numeric_type(c_type) or c_type == 'bool'):
+                continue
+            uses = [any(isinstance(n, ast.Name) and n.id == name for stmt in block for n in ast.walk(stmt))
+                    for block in blocks]
+            outside = any(isinstance(n, ast.Name) and n.id == name and id(n) not in inside
+                          for n in ast.walk(function))
+            if sum(uses) > 1 or outside:
+                self.emit(f"{self._local_int_type(name, c_type)} {name};")
+                self.local_vars.add(name)
+
+    def _predeclare_loop_locals(self, node: ast.While) -> bool:
+        """Declare ahead the locals first assigned in a loop that will be copied
+
+        The copies and the remainder loop are separate blocks, so a local
+        declared by the first copy would not be visible in the others.
+        False (nothing emitted) if one of them is not a plain scalar.
+        """
+        names = []
+        for child in (n for stmt in node.body for n in ast.walk(stmt)):
+            if (isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store)
+                    and child.id not in self.local_vars and child.id not in names):
+                names.append(child.id)
+        for name in names:
+            c_type = self.local_types.get(name)
+            if not (self._is_numeric_type(c_type) or c_type == 'bool'):
+                self.report.add('Loop unrolling', f"{self.current_function}: line {node.lineno}: "
+                                                  f"kept rolled ('{name}' is not a scalar local)")
+                return False
+        for name in names:
+            self.emit(f"{self._local_int_type(name, self.local_types[name])} {name};")
+            self.local_vars.add(name)
+        return True
+
+    def _unrolled_condition(self, node: ast.While, unroll) -> str:
+        """``i + (n - 1) * step < stop``: n more iterations are due"""
+        ahead = ast.BinOp(left=node.test.left, op=ast.Add(), right=ast.Constant((unroll.factor - 1) * unroll.step))
+        ahead.c_type = getattr(node.test.left, 'c_type', None)
+        ahead.right.c_type = 'int32_t'
+        test = ast.Compare(left=ahead, ops=[ast.Lt()], comparators=[unroll.stop])
+        ast.copy_location(ahead, node.test)
+        ast.copy_location(test, node.test)
+        return self._condition_to_c(test)
+
+    def _report_unroll(self, node: ast.While, unroll, start: int, rolled: int):
+        """Report the unrolled loop with the C lines it took against one rolled copy"""
+        total = len(self.code) - start
+        if unroll.factor:
+            before = len(self.code) - rolled
+            what = f"unrolled x{unroll.factor} with a remainder loop"
+        else:
+            # one copy of the body plus the while line and its brace
+            before = (total // unroll.trips if unroll.trips else 0) + 2
+            what = f"fully unrolled, {unroll.trips} iterations" + ("" if unroll.explicit else " (automatic)")
+        self.report.add('Loop unrolling', f"{self.current_function}: line {node.lineno}: {what} "
+                                          f"({before} -> {total} C lines)")
+
+    def _is_numeric_type(self, c_type: Optional[str]) -> bool:
+        return is_int_type(c_type) or is_float_type(c_type) or is_fixed_type(c_type)
+
+    def _is_int_local(self, name: str) -> bool:
+        return is_int_type(self.local_types.get(name)) and self.local_types.get(name) != 'bool'
 
+    def _pointer_elem_type(self, node: ast.Subscript) -> Optional[str]:
+        """Element type of ``a[i]`` if it is a plain memory access, else None"""
+        c_type = getattr(node.value, 'c_type', None)
+        if c_type in self.views:
+            return self.views[c_type] if id(node) in self.safe_indexes else None
+        if (not c_type or not c_type.endswith('*') or c_type in ('const char*', 'char*')
+                or self._container_of(node.value) is not None or node.value.id in self.const_dicts):
+            return None
+        return c_type[:-1].strip()
+
+    def _begin_loop_plan(self, node: ast.While, plan) -> List[str]:
+        """Declare the hoisted values, derived indexes and pointers of a loop; return their increments"""
+        func = self.current_function
+        for k, expr in enumerate(plan.hoisted):
+            name = f"inv{node.lineno}" + (f"_{k}" if len(plan.hoisted) > 1 else "")
+            value = self._expr_to_c(expr)
+            self.emit(f"const {expr.c_type} {name} = {value};")
+            expr.loop_c = name
+            self.report.add('Loop optimizations', f"{func}: line {node.lineno}: hoisted '{value}' as {name}")
+        steps = []
+        index, step = plan.index, plan.step
+        for factor, nodes in sorted(plan.scaled.items()):
+            name = f"{index}_x{factor if factor > 0 else f'm{-factor}'}_{node.lineno}"
+            self.emit(f"{nodes[0].c_type} {name} = {index} * {factor};")
+            steps.append(f"{name} += {factor * step};")
+            for scaled in nodes:
+                scaled.loop_c = name
+            self.report.add('Loop optimizations',
+                            f"{func}: line {node.lineno}: '{index} * {factor}' strength-reduced to "
+                            f"{name} += {factor * step}")
+        for array, accesses in sorted(plan.pointers.items()):
+            elem_type = self._pointer_elem_type(accesses[0][0])
+            name = f"{array}_p{node.lineno}"
+            base = f"{array}.data" if self._is_view(accesses[0][0].value) else array
+            writes = any(isinstance(access.ctx, ast.Store) for access, _ in accesses)
+            self.emit(f"{'' if writes else 'const '}{elem_type} *{name} = {base} + {index};")
+            steps.append(f"{name} += {step};")
+            for access, offset in accesses:
+                access.loop_c = f"(*{name})" if offset == 0 else f"{name}[{offset}]"
+            self.report.add('Loop optimizations',
+                            f"{func}: line {node.lineno}: '{array}[{index}]' through pointer {name}")
+        return steps
+
+    @staticmethod
+    def _end_loop_plan(plan):
+        """The loop's variables go out of use once it is emitted"""
+        nodes = list(plan.hoisted) + [n for group in plan.scaled.values() for n in group]
+        nodes += [access for group in plan.pointers.values() for access, _ in group]
+        for expr in nodes:
+            if hasattr(expr, 'loop_c'):
+                del expr.loop_c
+
+    def _loop_operand(self, array: ast.Name, idiom, count: str, checked: bool = True) -> Optional[tuple]:
+        """(element type, pointer to array[i]) of an array or view in a recognized loop
+
+        A view the loop does not bound by its own len() is checked once for
+        the whole range; without checked such a view is not accepted.
+        """
+        c_type = getattr(array, 'c_type', None)
+        if c_type in self.views:
+            stop = idiom.stop
+            if (isinstance(stop, ast.Call) and isinstance(stop.func, ast.Name) and stop.func.id == 'len'
+                    and isinstance(stop.args[0], ast.Name) and stop.args[0].id == array.id):
+                offset = idiom.index
+            elif checked:
+                offset = f"py2mcu_checked_offset({idiom.index}, {count}, {array.id}.len)"
+            else:
+                return None
+            return self.views[c_type], f"{array.id}.data + {offset}"
+        if c_type and c_type.endswith('*') and c_type not in ('const char*', 'char*'):
+            return c_type[:-1].strip(), f"{array.id} + {idiom.index}"
+        return None
+
+    def _loop_kernel(self, kind: str, acc_type: str, elem_type: str) -> str:
+        """Name of a py2mcu_loops.h kernel (registers its DEFINE line)"""
+        if kind in ('any', 'all'):
+            name = f"py2mcu_{kind}_{short_name(elem_type)}"
+            self.loop_kernels[name] = f"PY2MCU_{kind.upper()}_DEFINE({name}, {elem_type})"
+            return name
+        name = f"py2mcu_{kind}_{short_name(acc_type)}_{short_name(elem_type)}"
+        if kind == 'sum':
+            macro = 'PY2MCU_FSUM_DEFINE' if is_float_type(acc_type) or is_float_type(elem_type) else 'PY2MCU_SUM_DEFINE'
+            self.loop_kernels[name] = f"{macro}({name}, {elem_type}, {acc_type})"
+        else:
+            op = '>' if kind == 'max' else '<'
+            self.loop_kernels[name] = f"PY2MCU_BEST_DEFINE({name}, {elem_type}, {acc_type}, {op})"
+        return name
+
+    def _emit_loop_idiom(self, node: ast.While, idiom) -> bool:
+        """Emit a recognized loop as one call; False (nothing emitted) if its types do not fit"""
+        index, kind = idiom.index, idiom.kind
+        stop = self._expr_to_c(idiom.stop)
+        count = f"{stop} - {index}"
+        if kind in ('fill', 'copy', 'compare'):
+            dst = self._loop_operand(idiom.target, idiom, count, checked=kind != 'compare')
+            if dst is None:
+                return False
+            elem_type, at = dst
+            size = f"sizeof({elem_type}) * (uint32_t)({count})"
+            if kind == 'fill':
+                value = self._constant_number(idiom.source)
+                zero = value is not None and value == 0 and math.copysign(1, value) > 0
+                if not zero and c_sizeof(elem_type) != 1:
+                    return False
+                callee = 'memset'
+                call = f"memset({at}, {'0' if zero else self._coerce(idiom.source, elem_type)}, {size})"
+            else:
+                src = self._loop_operand(idiom.source, idiom, count, checked=kind != 'compare')
+                if src is None or src[0] != elem_type:
+                    return False
+                if kind == 'compare':
+                    if not (is_int_type(elem_type) or is_fixed_type(elem_type)):
+                        return False  # 0.0 == -0.0 and NaN != NaN: floats do not compare bytewise
+                    self.emit(f"if ({index} < {stop} && memcmp({at}, {src[1]}, {size}) != 0) {{")
+                    self.indent_level += 1
+                    for stmt in idiom.on_mismatch:
+                        self.visit(stmt)
+                    self.indent_level -= 1
+                    self.emit("}")
+                    self._report_idiom(node, idiom, 'memcmp')
+                    return True
+                distinct = (idiom.target.id in self.fresh_arrays or idiom.source.id in self.fresh_arrays) and \
+                    not (self._is_view(idiom.target) or self._is_view(idiom.source))
+                callee = 'memcpy' if distinct else 'py2mcu_copy_forward'
+                if distinct:
+                    call = f"memcpy({at}, {src[1]}, {size})"
+                else:
+                    self.loop_kernels['py2mcu_copy_forward'] = ""
+                    call = f"py2mcu_copy_forward({at}, {src[1]}, {size})"
+        else:
+            acc = idiom.target.id
+            acc_type = self.local_types.get(acc) or self.types.globals.get(acc)
+            acc_type = self.narrow_types.get(acc, acc_type)
+            src = self._loop_operand(idiom.source, idiom, count)
+            if src is None:
+                return False
+            elem_type, at = src
+            if not (is_int_type(acc_type) and is_int_type(elem_type)) or 'bool' in (acc_type, elem_type):
+                return False  # float reductions keep their order; bool accumulators are not sums
+            if kind != 'sum' and not self._int_range_fits(elem_type, acc_type):
+                return False
+            kernel = self._loop_kernel(kind, acc_type, elem_type)
+            call = (f"{acc} = ({acc} + {kernel}({at}, {count}))" if kind == 'sum'
+                    else f"{acc} = {kernel}({at}, {count}, {acc})")
+            callee = kernel
+        self.emit(f"if ({index} < {stop}) {{")
+        self.indent_level += 1
+        self.emit(f"{call};")
+        self.emit(f"{index} = {stop};")
         self.indent_level -= 1
         self.emit("}")
+        self._report_idiom(node, idiom, callee)
+        return True
+
+    @staticmethod
+    def _int_range_fits(inner: str, outer: str) -> bool:
+        """Every value of int type inner is a value of int type outer"""
+        (inner_bits, inner_signed), (outer_bits, outer_signed) = INT_TYPES[inner], INT_TYPES[outer]
+        if inner_signed == outer_signed:
+            return inner_bits <= outer_bits
+        return not inner_signed and inner_bits < outer_bits
+
+    def _report_idiom(self, node: ast.While, idiom, callee: str):
+        self.report.add('Loop idioms', f"{self.current_function}: line {node.lineno}: {idiom.kind} loop -> {callee}")
+
+    def _is_unannotated_param(self, node: ast.AST) -> bool:
+        """A parameter without annotation: its int32_t type is a default, not a declaration"""
+        function = self.function_defs.get(self.current_function)
+        return (isinstance(node, ast.Name) and function is not None
+                and any(arg.arg == node.id and arg.annotation is None for arg in function.args.args))
+
+    def _reduction_call(self, node: ast.Call) -> Optional[str]:
+        """sum(), min(), max(), any() and all() over an array or view"""
+        source_file = getattr(self, '_source_file', '<string>')
+        func = node.func
+        if (not isinstance(func, ast.Name) or func.id not in ('sum', 'min', 'max', 'any', 'all')
+                or func.id in self.function_defs):
+            return None
+        name = func.id
+        if name in ('min', 'max') and len(node.args) >= 2 and not node.keywords:
+            return self._min_max_of_values(node)
+        if node.args and is_array_expr(node.args[0], self.views):
+            return self._array_reduction(node)
+        if node.keywords or len(node.args) not in ((1, 2) if name == 'sum' else (1,)):
+            raise CompileError(f"{name}() takes an array or a view" + (" and a start value" if name == 'sum' else ""),
+                               node.lineno, source_file)
+        seq = node.args[0]
+        c_type = getattr(seq, 'c_type', None)
+        if c_type in self.views:
+            if not (self._is_simple_operand(seq) or (isinstance(seq, ast.Subscript) and isinstance(seq.slice, ast.Slice))):
+                raise CompileError(f"assign the view to a name before calling {name}() on it",
+                                   node.lineno, source_file)
+            elem_type = self.views[c_type]
+            ref = self._view_ref(seq)
+            data, length = f"{ref}.data", self._view_length(seq)
+            length = str(length) if length is not None else f"{ref}.len"
+        elif c_type and c_type.endswith('*') and c_type not in ('const char*', 'char*'):
+            elem_type = c_type[:-1].strip()
+            data, length = self._expr_to_c(seq), self._sequence_length(seq)
+            if length is None:
+                raise CompileError(f"the length of '{data}' is not known; pass a slice to {name}()",
+                                   node.lineno, source_file)
+            length = str(length)
+        elif c_type is None or self._is_unannotated_param(seq):
+            return None  # untyped argument: left as a plain call
+        else:
+            raise CompileError(f"{name}() takes an array or a view", node.lineno, source_file)
+        if elem_type not in KERNEL_TYPES:
+            raise CompileError(f"{name}() of {elem_type} elements is not supported", node.lineno, source_file)
+        if name in ('any', 'all'):
+            return f"{self._loop_kernel(name, elem_type, elem_type)}({data}, {length})"
+        if name == 'sum':
+            call = f"{self._loop_kernel('sum', node.c_type, elem_type)}({data}, {length})"
+            return f"({self._expr_to_c(node.args[1])} + {call})" if len(node.args) == 2 else call
+        if length == '0':
+            raise CompileError(f"{name}() of an empty sequence", node.lineno, source_file)
+        return f"{self._loop_kernel(name, elem_type, elem_type)}_of({data}, {length})"
+
+    def _min_max_of_values(self, node: ast.Call) -> str:
+        """``max(a, b, ...)``: nested calls of a two-value kernel"""
+        for arg in node.args:
+            if any(isinstance(child, ast.Call) and not (isinstance(child.func, ast.Name) and child.func.id == 'len')
+                   for child in ast.walk(arg)):
+                raise CompileError(f"{node.func.id}() of several values needs operands without calls "
+                                   "(assign them to names first)", node.lineno, getattr(self, '_source_file', '<string>'))
+        c_type = getattr(node, 'c_type', None)
+        if not (is_int_type(c_type) or is_float_type(c_type) or is_fixed_type(c_type)):
+            raise CompileError(f"{node.func.id}() of {c_type or 'these'} values is not supported",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        name = f"py2mcu_{node.func.id}2_{short_name(c_type)}"
+        self.loop_kernels[name] = f"PY2MCU_PICK_DEFINE({name}, {c_type}, {'>' if node.func.id == 'max' else '<'})"
+        result = self._coerce(node.args[0], c_type)
+        for arg in node.args[1:]:
+            result = f"{name}({result}, {self._coerce(arg, c_type)})"
+        return result
+
+    # -- whole-array expressions ----------------------------------------------------
+
+    @contextlib.contextmanager
+    def _lowered(self, changes: List[Tuple[ast.AST, str, object]]):
+        """Set (node, attribute, value) for the duration of a with block"""
+        saved = [(node, attr, getattr(node, attr, None), hasattr(node, attr)) for node, attr, _ in changes]
+        for node, attr, value in changes:
+            setattr(node, attr, value)
+        try:
+            yield
+        finally:
+            for node, attr, value, had in reversed(saved):
+                if had:
+                    setattr(node, attr, value)
+                else:
+                    delattr(node, attr)
+
+    def _array_operand(self, node: ast.AST) -> Tuple[str, object, Optional[str]]:
+        """(data pointer, first element, element count) of an array, view or slice operand
+
+        The first element is an int, or a C expression for a window
+        ``x[i:i + N]`` that slides with i.  The count is a C expression: a
+        constant, ``v.len`` or None when unknown.
+        """
+        base = node.value if isinstance(node, ast.Subscript) else node
+        if self._is_view(base):
+            ref = self._view_ref(base)
+            data = f"{ref}.data"
+            length = self._view_length(base)
+            count = str(length) if length is not None else f"{ref}.len"
+        else:
+            data = self._expr_to_c(base)
+            length = self._sequence_length(base)
+            count = str(length) if length is not None else None
+        if base is node:
+            return data, 0, count
+        bounds = node.slice
+        if bounds.step is None and bounds.lower is None and bounds.upper is None:
+            return data, 0, count
+        known = None
+        if bounds.step is None:
+            known = constant_slice(bounds, self._sequence_length(base), self.module_int_constants)
+        if known is None:
+            width = None
+            if bounds.step is None and bounds.lower is not None and isinstance(bounds.upper, ast.BinOp) \
+                    and isinstance(bounds.upper.op, ast.Add) and ast.dump(bounds.upper.left) == ast.dump(bounds.lower):
+                width = eval_const_int(bounds.upper.right, self.module_int_constants)
+            if width is None or width < 0:
+                raise CompileError("slices in array expressions need constant bounds (or x[i:i + N]) and no step",
+                                   node.lineno, getattr(self, '_source_file', '<string>'))
+            return data, self._expr_to_c(bounds.lower), str(width)  # the window must lie inside the array
+        return data, known[0], str(known[1])
+
+    def _array_pointer(self, node: ast.AST) -> str:
+        """C pointer to the first element of an array, view or slice operand"""
+        data, offset, _ = self._array_operand(node)
+        return f"{data} + {offset}" if offset else data
+
+    def _array_leaves(self, node: ast.AST) -> List[ast.AST]:
+        """Array operands of an element-wise expression (node itself for a plain array)"""
+        if is_array_leaf(node, self.views):
+            return [node]
+        if not is_array_expr(node, self.views):
+            if array_elem(getattr(node, 'c_type', None), self.views) is not None:
+                raise CompileError("only arithmetic, comparisons and abs() work element-wise on arrays",
+                                   getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+            return []  # a scalar, the same for every element
+        return [leaf for child in ast.iter_child_nodes(node) for leaf in self._array_leaves(child)]
+
+    def _array_count(self, node: ast.AST, operands: List[ast.AST]) -> str:
+        """Element count shared by the operands of an array expression"""
+        source_file = getattr(self, '_source_file', '<string>')
+        counts = [self._array_operand(operand)[2] for operand in operands]
+        known = sorted({count for count in counts if count is not None and count.isdigit()}, key=int)
+        if len(known) > 1:
+            raise CompileError(f"array operands have different lengths ({', '.join(known)})", node.lineno, source_file)
+        if known:
+            return known[0]
+        runtime = [count for count in counts if count is not None]
+        if not runtime:
+            raise CompileError("the length of the arrays is not known; annotate them Array[T, N] or pass views",
+                               node.lineno, source_file)
+        return runtime[0]
+
+    def _array_element_c(self, node: ast.AST, index: str, c_type: Optional[str] = None) -> str:
+        """C expression for element index of an array expression, converted to c_type"""
+        changes = []
+
+        def lower(child: ast.AST):
+            if is_array_leaf(child, self.views):
+                data, offset, _ = self._array_operand(child)
+                changes.append((child, 'loop_c', f"{data}[{index} + {offset}]" if offset else f"{data}[{index}]"))
+                changes.append((child, 'c_type', array_elem(child.c_type, self.views)))
+                return
+            if is_array_expr(child, self.views):
+                changes.append((child, 'c_type', array_elem(child.c_type, self.views)))
+                for grandchild in ast.iter_child_nodes(child):
+                    lower(grandchild)
+
+        lower(node)
+        with self._lowered(changes):
+            return self._coerce(node, c_type) if c_type else self._expr_to_c(node)
+
+    def _array_target(self, target: ast.AST) -> Optional[ast.AST]:
+        """A loaded copy of an array, view or slice assignment target, else None"""
+        base = target.value if isinstance(target, ast.Subscript) else target
+        if not isinstance(base, ast.Name) or (isinstance(target, ast.Subscript) and not isinstance(target.slice, ast.Slice)):
+            return None
+        if base.id in self.array_elem_types:
+            c_type = f"{self.array_elem_types[base.id]}*"
+        else:
+            c_type = self._target_type(base)
+            if c_type not in self.views:
+                return None
+        load = ast.copy_location(ast.Name(id=base.id, ctx=ast.Load()), base)
+        load.c_type = c_type
+        if base is target:
+            return load
+        load = ast.copy_location(ast.Subscript(value=load, slice=target.slice, ctx=ast.Load()), target)
+        load.c_type = c_type
+        return load
+
+    def _emit_array_store(self, node: ast.stmt, target: ast.AST, value: ast.AST, op: Optional[ast.operator] = None):
+        """``out[:] = expr`` or ``out += expr``: one loop over the elements, no temporary arrays
+
+        On ARM targets the patterns CMSIS-DSP implements (``a + b``, ``a * k``,
+        ``-a``, ...) call the library when PY2MCU_USE_CMSIS_DSP is defined.
+        """
+        source_file = getattr(self, '_source_file', '<string>')
+        dst = self._array_target(target)
+        if dst is None:
+            raise CompileError("element-wise assignment needs an array, a view or a slice of one",
+                               node.lineno, source_file)
+        elem_type = array_elem(dst.c_type, self.views)
+        if op is not None:
+            value = ast.copy_location(ast.BinOp(left=dst, op=op, right=value), node)
+            value.c_type = self.types._elementwise_type(value, [dst.c_type, getattr(node.value, 'c_type', None)])
+        operands = self._array_leaves(value)
+        data, offset, _ = self._array_operand(dst)
+        base = dst.value if isinstance(dst, ast.Subscript) else dst
+        for operand in operands:
+            source = operand.value if isinstance(operand, ast.Subscript) else operand
+            if (isinstance(source, ast.Name) and source.id == base.id and operand is not dst
+                    and self._array_operand(operand)[1] != offset):
+                raise CompileError(f"'{base.id}' is read at other positions than it is written; "
+                                   "copy it first (a fused loop has no temporary)", node.lineno, source_file)
+        count = self._array_count(node, [dst] + operands)
+        fill = None
+        if not operands and not self._is_simple_operand(value):
+            fill = f"fill{node.lineno}"
+            self.emit(f"const {elem_type} {fill} = {self._coerce(value, elem_type)};")
+        library = self._cmsis_store(value, elem_type, self._array_pointer(dst), count)
+        if library is not None:
+            self.uses_cmsis_dsp = True
+            self.code.append("#ifdef PY2MCU_USE_CMSIS_DSP")
+            self.emit(library)
+            self.code.append("#else")
+        index = f"k{node.lineno}"
+        simd = self._simd_store(dst, value, elem_type, index)
+        if simd is None:
+            self.emit(f"for (int32_t {index} = 0; {index} < {count}; {index}++) {{")
+        else:
+            self.emit("{")
+            self.indent_level += 1
+            self.emit(f"int32_t {index} = 0;")
+            self.uses_simd = True
+            before, after = self._simd_lines(simd, index, count)
+            self._emit_lines(before)
+            self.emit(f"for (; {index} < {count}; {index}++) {{")
+        self.indent_level += 1
+        element = fill or self._array_element_c(value, index, elem_type)
+        self.emit(f"{data}[{index} + {offset}] = {element};" if offset else f"{data}[{index}] = {element};")
+        self.indent_level -= 1
+        self.emit("}")
+        if simd is not None:
+            self._emit_lines(after)
+            self.indent_level -= 1
+            self.emit("}")
+        if library is not None:
+            self.code.append("#endif")
+        note = f", {library.split('(')[0]} with PY2MCU_USE_CMSIS_DSP" if library is not None else ""
+        self.report.add('Array expressions', f"{self.current_function}: line {node.lineno}: "
+                        f"'{base.id}' computed in one loop over {count} elements{note}")
+        if simd is not None:
+            self.report.add('SIMD', f"{self.current_function}: line {node.lineno}: '{base.id}' {simd.note}")
+
+    def _emit_array_assign(self, node: ast.Assign, target: ast.AST) -> bool:
+        """``out[a:b] = ...`` and ``y = <array expression>``; False if node is neither"""
+        source_file = getattr(self, '_source_file', '<string>')
+        if isinstance(target, ast.Subscript) and isinstance(target.slice, ast.Slice):
+            self._emit_array_store(node, target, node.value)
+            return True
+        if not (isinstance(target, ast.Name) and is_array_expr(node.value, self.views)):
+            return False
+        name = target.id
+        func = self.function_defs.get(self.current_function)
+        params = {arg.arg for arg in func.args.args} if func is not None else set()
+        if name in params or name in self.global_array_elem_types or name in self.types.globals:
+            raise CompileError(f"assigning an array expression rebinds '{name}' in NumPy; "
+                               f"write '{name}[:] = ...' to store into it", node.lineno, source_file)
+        if name not in self.local_vars:
+            # y = a * k: a new array holding the result
+            elem_type = array_elem(node.value.c_type, self.views)
+            count = self._array_count(node, self._array_leaves(node.value))
+            if not count.isdigit() or name in self._returned_names:
+                raise CompileError(f"declare '{name}: Array[T, N]' to hold the array expression",
+                                   node.lineno, source_file)
+            self.emit(f"{elem_type} {name}[{count}]{self._alignment_attribute(name, elem_type)};")
+            self.local_vars.add(name)
+            self.array_elem_types[name] = elem_type
+            self.array_lengths[name] = int(count)
+        self._emit_array_store(node, target, node.value)
+        return True
+
+    # -- SIMD lowering of array loops -----------------------------------------------
+
+    def _simd_mode(self) -> Optional[str]:
+        """'vector', 'dsp' or None: how array loops are vectorized for the target (-O2 and above)"""
+        return get_target_info(self.target)['simd'] if self.optimize_level >= 2 else None
+
+    @staticmethod
+    def _simd_storage(c_type: Optional[str]) -> Optional[str]:
+        """Integer or float type whose lanes hold elements of c_type, None if there is none"""
+        fmt = format_of_c_type(c_type)
+        storage = fmt.storage_type if fmt is not None else c_type
+        return storage if storage in LANE_TYPES else None
+
+    def _alignment_attribute(self, name: str, elem_type: str) -> str:
+        """`` PY2MCU_ALIGNED(n)`` for the declaration of an array SIMD loops work on, else ''"""
+        if name not in self.simd_arrays or self._simd_storage(elem_type) is None:
+            self.aligned_arrays.pop(name, None)
+            return ""
+        alignment = VECTOR_BYTES if self._simd_mode() == 'vector' else 4
+        self.aligned_arrays[name] = alignment
+        self.uses_simd = True
+        return f" PY2MCU_ALIGNED({alignment})"
+
+    def _vector_type(self, elem_type: str, lanes: int) -> str:
+        name = vector_name(elem_type, lanes)
+        self.simd_vectors[name] = f"PY2MCU_VECTOR_DEFINE({name}, {elem_type}, {lanes})"
+        return name
+
+    def _simd_access(self, operand: ast.AST, index: str, size: int) -> Tuple[str, bool]:
+        """(pointer to element index of an array operand, True if every access of size bytes is aligned)
+
+        Only arrays declared here with PY2MCU_ALIGNED have a known alignment;
+        parameters, views and heap lists may start anywhere.
+        """
+        data, offset, _ = self._array_operand(operand)
+        pointer = f"{data} + {index} + {offset}" if offset else f"{data} + {index}"
+        base = operand.value if isinstance(operand, ast.Subscript) else operand
+        known = 0
+        if isinstance(base, ast.Name) and not self._is_view(base):
+            known = self.aligned_arrays.get(base.id, 0)
+        elem_size = LANE_TYPES[self._simd_storage(array_elem(operand.c_type, self.views))]
+        return pointer, guaranteed_alignment(known, offset, size, elem_size) >= size
+
+    def _vector_expression(self, value: ast.AST, index: str, lane: str, lanes: int) -> Tuple[List[str], str, int]:
+        """(vector loads of the array operands, C expression of value on them, aligned loads)"""
+        lines, changes, aligned = [], [], 0
+        lane_vector = self._vector_type(lane, lanes)
+        for number, leaf in enumerate(self._array_leaves(value)):
+            storage = self._simd_storage(array_elem(leaf.c_type, self.views))
+            vector = self._vector_type(storage, lanes)
+            pointer, is_aligned = self._simd_access(leaf, index, LANE_TYPES[storage] * lanes)
+            aligned += is_aligned
+            load = f"PY2MCU_VLOAD{'_ALIGNED' if is_aligned else ''}({vector}, {pointer})"
+            if storage != lane:
+                load = f"__builtin_convertvector({load}, {lane_vector})"
+            lines.append(f"{lane_vector} {index}_{number} = {load};")
+            changes += [(leaf, 'loop_c', f"{index}_{number}"), (leaf, 'c_type', lane)]
+        changes += [(node, 'c_type', lane) for node in elementwise_nodes(value, self.views)]
+        for scalar in scalar_operands(value, self.views):
+            if scalar.c_type != lane:
+                # a vector operation converts its scalar operand only without loss of range
+                changes += [(scalar, 'loop_c', f"(({lane})({self._expr_to_c(scalar)}))"), (scalar, 'c_type', lane)]
+        with self._lowered(changes):
+            return lines, self._expr_to_c(value), aligned
+
+    def _simd_store(self, dst: ast.AST, value: ast.AST, elem_type: str, index: str) -> Optional[SimdLoop]:
+        """Vector main loop for ``dst[:] = value``, None if value does not vectorize for the target"""
+        mode, storage = self._simd_mode(), self._simd_storage(elem_type)
+        if mode is None or storage is None or not self._array_leaves(value):
+            return None
+        if mode == 'dsp':
+            return self._dsp_store(dst, value, elem_type, storage, index)
+        fmt = format_of_c_type(elem_type)
+        saturate = saturating_pattern(value, elem_type, self.views)
+        if saturate:
+            lane = storage
+        elif fmt is not None:
+            return None  # fixed-point multiplies and divides round and saturate per element
+        else:
+            lane = lane_type(value, elem_type, self.views)
+            if lane is None:
+                return None
+        sizes = [LANE_TYPES[lane], LANE_TYPES[storage]]
+        sizes += [LANE_TYPES[self._simd_storage(array_elem(leaf.c_type, self.views))] for leaf in self._array_leaves(value)]
+        lanes = VECTOR_BYTES // min(sizes)
+        lines, expr, aligned = self._vector_expression(value, index, lane, lanes)
+        vector, result = self._vector_type(lane, lanes), f"{index}_r"
+        if saturate:
+            lines += self._saturating_lines(saturate, fmt, index, vector, self._vector_type(f"u{storage}", lanes))
+        else:
+            lines.append(f"{vector} {result} = {expr};")
+        if lane != storage:
+            store_vector = self._vector_type(storage, lanes)
+            lines.append(f"{store_vector} {index}_s = __builtin_convertvector({result}, {store_vector});")
+            result = f"{index}_s"
+        pointer, is_aligned = self._simd_access(dst, index, LANE_TYPES[storage] * lanes)
+        lines.append(f"PY2MCU_VSTORE{'_ALIGNED' if is_aligned else ''}({pointer}, {result});")
+        accesses = len(self._array_leaves(value)) + 1
+        note = (f"{lanes} x {lane} lanes{' saturating' if saturate else ''} (GCC vectors), "
+                f"{aligned + is_aligned} of {accesses} accesses aligned")
+        return SimdLoop('PY2MCU_SIMD_VECTOR', lanes, [], lines, [], note)
+
+    @staticmethod
+    def _saturating_lines(kind: str, fmt, index: str, vector: str, unsigned: str) -> List[str]:
+        """Saturating add, subtract or negate of the loaded vectors {index}_0 and {index}_1 into {index}_r
+
+        The operation wraps in unsigned lanes; lanes that overflowed (operands
+        of one sign, result of the other) get the limit of the operands' sign.
+        """
+        a, b, r, m = f"{index}_0", f"{index}_1", f"{index}_r", f"{index}_m"
+        minimum = f"({-fmt.max} - 1)"
+        if kind == 'neg':
+            return [f"{vector} {r} = ({vector})(({unsigned}){{0}} - ({unsigned}){a});",
+                    f"{vector} {m} = {a} == {minimum};",
+                    f"{r} = ({r} & ~{m}) | ({fmt.max} & {m});"]
+        op, overflow = ('+', f"({a} ^ {r}) & ({b} ^ {r})") if kind == 'add' else ('-', f"({a} ^ {b}) & ({a} ^ {r})")
+        return [f"{vector} {r} = ({vector})(({unsigned}){a} {op} ({unsigned}){b});",
+                f"{vector} {m} = ({overflow}) < 0;",
+                f"{r} = ({r} & ~{m}) | ((({a} >> {fmt.bits - 1}) ^ {fmt.max}) & {m});"]
+
+    def _dsp_store(self, dst: ast.AST, value: ast.AST, elem_type: str, storage: str, index: str) -> Optional[SimdLoop]:
+        """Packed 16/8-bit loop for ``dst[:] = a + b`` and friends with the ARM DSP extension"""
+        pattern = dsp_pattern(value, elem_type, self.views)
+        if pattern is None:
+            return None
+        intrinsic, arrays, scalar = pattern
+        lines, args, aligned = [], [], 0
+        for number, operand in enumerate(arrays):
+            if operand is None:
+                args.append("0")  # -a is 0 - a
+                continue
+            pointer, is_aligned = self._simd_access(operand, index, 4)
+            aligned += is_aligned
+            lines.append(f"uint32_t {index}_{number} = PY2MCU_LOAD32{'_ALIGNED' if is_aligned else ''}({pointer});")
+            args.append(f"{index}_{number}")
+        if scalar is not None:
+            args.append(f"PY2MCU_PACK{8 * LANE_TYPES[storage]}({self._expr_to_c(scalar)})")
+        pointer, is_aligned = self._simd_access(dst, index, 4)
+        lines.append(f"PY2MCU_STORE32{'_ALIGNED' if is_aligned else ''}({pointer}, {intrinsic}({', '.join(args)}));")
+        lanes = 4 // LANE_TYPES[storage]
+        accesses = len([operand for operand in arrays if operand is not None]) + 1
+        note = f"{intrinsic} on {lanes} x {storage} lanes, {aligned + is_aligned} of {accesses} accesses aligned"
+        return SimdLoop('PY2MCU_SIMD_DSP', lanes, [], lines, [], note)
+
+    def _simd_sum(self, expr: ast.AST, acc_type: str, index: str, acc: str) -> Optional[SimdLoop]:
+        """Vector main loop for an integer sum() of an array expression
+
+        Integer addition wraps the same in any order; float sums keep the
+        scalar loop and its rounding.  ``sum(a * b)`` of int16_t arrays
+        multiplies pairs of lanes in 32-bit words, like __SMLAD does.
+        """
+        mode = self._simd_mode()
+        if mode is None or not is_int_type(acc_type) or acc_type not in LANE_TYPES:
+            return None
+        pattern = cmsis_pattern(expr, self.views)
+        pairs = (pattern is not None and pattern[0] == 'mult' and acc_type == 'int32_t'
+                 and all(array_elem(operand.c_type, self.views) == 'int16_t' for operand in pattern[1]))
+        if mode == 'dsp' or pairs:
+            if not pairs:
+                return None
+            size = 4 if mode == 'dsp' else VECTOR_BYTES
+            loads, aligned = [], 0
+            for operand in pattern[1]:
+                pointer, is_aligned = self._simd_access(operand, index, size)
+                aligned += is_aligned
+                if mode == 'dsp':
+                    loads.append(f"PY2MCU_LOAD32{'_ALIGNED' if is_aligned else ''}({pointer})")
+                else:
+                    loads.append(f"PY2MCU_VLOAD{'_ALIGNED' if is_aligned else ''}"
+                                 f"({self._vector_type('int32_t', size // 4)}, {pointer})")
+            if mode == 'dsp':
+                line = f"{acc} = (int32_t)__SMLAD({loads[0]}, {loads[1]}, (uint32_t){acc});"
+                return SimdLoop('PY2MCU_SIMD_DSP', 2, [], [line], [],
+                                f"__SMLAD on 2 x int16_t lanes, {aligned} of 2 loads aligned")
+            vector, partial, lane = self._vector_type('int32_t', size // 4), f"{index}_acc", f"{index}_lane"
+            a, b = f"{index}_0", f"{index}_1"
+            body = [f"{vector} {a} = {loads[0]};", f"{vector} {b} = {loads[1]};",
+                    f"{partial} += py2mcu_madd16({a}, {b});"]
+            return SimdLoop('PY2MCU_SIMD_VECTOR', size // 2, [f"{vector} {partial} = {{0}};"], body,
+                            [f"for (int32_t {lane} = 0; {lane} < {size // 4}; {lane}++) {{",
+                             f"    {acc} += {partial}[{lane}];", "}"],
+                            f"{size // 2} x int16_t lanes in pairs (GCC vectors), {aligned} of 2 loads aligned")
+        if lane_type(expr, acc_type, self.views) != acc_type:
+            return None
+        leaves = self._array_leaves(expr)
+        sizes = [LANE_TYPES[acc_type]] + [LANE_TYPES[self._simd_storage(array_elem(leaf.c_type, self.views))]
+                                          for leaf in leaves]
+        lanes = VECTOR_BYTES // min(sizes)
+        lines, value, aligned = self._vector_expression(expr, index, acc_type, lanes)
+        vector, partial = self._vector_type(acc_type, lanes), f"{index}_acc"
+        lane = f"{index}_lane"
+        return SimdLoop('PY2MCU_SIMD_VECTOR', lanes, [f"{vector} {partial} = {{0}};"],
+                        lines + [f"{partial} += {value};"],
+                        [f"for (int32_t {lane} = 0; {lane} < {lanes}; {lane}++) {{", f"    {acc} += {partial}[{lane}];", "}"],
+                        f"{lanes} x {acc_type} lanes (GCC vectors), {aligned} of {len(leaves)} loads aligned")
+
+    @staticmethod
+    def _simd_lines(simd: SimdLoop, index: str, count: str) -> Tuple[List[str], List[str]]:
+        """Lines before and after the scalar loop over the elements
+
+        The vector main loop goes in an #if block ahead of it and the scalar
+        loop finishes the remaining elements; when the vector loop covers a
+        constant count exactly, the scalar loop is only the #else branch.
+        """
+        exact = count.isdigit() and int(count) % simd.lanes == 0
+        step = f"for (; {index} + {simd.lanes} <= {count}; {index} += {simd.lanes}) {{"
+        before = ([f"#if {simd.guard}"] + simd.prologue + [step] + [f"    {line}" for line in simd.body] + ["}"]
+                  + simd.epilogue + ["#else" if exact else "#endif"])
+        return before, ["#endif"] if exact else []
+
+    def _emit_lines(self, lines: List[str]):
+        for line in lines:
+            if line.startswith('#'):
+                self.code.append(line)  # preprocessor lines start in column 0
+            else:
+                self.emit(line)
+
+    def _has_cmsis_dsp(self) -> bool:
+        """True on ARM Cortex-M targets, where CMSIS-DSP may be linked in"""
+        return str(get_target_info(self.target)['arch'] or '').startswith('cortex-m')
+
+    def _cmsis_store(self, value: ast.AST, elem_type: str, dst: str, count: str) -> Optional[str]:
+        """CMSIS-DSP call computing value into dst on ARM targets, else None"""
+        if not self._has_cmsis_dsp():
+            return None
+        pattern = cmsis_pattern(value, self.views)
+        if pattern is None or array_elem(getattr(value, 'c_type', None), self.views) != elem_type:
+            return None
+        stem, arrays, scalar = pattern
+        function = cmsis_function(stem, elem_type)
+        if function is None or any(array_elem(a.c_type, self.views) != elem_type for a in arrays):
+            return None
+        args = [self._array_pointer(operand) for operand in arrays]
+        if scalar is not None:
+            if not (is_float_type(getattr(scalar, 'c_type', None)) or is_int_type(getattr(scalar, 'c_type', None))):
+                return None
+            args.append(self._expr_to_c(scalar))
+        return f"{function}({', '.join(args + [dst, count])});"
+
+    def _array_reduction(self, node: ast.Call) -> str:
+        """sum(), min(), max(), any() or all() of an array expression: a helper with one fused loop
+
+        The helper takes the names the expression reads as parameters, so it
+        is defined once ahead of the function and called in place.
+        """
+        source_file = getattr(self, '_source_file', '<string>')
+        kind, expr = node.func.id, node.args[0]
+        if node.keywords or len(node.args) > (2 if kind == 'sum' else 1):
+            raise CompileError(f"{kind}() takes one array expression", node.lineno, source_file)
+        names = [name for name in operand_names(expr) if name.id not in self.module_int_constants]
+        helper = self.array_reductions.get(id(node))
+        if helper is None:
+            helper = self._array_reduction_helper(node, kind, expr, names)
+            self.array_reductions[id(node)] = helper
+        call = f"{helper}({', '.join(self._expr_to_c(name) for name in names)})"
+        if len(node.args) == 2:
+            return f"({self._expr_to_c(node.args[1])} + {call})"
+        return call
+
+    def _array_reduction_helper(self, node: ast.Call, kind: str, expr: ast.AST, names: List[ast.Name]) -> str:
+        source_file = getattr(self, '_source_file', '<string>')
+        elem_type = array_elem(expr.c_type, self.views)
+        acc_type = 'bool' if kind in ('any', 'all') else node.c_type
+        if not all(t == 'bool' or is_int_type(t) or is_float_type(t) for t in (elem_type, acc_type)):
+            raise CompileError(f"{kind}() of {elem_type} elements is not supported", node.lineno, source_file)
+        params = []
+        for name in names:
+            c_type = getattr(name, 'c_type', None)
+            elem = array_elem(c_type, self.views)
+            if c_type is None:
+                raise CompileError(f"the type of '{name.id}' is not known", node.lineno, source_file)
+            params.append(f"{c_type} {name.id}" if c_type in self.views or elem is None else f"const {elem} *{name.id}")
+        changes = [(name, 'loop_c', name.id) for name in names]
+        changes += [(child, 'loop_c', str(self.module_int_constants[child.id])) for child in ast.walk(expr)
+                    if isinstance(child, ast.Name) and child.id in self.module_int_constants]
+        taken = {name.id for name in names}
+        index, acc, best, value = (local + '_' * (local in taken) for local in ('k', 'acc', 'best', 'x'))
+        with self._lowered(changes):
+            operands = self._array_leaves(expr)
+            count = self._array_count(node, operands)
+            element = self._array_element_c(expr, index)
+            pattern = cmsis_pattern(expr, self.views) if kind == 'sum' and self._has_cmsis_dsp() else None
+            dot, simd = None, None
+            if kind == 'sum' and acc_type != 'bool':
+                simd = self._simd_sum(expr, acc_type, index, acc)
+            if (pattern is not None and pattern[0] == 'mult' and acc_type == 'float'
+                    and all(array_elem(operand.c_type, self.views) == 'float' for operand in operands)):
+                sources = [self._array_pointer(operand) for operand in operands]
+                dot = f"arm_dot_prod_f32({sources[0]}, {sources[1]}, {count}, &{acc});"
+        name = f"py2mcu_{kind}{node.lineno}"
+        while name in self.array_reductions.values():
+            name += "_"
+        loop = f"    for (int32_t {index} = 0; {index} < {count}; {index}++) {{"
+        lines = [f"// {kind}() of an element-wise expression, fused into one loop",
+                 f"static inline {acc_type} {name}({', '.join(params) or 'void'}) {{"]
+        if kind in ('any', 'all'):
+            test = f"({element})" if kind == 'any' else f"(!({element}))"
+            lines += [loop, f"        if {test} return {'true' if kind == 'any' else 'false'};", "    }",
+                      f"    return {'false' if kind == 'any' else 'true'};"]
+        elif kind == 'sum':
+            body = [f"    {acc_type} {acc} = 0;", loop, f"        {acc} += {element};", "    }", f"    return {acc};"]
+            if simd is not None:
+                self.uses_simd = True
+                before, after = self._simd_lines(simd, index, count)
+                indent = lambda lines: [line if line.startswith('#') else f"    {line}" for line in lines]  # noqa: E731
+                body[1:4] = ([f"    int32_t {index} = 0;"] + indent(before) + [f"    for (; {index} < {count}; {index}++) {{"]
+                             + body[2:4] + indent(after))
+            if dot is not None:
+                self.uses_cmsis_dsp = True
+                body = ["#ifdef PY2MCU_USE_CMSIS_DSP", f"    {acc_type} {acc};", f"    {dot}", f"    return {acc};",
+                        "#else"] + body + ["#endif"]
+            lines += body
+        else:
+            if count == '0':
+                raise CompileError(f"{kind}() of an empty sequence", node.lineno, source_file)
+            op = '>' if kind == 'max' else '<'
+            if not count.isdigit():
+                self.loop_kernels['PY2MCU_VALUE_ERROR'] = ""  # py2mcu_loops.h defines it
+                lines.append(f"    if ({count} == 0) PY2MCU_VALUE_ERROR();")
+            lines += [f"    {acc_type} {best} = 0;", loop, f"        {acc_type} {value} = {element};",
+                      f"        if ({index} == 0 || {value} {op} {best}) {best} = {value};", "    }", f"    return {best};"]
+        self.array_helpers += lines + ["}", ""]
+        self.report.add('Array expressions', f"{self.current_function}: line {node.lineno}: "
+                        f"{kind}() fused into {name}() over {count} elements"
+                        + (", arm_dot_prod_f32 with PY2MCU_USE_CMSIS_DSP" if dot is not None else ""))
+        if simd is not None:
+            self.report.add('SIMD', f"{self.current_function}: line {node.lineno}: {kind}() in {name}() {simd.note}")
+        return name
+
+    def visit_Break(self, node: ast.Break):
+        self.emit("break;")
+
+    def visit_Continue(self, node: ast.Continue):
+        self.emit("continue;")
 
-    
     def _get_storage_class_specifiers(self, modifiers: dict, base_type: str) -> str:
         """Generate C storage class specifiers from modifiers.
 
@@ -403,6 +2338,29 @@ class CCodeGenerator(ast.NodeVisitor):
 
     def visit_AnnAssign(self, node: ast.AnnAssign):
         """Generate annotated assignment"""
+        matrix = self._matrix_annotation(node.annotation)
+        if matrix is not None and isinstance(node.target, ast.Name):
+            self._emit_matrix_decl(node, node.target.id, matrix)
+            return
+        container = self._container_annotation(node.annotation)
+        if container is not None and isinstance(node.target, ast.Name):
+            self._emit_container_decl(node, node.target.id, container)
+            return
+        if self._is_const_dict(node):
+            return
+        if self.in_function and isinstance(node.target, ast.Name) and self._is_view_alloc(node.value):
+            self._emit_view_alloc(node, node.target.id)
+            return
+        if (self.in_function and isinstance(node.target, ast.Name) and node.value is not None
+                and is_array_expr(node.value, self.views) and self._array_annotation(node.annotation) is not None):
+            # x: Array[T, N] = a * k: storage, then one loop
+            self.array_elem_types[node.target.id] = self._array_elem_type(node)
+            self._emit_list_init(ast.copy_location(ast.AnnAssign(target=node.target, annotation=node.annotation,
+                                                                 value=None, simple=1), node), node.target.id)
+            self._emit_array_store(node, node.target, node.value)
+            return
+        if not self.in_function and isinstance(node.target, ast.Name) and self._emit_global_bytes(node, node.target.id):
+            return
         if isinstance(node.target, ast.Name):
             var_name = node.target.id
 
@@ -411,31 +2369,28 @@ class CCodeGenerator(ast.NodeVisitor):
                 return
 
             var_type = self._map_type(node.annotation)
+            array_info = self._array_annotation(node.annotation)
+            if array_info is not None:
+                self.array_elem_types[var_name] = self._array_elem_type(node)
+                if not self.in_function:
+                    self.global_array_elem_types[var_name] = self.array_elem_types[var_name]
+
+            # Literal initialization ([0]*N, [1, 2, 3]) or a bare Array[T, N]
+            if self._is_array_alloc(node):
+                if self.in_function:
+                    self._emit_list_init(node, var_name)
+                else:
+                    self._emit_global_array(node, var_name)
+                return
 
             if node.value:
-                # Check if this is a list type
-                is_list = isinstance(node.annotation, ast.Name) and node.annotation.id == 'list'
-                
-                if is_list and self.in_function:
-                    # Check if it's a literal initialization: [0]*N or [1, 2, 3]
-                    if isinstance(node.value, (ast.List, ast.BinOp)):
-                        # Inside function: generate heap allocation
-                        elem_type, size = self._infer_list_info(node.value)
-                        self.emit(f"{elem_type}* {var_name} = ({elem_type}*)gc_malloc(sizeof({elem_type}) * {size});")
-                        self.local_vars.add(var_name)
-                        # Initialize array with zeros (simple approach)
-                        self.emit(f"for (int _i = 0; _i < {size}; _i++) {{ {var_name}[_i] = 0; }}")
-                        return
-                    else:
-                        # For other values (like function calls), just do a regular assignment
-                        value = self._expr_to_c(node.value)
-                        self.emit(f"{var_type} {var_name} = {value};")
-                        self.local_vars.add(var_name)
-                        return
-                
-                value = self._expr_to_c(node.value)
+                if var_type == 'double':
+                    self._mark_double_literals(node.value)
+                    self._check_double_promotion(node, [getattr(node.value, 'c_type', None), var_type])
+                value = self._coerce(node.value, var_type)
                 if self.in_function:
                     # Inside function: regular declaration
+                    var_type = self._local_int_type(var_name, var_type)
                     self.emit(f"{var_type} {var_name} = {value};")
                     self.local_vars.add(var_name)
                 else:
@@ -454,6 +2409,7 @@ class CCodeGenerator(ast.NodeVisitor):
             else:
                 # Declaration without value
                 if self.in_function:
+                    var_type = self._local_int_type(var_name, var_type)
                     self.emit(f"{var_type} {var_name};")
                     self.local_vars.add(var_name)
                 else:
@@ -466,10 +2422,1064 @@ class CCodeGenerator(ast.NodeVisitor):
                     self.emit(f"{full_type} {var_name};")
 
     
+    def visit_AugAssign(self, node: ast.AugAssign):
+        """Generate compound assignment (one read-modify-write of the target)"""
+        if self.matrices and self._emit_matrix_augassign(node):
+            return
+        if self.in_function and self._array_target(node.target) is not None:
+            self._emit_array_store(node, node.target, node.value, node.op)  # a += b on whole arrays
+            return
+        if isinstance(node.target, ast.Subscript) and self._container_of(node.target.value) is not None:
+            # d[k] += v is d[k] = d[k] + v
+            load = ast.copy_location(ast.Subscript(value=node.target.value, slice=node.target.slice,
+                                                   ctx=ast.Load()), node.target)
+            load.c_type = getattr(node.target, 'c_type', None)
+            value = ast.copy_location(ast.BinOp(left=load, op=node.op, right=node.value), node)
+            value.c_type = load.c_type
+            self.visit_Assign(ast.copy_location(ast.Assign(targets=[node.target], value=value), node))
+            return
+        target = self._expr_to_c(node.target)
+        target_type = self._target_type(node.target)
+        fmt = format_of_c_type(target_type)
+        if fmt is not None:
+            # Saturating helpers: x = q15_add(x, y)
+            load = ast.copy_location(type(node.target)(**{**vars(node.target), 'ctx': ast.Load()}), node.target)
+            load.c_type = target_type
+            binop = ast.copy_location(ast.BinOp(left=load, op=node.op, right=node.value), node)
+            binop.c_type = target_type
+            self.emit(f"{target} = {self._fixed_binop(binop, fmt)};")
+            return
+        op = self._op_to_c(node.op)
+        if op == '?':
+            raise CompileError(f"operator {type(node.op).__name__} is not supported in augmented assignment",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        if is_float_type(target_type):
+            self._check_double_promotion(node, [target_type, getattr(node.value, 'c_type', None)])
+        value = self._expr_to_c(node.value)
+        if isinstance(node.op, (ast.LShift, ast.RShift)):
+            count = eval_const_int(node.value, self.module_int_constants)
+            width = 64 if target_type in ('int64_t', 'uint64_t') else 32
+            if count is not None and not 0 <= count < width:
+                raise CompileError(f"shift count {count} is outside 0..{width - 1} for {target_type}",
+                                   node.lineno, getattr(self, '_source_file', '<string>'))
+        if is_int_type(target_type) and isinstance(node.op, ast.Div):
+            raise CompileError("'/=' makes an int variable a float in Python; use '//=' or a float variable",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        self.emit(f"{target} {op}= {value};")
+
+    def visit_Delete(self, node: ast.Delete):
+        """del d[key] on a fixed-capacity dict"""
+        for target in node.targets:
+            container = self._container_of(target.value) if isinstance(target, ast.Subscript) else None
+            if container is None:
+                raise CompileError("del is only supported for Dict[K, V, N] entries",
+                                   node.lineno, getattr(self, '_source_file', '<string>'))
+            table, ref = container
+            self.emit(f"{table.name}_remove({ref}, {self._expr_to_c(target.slice)});")
+
+    def _collect_containers(self, tree: ast.Module):
+        """Find the Dict[K, V, N] / Set[K, N] types the module uses"""
+        self.containers = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript):
+                container = self._container_annotation(node)
+                if container is not None:
+                    self.containers[container.c_type] = container
+
+    def _container_annotation(self, node: ast.AST):
+        try:
+            return container_annotation(node, self._map_type, self.module_int_constants)
+        except ValueError as e:
+            raise CompileError(str(e), getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+
+    def _container_of(self, node: ast.AST):
+        """(ContainerType, C reference) if node names a fixed-capacity dict or set"""
+        if not isinstance(node, ast.Name):
+            return None
+        container = self.containers.get(getattr(node, 'c_type', None) or self.types.globals.get(node.id))
+        if container is None:
+            return None
+        return container, node.id if node.id in self.container_params else f"&{node.id}"
+
+    def _emit_container_decl(self, node: ast.AST, name: str, container):
+        value = node.value
+        empty = (value is None or (isinstance(value, ast.Dict) and not value.keys)
+                 or (isinstance(value, ast.Call) and not value.args
+                     and (isinstance(value.func, ast.Subscript)
+                          or (isinstance(value.func, ast.Name) and value.func.id in ('set', 'dict')))))
+        if not empty:
+            raise CompileError(f"'{name}' must start empty ({{}}, set() or {container.name}())",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        self.emit(f"{container.c_type} {name};")
+        if self.in_function:
+            self.local_vars.add(name)
+            self.emit(f"{container.name}_clear(&{name});")
+        else:
+            self.defined_names.add(name)  # static storage starts zeroed (empty)
+
+    def _container_summary(self, container) -> str:
+        entry = c_sizeof(container.key_type) + (c_sizeof(container.value_type) if container.value_type else 0)
+        size = 4 + container.slots * (1 + entry)
+        load = 100 * container.capacity / container.slots
+        return (f"{container.name}: {container.capacity} entries in {container.slots} slots "
+                f"(max load {load:.0f}%), {size} bytes each")
+
+    def _container_call(self, node: ast.Call) -> Optional[str]:
+        """Methods and len() of fixed-capacity dicts and sets"""
+        func = node.func
+        if isinstance(func, ast.Name) and func.id == 'len' and len(node.args) == 1:
+            container = self._container_of(node.args[0])
+            if container is not None:
+                ref = container[1]
+                count = f"{ref[1:]}.count" if ref.startswith('&') else f"{ref}->count"
+                return f"((int32_t){count})"
+            return None
+        container = self._container_of(func.value) if isinstance(func, ast.Attribute) else None
+        if container is None:
+            return None
+        table, ref = container
+        method = METHODS[table.kind].get(func.attr)
+        if method is None:
+            raise CompileError(f"{table.kind} method '{func.attr}' is not supported on {table.name}",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        suffix, has_fallback = method
+        args = [ref] + [self._expr_to_c(arg) for arg in node.args[:1]]
+        if has_fallback:
+            args.append(self._coerce(node.args[1], table.value_type) if len(node.args) > 1 else "0")
+        return f"{table.name}_{suffix}({', '.join(args)})"
+
+    # -- small matrices (Mat[T, R, C], Vec[T, N]) ---------------------------------
+
+    def _matrix_annotation(self, node: ast.AST) -> Optional[MatrixType]:
+        """MatrixType of a ``Mat[T, R, C]`` / ``Vec[T, N]`` annotation (registers its DEFINE)"""
+        try:
+            matrix = matrix_annotation(node, self._map_type, self.module_int_constants)
+        except ValueError as e:
+            raise CompileError(str(e), getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+        if matrix is not None:
+            self.matrices.setdefault(matrix.c_type, matrix)
+        return matrix
+
+    def _matrix_type(self, elem_type: Optional[str], shape: tuple) -> Optional[str]:
+        """C type of the Mat/Vec of elem_type and shape (registers its DEFINE); None for other elements"""
+        if not is_element_type(elem_type):
+            return None
+        matrix = MatrixType(elem_type, shape)
+        self.matrices.setdefault(matrix.c_type, matrix)
+        return matrix.c_type
+
+    def _matrix_of(self, node: ast.AST) -> Optional[MatrixType]:
+        return self.matrices.get(getattr(node, 'c_type', None))
+
+    def _matrix_params(self) -> Dict[str, ast.AST]:
+        """Annotations of the current function's parameters"""
+        func = self.function_defs.get(self.current_function) if self.in_function else None
+        return {arg.arg: arg.annotation for arg in func.args.args} if func is not None else {}
+
+    def _matrix_variable(self, name: str) -> Optional[MatrixType]:
+        """MatrixType of a Mat/Vec local, parameter or global"""
+        params = self._matrix_params()
+        if name in params:
+            return self.matrices.get(self._map_type(params[name])) if params[name] is not None else None
+        local = self.local_types.get(name) if self.in_function else None
+        return self.matrices.get(local or self.types.globals.get(name))
+
+    def _check_matrix_store(self, node: ast.AST, name: str):
+        """Changing a Mat/Vec parameter in place would change the caller's array in NumPy"""
+        if name in self._matrix_params():
+            raise CompileError(f"'{name}' is a copy in C (Mat and Vec are passed by value) but the caller's "
+                               f"array in NumPy; return the new value instead of changing '{name}'",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+
+    def _check_matrix_alias(self, node: ast.AST, name: str, value: ast.AST):
+        """``b = a`` makes b a second name for a's array in NumPy but a copy in C"""
+        if isinstance(value, ast.Name) and self._matrix_of(value) is not None:
+            raise CompileError(f"'{name} = {value.id}' shares the elements of '{value.id}' in NumPy; "
+                               f"write '{name} = {value.id}.copy()'",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+
+    def _matrix_operands(self, node: ast.AST) -> bool:
+        """node is arithmetic on Mat/Vec values; raises CompileError where NumPy would fail or broadcast"""
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            return False
+        operands = [node.left, node.right] if isinstance(node, ast.BinOp) else [node.operand]
+        matrices = [self._matrix_of(operand) for operand in operands]
+        if all(matrix is None for matrix in matrices):
+            return False
+        for operand, matrix in zip(operands, matrices):
+            if matrix is None and array_elem(getattr(operand, 'c_type', None), self.views) is not None:
+                raise CompileError(f"'{self._source_text(operand)}' is an array, not a Mat or Vec; "
+                                   "give it a Mat or Vec annotation", node.lineno,
+                                   getattr(self, '_source_file', '<string>'))
+        try:
+            result_shape(node.op, *[matrix.shape if matrix else None for matrix in matrices])
+        except ValueError as e:
+            raise CompileError(str(e), node.lineno, getattr(self, '_source_file', '<string>'))
+        return True
+
+    @contextlib.contextmanager
+    def _matrix_temporaries(self, stmt: ast.stmt):
+        """Compute the Mat/Vec values stmt would evaluate more than once into const temporaries"""
+        self.matrix_products = 0
+        use = 'elements' if isinstance(stmt, ast.AugAssign) else None
+        with contextlib.ExitStack() as stack:
+            self._hoist_matrix_operands(stmt.value, use, stack)
+            yield
+        if self.matrix_products:
+            self.report.add('Matrices', f"{self.current_function}(): line {stmt.lineno}: "
+                                        f"{self.matrix_products} multiply-adds unrolled")
+
+    def _hoist_matrix_operands(self, node: ast.AST, use: Optional[str], stack: contextlib.ExitStack):
+        """Post-order: give node a temporary when it is read element by element and is expensive
+
+        use is None for a value used whole, 'elements' when its elements are
+        read one at a time (a call would run once per element) and
+        'product' for an operand of ``@`` (each element is read once per
+        row or column of the product).
+        """
+        matrix = self._matrix_of(node)
+        kind = matrix_call(node, self.numpy_names)
+        if self._matrix_operands(node):
+            child_use = 'product' if isinstance(node.op, ast.MatMult) else 'elements'
+            for child in ast.iter_child_nodes(node):
+                self._hoist_matrix_operands(child, child_use if self._matrix_of(child) else None, stack)
+        elif isinstance(node, ast.Attribute) and matrix is not None:
+            self._hoist_matrix_operands(node.value, 'elements', stack)  # .T
+        elif kind in ('copy', 'transpose'):
+            operand = node.args[0] if node.args else node.func.value
+            self._hoist_matrix_operands(operand, use if kind == 'copy' else 'elements', stack)
+        elif isinstance(node, ast.Subscript) and self._matrix_of(node.value) is not None:
+            self._hoist_matrix_operands(node.value, 'elements', stack)
+            self._hoist_matrix_operands(node.slice, None, stack)
+        else:
+            for child in ast.iter_child_nodes(node):
+                self._hoist_matrix_operands(child, None, stack)
+        if matrix is None or use is None or getattr(node, 'loop_c', None) is not None:
+            return
+        if use == 'elements' and not (isinstance(node, ast.Call) and kind in (None, 'inv')):
+            return
+        if use == 'product' and self._is_simple_matrix(node):
+            return
+        name = base = f"tmp{node.lineno}"
+        suffix = 1
+        while name in self.local_vars:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        self.local_vars.add(name)
+        self._emit_matrix_value(f"const {matrix.c_type} {name} = ", node, matrix)
+        stack.enter_context(self._lowered([(node, 'loop_c', name)]))
+
+    def _is_simple_matrix(self, node: ast.AST) -> bool:
+        """Elements readable without arithmetic: variables, their transposes and copies, NumPy fills"""
+        if isinstance(node, ast.Name) or getattr(node, 'loop_c', None) is not None:
+            return True
+        if isinstance(node, ast.Attribute):
+            return self._is_simple_matrix(node.value)
+        kind = matrix_call(node, self.numpy_names)
+        if kind in ('copy', 'transpose'):
+            return self._is_simple_matrix(node.args[0] if node.args else node.func.value)
+        return kind in NUMPY_FILLS
+
+    def _c_leaf(self, node: ast.AST, c_code: str, c_type: str) -> ast.AST:
+        """Stand-in operand for C code already generated, located at node"""
+        leaf = ast.copy_location(ast.Name(id='_', ctx=ast.Load()), node)
+        leaf.loop_c = c_code
+        leaf.c_type = c_type
+        return leaf
+
+    def _matrix_element(self, node: ast.AST, pos: tuple) -> str:
+        """C expression of the element at pos of a Mat/Vec expression, in its element type"""
+        matrix = self._matrix_of(node)
+        ref = getattr(node, 'loop_c', None)
+        if ref is None and isinstance(node, ast.Name):
+            ref = node.id
+        if ref is not None:
+            return matrix.element(ref, pos)
+        if isinstance(node, ast.Attribute):
+            return self._matrix_element(node.value, pos[::-1])  # .T
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.MatMult):
+            return self._matmul_element(node, pos)
+        if isinstance(node, (ast.BinOp, ast.UnaryOp)):
+            operands = [node.left, node.right] if isinstance(node, ast.BinOp) else [node.operand]
+            changes = [(node, 'c_type', matrix.elem_type)]
+            for operand in operands:
+                inner = self._matrix_of(operand)
+                if inner is not None:
+                    changes += [(operand, 'loop_c', self._matrix_element(operand, pos)),
+                                (operand, 'c_type', inner.elem_type)]
+            with self._lowered(changes):
+                return self._expr_to_c(node)
+        kind = matrix_call(node, self.numpy_names)
+        if kind == 'copy':
+            return self._matrix_element(node.func.value, pos)
+        if kind == 'transpose':
+            return self._matrix_element(node.args[0] if node.args else node.func.value, pos[::-1])
+        if kind in NUMPY_FILLS:
+            value = fill_value(kind, pos)
+            constant = ast.copy_location(ast.Constant(value=float(value) if is_float_type(matrix.elem_type)
+                                                      else value), node)
+            constant.c_type = matrix.elem_type if is_float_type(matrix.elem_type) else 'int32_t'
+            return self._coerce(constant, matrix.elem_type)
+        if kind == 'full':
+            return self._coerce(node.args[1], matrix.elem_type)
+        whole = self._matrix_whole(node)  # a call not given a temporary: only in conditions
+        return matrix.element(whole, pos)
+
+    def _matmul_element(self, node: ast.BinOp, pos: tuple) -> str:
+        """Element pos of ``a @ b`` (pos () for ``v @ w``): the products summed in order"""
+        left, right = self._matrix_of(node.left), self._matrix_of(node.right)
+        matrix = self._matrix_of(node)
+        c_type = matrix.elem_type if matrix is not None else node.c_type
+        split = len(left.shape) - 1
+        terms = []
+        for k in range(left.shape[-1]):
+            a = self._c_leaf(node, self._matrix_element(node.left, pos[:split] + (k,)), left.elem_type)
+            b = self._c_leaf(node, self._matrix_element(node.right, (k,) + pos[split:]), right.elem_type)
+            product = ast.copy_location(ast.BinOp(left=a, op=ast.Mult(), right=b), node)
+            product.c_type = c_type
+            terms.append(product)
+        self.matrix_products += len(terms)
+        return self._sum_c(node, terms, c_type)
+
+    def _sum_c(self, node: ast.AST, terms: List[ast.AST], c_type: str) -> str:
+        """C sum of terms in c_type, added left to right"""
+        if format_of_c_type(c_type) is None:
+            parts = [self._expr_to_c(term) for term in terms]
+            return parts[0] if len(parts) == 1 else f"({' + '.join(parts)})"
+        total = terms[0]
+        for term in terms[1:]:
+            total = ast.copy_location(ast.BinOp(left=total, op=ast.Add(), right=term), node)
+            total.c_type = c_type
+        return self._coerce(total, c_type)
+
+    def _matrix_whole(self, node: ast.AST) -> Optional[str]:
+        """C value of a Mat/Vec expression that needs no element-wise code, else None"""
+        if getattr(node, 'loop_c', None) is not None:
+            return node.loop_c
+        if isinstance(node, ast.Name):
+            return node.id
+        kind = matrix_call(node, self.numpy_names)
+        if kind == 'copy':
+            return self._matrix_whole(node.func.value)
+        if isinstance(node, ast.Call) and kind in (None, 'inv'):
+            return self._expr_to_c(node)
+        return None
+
+    def _matrix_expr(self, node: ast.AST) -> Optional[str]:
+        """C of element reads, ``v @ w``, sums and whole values of Mat/Vec type; None for other nodes"""
+        source_file = getattr(self, '_source_file', '<string>')
+        if isinstance(node, ast.Subscript) and self._matrix_of(node.value) is not None:
+            return self._matrix_index(node)
+        if isinstance(node, ast.Compare) and any(self._matrix_of(side) for side in [node.left] + node.comparators):
+            raise CompileError("comparisons of Mat and Vec values are not supported; compare their elements",
+                               node.lineno, source_file)
+        matrix = self._matrix_of(node)
+        if self._matrix_operands(node):
+            if matrix is not None:
+                return self._matrix_literal(node, matrix)
+            if isinstance(node.op, ast.MatMult) and getattr(node, 'c_type', None):
+                return self._matmul_element(node, ())  # v @ w
+            raise CompileError(f"operator {type(node.op).__name__} is not supported on Mat and Vec values",
+                               node.lineno, source_file)
+        if not isinstance(node, ast.Call):
+            return None if matrix is None or isinstance(node, ast.Name) else self._matrix_literal(node, matrix)
+        kind = matrix_call(node, self.numpy_names)
+        if kind == 'inv':
+            return f"{self._inverse_helper(node)}({self._expr_to_c(node.args[0])})"
+        if isinstance(node.func, ast.Name) and node.func.id == 'sum' and len(node.args) == 1:
+            return self._matrix_sum(node)
+        if matrix is None or kind is None:
+            return None  # a function returning a Mat or Vec is an ordinary call
+        return self._matrix_whole(node) or self._matrix_literal(node, matrix)
+
+    def _matrix_sum(self, node: ast.Call) -> Optional[str]:
+        """``sum(v)`` of a Vec (``np.dot(v, w)`` is ``sum(v * w)``)"""
+        matrix = self._matrix_of(node.args[0])
+        if matrix is None:
+            return None
+        if not matrix.is_vector:
+            raise CompileError("sum() of a Mat adds its rows in Python but every element in NumPy; "
+                               "sum the elements you mean", node.lineno, getattr(self, '_source_file', '<string>'))
+        terms = [self._c_leaf(node, self._matrix_element(node.args[0], pos), matrix.elem_type)
+                 for pos in matrix.positions()]
+        return self._sum_c(node, terms, node.c_type)
+
+    def _matrix_index(self, node: ast.Subscript) -> str:
+        """``m[i, j]`` / ``v[i]``: one element (range-checked when the index is constant)"""
+        matrix = self._matrix_of(node.value)
+        source_file = getattr(self, '_source_file', '<string>')
+        indexes = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        if len(indexes) != len(matrix.shape) or any(isinstance(index, ast.Slice) for index in indexes):
+            form = 'v[i]' if matrix.is_vector else 'm[i, j]'
+            raise CompileError(f"index {matrix!r} one element at a time: {form}", node.lineno, source_file)
+        if isinstance(node.ctx, ast.Store) and isinstance(node.value, ast.Name):
+            self._check_matrix_store(node, node.value.id)
+        pos = []
+        for index, size in zip(indexes, matrix.shape):
+            value = eval_const_int(index, self.module_int_constants)
+            if value is None:
+                pos.append(self._expr_to_c(index))
+            elif -size <= value < size:
+                pos.append(value % size)
+            else:
+                raise CompileError(f"index {value} is out of range for {matrix!r}", node.lineno, source_file)
+        if all(isinstance(p, int) for p in pos):
+            return self._matrix_element(node.value, tuple(pos))
+        whole = self._matrix_whole(node.value)
+        return matrix.element(whole if whole is not None else self._matrix_literal(node.value, matrix), pos)
+
+    def _inverse_helper(self, node: ast.Call) -> str:
+        """Name of the unrolled inverse of np.linalg.inv(x)'s matrix type (generated once per type)"""
+        matrix = self._matrix_of(node.args[0])
+        source_file = getattr(self, '_source_file', '<string>')
+        if matrix is None or matrix.is_vector or matrix.shape[0] != matrix.shape[1]:
+            raise CompileError("np.linalg.inv() needs a square Mat", node.lineno, source_file)
+        if not is_float_type(matrix.elem_type):
+            raise CompileError(f"np.linalg.inv() needs float or double elements, not {matrix!r}",
+                               node.lineno, source_file)
+        n = matrix.shape[0]
+        if n > MAX_INVERSE:
+            raise CompileError(f"np.linalg.inv() is unrolled up to {MAX_INVERSE} x {MAX_INVERSE}, "
+                               f"not for {matrix!r}", node.lineno, source_file)
+        name = f"py2mcu_inv_{matrix.name}"
+        if name not in self.matrix_helpers:
+            double = matrix.elem_type == 'double'
+            lines, entries = inverse_body(n, matrix.elem_type, lambda value: float_literal(float(value), double))
+            rows = ["{" + ", ".join(entries[i, j] for j in range(n)) + "}" for i in range(n)]
+            helper = [f"// np.linalg.inv() of {matrix!r}: adjugate over determinant",
+                      f"static inline {matrix.c_type} {name}({matrix.c_type} a) {{"]
+            helper += [f"    {line}" for line in lines]
+            helper += [f"    const {matrix.c_type} inv = {{{{"]
+            helper += [f"        {row}{',' if i < n - 1 else ''}" for i, row in enumerate(rows)]
+            helper += ["    }};", "    return inv;", "}", ""]
+            self.matrix_helpers[name] = helper
+            multiplies = sum(line.count(' * ') for line in lines) + n * n
+            self.report.add('Matrices', f"{name}(): {multiplies} multiplications and 1 division")
+        return name
+
+    def _matrix_literal_elements(self, node: ast.AST, matrix: MatrixType) -> Optional[Dict[tuple, ast.AST]]:
+        """Element nodes by position of a list literal or ``[v] * n`` for matrix; None for other values
+
+        Raises CompileError when the literal does not have matrix's shape.
+        """
+        elements = None
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult) and isinstance(node.left, ast.List) \
+                and len(node.left.elts) == 1 and not isinstance(node.left.elts[0], ast.List):
+            count = eval_const_int(node.right, self.module_int_constants)
+            if matrix.is_vector and count == matrix.shape[0]:
+                elements = {pos: node.left.elts[0] for pos in matrix.positions()}
+        elif isinstance(node, ast.List):
+            rows = node.elts
+            if matrix.is_vector:
+                if len(rows) == matrix.shape[0] and not any(isinstance(row, ast.List) for row in rows):
+                    elements = {(i,): elt for i, elt in enumerate(rows)}
+            elif len(rows) == matrix.shape[0] and all(isinstance(row, ast.List) and len(row.elts) == matrix.shape[1]
+                                                      for row in rows):
+                elements = {(i, j): elt for i, row in enumerate(rows) for j, elt in enumerate(row.elts)}
+        else:
+            return None
+        if elements is None:
+            form = f"{matrix.shape[0]} numbers" if matrix.is_vector else \
+                f"{matrix.shape[0]} rows of {matrix.shape[1]} numbers"
+            raise CompileError(f"{matrix!r} needs {form}", node.lineno, getattr(self, '_source_file', '<string>'))
+        return elements
+
+    def _matrix_rows(self, node: ast.AST, matrix: MatrixType) -> List[str]:
+        """Initializer of node converted to matrix: one ``{...}`` per row (the elements of a Vec)"""
+        literal = self._matrix_literal_elements(node, matrix)
+        source = self._matrix_of(node)
+        if literal is not None:
+            element = lambda pos: self._coerce(literal[pos], matrix.elem_type)  # noqa: E731
+        elif source is not None and source.shape == matrix.shape:
+            def element(pos):
+                value = self._matrix_element(node, pos)
+                if source.elem_type == matrix.elem_type:
+                    return value
+                converted = self._c_leaf(node, value, source.elem_type)
+                return self._coerce(converted, matrix.elem_type) if is_fixed_type(matrix.elem_type) or \
+                    is_fixed_type(source.elem_type) else f"({matrix.elem_type}){value}"
+        else:
+            found = repr(source) if source is not None else getattr(node, 'c_type', None) or 'this value'
+            raise CompileError(f"{matrix!r} cannot hold {found}", node.lineno, getattr(self, '_source_file', '<string>'))
+        if matrix.is_vector:
+            return [element(pos) for pos in matrix.positions()]
+        rows, cols = matrix.shape
+        return ["{" + ", ".join(element((i, j)) for j in range(cols)) + "}" for i in range(rows)]
+
+    def _matrix_literal(self, node: ast.AST, matrix: MatrixType) -> str:
+        """Compound literal of node's value as matrix, on one line"""
+        return f"(({matrix.c_type}){{{{{', '.join(self._matrix_rows(node, matrix))}}}}})"
+
+    def _matrix_value(self, node: ast.AST, matrix: MatrixType) -> str:
+        """C value of node converted to matrix (for arguments)"""
+        if getattr(node, 'c_type', None) == matrix.c_type:
+            whole = self._matrix_whole(node)
+            if whole is not None:
+                return whole
+        return self._matrix_literal(node, matrix)
+
+    def _emit_matrix_value(self, prefix: str, node: ast.AST, matrix: MatrixType, cast: bool = False):
+        """Emit ``<prefix><node's value as matrix>;``, a row per line when it is long
+
+        cast makes the initializer a compound literal, for assignments and returns.
+        """
+        if getattr(node, 'c_type', None) == matrix.c_type:
+            whole = self._matrix_whole(node)
+            if whole is not None:
+                self.emit(f"{prefix}{whole};")
+                return
+        rows = self._matrix_rows(node, matrix)
+        start = f"{prefix}({matrix.c_type}){{{{" if cast else f"{prefix}{{{{"
+        line = f"{start}{', '.join(rows)}}}}};"
+        if len(line) + 4 * self.indent_level <= 100:
+            self.emit(line)
+            return
+        self.emit(start)
+        for i, row in enumerate(rows):
+            self.emit(f"    {row}{',' if i < len(rows) - 1 else ''}")
+        self.emit("}};")
+
+    def _emit_matrix_decl(self, node: ast.AnnAssign, name: str, matrix: MatrixType):
+        """``m: Mat[T, R, C] = value``: a struct local, or a global with a constant initializer"""
+        value = node.value
+        if value is not None:
+            self._check_matrix_alias(node, name, value)
+        if self.in_function:
+            self.local_vars.add(name)
+            if value is None:
+                self.emit(f"{matrix.c_type} {name};")
+            else:
+                self._emit_matrix_value(f"{matrix.c_type} {name} = ", value, matrix)
+            return
+        modifiers = {'const': False, 'public': False, 'volatile': False}
+        if hasattr(self, '_source_code'):
+            modifiers = extract_variable_modifiers(self._source_code, node.lineno)
+        full_type = self._get_storage_class_specifiers(modifiers, matrix.c_type)
+        if value is None:
+            self.emit(f"{full_type} {name};")
+        elif self._matrix_literal_elements(value, matrix) is not None or \
+                matrix_call(value, self.numpy_names) in (*NUMPY_FILLS, 'full'):
+            self._emit_matrix_value(f"{full_type} {name} = ", value, matrix)
+        else:
+            raise CompileError(f"module-level '{name}' needs a constant value: a nested list, "
+                               "np.eye(n), np.zeros((r, c)) ...", node.lineno, getattr(self, '_source_file', '<string>'))
+
+    def _emit_matrix_assign(self, node: ast.Assign, target: ast.AST) -> bool:
+        """``m[i, j] = x`` and ``m = value`` for Mat/Vec variables; False for other assignments"""
+        if isinstance(target, ast.Subscript) and self._matrix_of(target.value) is not None:
+            elem_type = self._matrix_of(target.value).elem_type
+            self.emit(f"{self._expr_to_c(target)} = {self._coerce(node.value, elem_type)};")
+            return True
+        if not isinstance(target, ast.Name):
+            return False
+        matrix = self._matrix_variable(target.id)
+        if matrix is None:
+            return False
+        self._check_matrix_alias(node, target.id, node.value)
+        if not self.in_function:
+            self._emit_matrix_decl(ast.copy_location(ast.AnnAssign(target=target, annotation=None, value=node.value,
+                                                                   simple=1), node), target.id, matrix)
+        elif target.id in self.local_vars or target.id in self._matrix_params() or any(
+                isinstance(child, ast.Global) and target.id in child.names
+                for child in ast.walk(self.function_defs.get(self.current_function) or ast.Pass())):
+            self._emit_matrix_value(f"{target.id} = ", node.value, matrix, cast=True)
+        else:
+            self.local_vars.add(target.id)
+            self._emit_matrix_value(f"{matrix.c_type} {target.id} = ", node.value, matrix)
+        return True
+
+    def _emit_matrix_augassign(self, node: ast.AugAssign) -> bool:
+        """``m += x``, ``m @= r`` ...: the whole new value, computed before m is stored"""
+        matrix = self._matrix_variable(node.target.id) if isinstance(node.target, ast.Name) else None
+        if matrix is None:
+            return False
+        self._check_matrix_store(node, node.target.id)
+        load = ast.copy_location(ast.Name(id=node.target.id, ctx=ast.Load()), node.target)
+        load.c_type = matrix.c_type
+        value = ast.copy_location(ast.BinOp(left=load, op=node.op, right=node.value), node)
+        value.c_type = self.types._matrix_type(value, [matrix.c_type, getattr(node.value, 'c_type', None)])
+        if not self._matrix_operands(value) or self._matrix_of(value) is None:
+            raise CompileError(f"operator {type(node.op).__name__} is not supported on Mat and Vec values",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        self._emit_matrix_value(f"{node.target.id} = ", value, matrix, cast=True)
+        return True
+
+    def _view_type(self, elem_type: str) -> str:
+        """C type of a view of elem_type (registers its PY2MCU_VIEW_DEFINE)"""
+        c_type = f"{view_name(elem_type)}_t"
+        self.views[c_type] = elem_type
+        return c_type
+
+    def _is_view(self, node: ast.AST) -> bool:
+        return getattr(node, 'c_type', None) in self.views
+
+    def _view_ref(self, node: ast.AST) -> str:
+        """C expression of a view, parenthesized for member access"""
+        view = self._expr_to_c(node)
+        return view if view.isidentifier() else f"({view})"
+
+    def _view_length(self, node: ast.AST) -> Optional[int]:
+        """Length of a view expression when it is known at compile time"""
+        if isinstance(node, ast.Name):
+            return self.view_lengths.get(node.id)
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice) and node.slice.step is None:
+            const = constant_slice(node.slice, self._sequence_length(node.value), self.module_int_constants)
+            return const[1] if const is not None else None
+        if self._is_view_copy(node):
+            return self._view_length(node.func.value)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in BYTE_TYPES:
+            if len(node.args) == 1 and not is_int_type(getattr(node.args[0], 'c_type', None)):
+                return self._sequence_length(node.args[0])  # bytes(view), memoryview(array)
+        return self._bytes_length(node)
+
+    def _bytes_length(self, node: ast.AST) -> Optional[int]:
+        """Length of a bytes literal, ``bytes(N)`` or ``bytearray(N)`` with constant N"""
+        if isinstance(node, ast.Constant) and isinstance(node.value, bytes):
+            return len(node.value)
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ('bytes', 'bytearray')
+                and len(node.args) <= 1 and not node.keywords):
+            if not node.args:
+                return 0
+            if isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, bytes):
+                return len(node.args[0].value)
+            return eval_const_int(node.args[0], self.module_int_constants)
+        return None
+
+    def _global_bytes_lengths(self, tree: ast.Module) -> Dict[str, int]:
+        """Module bytes objects of constant length that no function rebinds"""
+        rebound = global_names(tree)
+        lengths = {}
+        for node in tree.body:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target] if isinstance(node, ast.AnnAssign) else []
+            if len(targets) == 1 and isinstance(targets[0], ast.Name) and targets[0].id not in rebound:
+                length = self._bytes_length(node.value) if node.value is not None else None
+                if length is not None:
+                    lengths[targets[0].id] = length
+        return lengths
+
+    def _sequence_length(self, node: ast.AST) -> Optional[int]:
+        """Constant length of an array or view expression, else None"""
+        if isinstance(node, ast.Name) and not self._is_view(node):
+            return self.array_lengths.get(node.id)
+        return self._view_length(node)
+
+    def _constant_view_lengths(self, func: ast.FunctionDef) -> Dict[str, int]:
+        """Views bound once in func to a slice, copy or view of constant length"""
+        bindings: Dict[str, int] = {}
+        for node in ast.walk(func):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                bindings[node.id] = bindings.get(node.id, 0) + 1
+        for arg in func.args.args:
+            bindings[arg.arg] = 2  # the caller decides
+        self.view_lengths = {name: length for name, length in self.global_view_lengths.items()
+                             if name not in bindings}
+        assigns = sorted((node for node in ast.walk(func) if isinstance(node, (ast.Assign, ast.AnnAssign))),
+                         key=lambda node: (node.lineno, node.col_offset))
+        for node in assigns:
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            if len(targets) != 1 or not isinstance(targets[0], ast.Name) or bindings.get(targets[0].id) != 1:
+                continue
+            length = self._view_length(node.value) if node.value is not None else None
+            if length is not None:
+                self.view_lengths[targets[0].id] = length
+        return self.view_lengths
+
+    def _slice_to_c(self, node: ast.Subscript) -> str:
+        """``seq[a:b]`` as a view of the array or view seq (no copy)"""
+        source_file = getattr(self, '_source_file', '<string>')
+        bounds = node.slice
+        if isinstance(node.ctx, ast.Store):
+            raise CompileError("assigning to a slice is not supported; assign the elements of a view instead",
+                               node.lineno, source_file)
+        if bounds.step is not None:
+            raise CompileError("slices with a step are not supported (a view is contiguous)",
+                               node.lineno, source_file)
+        base_type = getattr(node.value, 'c_type', None)
+        if base_type in self.views:
+            elem_type = self.views[base_type]
+            data = f"{self._view_ref(node.value)}.data"
+        elif base_type and base_type.endswith('*') and base_type not in ('const char*', 'char*'):
+            elem_type = base_type[:-1].strip()
+            data = self._expr_to_c(node.value)
+        else:
+            raise CompileError("only arrays and views can be sliced", node.lineno, source_file)
+        name = view_name(elem_type)
+        self._view_type(elem_type)
+
+        length = self._sequence_length(node.value)
+        const = constant_slice(bounds, length, self.module_int_constants)
+        if const is not None:
+            offset, count = const
+            return f"(({name}_t){{{data} + {offset}, {count}}})" if offset else f"(({name}_t){{{data}, {count}}})"
+        start = self._expr_to_c(bounds.lower) if bounds.lower is not None else "0"
+        if base_type in self.views:
+            stop = self._expr_to_c(bounds.upper) if bounds.upper is not None else "INT32_MAX"
+            return f"{name}_subview({self._expr_to_c(node.value)}, {start}, {stop})"
+        if length is not None:
+            stop = self._expr_to_c(bounds.upper) if bounds.upper is not None else str(length)
+            return f"{name}_slice({data}, {length}, {start}, {stop})"
+        # Length unknown (list parameter, heap list): bounds are taken as given
+        negative = [b for b in (bounds.lower, bounds.upper)
+                    if b is not None and (eval_const_int(b, self.module_int_constants) or 0) < 0]
+        if bounds.upper is None or negative:
+            raise CompileError(f"the length of '{self._expr_to_c(node.value)}' is not known: "
+                               f"its slices need a non-negative start and stop",
+                               node.lineno, source_file)
+        return f"{name}_span({data}, {start}, {self._expr_to_c(bounds.upper)})"
+
+    def _view_index(self, node: ast.Subscript) -> str:
+        """``view[i]``: checked access unless the index was proven in range"""
+        name = view_name(self.views[node.value.c_type])
+        view = self._view_ref(node.value)
+        index = eval_const_int(node.slice, self.module_int_constants)
+        if index is not None and index < 0:
+            length = self._view_length(node.value)
+            if length is not None:
+                index_c = str(length + index)
+            elif self._is_simple_operand(node.value):
+                index_c = f"{view}.len - {-index}"
+            else:
+                raise CompileError("a negative index needs a named view", node.lineno,
+                                   getattr(self, '_source_file', '<string>'))
+        else:
+            index_c = self._expr_to_c(node.slice)
+        if id(node) in self.safe_indexes:
+            return f"{view}.data[{index_c}]"
+        return f"(*{name}_at({self._expr_to_c(node.value)}, {index_c}))"
+
+    def _view_call(self, node: ast.Call) -> Optional[str]:
+        """len() of a view; .copy() is only valid as an assigned value"""
+        func = node.func
+        if isinstance(func, ast.Name) and func.id == 'len' and len(node.args) == 1:
+            if self._is_view(node.args[0]):
+                length = self._view_length(node.args[0])
+                return str(length) if length is not None else f"{self._view_ref(node.args[0])}.len"
+            return None
+        if isinstance(func, ast.Attribute) and self._is_view(func.value):
+            message = (".copy() of a view must be the value of an assignment" if func.attr == 'copy'
+                       else f"views support indexing, slicing, len() and .copy(), not .{func.attr}()")
+            raise CompileError(message, node.lineno, getattr(self, '_source_file', '<string>'))
+        return None
+
+    def _is_view_copy(self, value: Optional[ast.AST]) -> bool:
+        return (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                and value.func.attr == 'copy' and not value.args and self._is_view(value.func.value))
+
+    def _is_view_alloc(self, value: Optional[ast.AST]) -> bool:
+        """``view.copy()``, ``bytes(...)`` or ``bytearray(...)``: a value with storage of its own"""
+        if self._is_view_copy(value):
+            return True
+        return (isinstance(value, ast.Call) and isinstance(value.func, ast.Name)
+                and value.func.id in ('bytes', 'bytearray') and len(value.args) <= 1 and not value.keywords)
+
+    def _emit_view_alloc(self, node: ast.stmt, var_name: str):
+        """``x = view.copy()`` / ``bytearray(...)``: new storage, x views it
+
+        Storage of constant length lives on the stack unless it is returned;
+        other storage is allocated like lists.  ``bytes(n)`` and
+        ``bytearray(n)`` are zero-filled, ``bytes(seq)`` copies seq.
+        """
+        value = node.value
+        elem_type = 'uint8_t' if not self._is_view_copy(value) else self.views[value.c_type]
+        c_type = self._view_type(elem_type)
+        name = view_name(elem_type)
+        declare = "" if var_name in self.local_vars else f"{c_type} "
+        self.local_vars.add(var_name)
+        if self._is_view_copy(value):
+            source_node = value.func.value
+        elif value.args and not is_int_type(getattr(value.args[0], 'c_type', None)):
+            source_node = value.args[0]  # bytes(b"..."), bytearray(view), bytearray(array)
+        else:
+            source_node = None
+        length = self._view_length(value)
+        on_stack = length is not None and var_name not in self._returned_names
+        if source_node is None:
+            count = self._expr_to_c(value.args[0]) if value.args else "0"
+            if on_stack:
+                storage = f"{var_name}_buf{node.lineno}"
+                self.emit(f"{elem_type} {storage}[{max(length, 1)}] = {{0}};")
+                self.emit(f"{declare}{var_name} = (({c_type}){{{storage}, {length}}});")
+                return
+            self._check_heap_view(node, var_name)
+            self.emit(f"{declare}{var_name} = (({c_type}){{NULL, {count}}});")
+            self.emit(f"{var_name}.data = ({elem_type}*){self._gc_malloc_call(f'(uint32_t){var_name}.len', node)};")
+            self.emit(f"memset({var_name}.data, 0, (uint32_t){var_name}.len);")
+            return
+        source = self._coerce(source_node, c_type)
+        if on_stack:
+            storage = f"{var_name}_copy{node.lineno}"
+            self.emit(f"{elem_type} {storage}[{max(length, 1)}];")
+            self.emit(f"{declare}{var_name} = {name}_copy({source}, {storage});")
+            return
+        self._check_heap_view(node, var_name)
+        self.emit(f"{declare}{var_name} = {source};")
+        size = f"sizeof({elem_type}) * (uint32_t){var_name}.len"
+        self.emit(f"{var_name} = {name}_copy({var_name}, ({elem_type}*){self._gc_malloc_call(size, node)});")
+
+    def _check_heap_view(self, node: ast.stmt, var_name: str):
+        if self.no_heap:
+            raise CompileError(f"storage of unknown length for '{var_name}' needs the heap; use a constant "
+                               f"length (slice with constant bounds, bytearray(N)) or an Array",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+
+    def _emit_global_bytes(self, node: ast.stmt, var_name: str) -> bool:
+        """Module-level bytes literal or ``bytearray(N)``; True if node was one"""
+        value = node.value
+        length = self._bytes_length(value) if value is not None else None
+        if length is None:
+            return False
+        c_type = self._view_type('uint8_t')
+        if isinstance(value, ast.Constant):
+            self.emit(f"const {c_type} {var_name} = {{(uint8_t*){bytes_literal(value.value)}, {length}}};")
+            return True
+        init = ""
+        if value.args and isinstance(value.args[0], ast.Constant) and isinstance(value.args[0].value, bytes):
+            init = f" = {bytes_literal(value.args[0].value)}"  # exactly `length` chars: no terminator
+        if value.func.id == 'bytes':
+            self.emit(f"static const uint8_t {var_name}_storage[{max(length, 1)}]{init};")
+            self.emit(f"const {c_type} {var_name} = {{(uint8_t*){var_name}_storage, {length}}};")
+        else:
+            self.emit(f"static uint8_t {var_name}_storage[{max(length, 1)}]{init};")
+            self.emit(f"{c_type} {var_name} = {{{var_name}_storage, {length}}};")
+        return True
+
+    def _view_compare(self, node: ast.Compare) -> str:
+        """``a == b`` on views compares the elements"""
+        left, right = node.left, node.comparators[0]
+        c_type = left.c_type if self._is_view(left) else right.c_type
+        if not (self._is_view(left) and self._is_view(right)) or left.c_type != right.c_type:
+            raise CompileError("views compare only with views of the same element type",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        equal = f"{view_name(self.views[c_type])}_equal({self._expr_to_c(left)}, {self._expr_to_c(right)})"
+        return equal if isinstance(node.ops[0], ast.Eq) else f"(!{equal})"
+
+    # -- struct and int.from_bytes: direct loads and stores ------------------
+
+    def _struct_format(self, node: ast.Call) -> tuple:
+        """(order, fields, size) of a struct call's literal format"""
+        source_file = getattr(self, '_source_file', '<string>')
+        fmt = constant_format(node)
+        if fmt is None:
+            raise CompileError("struct formats must be string literals", node.lineno, source_file)
+        try:
+            return parse_format(fmt)
+        except ValueError as error:
+            raise CompileError(str(error), node.lineno, source_file)
+
+    def _byte_pointer(self, buf: ast.AST, offset: Optional[ast.AST], size: int, node: ast.AST) -> str:
+        """Pointer to `size` bytes at offset in buf, checked against buf's length
+
+        A constant offset into a buffer of constant length is checked here;
+        other offsets go through py2mcu_checked_offset() unless the buffer is
+        an array of unknown length (which is not checked when indexed either).
+        """
+        source_file = getattr(self, '_source_file', '<string>')
+        buf_type = getattr(buf, 'c_type', None)
+        if self.views.get(buf_type) == 'uint8_t':
+            ref = self._view_ref(buf)
+            data, runtime_length = f"{ref}.data", f"{ref}.len"
+        elif buf_type == 'uint8_t*':
+            data, runtime_length = self._expr_to_c(buf), None
+        else:
+            raise CompileError("struct and int.from_bytes() need a bytes, bytearray, memoryview or "
+                               "uint8_t array buffer", node.lineno, source_file)
+        length = self._sequence_length(buf)
+        limit = str(length) if length is not None else runtime_length
+        const = 0 if offset is None else eval_const_int(offset, self.module_int_constants)
+        if const is not None:
+            if const < 0:
+                raise CompileError("struct offsets must not be negative", node.lineno, source_file)
+            if length is not None and const + size > length:
+                raise CompileError(f"{size} bytes at offset {const} do not fit in "
+                                   f"'{self._expr_to_c(buf)}' ({length} bytes)", node.lineno, source_file)
+            if length is not None or limit is None:
+                return f"{data} + {const}" if const else data
+            return f"{data} + py2mcu_checked_offset({const}, {size}, {limit})"
+        if limit is None:
+            return f"{data} + {self._expr_to_c(offset)}"
+        return f"{data} + py2mcu_checked_offset({self._expr_to_c(offset)}, {size}, {limit})"
+
+    def _struct_pointer(self, node: ast.Call, size: int) -> str:
+        """Pointer to the bytes read by struct.unpack(fmt, buf) / unpack_from(fmt, buf, offset)"""
+        if len(node.args) < 2:
+            raise CompileError(f"struct.{node.func.attr}() needs a format and a buffer",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+        buf = node.args[1]
+        if node.func.attr == 'unpack':
+            length = self._sequence_length(buf)
+            if length is not None and length != size:
+                raise CompileError(f"struct.unpack() needs exactly {size} bytes, '{self._expr_to_c(buf)}' "
+                                   f"has {length}", node.lineno, getattr(self, '_source_file', '<string>'))
+            return self._byte_pointer(buf, None, size, node)
+        offset = node.args[2] if len(node.args) > 2 else None
+        for keyword in node.keywords:
+            if keyword.arg == 'offset':
+                offset = keyword.value
+        return self._byte_pointer(buf, offset, size, node)
+
+    def _field_load(self, field, order: str, pointer: str) -> str:
+        at = f"{pointer} + {field.offset}" if field.offset else pointer
+        if field.code == 's':
+            return f"(({self._view_type('uint8_t')}){{{at}, {field.size}}})"  # zero-copy
+        return load(field, order, at)
+
+    def _unpack_item(self, node: ast.Subscript) -> str:
+        """``struct.unpack_from(fmt, buf, offset)[k]``: a single load"""
+        order, fields, size = self._struct_format(node.value)
+        fields = values(fields)
+        index = eval_const_int(node.slice, self.module_int_constants)
+        if index is None or not -len(fields) <= index < len(fields):
+            raise CompileError(f"the result of struct.{node.value.func.attr}() is indexed with a constant "
+                               f"below {len(fields)}", node.lineno, getattr(self, '_source_file', '<string>'))
+        return self._field_load(fields[index], order, self._struct_pointer(node.value, size))
+
+    def _emit_unpack(self, node: ast.Assign):
+        """``a, b = struct.unpack_from(fmt, buf, offset)``: one load per field, no tuple"""
+        source_file = getattr(self, '_source_file', '<string>')
+        if not self.in_function:
+            raise CompileError("struct.unpack() is supported inside functions", node.lineno, source_file)
+        value = node.value
+        order, fields, size = self._struct_format(value)
+        fields = values(fields)
+        targets = node.targets[0].elts
+        if len(targets) != len(fields):
+            raise CompileError(f"struct format {constant_format(value)!r} has {len(fields)} values, "
+                               f"not {len(targets)}", node.lineno, source_file)
+        pointer = self._struct_pointer(value, size)
+        if len(fields) > 1 and not pointer.isidentifier():
+            self.emit(f"uint8_t *unpack{node.lineno} = {pointer};")
+            pointer = f"unpack{node.lineno}"
+        for target, field in zip(targets, fields):
+            if isinstance(target, ast.Name) and target.id == '_':
+                continue
+            loaded = self._field_load(field, order, pointer)
+            if isinstance(target, ast.Name) and target.id not in self.local_vars:
+                self.emit(f"{self.local_types.get(target.id) or field.c_type} {target.id} = {loaded};")
+                self.local_vars.add(target.id)
+            else:
+                self.emit(f"{self._expr_to_c(target)} = {loaded};")
+
+    def _emit_pack_into(self, node: ast.Call):
+        """``struct.pack_into(fmt, buf, offset, *values)``: one store per field"""
+        source_file = getattr(self, '_source_file', '<string>')
+        order, fields, size = self._struct_format(node)
+        if len(node.args) < 3:
+            raise CompileError("struct.pack_into() needs a format, a buffer, an offset and the values",
+                               node.lineno, source_file)
+        args = node.args[3:]
+        if len(args) != len(values(fields)):
+            raise CompileError(f"struct format {constant_format(node)!r} has {len(values(fields))} values, "
+                               f"not {len(args)}", node.lineno, source_file)
+        pointer = self._byte_pointer(node.args[1], node.args[2], size, node)
+        if len(fields) > 1 and not pointer.isidentifier():
+            self.emit(f"uint8_t *pack{node.lineno} = {pointer};")
+            pointer = f"pack{node.lineno}"
+        args = iter(args)
+        for field in fields:
+            at = f"{pointer} + {field.offset}" if field.offset else pointer
+            if field.code == 'x':
+                self.emit(f"memset({at}, 0, {field.size});")
+            elif field.code == 's':
+                arg = next(args)
+                view = self._coerce(arg, self._view_type('uint8_t'))
+                view = view if view.isidentifier() else f"({view})"
+                self.emit(f"py2mcu_store_bytes({at}, {field.size}, {view}.data, {view}.len);")
+            else:
+                self.emit(store(field, order, at, self._expr_to_c(next(args))))
+
+    def _from_bytes(self, node: ast.Call) -> str:
+        """``int.from_bytes(buf[i:i + n], order, signed=...)`` as one load from buf"""
+        source_file = getattr(self, '_source_file', '<string>')
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        source = node.args[0] if node.args else keywords.get('bytes')
+        order_node = node.args[1] if len(node.args) > 1 else keywords.get('byteorder')
+        order = 'big' if order_node is None else getattr(order_node, 'value', None)
+        if order not in ('little', 'big'):
+            raise CompileError("int.from_bytes() needs byteorder 'little' or 'big' as a literal",
+                               node.lineno, source_file)
+        signed_node = keywords.get('signed')
+        signed = False if signed_node is None else getattr(signed_node, 'value', None)
+        if not isinstance(signed, bool):
+            raise CompileError("int.from_bytes() needs signed=True or signed=False", node.lineno, source_file)
+        length = nominal_length(source, self.module_int_constants) if source is not None else None
+        if length is None or not 1 <= length <= 8:
+            raise CompileError("int.from_bytes() reads 1 to 8 bytes given by a literal or a slice of "
+                               "constant length such as buf[i:i + 4]", node.lineno, source_file)
+        if isinstance(source, ast.Constant):
+            value = int.from_bytes(source.value, order, signed=signed)
+            return f"(({node.c_type}){value}{'LL' if value < 0 else 'ULL'})"
+        pointer = self._byte_pointer(source.value, source.slice.lower, length, node)
+        return from_bytes(length, 'le' if order == 'little' else 'be', signed, pointer)
+
+    def _bytes_call(self, node: ast.Call) -> Optional[str]:
+        """memoryview(), struct.calcsize() and int.from_bytes(); errors for the rest of the byte API"""
+        source_file = getattr(self, '_source_file', '<string>')
+        func = node.func
+        if isinstance(func, ast.Name) and func.id == 'memoryview' and len(node.args) == 1:
+            return self._coerce(node.args[0], node.c_type)  # a view of the same memory
+        if isinstance(func, ast.Name) and func.id in ('bytes', 'bytearray') and self._is_view_alloc(node):
+            raise CompileError(f"{func.id}() must be the value of an assignment (it needs storage)",
+                               node.lineno, source_file)
+        if is_from_bytes(node):
+            return self._from_bytes(node)
+        name = struct_call(node, 'calcsize', 'unpack', 'unpack_from', 'pack', 'pack_into')
+        if name == 'calcsize':
+            return str(self._struct_format(node)[2])
+        if name in ('unpack', 'unpack_from'):
+            raise CompileError(f"struct.{name}() returns a tuple: unpack it into names or index it "
+                               f"with a constant", node.lineno, source_file)
+        if name is not None:
+            raise CompileError(f"struct.{name}() is not supported; pack into a bytearray with struct.pack_into()",
+                               node.lineno, source_file)
+        return None
+
+    def _is_const_dict(self, node: ast.AST) -> bool:
+        """Emit a module-level constant dict; True if node was one"""
+        if self.in_function or not isinstance(node.value, ast.Dict):
+            return False
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        for target in targets:
+            self._emit_const_dict(self.const_dicts[target.id])
+        return True
+
     def visit_Assign(self, node: ast.Assign):
         """Generate assignment"""
+        if self._is_const_dict(node):
+            return
+        if self.matrices and len(node.targets) == 1 and self._emit_matrix_assign(node, node.targets[0]):
+            return
+        if self.in_function and len(node.targets) == 1 and self._emit_array_assign(node, node.targets[0]):
+            return
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            if self.in_function and self._is_view_alloc(node.value):
+                self._emit_view_alloc(node, node.targets[0].id)
+                return
+            if not self.in_function and self._emit_global_bytes(node, node.targets[0].id):
+                return
+        if (len(node.targets) == 1 and isinstance(node.targets[0], (ast.Tuple, ast.List))
+                and struct_call(node.value, 'unpack', 'unpack_from')):
+            self._emit_unpack(node)
+            return
+        if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Subscript):
+            container = self._container_annotation(node.value.func)  # Dict[K, V, N]()
+            if container is not None:
+                for target in node.targets:
+                    self._emit_container_decl(node, target.id, container)
+                return
+        if len(node.targets) == 1 and isinstance(node.targets[0], ast.Subscript):
+            container = self._container_of(node.targets[0].value)
+            if container is not None:
+                table, ref = container
+                key = self._expr_to_c(node.targets[0].slice)
+                self.emit(f"{table.name}_set({ref}, {key}, {self._coerce(node.value, table.value_type)});")
+                return
         value = self._expr_to_c(node.value)
         for target in node.targets:
+            target_type = self._infer_type_from_value(target)
+            if isinstance(target, ast.Name):
+                target_type = self.local_types.get(target.id) or self.types.globals.get(target.id)
+            if is_fixed_type(target_type):
+                value = self._coerce(node.value, target_type)
             if isinstance(target, ast.Name):
                 var_name = target.id
 
@@ -487,8 +3497,9 @@ class CCodeGenerator(ast.NodeVisitor):
                             self.emit(f"{var_name} = {value};")
                             self.local_vars.add(var_name)
                         else:
-                            # First assignment: declare with inferred type
-                            var_type = self._infer_type_from_value(node.value)
+                            # First assignment: declare with the type inferred for the variable
+                            var_type = self.local_types.get(var_name) or self._infer_type_from_value(node.value)
+                            var_type = self._local_int_type(var_name, var_type)
                             self.emit(f"{var_type} {var_name} = {value};")
                             self.local_vars.add(var_name)
                     else:
@@ -497,12 +3508,23 @@ class CCodeGenerator(ast.NodeVisitor):
                 else:
                     # Module-level: declare as const global
                     var_type = self._infer_type_from_value(node.value)
-                    self.emit(f"const {var_type} {var_name} = {value};")
+                    if not var_type.startswith('const '):
+                        var_type = f"const {var_type}"
+                    self.emit(f"{var_type} {var_name} = {value};")
             elif isinstance(target, ast.Subscript):
                 # Handle subscript assignment (e.g., samples[i] = ...)
                 target_c = self._expr_to_c(target)
                 self.emit(f"{target_c} = {value};")
 
+    def _gc_malloc_call(self, size_expr: str, node: ast.AST) -> str:
+        """Build a gc_malloc_at() call tagged with the Python source line.
+
+        With PY2MCU_ALLOC_STATS the runtime attributes the allocation to this
+        file/line; otherwise gc_malloc_at() is a macro for gc_malloc().
+        """
+        source_file = self._escape_c_string(getattr(self, '_source_file', '<string>'))
+        return f'gc_malloc_at({size_expr}, "{source_file}", {getattr(node, "lineno", 0)})'
+
     def _escape_c_string(self, s: str) -> str:
         """Escape string for C code, converting actual newlines/tabs to \\n/\\t"""
         escape_map = {
@@ -519,16 +3541,37 @@ class CCodeGenerator(ast.NodeVisitor):
 
     def _expr_to_c(self, node: ast.AST) -> str:
         """Convert Python expression to C expression"""
+        lowered = getattr(node, 'loop_c', None)
+        if lowered is not None:
+            return lowered  # hoisted, strength-reduced or read through a loop pointer
+        if self.matrices:
+            matrix_c = self._matrix_expr(node)
+            if matrix_c is not None:
+                return matrix_c
         if isinstance(node, ast.Constant):
             if isinstance(node.value, bool):
                 return "true" if node.value else "false"
             elif isinstance(node.value, str):
                 escaped = self._escape_c_string(node.value)
                 return f'"{escaped}"'
+            elif isinstance(node.value, float):
+                double = getattr(node, 'c_type', None) == 'double'
+                if math.isfinite(node.value) and not fits_float(node.value, double):
+                    raise CompileError(f"float literal {node.value!r} is out of range for float "
+                                       f"(largest is {FLOAT_MAX:.7g}); annotate the value as double",
+                                       getattr(node, 'lineno', None), getattr(self, '_source_file', '<string>'))
+                return float_literal(node.value, double=double)
+            elif isinstance(node.value, bytes):
+                # Bytes are immutable, so the view may point into the string literal
+                name = self._view_type('uint8_t')
+                return f"(({name}){{(uint8_t*){bytes_literal(node.value)}, {len(node.value)}}})"
             else:
                 return str(node.value)
 
         elif isinstance(node, ast.Name):
+            if node.id in self.const_dicts:
+                raise CompileError(f"constant dict '{node.id}' supports only [key], .get(), 'in' and len()",
+                                   node.lineno, getattr(self, '_source_file', '<string>'))
             return node.id
 
         elif isinstance(node, ast.JoinedStr):
@@ -541,29 +3584,132 @@ class CCodeGenerator(ast.NodeVisitor):
             return '"{}"' # Placeholder
 
         elif isinstance(node, ast.BinOp):
+            fmt = format_of_c_type(getattr(node, 'c_type', None))
+            if fmt is not None:
+                return self._fixed_binop(node, fmt)
+            if getattr(node, 'c_type', None) == 'double':
+                self._mark_double_literals(node.left, node.right)
+            self._check_double_promotion(node, [getattr(node.left, 'c_type', None),
+                                                getattr(node.right, 'c_type', None)])
             left = self._expr_to_c(node.left)
             right = self._expr_to_c(node.right)
+            if isinstance(node.op, ast.Div) and is_float_type(getattr(node, 'c_type', None)):
+                reciprocal = self._float_reciprocal(node.right)
+                if reciprocal is not None:
+                    # Multiplication is several times cheaper than division
+                    return f"({left} * {float_literal(reciprocal, node.c_type == 'double')})"
+            if isinstance(node.op, (ast.FloorDiv, ast.Mod)) and id(node) in self.nonneg_ops:
+                # Left operand proven >= 0: C and Python agree and shift/mask is exact
+                divisor = self._power_of_two_divisor(node)
+                if divisor is not None:
+                    if isinstance(node.op, ast.FloorDiv):
+                        return f"({left} >> {divisor.bit_length() - 1})"
+                    return f"({left} & {divisor - 1})"
+            if isinstance(node.op, (ast.LShift, ast.RShift)):
+                left = self._shift_operand(node, left)
             op = self._op_to_c(node.op)
+            if (isinstance(node.op, ast.Div) and is_int_type(getattr(node.left, 'c_type', None))
+                    and is_int_type(getattr(node.right, 'c_type', None))):
+                # Python's / is true division even for two ints
+                return f"((float){left} / {right})"
             return f"({left} {op} {right})"
 
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return f"(!{self._condition_to_c(node.operand)})"
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Invert):
+            return f"(~{self._expr_to_c(node.operand)})"
+
+        elif isinstance(node, ast.BoolOp):
+            return self._boolop_to_c(node)
+
+        elif isinstance(node, ast.IfExp):
+            c_type = getattr(node, 'c_type', None)
+            body = self._coerce(node.body, c_type if is_fixed_type(c_type) else None)
+            orelse = self._coerce(node.orelse, c_type if is_fixed_type(c_type) else None)
+            return f"({self._condition_to_c(node.test)} ? {body} : {orelse})"
+
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            fmt = format_of_c_type(getattr(node, 'c_type', None))
+            if fmt is not None and isinstance(node.op, ast.USub):
+                return f"{fmt.name}_neg({self._expr_to_c(node.operand)})"
+            if getattr(node, 'c_type', None) == 'double':
+                self._mark_double_literals(node.operand)
+            sign = '-' if isinstance(node.op, ast.USub) else '+'
+            operand = self._expr_to_c(node.operand)
+            if operand.startswith(('-', '+')):
+                operand = f"({operand})"  # - -x would read as the -- operator
+            return f"{sign}{operand}"
+
         elif isinstance(node, ast.Compare):
-            left = self._expr_to_c(node.left)
-            op = self._compare_op_to_c(node.ops[0])
-            right = self._expr_to_c(node.comparators[0])
-            return f"({left} {op} {right})"
+            if len(node.ops) == 1 and isinstance(node.ops[0], (ast.In, ast.NotIn)):
+                return self._membership_to_c(node)
+            if (len(node.ops) == 1 and isinstance(node.ops[0], (ast.Eq, ast.NotEq))
+                    and (self._is_view(node.left) or self._is_view(node.comparators[0]))):
+                return self._view_compare(node)
+            operands = [node.left] + node.comparators
+            fixed_type = next((t for t in (getattr(o, 'c_type', None) for o in operands) if is_fixed_type(t)), None)
+            # Fixed-point values of one format compare as raw integers
+            terms = []
+            for i, op_node in enumerate(node.ops):
+                if i > 0 and not self._is_simple_operand(operands[i]):
+                    raise CompileError("chained comparison needs a variable or constant in the middle",
+                                       node.lineno, getattr(self, '_source_file', '<string>'))
+                left = self._coerce(operands[i], fixed_type)
+                right = self._coerce(operands[i + 1], fixed_type)
+                if self._mixed_signedness(operands[i], operands[i + 1]):
+                    # C would convert the signed side to unsigned: -1 < 1u is false
+                    left, right = f"(int64_t){left}", f"(int64_t){right}"
+                terms.append(f"({left} {self._compare_op_to_c(op_node)} {right})")
+            # a < b < c is (a < b) && (b < c)
+            return terms[0] if len(terms) == 1 else f"({' && '.join(terms)})"
 
         elif isinstance(node, ast.Attribute):
+            if (isinstance(node.value, ast.Name) and node.value.id == 'math'
+                    and node.attr in MATH_CONSTANTS):
+                return float_literal(MATH_CONSTANTS[node.attr])
             # Handle attribute access: obj.attr or obj.attr.subattr, etc.
             obj = self._expr_to_c(node.value)
             return f"{obj}.{node.attr}"
 
         elif isinstance(node, ast.Subscript):
+            if struct_call(node.value, 'unpack', 'unpack_from'):
+                return self._unpack_item(node)
+            if isinstance(node.value, ast.Name) and node.value.id in self.const_dicts:
+                return self._const_dict_lookup(self.const_dicts[node.value.id], node.slice, None)
+            container = self._container_of(node.value)
+            if container is not None:
+                return f"{container[0].name}_get({container[1]}, {self._expr_to_c(node.slice)}, 0)"
+            if isinstance(node.slice, ast.Slice):
+                return self._slice_to_c(node)
+            if self._is_view(node.value):
+                return self._view_index(node)
             # Handle list indexing (e.g., samples[i])
             value = self._expr_to_c(node.value)
             index = self._expr_to_c(node.slice)
             return f"{value}[{index}]"
 
         elif isinstance(node, ast.Call):
+            if getattr(node, 'folded_c', None) is not None:
+                return node.folded_c  # evaluated at compile time
+            const_dict = self._const_dict_call(node)
+            if const_dict is not None:
+                return const_dict
+            container = self._container_call(node)
+            if container is not None:
+                return container
+            view = self._view_call(node)
+            if view is not None:
+                return view
+            byte_access = self._bytes_call(node)
+            if byte_access is not None:
+                return byte_access
+            reduction = self._reduction_call(node)
+            if reduction is not None:
+                return reduction
+            numeric = self._numeric_call(node)
+            if numeric is not None:
+                return numeric
             func_name = self._expr_to_c(node.func)
             
             # Convert print() to printf()
@@ -580,15 +3726,10 @@ class CCodeGenerator(ast.NodeVisitor):
                             if isinstance(part, ast.Constant):
                                 format_parts.append(str(part.value).replace("%", "%%"))
                             elif isinstance(part, ast.FormattedValue):
-                                # Infer format specifier
-                                fmt = "%d"
-                                if isinstance(part.value, ast.Name) and part.value.id in self.string_vars:
-                                     fmt = "%s"
-                                elif isinstance(part.value, ast.Constant) and isinstance(part.value.value, str):
-                                     fmt = "%s"
-                                
+                                # Conversion from the inferred type of the value
+                                fmt, arg = self._printf_arg(part.value, self._format_spec(part))
                                 format_parts.append(fmt)
-                                args.append(self._expr_to_c(part.value))
+                                args.append(arg)
                         format_str = "".join(format_parts) + "\\n"
                         if args:
                             args_str = ", ".join(args)
@@ -602,22 +3743,31 @@ class CCodeGenerator(ast.NodeVisitor):
                             # format_str = node.args[0].value + " " + " ".join(["%d"] * (len(node.args) - 1)) + "\\n"
                             # Handle multiple arguments: first is format string, others are data
                             # For simplicity, if it's "text:", val, we can map to "text: %d\n"
-                            escaped_str = self._escape_c_string(node.args[0].value)
-                            format_str = escaped_str + " " + " ".join(["%d"] * (len(node.args) - 1)) + "\\n"
-                            remaining_args = ", ".join(self._expr_to_c(arg) for arg in node.args[1:])
+                            escaped_str = self._escape_c_string(node.args[0].value).replace("%", "%%")
+                            conversions = [self._printf_arg(arg) for arg in node.args[1:]]
+                            format_str = escaped_str + " " + " ".join(fmt for fmt, _ in conversions) + "\\n"
+                            remaining_args = ", ".join(arg for _, arg in conversions)
                             return f'{func_name}("{format_str}", {remaining_args})'
                         else:
                             # Single string argument
                             escaped_str = self._escape_c_string(node.args[0].value)
                             return f'{func_name}("%s\\n", "{escaped_str}")'
                     else:
-                        # Single non-string argument or other cases
-                        args = ", ".join(self._expr_to_c(arg) for arg in node.args)
-                        return f'{func_name}("%d\\n", {args})'
+                        # Non-string arguments, separated by spaces like print()
+                        conversions = [self._printf_arg(arg) for arg in node.args]
+                        format_str = " ".join(fmt for fmt, _ in conversions) + "\\n"
+                        args = ", ".join(arg for _, arg in conversions)
+                        return f'{func_name}("{format_str}", {args})'
                 else:
                     return f'{func_name}("\\n")'
             
-            args = ", ".join(self._expr_to_c(arg) for arg in node.args)
+            table = self.luts.get(func_name)
+            if table is not None and not table.interpolated and len(node.args) == 1:
+                return self._lut_load(table, table.index_expr(self._expr_to_c(node.args[0])))
+
+            self._check_call_promotion(node)
+            args = ", ".join(self._coerce(arg, param_type)
+                             for arg, param_type in zip(node.args, self._param_types(node)))
             return f"{func_name}({args})"
 
         else:
@@ -632,6 +3782,11 @@ class CCodeGenerator(ast.NodeVisitor):
             ast.Div: '/',
             ast.Mod: '%',
             ast.FloorDiv: '/',
+            ast.LShift: '<<',
+            ast.RShift: '>>',
+            ast.BitAnd: '&',
+            ast.BitOr: '|',
+            ast.BitXor: '^',
         }
         return op_map.get(type(op), '?')
 
@@ -652,6 +3807,10 @@ class CCodeGenerator(ast.NodeVisitor):
         if node is None:
             return "void"
 
+        fmt = annotation_format(node)
+        if fmt is not None:
+            return fmt.c_type
+
         if isinstance(node, ast.Name):
             type_map = {
                 'int': 'int32_t',
@@ -661,14 +3820,275 @@ class CCodeGenerator(ast.NodeVisitor):
                 'None': 'void',
                 'list': 'int32_t*',  # list defaults to pointer for function params
             }
+            if node.id in BYTE_TYPES:
+                return self._view_type('uint8_t')
             return type_map.get(node.id, node.id)
 
+        elif isinstance(node, ast.Subscript):
+            matrix = self._matrix_annotation(node)
+            if matrix is not None:
+                return matrix.c_type
+            container = self._container_annotation(node)
+            if container is not None:
+                return container.c_type
+            elem_type = view_annotation(node, self._map_type)
+            if elem_type is not None:
+                return self._view_type(elem_type)
+            # list[T] and Array[T, N] decay to T* for parameters and returns
+            info = self._array_annotation(node)
+            if info is not None:
+                return f"{info[0] or 'int32_t'}*"
+
         elif isinstance(node, ast.Constant):
             if node.value is None:
                 return "void"
 
         return "void"
 
+    def _emit_list_init(self, node: ast.AnnAssign, var_name: str):
+        """Emit storage and initial contents for ``name: list = <literal>``
+
+        Read-only constant lists become ``static const`` tables (flash on
+        MCUs).  Other lists get heap, planned static or stack storage and are
+        initialized with a brace initializer, one memset or one memcpy from a
+        const template; lists with runtime elements get one store per element.
+        ``Array[T, N]`` and lists in @static_alloc functions live on the stack
+        unless they are returned.
+        """
+        elem_type, size_node = self._list_allocation_info(node)
+        size = self._expr_to_c(size_node) if size_node is not None else "1"
+        count = eval_const_int(size_node, self.module_int_constants) if size_node is not None else None
+        self._check_array_length(node, var_name, count)
+        values = self._const_list_values(node.value, count)
+        self.local_vars.add(var_name)
+
+        if var_name in self.const_lists:
+            self.emit(f"static const {elem_type} {var_name}[{len(values)}] = {{{', '.join(values)}}};")
+            return
+
+        all_zero = values is not None and all(v in ('0', '0.0', 'false') for v in values)
+        escapes = var_name in self._returned_names
+        fixed = self._array_annotation(node.annotation)[1] is not None
+        if (self.static_alloc or fixed) and count is not None and not escapes and not self.memory_plan:
+            # Stack array with brace initializer
+            aligned = self._alignment_attribute(var_name, elem_type)
+            if values is not None:
+                init = '{0}' if all_zero else '{' + ', '.join(values) + '}'
+                self.emit(f"{elem_type} {var_name}[{count}]{aligned} = {init};")
+                return
+            self.emit(f"{elem_type} {var_name}[{count}]{aligned};")
+        else:
+            self.aligned_arrays.pop(var_name, None)
+            placement = None
+            if self.memory_plan:
+                placement = self.memory_plan.placement(self.current_function, var_name)
+            if placement is None:
+                # Inside function: generate heap allocation
+                self.emit(f"{elem_type}* {var_name} = ({elem_type}*){self._gc_malloc_call(f'sizeof({elem_type}) * {size}', node)};")
+            elif placement['storage'] == 'overlay':
+                self.emit(f"{elem_type}* {var_name} = ({elem_type}*)&py2mcu_overlay.bytes[{placement['offset']}];")
+            else:
+                self.emit(f"static {elem_type} {var_name}[{placement['count']}];")
+
+        if all_zero:
+            self.emit(f"memset({var_name}, 0, sizeof({elem_type}) * {size});")
+        elif values is not None:
+            self.emit(f"static const {elem_type} {var_name}_init[{len(values)}] = {{{', '.join(values)}}};")
+            self.emit(f"memcpy({var_name}, {var_name}_init, sizeof({var_name}_init));")
+        elif isinstance(node.value, ast.List):
+            for index, elt in enumerate(node.value.elts):
+                self.emit(f"{var_name}[{index}] = {self._expr_to_c(elt)};")
+        elif isinstance(node.value, ast.BinOp) and isinstance(node.value.left, ast.List) and node.value.left.elts:
+            fill = self._expr_to_c(node.value.left.elts[0])
+            self.emit(f"for (int _i = 0; _i < {size}; _i++) {{ {var_name}[_i] = {fill}; }}")
+
+    def _check_array_length(self, node: ast.AnnAssign, var_name: str, count: Optional[int]):
+        """Reject ``Array[T, N]`` initialized with a literal of another length"""
+        if count is None or not isinstance(node.value, ast.List):
+            return
+        if self._array_annotation(node.annotation)[1] is not None and len(node.value.elts) != count:
+            raise CompileError(
+                f"'{var_name}' is declared with {count} elements but initialized with {len(node.value.elts)}",
+                node.lineno, getattr(self, '_source_file', '<string>'))
+
+    # Largest ``[v] * N`` expanded into a const template; bigger fills use a loop
+    MAX_TEMPLATE_ELEMENTS = 64
+
+    def _const_list_values(self, value: ast.AST, count: Optional[int]) -> Optional[List[str]]:
+        """C literals for a list whose elements are all compile-time constants"""
+        if isinstance(value, ast.List):
+            elts = value.elts
+        elif isinstance(value, ast.BinOp) and isinstance(value.left, ast.List) and count is not None:
+            if len(value.left.elts) != 1:
+                return None
+            literal = self._const_element(value.left.elts[0])
+            if literal is None:
+                return None
+            if literal not in ('0', '0.0', 'false') and count > self.MAX_TEMPLATE_ELEMENTS:
+                return None
+            return [literal] * count
+        else:
+            return None
+
+        literals = [self._const_element(elt) for elt in elts]
+        if not literals or any(lit is None for lit in literals):
+            return None
+        return literals
+
+    def _const_element(self, node: ast.AST) -> Optional[str]:
+        """C literal for a constant list element, or None"""
+        folded = eval_const_int(node, self.module_int_constants)
+        if folded is not None:
+            return str(folded)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (bool, float)):
+            return self._expr_to_c(node)
+        if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)
+                and isinstance(node.operand, ast.Constant) and isinstance(node.operand.value, float)):
+            return f"-{self._expr_to_c(node.operand)}"
+        if isinstance(node, ast.Name) and node.id in self.define_names:
+            return node.id
+        if getattr(node, 'folded_c', None) is not None:
+            return node.folded_c
+        if (isinstance(node, ast.Call) and len(node.args) == 1 and format_of_c_type(getattr(node, 'c_type', None))
+                and self._constant_number(node.args[0]) is not None):
+            return self._expr_to_c(node)  # q15(0.25) -> raw constant
+        return None
+
+    def _find_const_lists(self, func: ast.FunctionDef) -> set:
+        """Names of constant list literals in func that are never mutated or escaped"""
+        names = set()
+        for node in ast.walk(func):
+            if (isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name)
+                    and node.value is not None and self._is_array_alloc(node)
+                    and list_is_read_only(func, node.target.id)):
+                _, size_node = self._list_allocation_info(node)
+                count = eval_const_int(size_node, self.module_int_constants) if size_node is not None else None
+                if self._const_list_values(node.value, count) is not None:
+                    names.add(node.target.id)
+        return names
+
+    def _is_array_alloc(self, node: ast.AnnAssign) -> bool:
+        """True if node creates array storage
+
+        That is ``name: list = [...]`` / ``[v] * N`` (any list-like annotation),
+        a bare ``name: Array[T, N]`` declaration or one holding an array expression.
+        """
+        info = self._array_annotation(node.annotation)
+        if info is None:
+            return False
+        if node.value is None:
+            return info[1] is not None
+        return isinstance(node.value, (ast.List, ast.BinOp)) or is_array_expr(node.value, self.views)
+
+    def _array_annotation(self, node: ast.AST) -> Optional[tuple]:
+        """Decode list-like annotations
+
+        Returns:
+            (element C type or None, length node or None) for ``list``,
+            ``list[T]`` and ``Array[T, N]``; None for anything else.
+        """
+        if isinstance(node, ast.Name) and node.id in ('list', 'List'):
+            return (None, None)
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            args = self._subscript_args(node)
+            if node.value.id in ('list', 'List') and len(args) == 1:
+                return (self._map_type(args[0]), None)
+            if node.value.id == 'Array' and len(args) == 2:
+                return (self._map_type(args[0]), args[1])
+        return None
+
+    def _subscript_args(self, node: ast.Subscript) -> List[ast.AST]:
+        """Generic parameters of ``X[a, b]`` (handles the Python 3.8 ast.Index wrapper)"""
+        slice_node = node.slice
+        if hasattr(ast, 'Index') and isinstance(slice_node, ast.Index):
+            slice_node = slice_node.value
+        if isinstance(slice_node, ast.Tuple):
+            return list(slice_node.elts)
+        return [slice_node]
+
+    def _begin_array_scope(self, func: ast.FunctionDef):
+        """Reset array element types to module arrays plus func's array params"""
+        self.array_elem_types = dict(self.global_array_elem_types)
+        self.array_lengths = dict(self.global_array_lengths)
+        self.aligned_arrays = {name: alignment for name, alignment in self.global_aligned_arrays.items()
+                               if name not in {arg.arg for arg in func.args.args}}
+        for arg in func.args.args:
+            info = self._array_annotation(arg.annotation) if arg.annotation else None
+            if info is not None:
+                self.array_elem_types[arg.arg] = info[0] or 'int32_t'
+                length = eval_const_int(info[1], self.module_int_constants) if info[1] is not None else None
+                if length is not None:
+                    self.array_lengths[arg.arg] = length
+        self.array_lengths.update(self._array_lengths(ast.walk(func)))
+        self.view_lengths = self._constant_view_lengths(func)
+        stores = [node.id for node in ast.walk(func) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)]
+        self.fresh_arrays = {node.target.id for node in ast.walk(func)
+                             if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name)
+                             and self._is_array_alloc(node) and stores.count(node.target.id) == 1}
+        optimize = self.optimize_level >= 1 and not function_has_c_body(func)
+        self.loop_idioms = find_loop_idioms(func) if optimize else {}
+
+    def _array_lengths(self, nodes) -> Dict[str, int]:
+        """Constant lengths of the arrays allocated by the given statements"""
+        lengths = {}
+        for node in nodes:
+            if (isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name)
+                    and self._is_array_alloc(node)):
+                size_node = self._list_allocation_info(node)[1]
+                length = eval_const_int(size_node, self.module_int_constants) if size_node is not None else None
+                if length is not None:
+                    lengths[node.target.id] = length
+        return lengths
+
+    def _array_elem_type(self, node: ast.AnnAssign) -> str:
+        """Element C type of an annotated list/array declaration"""
+        return self._list_allocation_info(node)[0]
+
+    def _list_allocation_info(self, node: ast.AnnAssign) -> tuple:
+        """Return (element_type, size_node) for an array allocation
+
+        The element type comes from ``list[T]``/``Array[T, N]`` when given,
+        otherwise from the first literal element.  size_node is the AST of
+        the element count, or None when it cannot be determined.
+        """
+        annotated_type, length = self._array_annotation(node.annotation) or (None, None)
+        value = node.value
+        inferred_type, size_node = "int32_t", None
+        if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Mult):
+            if isinstance(value.left, ast.List) and value.left.elts:
+                inferred_type, size_node = self._infer_type_from_value(value.left.elts[0]), value.right
+        elif isinstance(value, ast.List) and value.elts:
+            inferred_type = self._infer_type_from_value(value.elts[0])
+            size_node = ast.Constant(value=len(value.elts))
+        if length is not None:
+            size_node = length
+        return (annotated_type or inferred_type, size_node)
+
+    def _emit_global_array(self, node: ast.AnnAssign, var_name: str):
+        """Emit a module-level array with a static initializer"""
+        elem_type, size_node = self._list_allocation_info(node)
+        count = eval_const_int(size_node, self.module_int_constants) if size_node is not None else None
+        if count is None:
+            raise CompileError(f"module-level array '{var_name}' needs a compile-time constant length",
+                               node.lineno, getattr(self, '_source_file', '<string>'))
+
+        modifiers = {'const': False, 'public': False, 'volatile': False}
+        if hasattr(self, '_source_code'):
+            modifiers = extract_variable_modifiers(self._source_code, node.lineno)
+        full_type = self._get_storage_class_specifiers(modifiers, elem_type)
+
+        self._check_array_length(node, var_name, count)
+        values = self._const_list_values(node.value, count)
+        if values is None and isinstance(node.value, ast.List):
+            values = [self._expr_to_c(elt) for elt in node.value.elts]
+        aligned = self._alignment_attribute(var_name, elem_type)
+        if aligned:
+            self.global_aligned_arrays[var_name] = self.aligned_arrays[var_name]
+        if values is None or all(v in ('0', '0.0', 'false') for v in values):
+            self.emit(f"{full_type} {var_name}[{count}]{aligned};")
+        else:
+            self.emit(f"{full_type} {var_name}[{count}]{aligned} = {{{', '.join(values)}}};")
+
     def _infer_list_info(self, node: ast.AST) -> tuple:
         """Infer list element type and size from initialization expression.
         
@@ -700,6 +4120,15 @@ class CCodeGenerator(ast.NodeVisitor):
     
     def _infer_type_from_value(self, node: ast.AST) -> str:
         """Infer C type from Python value node"""
+        if isinstance(node, ast.Subscript) and self._is_view(node.value) and not isinstance(node.slice, ast.Slice):
+            return self.views[node.value.c_type]
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            # Indexing a typed array yields its element type
+            if node.value.id in self.array_elem_types:
+                return self.array_elem_types[node.value.id]
+        c_type = getattr(node, 'c_type', None)
+        if c_type and not isinstance(node, ast.Constant):
+            return c_type
         if isinstance(node, ast.Constant):
             if isinstance(node.value, bool):
                 return "bool"
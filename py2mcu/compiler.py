@@ -10,7 +10,9 @@ from py2mcu.type_checker import TypeChecker
 from py2mcu.codegen import CCodeGenerator
 
 class Compiler:
-    def __init__(self, target: str = 'pc', optimize: str = '2'):
+    def __init__(self, target: str = 'pc', optimize: str = '2',
+                 no_heap: bool = False, ram_budget: Optional[int] = None,
+                 double_promotion: str = 'warn'):
         # keep a normalized version for internal use; any "TARGET_" prefix
         # is stripped and everything is forced to lower case.  this mirrors the
         # behaviour in CCodeGenerator, so the two always agree.
@@ -19,8 +21,22 @@ class Compiler:
             normalized = normalized[len('target_'):]
         self.target = normalized
         self.optimize = optimize
+        self.no_heap = no_heap
         self.type_checker = TypeChecker()
-        self.codegen = CCodeGenerator(target)
+        self.codegen = CCodeGenerator(target, no_heap=no_heap, ram_budget=ram_budget,
+                                      optimize=self._optimize_level(optimize),
+                                      double_promotion=double_promotion)
+
+    @staticmethod
+    def _optimize_level(optimize) -> int:
+        """Numeric level for '-O' values; non-numeric levels such as 's' mean 2"""
+        text = str(optimize)
+        return int(text) if text.isdigit() else 2
+
+    @property
+    def report(self):
+        """Optimization/resource report of the last compilation"""
+        return self.codegen.report
 
     def compile_file(self, filepath: str) -> str:
         """Compile a Python file to C code"""
@@ -0,0 +1,616 @@
+"""
+Run pure module functions in CPython during compilation
+"""
+import __future__
+import ast
+import builtins
+import copy
+import math
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from py2mcu import types as py2mcu_types
+from py2mcu.analysis import c_snippets, function_has_c_body, global_names, module_functions
+from py2mcu.errors import CompileError
+from py2mcu.fixed import format_of_c_type
+from py2mcu.floats import fits_float, float_literal
+from py2mcu.inference import INT_TYPES, convert_int
+from py2mcu.parser import extract_variable_modifiers
+from py2mcu.ranges import INT32_MAX, INT32_MIN, TYPE_RANGES
+
+# Seconds one compile-time evaluation may run before it is abandoned
+TIME_LIMIT = 2.0
+
+
+class EvaluationTimeout(Exception):
+    """Raised inside the evaluated code when the time limit is reached"""
+
+
+@contextmanager
+def time_limit(seconds: float):
+    """Abort Python code running in this thread after ``seconds``
+
+    The check runs on every traced line, so a single long call into a
+    builtin (``sum(range(10**12))``) is not interrupted.
+    """
+    deadline = time.monotonic() + seconds
+
+    def tracer(frame, event, arg):
+        if time.monotonic() > deadline:
+            raise EvaluationTimeout(f"evaluation exceeded {seconds:g}s")
+        return tracer
+
+    previous = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+        yield
+    finally:
+        sys.settrace(previous)
+
+
+class CIntOverflow(ArithmeticError):
+    """An int result the generated C would compute in int32 does not fit"""
+
+
+def _c_int(value: Any) -> Any:
+    if isinstance(value, int) and not INT32_MIN <= value <= INT32_MAX:
+        raise CIntOverflow(f"{value} overflows int32_t")
+    return value
+
+
+def _c_binop(op: str, left: Any, right: Any) -> Any:
+    """left op right as the generated C computes it
+
+    Between ints, ``//`` and ``%`` truncate toward zero and every result
+    must fit int32_t (signed overflow is undefined in C).  Anything else
+    keeps Python semantics.
+    """
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return _PY_BINOPS[op](left, right)
+    if op in ('//', '%'):
+        if right == 0:
+            raise ZeroDivisionError("integer division by zero")
+        quotient = abs(left) // abs(right)
+        if (left < 0) != (right < 0):
+            quotient = -quotient
+        return _c_int(quotient if op == '//' else left - right * quotient)
+    return _c_int(_PY_BINOPS[op](left, right))
+
+
+def _c_convert(value: Any, c_type: str) -> Any:
+    """value stored in a parameter or local of int C type c_type"""
+    if isinstance(value, float):
+        low, high = TYPE_RANGES.get(c_type, (-2 ** 63, 2 ** 64 - 1))
+        if not low <= int(value) <= high:
+            raise CIntOverflow(f"{value} does not fit {c_type}")
+        return int(value)
+    if isinstance(value, int):
+        return convert_int(value, c_type)
+    return value
+
+
+def _c_unaryop(op: str, operand: Any) -> Any:
+    return _c_int(_PY_UNARYOPS[op](operand))
+
+
+_PY_BINOPS = {
+    '+': lambda a, b: a + b, '-': lambda a, b: a - b, '*': lambda a, b: a * b, '/': lambda a, b: a / b,
+    '//': lambda a, b: a // b, '%': lambda a, b: a % b, '**': lambda a, b: a ** b,
+    '<<': lambda a, b: a << b, '>>': lambda a, b: a >> b,
+    '&': lambda a, b: a & b, '|': lambda a, b: a | b, '^': lambda a, b: a ^ b, '@': lambda a, b: a @ b,
+}
+_PY_UNARYOPS = {'-': lambda a: -a, '+': lambda a: +a, '~': lambda a: ~a}
+_BINOP_SYMBOLS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%',
+    ast.Pow: '**', ast.LShift: '<<', ast.RShift: '>>', ast.BitAnd: '&', ast.BitOr: '|',
+    ast.BitXor: '^', ast.MatMult: '@',
+}
+_UNARY_SYMBOLS = {ast.USub: '-', ast.UAdd: '+', ast.Invert: '~'}
+
+
+class _CArithmetic(ast.NodeTransformer):
+    """
+    Route arithmetic through _c_binop/_c_unaryop so it follows the C lowering
+
+    With map_type (annotation -> C type), int parameters and annotated int
+    locals are converted to their C type where they are bound.
+    """
+
+    def __init__(self, map_type: Optional[Callable[[ast.expr], str]] = None):
+        self.map_type = map_type
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.generic_visit(node)
+        conversions = []
+        for arg in node.args.args:
+            c_type = self._int_type(arg.annotation) if arg.annotation else 'int32_t'
+            if c_type is not None:
+                value = self._call('__c_convert', ast.Name(id=arg.arg, ctx=ast.Load()), ast.Constant(c_type),
+                                   where=node)
+                conversions.append(ast.copy_location(
+                    ast.Assign(targets=[ast.Name(id=arg.arg, ctx=ast.Store())], value=value), node))
+        node.body[:0] = conversions
+        return node
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        self.generic_visit(node)
+        c_type = self._int_type(node.annotation)
+        if node.value is not None and c_type is not None and isinstance(node.target, ast.Name):
+            node.value = self._call('__c_convert', node.value, ast.Constant(c_type), where=node)
+        return node
+
+    def _int_type(self, annotation: ast.expr) -> Optional[str]:
+        if self.map_type is None:
+            return None
+        try:
+            c_type = self.map_type(annotation)
+        except Exception:
+            return None
+        return c_type if c_type in INT_TYPES else None
+
+    def visit_BinOp(self, node: ast.BinOp):
+        self.generic_visit(node)
+        return self._call('__c_binop', ast.Constant(_BINOP_SYMBOLS[type(node.op)]), node.left, node.right,
+                          where=node)
+
+    def visit_UnaryOp(self, node: ast.UnaryOp):
+        self.generic_visit(node)
+        if type(node.op) not in _UNARY_SYMBOLS:
+            return node
+        return self._call('__c_unaryop', ast.Constant(_UNARY_SYMBOLS[type(node.op)]), node.operand, where=node)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self.generic_visit(node)
+        # a[i] += x reads a[i] again: harmless, the functions folded have no side effects
+        current = copy.deepcopy(node.target)
+        current.ctx = ast.Load()
+        value = self._call('__c_binop', ast.Constant(_BINOP_SYMBOLS[type(node.op)]), current, node.value,
+                           where=node)
+        return ast.copy_location(ast.Assign(targets=[node.target], value=value), node)
+
+    @staticmethod
+    def _call(helper: str, *args: ast.expr, where: ast.AST) -> ast.Call:
+        call = ast.Call(func=ast.Name(id=helper, ctx=ast.Load()), args=list(args), keywords=[])
+        return ast.fix_missing_locations(ast.copy_location(call, where))
+
+
+# Builtins compile-time code may use: no I/O, imports or introspection
+SAFE_BUILTINS = {
+    'abs', 'all', 'any', 'bin', 'bool', 'bytes', 'bytearray', 'chr', 'dict', 'divmod', 'enumerate',
+    'filter', 'float', 'frozenset', 'hex', 'int', 'isinstance', 'len', 'list', 'map', 'max', 'min',
+    'oct', 'ord', 'pow', 'range', 'reversed', 'round', 'set', 'slice', 'sorted', 'str', 'sum', 'tuple',
+    'zip', 'ArithmeticError', 'AssertionError', 'Exception', 'IndexError', 'KeyError',
+    'OverflowError', 'TypeError', 'ValueError', 'ZeroDivisionError',
+}
+
+
+def _builtins() -> Dict[str, Any]:
+    return {name: getattr(builtins, name) for name in SAFE_BUILTINS}
+
+
+def _safe(node: ast.AST) -> bool:
+    """False if node names a dunder (``__import__``, ``x.__class__``): it is not run at compile time"""
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Attribute) and sub.attr.startswith('__'):
+            return False
+        if isinstance(sub, ast.Name) and sub.id.startswith('__'):
+            return False
+    return True
+
+
+class CompileTimeEvaluator:
+    """
+    Namespace holding the module's constants and pure Python functions
+
+    Functions implemented in C, decorators and annotations are dropped;
+    ``math``, the py2mcu type names and SAFE_BUILTINS are available.  A
+    module variable's assignment runs only when an evaluation reads the
+    variable, directly or through a function it calls.  Module constants
+    that cannot be evaluated are simply left out.
+
+    ``evaluate`` runs Python as written.  ``evaluate_as_c`` runs copies
+    of the functions whose int arithmetic and int parameters follow the
+    generated C (map_type gives the C type of an annotation), for folding
+    calls that would otherwise run on the target.
+    """
+
+    def __init__(self, tree: ast.Module, filename: str = '<string>', time_limit: Optional[float] = None,
+                 map_type: Optional[Callable[[ast.expr], str]] = None):
+        self.filename = filename
+        self.map_type = map_type
+        self.time_limit = time_limit if time_limit is not None else TIME_LIMIT
+        self.namespace: Dict[str, Any] = {'math': math, '__builtins__': _builtins()}
+        self.namespace.update({name: value for name, value in vars(py2mcu_types).items()
+                               if not name.startswith('_')})
+        self._functions: list = []
+        self._pending: Dict[str, List[ast.stmt]] = {}     # module variable -> assignments not run yet
+        self._c_namespace: Optional[Dict[str, Any]] = None
+        self._load_defines(getattr(tree, 'py2mcu_defines', None) or [])
+        self._load_module(tree)
+
+    def _load_defines(self, defines):
+        for define in defines:
+            try:
+                value = ast.parse(define['value'], mode='eval')
+                if _safe(value):
+                    self.namespace[define['name']] = eval(compile(value, self.filename, 'eval'), self.namespace)
+            except Exception:
+                pass
+
+    def _load_module(self, tree: ast.Module):
+        """Define the Python functions; module variables are run when a call first needs them"""
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef):
+                if function_has_c_body(node) or not _safe(node):
+                    continue
+                func = copy.deepcopy(node)
+                func.decorator_list = []
+                self._exec(func)
+                self._functions.append(node)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None and _safe(node):
+                for target in (node.targets if isinstance(node, ast.Assign) else [node.target]):
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            self._pending.setdefault(name.id, []).append(node)
+
+    def _exec(self, node: ast.stmt, namespace: Optional[Dict[str, Any]] = None):
+        module = ast.Module(body=[node], type_ignores=[])
+        try:
+            code = compile(module, self.filename, 'exec', flags=__future__.annotations.compiler_flag)
+            with time_limit(self.time_limit):
+                exec(code, self.namespace if namespace is None else namespace)
+        except Exception:
+            pass
+
+    def value(self, name: str) -> Any:
+        """Value of module name, running its assignment first if needed (None if unknown)"""
+        self._require(ast.Name(id=name, ctx=ast.Load()))
+        return self.namespace.get(name)
+
+    def _require(self, node: ast.AST, seen: Optional[Set[str]] = None):
+        """Run the assignments of the module variables node reads, through the functions it calls"""
+        seen = set() if seen is None else seen
+        functions = {func.name: func for func in self._functions}
+        for sub in ast.walk(node):
+            if not isinstance(sub, ast.Name) or sub.id in seen:
+                continue
+            seen.add(sub.id)
+            if sub.id in functions:
+                self._require(functions[sub.id], seen)
+            for assignment in self._pending.pop(sub.id, []):
+                self._require(assignment.value, seen)
+                self._exec(assignment)
+                if self._c_namespace is not None:
+                    self._c_namespace.update({name.id: self.namespace[name.id] for name in ast.walk(assignment)
+                                              if isinstance(name, ast.Name) and name.id in self.namespace})
+
+    def evaluate(self, node: ast.expr) -> Any:
+        """Value of expression node in the module namespace (exceptions propagate)"""
+        self._require(node)
+        code = compile(ast.fix_missing_locations(ast.Expression(body=node)), self.filename, 'eval')
+        with time_limit(self.time_limit):
+            return eval(code, self.namespace)
+
+    def evaluate_as_c(self, node: ast.expr) -> Any:
+        """Value of expression node with int arithmetic as the generated C does it
+
+        ``//`` and ``%`` truncate toward zero; an int result outside int32_t
+        raises CIntOverflow.  Arguments and annotated int locals are
+        converted to their C types.  ``@comptime`` functions keep Python semantics.
+        """
+        namespace = self._c_functions()
+        self._require(node)
+        expression = _CArithmetic().visit(ast.Expression(body=copy.deepcopy(node)))
+        code = compile(ast.fix_missing_locations(expression), self.filename, 'eval')
+        with time_limit(self.time_limit):
+            return eval(code, namespace)
+
+    def _c_functions(self) -> Dict[str, Any]:
+        if self._c_namespace is None:
+            comptime = comptime_functions(ast.Module(body=self._functions, type_ignores=[]))
+            self._c_namespace = dict(self.namespace, __c_binop=_c_binop, __c_unaryop=_c_unaryop,
+                                    __c_convert=_c_convert)
+            for node in self._functions:
+                if node.name in comptime:
+                    continue
+                func = _CArithmetic(self.map_type).visit(copy.deepcopy(node))
+                func.decorator_list = []
+                self._exec(ast.fix_missing_locations(func), self._c_namespace)
+        return self._c_namespace
+
+    def function(self, name: str) -> Optional[Callable]:
+        value = self.namespace.get(name)
+        return value if callable(value) else None
+
+    def call(self, name: str, args: tuple, node: ast.AST, what: str = 'compile-time call') -> Any:
+        """Call a module function, turning failures into CompileError"""
+        return self.map(name, [args], node, what)[0]
+
+    def map(self, name: str, arg_tuples, node: ast.AST, what: str = 'compile-time call') -> list:
+        """Call a module function once per argument tuple within one time limit"""
+        self._require(ast.Name(id=name, ctx=ast.Load()))
+        func = self.function(name)
+        if func is None:
+            raise CompileError(f"{what} '{name}' cannot be evaluated at compile time",
+                               getattr(node, 'lineno', None), self.filename)
+        results = []
+        args: tuple = ()
+        try:
+            with time_limit(self.time_limit):
+                for args in arg_tuples:
+                    results.append(func(*args))
+        except Exception as exc:
+            shown = ', '.join(repr(a) for a in args)
+            raise CompileError(f"{what} {name}({shown}) failed: {type(exc).__name__}: {exc}",
+                               getattr(node, 'lineno', None), self.filename)
+        return results
+
+
+# Builtins (and fixed-point constructors) a pure function may call
+PURE_BUILTINS = {
+    'abs', 'all', 'any', 'bool', 'divmod', 'enumerate', 'float', 'int', 'len', 'list',
+    'max', 'min', 'pow', 'range', 'reversed', 'round', 'sorted', 'sum', 'tuple', 'zip',
+    'Fixed', 'q15', 'q31',
+}
+
+
+def comptime_functions(tree: ast.Module) -> Set[str]:
+    """Functions decorated with ``@comptime``"""
+    return {name for name, func in module_functions(tree).items()
+            if any(isinstance(d, ast.Name) and d.id == 'comptime' for d in func.decorator_list)}
+
+
+def local_names(func: ast.FunctionDef) -> Set[str]:
+    """Parameters and every name func assigns"""
+    names = {arg.arg for arg in func.args.args}
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+    return names
+
+
+class ModuleConstants:
+    """
+    Module names bound once to a number that no function or ISR can change
+
+    Whether a name holds a number is found out, running its assignment,
+    only when ``name in constants`` is asked.
+    """
+
+    def __init__(self, names: Set[str], evaluator: CompileTimeEvaluator):
+        self.names = names
+        self.evaluator = evaluator
+        self._known: Dict[str, bool] = {}
+
+    def __contains__(self, name: str) -> bool:
+        if name not in self.names:
+            return False
+        if name not in self._known:
+            self._known[name] = _is_number(self.evaluator.value(name))
+        return self._known[name]
+
+
+def constant_names(tree: ast.Module, evaluator: CompileTimeEvaluator) -> ModuleConstants:
+    """Module names bound once to a number that no function or ISR can change
+
+    ``@#define`` constants count; globals rebound with ``global`` or marked
+    ``@volatile`` do not.
+    """
+    names = {d['name'] for d in getattr(tree, 'py2mcu_defines', None) or []}
+    source = getattr(tree, '_source', None)
+    assigned: Dict[str, int] = {}
+    for node in tree.body:
+        if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+            targets = [node.target.id]
+        elif isinstance(node, ast.Assign):
+            targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        else:
+            continue
+        if source and extract_variable_modifiers(source, node.lineno)['volatile']:
+            continue
+        for target in targets:
+            assigned[target] = assigned.get(target, 0) + 1
+            names.add(target)
+    names -= {name for name, count in assigned.items() if count > 1}
+    names -= global_names(tree)
+    return ModuleConstants(names, evaluator)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) or hasattr(type(value), 'from_raw')
+
+
+def pure_functions(tree: ast.Module, constants: 'ModuleConstants') -> Set[str]:
+    """Functions whose result depends only on their arguments
+
+    A pure function has no inline C or decorators, reads no mutable
+    module state, does not store into parameters or attributes and only
+    calls pure functions, ``math.*`` and a few side-effect-free builtins.
+    It takes no slices: they are copies in Python but views sharing the
+    list's storage in the generated C.
+    """
+    functions = module_functions(tree)
+    calls: Dict[str, Set[str]] = {}
+    for name, func in functions.items():
+        if name == 'main' or func.decorator_list:
+            continue
+        callees = _pure_body_callees(func, functions, constants)
+        if callees is not None:
+            calls[name] = callees
+
+    # Drop functions calling impure ones until nothing changes
+    pure = set(calls)
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not calls[name] <= pure:
+                pure.discard(name)
+                changed = True
+    return pure
+
+
+def _pure_body_callees(func: ast.FunctionDef, functions: Dict[str, ast.FunctionDef],
+                       constants: 'ModuleConstants') -> Optional[Set[str]]:
+    """Module functions func calls, or None if func itself has side effects"""
+    if function_has_c_body(func) or c_snippets(func):
+        return None
+    params = {arg.arg for arg in func.args.args}
+    local = local_names(func)
+    callees: Set[str] = set()
+    body = [node for stmt in func.body for node in ast.walk(stmt)]
+    reads = []
+    for node in body:
+        if isinstance(node, (ast.Global, ast.Nonlocal, ast.Attribute)) and not _is_math_attribute(node):
+            return None
+        if isinstance(node, ast.Slice):
+            return None
+        if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+            if not isinstance(node.value, ast.Name) or node.value.id in params:
+                return None
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in local:
+            if node.id in functions:
+                callees.add(node.id)
+            elif node.id not in PURE_BUILTINS and node.id != 'math':
+                reads.append(node.id)
+    # Asked last: finding out if a module name holds a number runs its assignment
+    if not all(name in constants for name in reads):
+        return None
+    return callees
+
+
+def _is_math_attribute(node: ast.AST) -> bool:
+    return (isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+            and node.value.id == 'math' and isinstance(node.ctx, ast.Load))
+
+
+class ConstantFolder:
+    """
+    Replace calls with constant arguments by their value
+
+    Calls to ``@comptime`` functions are always evaluated and must have
+    constant arguments; the functions are not emitted.  From -O1, calls to
+    pure functions whose arguments are all constant are folded too, with
+    C's int arithmetic; a call whose ints overflow int32_t is kept.  The
+    C literal is stored in ``call.folded_c``.
+    """
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.evaluator = codegen.evaluator
+        self.filename = getattr(tree, '_filename', '<string>')
+        self.comptime = comptime_functions(tree)
+        self.constants = constant_names(tree, self.evaluator)
+        self.foldable = set(self.comptime)
+        if codegen.optimize_level >= 1:
+            self.foldable |= pure_functions(tree, self.constants) - set(codegen.luts)
+        self.folded = 0
+
+    def run(self) -> 'ConstantFolder':
+        for node in self.tree.body:
+            if isinstance(node, ast.FunctionDef):
+                if node.name not in self.comptime:
+                    self._fold(node, local_names(node))
+            else:
+                self._fold(node, set())
+        return self
+
+    def _fold(self, node: ast.AST, local: Set[str]):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in self.foldable:
+            literal = self._fold_call(node, local)
+            if literal is not None:
+                node.folded_c = literal
+                return
+        for child in ast.iter_child_nodes(node):
+            self._fold(child, local)
+
+    def _error(self, message: str, node: ast.AST) -> CompileError:
+        return CompileError(message, getattr(node, 'lineno', None), self.filename)
+
+    def _fold_call(self, node: ast.Call, local: Set[str]) -> Optional[str]:
+        name = node.func.id
+        required = name in self.comptime
+        if not all(self._is_constant(arg, local) for arg in node.args + [k.value for k in node.keywords]):
+            if required:
+                raise self._error(f"@comptime function '{name}' needs compile-time constant arguments", node)
+            return None
+        try:
+            # Folded pure calls must give what the emitted C would compute
+            value = self.evaluator.evaluate(node) if required else self.evaluator.evaluate_as_c(node)
+        except Exception as exc:
+            if required:
+                raise self._error(f"@comptime call {self.codegen._source_text(node)} failed: "
+                                  f"{type(exc).__name__}: {exc}", node)
+            return None
+        c_type = self.codegen.types.returns.get(name)
+        literal = self._literal(value, c_type)
+        if literal is None:
+            if required:
+                raise self._error(f"@comptime call {self.codegen._source_text(node)} = {value!r} "
+                                  f"is not a {c_type} constant", node)
+            return None
+        self.folded += 1
+        self.codegen.report.add('Compile-time evaluation',
+                                f"line {node.lineno}: {self.codegen._source_text(node)} = {literal}")
+        return literal
+
+    def _is_constant(self, node: ast.AST, local: Set[str]) -> bool:
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, (int, float, bool, str))
+        if isinstance(node, ast.Name):
+            return node.id in self.constants and node.id not in local
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                known = func.id in self.foldable or (func.id in PURE_BUILTINS and func.id not in local)
+            else:
+                known = _is_math_attribute(func)
+            return known and all(self._is_constant(arg, local) for arg in node.args + [k.value for k in node.keywords])
+        if _is_math_attribute(node):
+            return True
+        if isinstance(node, (ast.UnaryOp, ast.BinOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Tuple, ast.List)):
+            return all(self._is_constant(child, local) for child in ast.iter_child_nodes(node)
+                       if isinstance(child, ast.expr))
+        return False
+
+    def _literal(self, value: Any, c_type: Optional[str]) -> Optional[str]:
+        """C literal for value as c_type, None if it does not fit"""
+        fmt = format_of_c_type(c_type)
+        if fmt is not None:
+            if hasattr(type(value), 'from_raw'):
+                raw = value.raw if value._format == fmt else fmt.from_float(float(value))
+            elif isinstance(value, (int, float)):
+                raw = fmt.from_float(value)
+            else:
+                return None
+            return f"(({c_type}){raw})"
+        if not isinstance(value, (int, float)):
+            return None
+        if c_type == 'bool':
+            return 'true' if value else 'false'
+        if c_type in ('float', 'double'):
+            try:
+                value = float(value)
+            except OverflowError:
+                return None
+            if not fits_float(value, double=c_type == 'double'):
+                return None     # inf or nan in C
+            return float_literal(value, double=c_type == 'double')
+        if c_type in TYPE_RANGES or c_type in ('int64_t', 'uint64_t'):
+            value = int(value)  # C conversion truncates toward zero
+            low, high = TYPE_RANGES.get(c_type, (-2 ** 63, 2 ** 64 - 1))
+            if not low <= value <= high:
+                return None
+            return _int_literal(value)
+        return None
+
+
+def _int_literal(value: int) -> str:
+    if -2 ** 31 <= value < 2 ** 31:
+        return str(value)
+    if 0 <= value < 2 ** 32:
+        return f"{value}u"
+    return f"{value}ULL" if value >= 2 ** 63 else f"{value}LL"
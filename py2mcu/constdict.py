@@ -0,0 +1,288 @@
+"""
+Constant module-level dicts compiled to minimal perfect-hash tables
+
+A dict whose keys and values are compile-time constants and which nothing
+modifies becomes flash tables and an O(1) lookup function.  The hash is a
+two-level "hash and displace" scheme: a key's first hash picks a bucket,
+the bucket's seed picks the key's slot.  Seeds are searched at compile time
+so that every key gets its own slot and the tables hold exactly one entry
+per key.  The hash functions match runtime/py2mcu_hash.h bit for bit.
+"""
+import ast
+from typing import Dict, List, Optional
+
+from py2mcu.analysis import collect_module_constants, eval_const_int, global_names
+from py2mcu.errors import CompileError
+from py2mcu.ranges import TYPE_RANGES
+
+MASK32 = 0xFFFFFFFF
+GOLDEN = 0x9E3779B9
+
+# Average keys per first-level bucket
+BUCKET_SIZE = 2
+
+# Seeds tried per bucket before the bucket count is doubled
+SEED_LIMIT = 1 << 16
+
+# Methods that modify a dict in place
+MUTATING_METHODS = {'clear', 'pop', 'popitem', 'setdefault', 'update', '__setitem__', '__delitem__'}
+
+
+def hash_str(text: str) -> int:
+    """32-bit FNV-1a over the UTF-8 bytes of text"""
+    h = 2166136261
+    for byte in text.encode('utf-8'):
+        h = ((h ^ byte) * 16777619) & MASK32
+    return h
+
+
+def hash_key(key) -> int:
+    return hash_str(key) if isinstance(key, str) else key & MASK32
+
+
+def mix(h: int) -> int:
+    """MurmurHash3 finalizer"""
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & MASK32
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & MASK32
+    return h ^ (h >> 16)
+
+
+def seeded(h: int, seed: int) -> int:
+    return mix((h + (seed + 1) * GOLDEN) & MASK32)
+
+
+def reduce(h: int, n: int) -> int:
+    """Map h to 0..n-1 with a multiply instead of a division"""
+    return ((h >> 16) * n) >> 16
+
+
+def perfect_hash(hashes: List[int]) -> List[int]:
+    """Seeds (one per bucket) that give every hash its own slot in 0..n-1
+
+    The bucket count is len(seeds).  Raises ValueError if two keys hash alike.
+    """
+    n = len(hashes)
+    if len(set(hashes)) != n:
+        raise ValueError("two keys have the same 32-bit hash")
+    bucket_count = max(1, -(-n // BUCKET_SIZE))
+    while True:
+        seeds = _place(hashes, bucket_count)
+        if seeds is not None:
+            return seeds
+        bucket_count *= 2
+
+
+def _place(hashes: List[int], bucket_count: int) -> Optional[List[int]]:
+    n = len(hashes)
+    buckets: List[List[int]] = [[] for _ in range(bucket_count)]
+    for h in hashes:
+        buckets[reduce(mix(h), bucket_count)].append(h)
+    seeds = [0] * bucket_count
+    taken = [False] * n
+    # Largest buckets first, while most slots are still free
+    for bucket in sorted(range(bucket_count), key=lambda b: -len(buckets[b])):
+        keys = buckets[bucket]
+        if not keys:
+            break
+        for seed in range(SEED_LIMIT):
+            slots = {reduce(seeded(h, seed), n) for h in keys}
+            if len(slots) == len(keys) and not any(taken[slot] for slot in slots):
+                for slot in slots:
+                    taken[slot] = True
+                seeds[bucket] = seed
+                break
+        else:
+            return None
+    return seeds
+
+
+def slot_of(key, seeds: List[int], n: int) -> int:
+    h = hash_key(key)
+    return reduce(seeded(h, seeds[reduce(mix(h), len(seeds))]), n)
+
+
+class Handler(str):
+    """A function name stored as a dict value"""
+
+
+def smallest_int_type(values) -> str:
+    """Narrowest C integer type holding every value"""
+    low, high = min(values), max(values)
+    for c_type in ('uint8_t', 'int8_t', 'uint16_t', 'int16_t', 'int32_t', 'uint32_t'):
+        type_low, type_high = TYPE_RANGES[c_type]
+        if type_low <= low and high <= type_high:
+            return c_type
+    return 'int64_t'
+
+
+class ConstDict:
+    """Entries of one constant dict in slot order, with the seeds that find them"""
+
+    def __init__(self, name: str, node: ast.AST):
+        self.name = name
+        self.node = node
+        self.key_kind = 'int'           # 'int' or 'str'
+        self.key_type = 'int32_t'       # C type of the lookup argument
+        self.key_storage = 'int32_t'    # C element type of the key table
+        self.value_kind = 'int'         # 'int', 'float', 'bool', 'str' or 'handler'
+        self.c_type: Optional[str] = 'int32_t'  # C type of a looked-up value
+        self.value_storage = 'int32_t'  # C element type of the value table
+        self.items: Dict = {}           # the Python dict
+        self.keys: List = []            # keys in slot order
+        self.values: List = []          # values in slot order (function names for handlers)
+        self.seeds: List[int] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.keys)
+
+    @property
+    def seed_type(self) -> str:
+        return 'uint8_t' if max(self.seeds) < 256 else 'uint16_t'
+
+
+class ConstDictBuilder:
+    """
+    Find module-level dicts with constant keys and values that are never
+    modified and compute their perfect-hash tables
+    """
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.filename = getattr(tree, '_filename', '<string>')
+        self.constants = collect_module_constants(tree)
+
+    def run(self) -> Dict[str, ConstDict]:
+        tables = {}
+        assigned: Dict[str, int] = {}
+        for node in self.tree.body:
+            for target in self._targets(node):
+                assigned[target] = assigned.get(target, 0) + 1
+        for node in self.tree.body:
+            annotation = getattr(node, 'annotation', None)
+            if annotation is not None and self.codegen._container_annotation(annotation) is not None:
+                continue  # Dict[K, V, N]: a mutable table
+            if isinstance(getattr(node, 'value', None), ast.Dict):
+                for name in self._targets(node):
+                    self._check_constant(name, node, assigned)
+                    tables[name] = self._build(name, node)
+        return tables
+
+    @staticmethod
+    def _targets(node: ast.AST) -> List[str]:
+        if isinstance(node, ast.Assign):
+            return [target.id for target in node.targets if isinstance(target, ast.Name)]
+        if isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(node.target, ast.Name):
+            return [node.target.id]
+        return []
+
+    def _error(self, message: str, node: ast.AST) -> CompileError:
+        return CompileError(message, getattr(node, 'lineno', None), self.filename)
+
+    def _check_constant(self, name: str, node: ast.AST, assigned: Dict[str, int]):
+        if assigned[name] > 1 or name in global_names(self.tree):
+            raise self._error(f"dict '{name}' is reassigned; only constant dicts are supported", node)
+        for use in ast.walk(self.tree):
+            if (isinstance(use, ast.Subscript) and isinstance(use.value, ast.Name) and use.value.id == name
+                    and isinstance(use.ctx, (ast.Store, ast.Del))):
+                raise self._error(f"dict '{name}' is modified; only constant dicts are supported "
+                                  "(declare a mutable table as Dict[K, V, N])", use)
+            if (isinstance(use, ast.Attribute) and isinstance(use.value, ast.Name) and use.value.id == name
+                    and use.attr in MUTATING_METHODS):
+                raise self._error(f"dict '{name}' is modified by .{use.attr}(); "
+                                  "only constant dicts are supported", use)
+
+    def _build(self, name: str, node: ast.AST) -> ConstDict:
+        table = ConstDict(name, node)
+        literal = node.value
+        if not literal.keys:
+            raise self._error(f"dict '{name}' is empty", node)
+        for key_node, value_node in zip(literal.keys, literal.values):
+            if key_node is None:
+                raise self._error(f"dict '{name}': ** unpacking is not supported", value_node)
+            table.items[self._key(name, key_node)] = self._value(name, value_node)
+
+        keys = list(table.items)
+        kinds = {type(key) for key in keys}
+        if len(kinds) > 1:
+            raise self._error(f"dict '{name}' mixes int and str keys", node)
+        value_kinds = {self._value_kind(value) for value in table.items.values()}
+        if len(value_kinds) > 1:
+            raise self._error(f"dict '{name}' mixes values of kinds {', '.join(sorted(value_kinds))}", node)
+        table.key_kind = 'str' if kinds == {str} else 'int'
+        table.value_kind = value_kinds.pop()
+        self._assign_types(table, getattr(node, 'annotation', None))
+
+        try:
+            table.seeds = perfect_hash([hash_key(key) for key in keys])
+        except ValueError as e:
+            raise self._error(f"dict '{name}': {e}", node)
+        slots = {slot_of(key, table.seeds, len(keys)): key for key in keys}
+        table.keys = [slots[slot] for slot in range(len(keys))]
+        table.values = [table.items[key] for key in table.keys]
+        return table
+
+    def _key(self, name: str, node: ast.AST):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        value = eval_const_int(node, self.constants)
+        if value is None:
+            raise self._error(f"dict '{name}': keys must be int or str constants", node)
+        if not -2 ** 31 <= value < 2 ** 32:
+            raise self._error(f"dict '{name}': key {value} does not fit in 32 bits", node)
+        return value
+
+    def _value(self, name: str, node: ast.AST):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (bool, float, str)):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in self.codegen.function_defs:
+            return Handler(node.id)
+        if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub)
+                and isinstance(node.operand, ast.Constant) and isinstance(node.operand.value, float)):
+            return -node.operand.value
+        value = eval_const_int(node, self.constants)
+        if value is None:
+            raise self._error(f"dict '{name}': values must be constants or function names", node)
+        return value
+
+    @staticmethod
+    def _value_kind(value) -> str:
+        if isinstance(value, Handler):
+            return 'handler'
+        return {bool: 'bool', float: 'float', str: 'str'}.get(type(value), 'int')
+
+    def _assign_types(self, table: ConstDict, annotation: Optional[ast.AST]):
+        """Key and value C types from ``dict[K, V]`` or from the values"""
+        key_annotation = value_annotation = None
+        if (isinstance(annotation, ast.Subscript) and isinstance(annotation.slice, ast.Tuple)
+                and len(annotation.slice.elts) == 2):
+            key_annotation, value_annotation = annotation.slice.elts
+
+        if table.key_kind == 'str':
+            table.key_type = table.key_storage = 'const char*'
+        else:
+            table.key_storage = smallest_int_type(table.items)
+            table.key_type = 'uint32_t' if max(table.items) > TYPE_RANGES['int32_t'][1] else 'int32_t'
+            if key_annotation is not None:
+                table.key_type = self.codegen._map_type(key_annotation)
+
+        values = list(table.items.values())
+        if table.value_kind == 'int':
+            table.value_storage = smallest_int_type(values)
+            table.c_type = 'int32_t' if table.value_storage != 'uint32_t' else 'uint32_t'
+            if table.value_storage == 'int64_t':
+                table.c_type = 'int64_t'
+        elif table.value_kind == 'handler':
+            table.c_type = None  # a function pointer; calls have the handlers' return type
+            table.value_storage = f"{table.name}_fn"
+        else:
+            table.c_type = table.value_storage = {'float': 'float', 'bool': 'bool', 'str': 'const char*'}[
+                table.value_kind]
+        if value_annotation is not None and table.value_kind != 'handler':
+            table.c_type = table.value_storage = self.codegen._map_type(value_annotation)
+            low_high = TYPE_RANGES.get(table.c_type)
+            if low_high and table.value_kind == 'int' and not all(low_high[0] <= v <= low_high[1] for v in values):
+                raise self._error(f"dict '{table.name}': a value does not fit {table.c_type}", table.node)
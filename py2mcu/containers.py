@@ -0,0 +1,147 @@
+"""
+Fixed-capacity ``Dict[K, V, N]`` and ``Set[K, N]`` tables
+
+Each distinct container type becomes one PY2MCU_MAP_DEFINE / PY2MCU_SET_DEFINE
+instantiation of runtime/py2mcu_map.h: a statically sized open-addressing
+table with linear probing and operations specialized for its key type.
+"""
+import ast
+from typing import Dict, List, Optional
+
+from py2mcu.analysis import eval_const_int
+from py2mcu.fixed import format_of_c_type
+
+# Largest share of slots a full table may occupy
+MAX_LOAD = 0.75
+
+MIN_BITS = 1
+
+# Short names of element types in container type names
+SHORT_NAMES = {
+    'int8_t': 'i8', 'uint8_t': 'u8', 'int16_t': 'i16', 'uint16_t': 'u16',
+    'int32_t': 'i32', 'uint32_t': 'u32', 'int64_t': 'i64', 'uint64_t': 'u64',
+    'bool': 'bool', 'float': 'f32', 'double': 'f64',
+}
+KEY_TYPES = {'int8_t': 8, 'uint8_t': 8, 'int16_t': 16, 'uint16_t': 16,
+             'int32_t': 32, 'uint32_t': 32, 'int64_t': 64, 'uint64_t': 64}
+
+# Methods by container kind: name -> (C function suffix, passes a fallback value)
+METHODS = {
+    'dict': {'get': ('get', True), 'pop': ('pop', True), 'clear': ('clear', False)},
+    'set': {'add': ('add', False), 'discard': ('remove', False), 'remove': ('remove', False),
+            'clear': ('clear', False)},
+}
+
+
+def table_bits(capacity: int) -> int:
+    """log2 of the slot count that keeps a full table within MAX_LOAD"""
+    bits = MIN_BITS
+    while (1 << bits) * MAX_LOAD < capacity:
+        bits += 1
+    return bits
+
+
+def key_hash(key_type: str, bits: int) -> str:
+    """Home-slot function for keys of key_type in a table of 2^bits slots"""
+    if KEY_TYPES[key_type] <= bits:
+        return 'py2mcu_hash_direct'  # a slot for every key value: no collisions
+    return 'py2mcu_hash_fib64' if KEY_TYPES[key_type] == 64 else 'py2mcu_hash_fib32'
+
+
+def home_slot(key: int, key_type: str, bits: int) -> int:
+    """Python model of the C home-slot function"""
+    mask = (1 << bits) - 1
+    function = key_hash(key_type, bits)
+    if function == 'py2mcu_hash_direct':
+        return key & mask
+    key &= (1 << KEY_TYPES[key_type]) - 1
+    if function == 'py2mcu_hash_fib64':
+        key = (key ^ (key >> 32)) & 0xFFFFFFFF
+    return ((key * 2654435769) & 0xFFFFFFFF) >> (32 - bits)
+
+
+def fill_slots(keys: List[int], key_type: str, bits: int) -> Dict[int, int]:
+    """Python model of inserting keys in order: slot -> key"""
+    slots: Dict[int, int] = {}
+    for key in keys:
+        i = home_slot(key, key_type, bits)
+        while i in slots and slots[i] != key:
+            i = (i + 1) & ((1 << bits) - 1)
+        slots[i] = key
+    return slots
+
+
+def probe_length(slots: Dict[int, int], key: int, key_type: str, bits: int) -> int:
+    """Slots a lookup of key examines (up to the key or the first empty slot)"""
+    i = home_slot(key, key_type, bits)
+    probes = 1
+    while i in slots and slots[i] != key:
+        i = (i + 1) & ((1 << bits) - 1)
+        probes += 1
+    return probes
+
+
+class ContainerType:
+    """One fixed-capacity dict or set type"""
+
+    def __init__(self, kind: str, key_type: str, value_type: Optional[str], capacity: int):
+        self.kind = kind
+        self.key_type = key_type
+        self.value_type = value_type
+        self.capacity = capacity
+        self.bits = table_bits(capacity)
+
+    @property
+    def name(self) -> str:
+        parts = [SHORT_NAMES[self.key_type]]
+        if self.kind == 'dict':
+            fmt = format_of_c_type(self.value_type)
+            parts.append(fmt.name if fmt is not None else SHORT_NAMES[self.value_type])
+        return f"{'map' if self.kind == 'dict' else 'set'}_{'_'.join(parts)}_{self.capacity}"
+
+    @property
+    def c_type(self) -> str:
+        return f"{self.name}_t"
+
+    @property
+    def slots(self) -> int:
+        return 1 << self.bits
+
+    def define(self) -> str:
+        hash_function = key_hash(self.key_type, self.bits)
+        if self.kind == 'dict':
+            return (f"PY2MCU_MAP_DEFINE({self.name}, {self.key_type}, {self.value_type}, "
+                    f"{self.capacity}, {self.bits}, {hash_function})")
+        return f"PY2MCU_SET_DEFINE({self.name}, {self.key_type}, {self.capacity}, {self.bits}, {hash_function})"
+
+    def method_type(self, method: str) -> Optional[str]:
+        """C type returned by a method call"""
+        if method in ('get', 'pop'):
+            return self.value_type
+        return None
+
+
+def container_annotation(node: ast.AST, map_type, constants: Dict[str, int]) -> Optional[ContainerType]:
+    """Decode ``Dict[K, V, N]`` / ``Set[K, N]``; None for other annotations
+
+    Raises ValueError for a malformed container annotation.
+    """
+    if not (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and node.value.id in ('Dict', 'Set')):
+        return None
+    args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+    kind = 'dict' if node.value.id == 'Dict' else 'set'
+    if len(args) != (3 if kind == 'dict' else 2):
+        return None  # typing.Dict[K, V] / typing.Set[K]
+    capacity = eval_const_int(args[-1], constants)
+    if capacity is None or capacity < 1:
+        raise ValueError(f"{node.value.id} capacity must be a positive constant")
+    key_type = map_type(args[0])
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"{node.value.id} keys must be integers, not {key_type}")
+    value_type = None
+    if kind == 'dict':
+        value_type = map_type(args[1])
+        if value_type not in SHORT_NAMES and format_of_c_type(value_type) is None:
+            raise ValueError(f"Dict values must be numbers or bool, not {value_type}")
+    return ContainerType(kind, key_type, value_type, capacity)
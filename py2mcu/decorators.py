@@ -67,3 +67,91 @@ def static_alloc(func):
     """
     func._static_alloc = True
     return func
+
+def lut(domain: range, dtype=int, interpolate: bool = False):
+    """
+    Decorator to replace a pure function by a table computed at compile time
+
+    Usage:
+        @lut(domain=range(0, 256), dtype=uint8_t)
+        def gamma(x: int) -> int:
+            return 255 * (x / 255) ** 2.2
+
+    On the PC the function is tabulated and looked up the same way as on
+    the MCU: values are rounded half away from zero to integers (or
+    converted to the fixed-point dtype), sparse domains hold the last
+    sample or, with ``interpolate=True``, interpolate linearly.
+    """
+    from py2mcu.tables import interpolate as interpolate_table, round_half_away
+
+    def decorator(func):
+        if dtype is float:
+            table = [float(func(x)) for x in domain]
+        elif hasattr(dtype, 'from_raw'):
+            table = [dtype(func(x)).raw for x in domain]
+        else:
+            table = [round_half_away(func(x)) for x in domain]
+
+        def wrapper(x):
+            if interpolate:
+                value = interpolate_table(table, domain.start, domain.step, x, dtype is not float)
+            else:
+                index = (x - domain.start) // domain.step
+                if not 0 <= index < len(table):
+                    raise IndexError(f"{func.__name__}({x}) is outside the @lut domain {domain}")
+                value = table[index]
+            return dtype.from_raw(value) if hasattr(dtype, 'from_raw') else value
+        wrapper.__name__ = func.__name__
+        wrapper._lut_table = table
+        return wrapper
+    return decorator
+
+def comptime(func):
+    """
+    Decorator to evaluate a function while compiling
+
+    Every call must have compile-time constant arguments; the compiler runs
+    the Python body and emits the result as a C constant.  The function
+    itself is not compiled.  On the PC it is an ordinary function.
+    """
+    func._comptime = True
+    return func
+
+def unroll(n: int):
+    """
+    Decorator asking the compiler to unroll the innermost loops n times
+
+    Usage:
+        @unroll(4)
+        def fir(out: Array[int32_t, 64], x: Array[int16_t, 67]):
+            ...
+
+    Iterations left over when the trip count is not a multiple of n run in
+    a remainder loop.  ``@unroll(1)`` keeps every loop rolled.  A single
+    loop is controlled with a ``# @unroll(n)`` comment on the line above
+    it.  On the PC the function is unchanged.
+    """
+    def decorator(func):
+        func._unroll = n
+        return func
+    return decorator
+
+def pure(func):
+    """
+    Decorator declaring that a function has no side effects
+
+    Usage:
+        @pure
+        def read_table(idx: int) -> int:
+            '''
+            __C_CODE__
+            return table[idx & 0xFF];
+            '''
+
+    The compiler cannot see into ``__C_CODE__`` bodies, so it trusts the
+    decorator there; a Python body is checked and a side effect is a
+    compile error.  Repeated calls with the same arguments are evaluated
+    once.  On the PC the function is unchanged.
+    """
+    func._pure = True
+    return func
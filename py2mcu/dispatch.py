@@ -0,0 +1,151 @@
+"""
+Integer dispatch: if/elif chains, match statements and membership tests
+"""
+import ast
+from typing import Dict, List, Optional, Tuple
+
+from py2mcu.analysis import eval_const_int
+
+# if/elif chains testing at least this many values become a switch
+SWITCH_MIN_VALUES = 3
+
+# Membership in a set of values below this bound is a bit test
+MASK_BITS = 32
+
+# (values, body) of one switch case; values are (int, source node) pairs
+Case = Tuple[List[Tuple[int, ast.AST]], List[ast.stmt]]
+
+
+def constant_values(node: ast.AST, constants: Dict[str, int]) -> Optional[List[Tuple[int, ast.AST]]]:
+    """Values of a constant int tuple/list/set literal, None otherwise"""
+    if not isinstance(node, (ast.Tuple, ast.List, ast.Set)) or not node.elts:
+        return None
+    values = [(eval_const_int(elt, constants), elt) for elt in node.elts]
+    if any(value is None for value, _ in values):
+        return None
+    return values
+
+
+def equality_test(test: ast.AST, constants: Dict[str, int]) -> Optional[Tuple[ast.AST, list]]:
+    """(subject, values) for ``x == C``, ``C == x``, ``x in (C, ...)`` and ``or`` of those"""
+    if isinstance(test, ast.BoolOp) and isinstance(test.op, ast.Or):
+        parts = [equality_test(value, constants) for value in test.values]
+        if any(part is None for part in parts):
+            return None
+        subject = parts[0][0]
+        if any(ast.dump(part[0]) != ast.dump(subject) for part in parts):
+            return None
+        return subject, [value for part in parts for value in part[1]]
+    if not isinstance(test, ast.Compare) or len(test.ops) != 1:
+        return None
+    left, right, op = test.left, test.comparators[0], test.ops[0]
+    if isinstance(op, ast.In):
+        values = constant_values(right, constants)
+        return (left, values) if values is not None else None
+    if not isinstance(op, ast.Eq):
+        return None
+    value = eval_const_int(right, constants)
+    if value is not None:
+        return left, [(value, right)]
+    value = eval_const_int(left, constants)
+    if value is not None:
+        return right, [(value, left)]
+    return None
+
+
+def if_chain_cases(node: ast.If, constants: Dict[str, int]) -> Optional[Tuple[ast.AST, List[Case], list]]:
+    """(subject, cases, else body) when every test of an if/elif chain compares one subject"""
+    subject = None
+    cases: List[Case] = []
+    current = node
+    while True:
+        test = equality_test(current.test, constants)
+        if test is None or (subject is not None and ast.dump(test[0]) != ast.dump(subject)):
+            return None
+        subject = test[0]
+        cases.append((test[1], current.body))
+        if len(current.orelse) == 1 and isinstance(current.orelse[0], ast.If):
+            current = current.orelse[0]
+        else:
+            return subject, cases, current.orelse
+
+
+def match_cases(node: ast.AST, constants: Dict[str, int]) -> Tuple[List[Case], Optional[list]]:
+    """(cases, default body) of a match statement on integer constants
+
+    Raises ValueError for patterns that are not integer constants or ``_``.
+    """
+    cases: List[Case] = []
+    default = None
+    for case in node.cases:
+        if case.guard is not None:
+            raise ValueError("match cases with guards are not supported")
+        values = _pattern_values(case.pattern, constants)
+        if values is None:
+            default = case.body
+            break  # later cases are unreachable
+        cases.append((values, case.body))
+    return cases, default
+
+
+def _pattern_values(pattern: ast.AST, constants: Dict[str, int]) -> Optional[list]:
+    """Values matched by pattern; None for the wildcard"""
+    if isinstance(pattern, ast.MatchAs) and pattern.pattern is None:
+        if pattern.name is not None:
+            raise ValueError(f"capture pattern '{pattern.name}' is not supported")
+        return None
+    if isinstance(pattern, ast.MatchValue):
+        value = eval_const_int(pattern.value, constants)
+        if value is not None:
+            return [(value, pattern.value)]
+    if isinstance(pattern, ast.MatchSingleton) and isinstance(pattern.value, bool):
+        return [(int(pattern.value), pattern)]
+    if isinstance(pattern, ast.MatchOr):
+        values = []
+        for alternative in pattern.patterns:
+            part = _pattern_values(alternative, constants)
+            if part is None:
+                return None
+            values.extend(part)
+        return values
+    raise ValueError("match patterns must be integer constants, '|' of constants or '_'")
+
+
+def first_match_only(cases: List[Case]) -> List[Case]:
+    """Drop values already taken by an earlier case (Python picks the first match)"""
+    seen = set()
+    result = []
+    for values, body in cases:
+        kept = []
+        for value, source in values:
+            if value not in seen:
+                seen.add(value)
+                kept.append((value, source))
+        if kept:
+            result.append((kept, body))
+    return result
+
+
+def contains_loop_break(stmts: List[ast.stmt]) -> bool:
+    """True if a break in stmts would leave an enclosing loop (it would leave a C switch)"""
+    for stmt in stmts:
+        if isinstance(stmt, ast.Break):
+            return True
+        if isinstance(stmt, (ast.For, ast.While, ast.AsyncFor, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        blocks = [getattr(stmt, field, None) for field in ('body', 'orelse', 'finalbody')]
+        blocks += [handler.body for handler in getattr(stmt, 'handlers', ())]
+        blocks += [case.body for case in getattr(stmt, 'cases', ())]
+        if any(isinstance(block, list) and contains_loop_break(block) for block in blocks):
+            return True
+    return False
+
+
+def membership_mask(values: List[int]) -> Optional[int]:
+    """Bit mask for a membership test if every value is a bit position"""
+    if all(0 <= value < MASK_BITS for value in values):
+        mask = 0
+        for value in values:
+            mask |= 1 << value
+        return mask
+    return None
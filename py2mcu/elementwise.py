@@ -0,0 +1,170 @@
+"""
+Whole-array (NumPy style) expressions
+
+``out[:] = a * gain + b`` on typed arrays, views and slices is evaluated
+element by element in one C loop: every array operand is read at the
+loop index, scalars are used as they are and no temporary array is made.
+On the PC the same source runs with NumPy arrays, so this module also
+rewrites the NumPy spellings the compiler understands (``np.zeros``,
+``np.array``, ``np.sum``, ``np.dot``, ...) to their builtin equivalents.
+"""
+import ast
+from typing import Dict, List, Optional, Set
+
+# np.<name>(...) -> builtin of the same meaning
+NUMPY_BUILTINS = {'sum': 'sum', 'min': 'min', 'max': 'max', 'amin': 'min', 'amax': 'max',
+                  'any': 'any', 'all': 'all', 'abs': 'abs', 'absolute': 'abs'}
+# np.<name>(n, ...) -> [fill] * n
+NUMPY_FILLS = {'zeros': 0, 'ones': 1, 'empty': 0}
+
+# Comparisons that work element-wise on arrays (not in, not is)
+ELEMENTWISE_COMPARES = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# CMSIS-DSP functions for ``out[:] = <pattern>``, by element type
+CMSIS_BINARY = {
+    'add': ('float', 'q15_t', 'q31_t'),
+    'sub': ('float', 'q15_t', 'q31_t'),
+    'mult': ('float',),
+}
+CMSIS_SCALAR = {'scale': ('float',), 'offset': ('float',)}
+CMSIS_UNARY = {'negate': ('float', 'q15_t', 'q31_t'), 'abs': ('float',)}
+CMSIS_SUFFIX = {'float': 'f32', 'q15_t': 'q15', 'q31_t': 'q31'}
+
+
+def numpy_names(tree: ast.Module) -> Set[str]:
+    """Names NumPy is imported as (``import numpy as np`` gives {'np'})"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.asname or alias.name for alias in node.names if alias.name == 'numpy')
+    return names
+
+
+class NumpyRewriter(ast.NodeTransformer):
+    """
+    Rewrite NumPy calls to the builtins the code generator lowers
+
+        np.zeros(n) / np.ones(n) / np.full(n, v)   [0] * n / [1] * n / [v] * n
+        np.array([...])                            [...]
+        np.sum(x), np.max(x), np.abs(x), ...       sum(x), max(x), abs(x), ...
+        np.dot(a, b)                               sum(a * b)
+
+    dtype= and other keywords are dropped: the element type comes from
+    the ``Array[T, N]`` annotation.
+    """
+
+    def __init__(self, names: Set[str]):
+        self.names = names
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+        func = node.func
+        if not (isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in self.names):
+            return node
+        name, args = func.attr, node.args
+        if name in NUMPY_FILLS and len(args) == 1 and not isinstance(args[0], ast.Tuple):
+            return self._repeat(node, ast.Constant(value=NUMPY_FILLS[name]), args[0])
+        if name == 'full' and len(args) == 2 and not isinstance(args[0], ast.Tuple):
+            return self._repeat(node, args[1], args[0])
+        if name in ('array', 'asarray') and len(args) == 1 and isinstance(args[0], ast.List):
+            return args[0]
+        if name in NUMPY_BUILTINS and len(args) == 1 and not node.keywords:
+            return self._call(node, NUMPY_BUILTINS[name], args)
+        if name == 'dot' and len(args) == 2 and not node.keywords:
+            product = ast.copy_location(ast.BinOp(left=args[0], op=ast.Mult(), right=args[1]), node)
+            return self._call(node, 'sum', [product])
+        return node
+
+    @staticmethod
+    def _repeat(node: ast.Call, value: ast.expr, count: ast.expr) -> ast.AST:
+        items = ast.copy_location(ast.List(elts=[ast.copy_location(value, node)], ctx=ast.Load()), node)
+        return ast.fix_missing_locations(ast.copy_location(ast.BinOp(left=items, op=ast.Mult(), right=count), node))
+
+    @staticmethod
+    def _call(node: ast.Call, name: str, args: List[ast.expr]) -> ast.AST:
+        func = ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node.func)
+        return ast.copy_location(ast.Call(func=func, args=args, keywords=[]), node)
+
+
+def rewrite_numpy(tree: ast.Module) -> Set[str]:
+    """Rewrite tree's NumPy calls in place; returns the names NumPy is imported as"""
+    names = numpy_names(tree)
+    if names:
+        NumpyRewriter(names).visit(tree)
+    return names
+
+
+def array_elem(c_type: Optional[str], views: Dict[str, str]) -> Optional[str]:
+    """Element type of an array (``T*``) or view C type, else None"""
+    if c_type in views:
+        return views[c_type]
+    if c_type and c_type.endswith('*') and c_type not in ('const char*', 'char*'):
+        return c_type[:-1].strip()
+    return None
+
+
+def repeats_list(node: ast.BinOp) -> bool:
+    """``[v] * n`` and friends: list and string operations, not element-wise ones"""
+    return any(isinstance(side, (ast.List, ast.Tuple)) or
+               (isinstance(side, ast.Constant) and isinstance(side.value, (str, bytes)))
+               for side in (node.left, node.right))
+
+
+def is_array_expr(node: ast.AST, views: Dict[str, str]) -> bool:
+    """An element-wise operation (not a plain array, view or slice) producing an array"""
+    if not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call)):
+        return False
+    if isinstance(node, ast.Call) and not is_elementwise_call(node):
+        return False
+    return array_elem(getattr(node, 'c_type', None), views) is not None
+
+
+def is_elementwise_call(node: ast.Call) -> bool:
+    return isinstance(node.func, ast.Name) and node.func.id == 'abs' and len(node.args) == 1 and not node.keywords
+
+
+def is_array_leaf(node: ast.AST, views: Dict[str, str]) -> bool:
+    """A whole array, view or slice read as an operand of an element-wise expression"""
+    if array_elem(getattr(node, 'c_type', None), views) is None:
+        return False
+    return isinstance(node, ast.Name) or (isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice))
+
+
+def operand_names(node: ast.AST) -> List[ast.Name]:
+    """Name nodes an expression reads (not called functions), first occurrence of each"""
+    called = {id(child.func) for child in ast.walk(node) if isinstance(child, ast.Call)}
+    seen, names = set(), []
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and id(child) not in called and child.id not in seen:
+            seen.add(child.id)
+            names.append(child)
+    return names
+
+
+def cmsis_pattern(node: ast.AST, views: Dict[str, str]):
+    """(CMSIS function stem, array operands, scalar operand or None) of a pattern CMSIS-DSP implements"""
+    leaf = lambda child: is_array_leaf(child, views)  # noqa: E731
+    if isinstance(node, ast.BinOp):
+        left, right = node.left, node.right
+        names = {ast.Add: 'add', ast.Sub: 'sub', ast.Mult: 'mult'}
+        if type(node.op) in names and leaf(left) and leaf(right):
+            return names[type(node.op)], [left, right], None
+        if isinstance(node.op, (ast.Add, ast.Mult)):
+            stem = 'offset' if isinstance(node.op, ast.Add) else 'scale'
+            if leaf(left) and not leaf(right) and array_elem(getattr(right, 'c_type', None), views) is None:
+                return stem, [left], right
+            if leaf(right) and not leaf(left) and array_elem(getattr(left, 'c_type', None), views) is None:
+                return stem, [right], left
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and leaf(node.operand):
+        return 'negate', [node.operand], None
+    if isinstance(node, ast.Call) and is_elementwise_call(node) and leaf(node.args[0]):
+        return 'abs', [node.args[0]], None
+    return None
+
+
+def cmsis_function(stem: str, elem_type: str) -> Optional[str]:
+    """``arm_<stem>_<f32|q15|q31>`` if CMSIS-DSP has it for elem_type"""
+    for table in (CMSIS_BINARY, CMSIS_SCALAR, CMSIS_UNARY):
+        if stem in table:
+            return f"arm_{stem}_{CMSIS_SUFFIX[elem_type]}" if elem_type in table[stem] else None
+    return None
@@ -0,0 +1,23 @@
+"""
+Compiler diagnostics
+"""
+from typing import Optional
+
+
+class CompileError(Exception):
+    """Error in the Python source that prevents generating C code
+
+    The message is formatted like a C compiler diagnostic
+    (``file.py:12: error: ...``) so editors can jump to the line.
+    """
+
+    def __init__(self, message: str, lineno: Optional[int] = None, filename: str = '<string>'):
+        self.message = message
+        self.lineno = lineno
+        self.filename = filename
+        super().__init__(str(self))
+
+    def __str__(self) -> str:
+        if self.lineno is not None:
+            return f"{self.filename}:{self.lineno}: error: {self.message}"
+        return f"{self.filename}: error: {self.message}"
@@ -0,0 +1,136 @@
+"""
+Fixed-point formats shared by the code generator and the PC simulation
+"""
+import ast
+import math
+import struct
+from typing import Dict, Optional
+
+# Integer storage and intermediate (double-width) type per total bit width
+STORAGE_TYPES = {8: ('int8_t', 'int16_t'), 16: ('int16_t', 'int32_t'), 32: ('int32_t', 'int64_t')}
+
+
+class FixedFormat:
+    """Signed two's complement Q format with int_bits (including sign) and frac_bits
+
+    All arithmetic saturates.  Multiplication truncates toward minus infinity
+    (arithmetic shift), division truncates toward zero like C.
+    """
+
+    def __init__(self, int_bits: int, frac_bits: int, name: Optional[str] = None):
+        self.int_bits = int_bits
+        self.frac_bits = frac_bits
+        self.bits = int_bits + frac_bits
+        if self.bits not in STORAGE_TYPES or int_bits < 1 or frac_bits < 0:
+            raise ValueError(f"Fixed[{int_bits}, {frac_bits}] must be 8, 16 or 32 bits wide with a sign bit")
+        self.name = name or f"fix{int_bits}_{frac_bits}"
+        self.c_type = f"{self.name}_t"
+        self.storage_type, self.wide_type = STORAGE_TYPES[self.bits]
+        self.min = -(1 << (self.bits - 1))
+        self.max = (1 << (self.bits - 1)) - 1
+        self.scale = 1 << frac_bits
+
+    def __repr__(self):
+        return f"FixedFormat({self.name})"
+
+    def __eq__(self, other):
+        return isinstance(other, FixedFormat) and (self.int_bits, self.frac_bits) == (other.int_bits, other.frac_bits)
+
+    def __hash__(self):
+        return hash((self.int_bits, self.frac_bits))
+
+    # -- raw value arithmetic (mirrors runtime/py2mcu_fixed.h) -----------------
+
+    def saturate(self, raw: int) -> int:
+        return max(self.min, min(self.max, raw))
+
+    def from_int(self, value: int) -> int:
+        return self.saturate(value << self.frac_bits)
+
+    def from_float(self, value: float) -> int:
+        """Round half away from zero"""
+        scaled = value * self.scale
+        if math.isnan(scaled):
+            return 0
+        if math.isinf(scaled):
+            return self.max if scaled > 0 else self.min
+        rounded = math.floor(scaled + 0.5) if scaled >= 0 else math.ceil(scaled - 0.5)
+        return self.saturate(int(rounded))
+
+    def to_float(self, raw: int) -> float:
+        """Single precision like the C helper (exact up to 24 significant bits)"""
+        return struct.unpack('f', struct.pack('f', raw))[0] / self.scale
+
+    def to_int(self, raw: int) -> int:
+        return _c_div(raw, self.scale)
+
+    def add(self, a: int, b: int) -> int:
+        return self.saturate(a + b)
+
+    def sub(self, a: int, b: int) -> int:
+        return self.saturate(a - b)
+
+    def neg(self, a: int) -> int:
+        return self.saturate(-a)
+
+    def mul(self, a: int, b: int) -> int:
+        return self.saturate((a * b) >> self.frac_bits)
+
+    def mul_int(self, a: int, n: int) -> int:
+        return self.saturate(a * n)
+
+    def div(self, a: int, b: int) -> int:
+        if b == 0:
+            return self.max if a >= 0 else self.min
+        return self.saturate(_c_div(a << self.frac_bits, b))
+
+    def div_int(self, a: int, n: int) -> int:
+        if n == 0:
+            return self.max if a >= 0 else self.min
+        return self.saturate(_c_div(a, n))
+
+
+def _c_div(a: int, b: int) -> int:
+    """Integer division truncating toward zero (C semantics)"""
+    quotient = abs(a) // abs(b)
+    return quotient if (a >= 0) == (b >= 0) else -quotient
+
+
+Q15 = FixedFormat(1, 15, 'q15')
+Q31 = FixedFormat(1, 31, 'q31')
+NAMED_FORMATS = {'q15': Q15, 'q31': Q31}
+
+# C type name -> format, for every format seen by format_for()
+_formats_by_c_type: Dict[str, FixedFormat] = {Q15.c_type: Q15, Q31.c_type: Q31}
+
+
+def format_for(int_bits: int, frac_bits: int) -> FixedFormat:
+    """The FixedFormat for Fixed[int_bits, frac_bits]; q15/q31 keep their names"""
+    for fmt in NAMED_FORMATS.values():
+        if (fmt.int_bits, fmt.frac_bits) == (int_bits, frac_bits):
+            return fmt
+    fmt = FixedFormat(int_bits, frac_bits)
+    _formats_by_c_type[fmt.c_type] = fmt
+    return fmt
+
+
+def format_of_c_type(c_type: Optional[str]) -> Optional[FixedFormat]:
+    return _formats_by_c_type.get(c_type) if c_type else None
+
+
+def annotation_format(node: Optional[ast.AST]) -> Optional[FixedFormat]:
+    """Format named by a ``q15``/``q31``/``Fixed[I, F]`` annotation or constructor
+
+    Raises ValueError for a Fixed[...] with unsupported widths.
+    """
+    if isinstance(node, ast.Name):
+        return NAMED_FORMATS.get(node.id)
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == 'Fixed':
+        slice_node = node.slice
+        if hasattr(ast, 'Index') and isinstance(slice_node, ast.Index):
+            slice_node = slice_node.value
+        params = slice_node.elts if isinstance(slice_node, ast.Tuple) else [slice_node]
+        if len(params) != 2 or not all(isinstance(p, ast.Constant) and isinstance(p.value, int) for p in params):
+            raise ValueError("Fixed[...] takes two integer constants: Fixed[int_bits, frac_bits]")
+        return format_for(params[0].value, params[1].value)
+    return None
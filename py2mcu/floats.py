@@ -0,0 +1,61 @@
+"""
+Single-precision float lowering helpers
+"""
+import math
+import re
+from typing import Optional
+
+# math.<name> -> single-precision libm function
+MATH_FUNCTIONS = {
+    'sqrt': 'sqrtf', 'sin': 'sinf', 'cos': 'cosf', 'tan': 'tanf',
+    'asin': 'asinf', 'acos': 'acosf', 'atan': 'atanf', 'atan2': 'atan2f',
+    'sinh': 'sinhf', 'cosh': 'coshf', 'tanh': 'tanhf',
+    'exp': 'expf', 'log': 'logf', 'log10': 'log10f', 'log2': 'log2f',
+    'pow': 'powf', 'fabs': 'fabsf', 'fmod': 'fmodf', 'hypot': 'hypotf',
+    'copysign': 'copysignf', 'floor': 'floorf', 'ceil': 'ceilf', 'trunc': 'truncf',
+}
+
+# math.<name> predicates mapped to the C99 classification macros
+MATH_MACROS = {'isnan': 'isnan', 'isinf': 'isinf', 'isfinite': 'isfinite'}
+
+MATH_CONSTANTS = {'pi': math.pi, 'e': math.e, 'tau': math.tau, 'inf': math.inf, 'nan': math.nan}
+
+_FLOAT_TOKEN = re.compile(
+    r'(?<![\w.])(?:(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|\d+[eE][-+]?\d+)(?![\w.])')
+
+
+# Largest finite single-precision value (FLT_MAX)
+FLOAT_MAX = 3.4028234663852886e+38
+
+
+def fits_float(value: float, double: bool = False) -> bool:
+    """True if value is finite in single precision (double precision if double)"""
+    return math.isfinite(value) and (double or abs(value) <= FLOAT_MAX)
+
+
+def float_literal(value: float, double: bool = False) -> str:
+    """C literal for a Python float; single precision unless double"""
+    if math.isnan(value):
+        return 'NAN'
+    if math.isinf(value):
+        return 'INFINITY' if value > 0 else '-INFINITY'
+    text = repr(value)
+    if '.' not in text and 'e' not in text:
+        text += '.0'
+    return text if double else f"{text}f"
+
+
+def suffix_float_literals(text: str) -> str:
+    """Add the f suffix to every float literal in a C expression string"""
+    return _FLOAT_TOKEN.sub(lambda match: match.group(0) + 'f', text)
+
+
+def exact_reciprocal(value: float) -> Optional[float]:
+    """1/value if it is exactly representable in single precision"""
+    if value == 0 or math.isinf(value) or math.isnan(value):
+        return None
+    mantissa, _ = math.frexp(abs(value))
+    if mantissa != 0.5:
+        return None  # not a power of two
+    reciprocal = 1.0 / value
+    return reciprocal if abs(reciprocal) >= 2.0 ** -126 else None
@@ -0,0 +1,229 @@
+"""
+Loop idioms: fill, copy, compare and reduction loops over arrays
+
+A counted loop
+
+    while i < n:
+        <one statement>
+        i = i + 1
+
+whose statement has one of the shapes below becomes a library call
+(memset, memcpy, memcmp) or a kernel of runtime/py2mcu_loops.h.  This
+module only matches syntax; the code generator checks the types and falls
+back to the plain loop when they do not fit.
+
+    dst[i] = value                      fill
+    dst[i] = src[i]                     copy
+    total = total + src[i]              sum (also +=)
+    if src[i] > best: best = src[i]     max (< for min, also best = max(best, src[i]))
+    if a[i] != b[i]: ...; break         compare (i must be dead after the loop)
+"""
+import ast
+from typing import Dict, List, NamedTuple, Optional
+
+from py2mcu.containers import SHORT_NAMES
+from py2mcu.fixed import format_of_c_type
+
+# Element types the kernels are defined for (fixed-point sums saturate, so they stay loops)
+KERNEL_TYPES = ('int8_t', 'uint8_t', 'int16_t', 'uint16_t', 'int32_t', 'uint32_t',
+                'int64_t', 'uint64_t', 'bool', 'float', 'double')
+
+
+class Idiom(NamedTuple):
+    """A recognized loop"""
+    kind: str                     # fill, copy, compare, sum, min or max
+    index: str                    # the loop counter
+    stop: ast.expr                # loop bound (not changed by the loop)
+    target: ast.expr              # dst array (fill, copy), a (compare) or the accumulator Name
+    source: ast.expr              # fill value, src array or b (compare)
+    on_mismatch: List[ast.stmt]   # compare: the statements before the break
+
+
+def short_name(c_type: str) -> str:
+    """u8, i32, f32, q15, ... for kernel names"""
+    fmt = format_of_c_type(c_type)
+    return fmt.name if fmt is not None else SHORT_NAMES.get(c_type, c_type)
+
+
+def _index_of(node: ast.AST) -> Optional[ast.AST]:
+    value = node.slice
+    if hasattr(ast, 'Index') and isinstance(value, ast.Index):
+        value = value.value
+    return value
+
+
+def _element(node: ast.AST, index: str) -> Optional[ast.Name]:
+    """The array of ``array[index]``, else None"""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        sub = _index_of(node)
+        if isinstance(sub, ast.Name) and sub.id == index:
+            return node.value
+    return None
+
+
+def _mentions(node: ast.AST, name: str) -> bool:
+    return any(isinstance(child, ast.Name) and child.id == name for child in ast.walk(node))
+
+
+def _stored_names(stmts: List[ast.stmt]) -> set:
+    return {node.id for stmt in stmts for node in ast.walk(stmt)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)}
+
+
+def is_invariant(node: ast.AST, stored: set) -> bool:
+    """node reads only names the loop does not assign, and calls at most len()"""
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and child.id in stored:
+            return False
+        if isinstance(child, ast.Call) and not (isinstance(child.func, ast.Name) and child.func.id == 'len'):
+            return False
+        if isinstance(child, (ast.Subscript, ast.NamedExpr)):
+            return False  # array elements may be written by the loop
+    return True
+
+
+def _is_increment(stmt: ast.stmt, index: str) -> bool:
+    if isinstance(stmt, ast.AugAssign):
+        target, op, step = stmt.target, stmt.op, stmt.value
+    elif (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.value, ast.BinOp)
+          and isinstance(stmt.value.left, ast.Name) and stmt.value.left.id == index):
+        target, op, step = stmt.targets[0], stmt.value.op, stmt.value.right
+    else:
+        return False
+    return (isinstance(target, ast.Name) and target.id == index and isinstance(op, ast.Add)
+            and isinstance(step, ast.Constant) and step.value == 1 and not isinstance(step.value, bool))
+
+
+def _reduction(stmt: ast.stmt, index: str) -> Optional[tuple]:
+    """(kind, accumulator, source array) of a sum/min/max statement"""
+    if isinstance(stmt, ast.AugAssign) and isinstance(stmt.op, ast.Add) and isinstance(stmt.target, ast.Name):
+        source = _element(stmt.value, index)
+        return ('sum', stmt.target, source) if source is not None else None
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name):
+        acc, value = stmt.targets[0], stmt.value
+        operands = None
+        if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add):
+            kind, operands = 'sum', [value.left, value.right]
+        elif (isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id in ('min', 'max')
+              and len(value.args) == 2 and not value.keywords):
+            kind, operands = value.func.id, value.args
+        if operands is None:
+            return None
+        for mine, other in (operands, operands[::-1]):
+            if isinstance(mine, ast.Name) and mine.id == acc.id and _element(other, index) is not None:
+                return kind, acc, _element(other, index)
+        return None
+    if (isinstance(stmt, ast.If) and not stmt.orelse and len(stmt.body) == 1
+            and isinstance(stmt.test, ast.Compare) and len(stmt.test.ops) == 1):
+        assign = stmt.body[0]
+        left, op, right = stmt.test.left, stmt.test.ops[0], stmt.test.comparators[0]
+        if not (isinstance(assign, ast.Assign) and len(assign.targets) == 1 and isinstance(assign.targets[0], ast.Name)):
+            return None
+        acc = assign.targets[0]
+        source = _element(assign.value, index)
+        if source is None:
+            return None
+        greater = isinstance(op, (ast.Gt, ast.GtE))
+        if not (greater or isinstance(op, (ast.Lt, ast.LtE))):
+            return None
+        if ast.dump(left) == ast.dump(assign.value) and isinstance(right, ast.Name) and right.id == acc.id:
+            return ('max' if greater else 'min'), acc, source       # if src[i] > best: best = src[i]
+        if ast.dump(right) == ast.dump(assign.value) and isinstance(left, ast.Name) and left.id == acc.id:
+            return ('min' if greater else 'max'), acc, source       # if best > src[i]: best = src[i]
+    return None
+
+
+def _compare(stmt: ast.stmt, index: str) -> Optional[tuple]:
+    """(a, b, statements before break) of ``if a[i] != b[i]: ...; break``"""
+    if not (isinstance(stmt, ast.If) and not stmt.orelse and isinstance(stmt.test, ast.Compare)
+            and len(stmt.test.ops) == 1 and isinstance(stmt.test.ops[0], ast.NotEq)):
+        return None
+    a, b = _element(stmt.test.left, index), _element(stmt.test.comparators[0], index)
+    body = stmt.body
+    if a is None or b is None or a.id == b.id or not body or not isinstance(body[-1], ast.Break):
+        return None
+    simple = (ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Expr, ast.Return)
+    if any(not isinstance(s, simple) or _mentions(s, index) for s in body[:-1]):
+        return None
+    return a, b, body[:-1]
+
+
+def loop_idiom(node: ast.While) -> Optional[Idiom]:
+    """The idiom of a counted while loop, None for any other loop"""
+    test = node.test
+    if (node.orelse or len(node.body) != 2 or not isinstance(test, ast.Compare) or len(test.ops) != 1
+            or not isinstance(test.ops[0], ast.Lt) or not isinstance(test.left, ast.Name)):
+        return None
+    index, stop = test.left.id, test.comparators[0]
+    stmt, step = node.body
+    stored = _stored_names(node.body)
+    if not _is_increment(step, index) or not is_invariant(stop, stored):
+        return None
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+        dst = _element(stmt.targets[0], index)
+        if dst is not None:
+            src = _element(stmt.value, index)
+            if src is not None and src.id != dst.id:
+                return Idiom('copy', index, stop, dst, src, [])
+            if is_invariant(stmt.value, stored) and not _mentions(stmt.value, dst.id):
+                return Idiom('fill', index, stop, dst, stmt.value, [])
+            return None
+    reduction = _reduction(stmt, index)
+    if reduction is not None:
+        kind, acc, source = reduction
+        if acc.id not in (index, source.id) and not _mentions(stop, acc.id):
+            return Idiom(kind, index, stop, acc, source, [])
+        return None
+    compare = _compare(stmt, index)
+    if compare is not None:
+        a, b, body = compare
+        return Idiom('compare', index, stop, a, b, body)
+    return None
+
+
+def _dead_after(name: str, rest: list) -> bool:
+    """True if name is assigned before it is read in the statements that follow
+
+    rest lists the blocks that run next, innermost first; None stands for
+    the back edge of an enclosing loop (where the name may be read again).
+    """
+    for block in rest:
+        if block is None:
+            return False
+        for stmt in block:
+            if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+                    and stmt.targets[0].id == name and not _mentions(stmt.value, name)):
+                return True
+            if _mentions(stmt, name):
+                return False
+    return True
+
+
+def find_loop_idioms(func: ast.FunctionDef) -> Dict[int, Idiom]:
+    """id(while node) -> idiom for the recognized loops of func"""
+    found: Dict[int, Idiom] = {}
+
+    def scan(stmts: List[ast.stmt], after: list):
+        for k, stmt in enumerate(stmts):
+            rest = [stmts[k + 1:]] + after
+            if isinstance(stmt, ast.While):
+                idiom = loop_idiom(stmt)
+                if idiom is not None and (idiom.kind != 'compare' or _dead_after(idiom.index, rest)):
+                    found[id(stmt)] = idiom
+                scan(stmt.body, [None] + rest)
+                scan(stmt.orelse, rest)
+            elif isinstance(stmt, (ast.For, ast.AsyncFor)):
+                scan(stmt.body, [None] + rest)
+                scan(stmt.orelse, rest)
+            elif not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                for field in ('body', 'orelse', 'finalbody'):
+                    block = getattr(stmt, field, None)
+                    if isinstance(block, list):
+                        scan(block, rest)
+                for handler in getattr(stmt, 'handlers', ()):
+                    scan(handler.body, rest)
+                for case in getattr(stmt, 'cases', ()):
+                    scan(case.body, rest)
+
+    scan(func.body, [])
+    return found
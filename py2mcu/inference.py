@@ -0,0 +1,639 @@
+"""
+Flow-sensitive type inference: attach a C type to every expression
+"""
+import ast
+import os
+from typing import Dict, List, Optional, Tuple
+
+from py2mcu.analysis import eval_const_int, function_has_c_body
+from py2mcu.elementwise import ELEMENTWISE_COMPARES, array_elem, repeats_list
+from py2mcu.fixed import NAMED_FORMATS, annotation_format, format_of_c_type
+from py2mcu.matrices import NUMPY_FILLS, fill_shape, matrix_call, result_shape, transposed
+from py2mcu.structs import constant_format, from_bytes_type, is_from_bytes, parse_format, struct_call, values
+from py2mcu.tables import lut_result_annotation
+from py2mcu.parser import parse_python_file
+from py2mcu.views import nominal_length
+
+# Integer C types as (bits, signed)
+INT_TYPES = {
+    'bool': (1, False), 'char': (8, True),
+    'int8_t': (8, True), 'uint8_t': (8, False),
+    'int16_t': (16, True), 'uint16_t': (16, False),
+    'int32_t': (32, True), 'uint32_t': (32, False),
+    'int64_t': (64, True), 'uint64_t': (64, False),
+}
+FLOAT_TYPES = ('float', 'double')
+
+# Return types of builtins whose result does not depend on the arguments
+BUILTIN_RESULTS = {
+    'len': 'int32_t', 'int': 'int32_t', 'round': 'int32_t', 'ord': 'int32_t',
+    'hash': 'int32_t', 'float': 'float', 'bool': 'bool', 'chr': 'char',
+    'str': 'const char*', 'hex': 'const char*', 'bin': 'const char*',
+    'isinstance': 'bool', 'callable': 'bool',
+}
+
+# math functions returning int in Python; every other math.* returns float
+MATH_INT_RESULTS = {'floor', 'ceil', 'trunc', 'gcd', 'factorial', 'isqrt', 'comb', 'perm'}
+MATH_BOOL_RESULTS = {'isnan', 'isinf', 'isfinite', 'isclose'}
+
+# Imported module path -> (mtime, {function: return C type})
+_module_signature_cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
+
+
+def is_int_type(c_type: Optional[str]) -> bool:
+    return c_type in INT_TYPES
+
+
+def convert_int(value: int, c_type: Optional[str]) -> int:
+    """value converted to int C type c_type as an assignment or a call would
+
+    Out-of-range values wrap modulo 2**bits, as C does for unsigned types
+    and GCC does for signed ones; bool is 1 for any non-zero value.
+    """
+    if c_type == 'bool':
+        return int(value != 0)
+    if c_type not in INT_TYPES:
+        return value
+    bits, signed = INT_TYPES[c_type]
+    value &= (1 << bits) - 1
+    if signed and value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+def is_float_type(c_type: Optional[str]) -> bool:
+    return c_type in FLOAT_TYPES
+
+
+def _int_type(bits: int, signed: bool) -> str:
+    bits = max(8, min(bits, 64))
+    return f"{'' if signed else 'u'}int{bits}_t"
+
+
+def is_fixed_type(c_type: Optional[str]) -> bool:
+    return format_of_c_type(c_type) is not None
+
+
+def join_types(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """Smallest C type able to hold values of both a and b"""
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if is_fixed_type(a) or is_fixed_type(b):
+        return a if is_fixed_type(a) else b  # numbers convert to the fixed format
+    if is_float_type(a) or is_float_type(b):
+        if (is_float_type(a) or is_int_type(a)) and (is_float_type(b) or is_int_type(b)):
+            return 'double' if 'double' in (a, b) else 'float'
+        return a
+    if not (is_int_type(a) and is_int_type(b)):
+        return a  # pointers/strings: the first binding decides
+    (a_bits, a_signed), (b_bits, b_signed) = INT_TYPES[a], INT_TYPES[b]
+    if a == 'bool' or b == 'bool':
+        return b if a == 'bool' else a
+    if a_signed == b_signed:
+        return _int_type(max(a_bits, b_bits), a_signed)
+    # Mixed signedness: a signed type wide enough for the unsigned operand
+    unsigned_bits = a_bits if not a_signed else b_bits
+    signed_bits = a_bits if a_signed else b_bits
+    return _int_type(max(signed_bits, unsigned_bits * 2), True)
+
+
+def arithmetic_type(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """Result type of a C binary arithmetic operator (usual conversions)"""
+    if a is None or b is None:
+        return a or b
+    if is_fixed_type(a) or is_fixed_type(b):
+        return a if is_fixed_type(a) else b
+    if is_float_type(a) or is_float_type(b):
+        return 'double' if 'double' in (a, b) else 'float'
+    if not (is_int_type(a) and is_int_type(b)):
+        return None
+    # Integer promotion, then the operand of higher rank wins; at equal
+    # rank the unsigned type wins
+    ranked = ['int32_t', 'uint32_t', 'int64_t', 'uint64_t']
+    a, b = (t if INT_TYPES[t][0] >= 32 else 'int32_t' for t in (a, b))
+    return max(a, b, key=ranked.index)
+
+
+class TypeInference:
+    """
+    Infer C types for a module
+
+    Statements are processed in program order and loops are iterated until
+    the environment is stable.  A local's C type (it has one declaration) is
+    the join of every type assigned to it; annotated locals keep their
+    annotation.  Afterwards every expression node gets a ``c_type``
+    attribute computed against the final environment.
+
+    Results:
+        locals:   function name -> {local variable: C type}
+        returns:  function name -> C return type (annotated or inferred)
+        globals:  module variable -> C type
+    """
+
+    MAX_PASSES = 8
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.source_dir = getattr(tree, '_source_dir', None)
+        self.functions = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+        self.locals: Dict[str, Dict[str, str]] = {}
+        self.returns: Dict[str, str] = {}
+        self.globals: Dict[str, str] = {}
+        self.imported: Dict[str, str] = {}          # imported function -> return type
+        self.module_aliases: Dict[str, Dict[str, str]] = {}  # import alias -> signatures
+        self._in_progress: set = set()
+
+    def run(self) -> 'TypeInference':
+        self._collect_imports()
+        self._collect_globals()
+        for name in self.functions:
+            self._infer_function(name)
+        self._annotate_module_level()
+        return self
+
+    # -- module scope ----------------------------------------------------------
+
+    def _collect_globals(self):
+        env: Dict[str, str] = {}
+        for node in self.tree.body:
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                if self.codegen._array_annotation(node.annotation) is not None or self.codegen._is_array_alloc(node):
+                    env[node.target.id] = self.codegen._array_elem_type(node) + '*'
+                else:
+                    env[node.target.id] = self.codegen._map_type(node.annotation)
+            elif isinstance(node, ast.Assign):
+                value_type = self._expr_type(node.value, env, annotate=False)
+                for target in node.targets:
+                    if isinstance(target, ast.Name) and value_type:
+                        env[target.id] = join_types(env.get(target.id), value_type)
+        for define in getattr(self.tree, 'py2mcu_defines', None) or []:
+            if define.get('type'):
+                env[define['name']] = define['type']
+        self.globals = env
+
+    def _annotate_module_level(self):
+        for node in self.tree.body:
+            if isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+                self._expr_type(node.value, self.globals, annotate=True)
+
+    # -- imports ---------------------------------------------------------------
+
+    def _collect_imports(self):
+        for node in self.tree.body:
+            if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                signatures = self._module_signatures(node.module)
+                for alias in node.names:
+                    if alias.name in signatures:
+                        self.imported[alias.asname or alias.name] = signatures[alias.name]
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    signatures = self._module_signatures(alias.name)
+                    if signatures:
+                        self.module_aliases[alias.asname or alias.name] = signatures
+
+    def _module_signatures(self, module: str) -> Dict[str, str]:
+        """Return types of a sibling module's functions, cached per file"""
+        if not self.source_dir:
+            return {}
+        path = os.path.join(self.source_dir, *module.split('.')) + '.py'
+        if not os.path.isfile(path):
+            return {}
+        mtime = os.path.getmtime(path)
+        cached = _module_signature_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        _module_signature_cache[path] = (mtime, {})  # breaks import cycles
+        tree = parse_python_file(path)
+        inference = TypeInference(self.codegen, tree)
+        inference._collect_imports()
+        inference._collect_globals()
+        signatures = {name: inference._return_type(name) for name in inference.functions}
+        _module_signature_cache[path] = (mtime, signatures)
+        return signatures
+
+    # -- functions -------------------------------------------------------------
+
+    def _return_type(self, name: str) -> str:
+        """Annotated return type, else inferred from the return statements"""
+        if name in self.returns:
+            return self.returns[name]
+        func = self.functions[name]
+        result = lut_result_annotation(func)
+        if result is not None:
+            self.returns[name] = self.codegen._map_type(result)
+            return self.returns[name]
+        if name in self._in_progress:
+            return 'int32_t'  # recursive call while inferring: assume int
+        self._infer_function(name)
+        return self.returns.get(name, 'void')
+
+    def _infer_function(self, name: str):
+        if name in self.locals or name in self._in_progress:
+            return
+        func = self.functions[name]
+        self._in_progress.add(name)
+        env, pinned = self._initial_env(func)
+        returned: Optional[str] = None
+        if not function_has_c_body(func):
+            for _ in range(self.MAX_PASSES):
+                before = dict(env)
+                returned = self._exec_block(func.body, env, pinned)
+                if env == before:
+                    break
+            for node in ast.walk(func):
+                if isinstance(node, ast.expr) and not isinstance(getattr(node, 'ctx', None), ast.Store):
+                    self._expr_type(node, env, annotate=True)
+        self._in_progress.discard(name)
+        params = {arg.arg for arg in func.args.args}
+        self.locals[name] = {var: c_type for var, c_type in env.items() if var not in params}
+        result = lut_result_annotation(func)
+        if result is not None:
+            self.returns[name] = self.codegen._map_type(result)
+        else:
+            self.returns[name] = returned or 'void'
+
+    def _initial_env(self, func: ast.FunctionDef) -> Tuple[Dict[str, str], set]:
+        env: Dict[str, str] = {}
+        pinned = set()
+        for arg in func.args.args:
+            env[arg.arg] = self.codegen._map_type(arg.annotation) if arg.annotation else 'int32_t'
+            pinned.add(arg.arg)
+        declared_global = set()
+        for node in ast.walk(func):
+            if isinstance(node, ast.Global):
+                declared_global.update(node.names)
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                if self.codegen._is_array_alloc(node) or self.codegen._array_annotation(node.annotation):
+                    env[node.target.id] = self.codegen._array_elem_type(node) + '*'
+                else:
+                    env[node.target.id] = self.codegen._map_type(node.annotation)
+                pinned.add(node.target.id)
+        for name in declared_global:
+            if name in self.globals:
+                env[name] = self.globals[name]
+            pinned.add(name)
+        return env, pinned
+
+    def _exec_block(self, stmts: List[ast.stmt], env: Dict[str, str], pinned: set) -> Optional[str]:
+        """Update env with the block's bindings; return the join of returned types"""
+        returned: Optional[str] = None
+        for stmt in stmts:
+            if isinstance(stmt, ast.Assign):
+                value_type = self._expr_type(stmt.value, env)
+                unpacked = self._unpack_types(stmt.value)
+                for target in stmt.targets:
+                    if unpacked is not None and isinstance(target, (ast.Tuple, ast.List)):
+                        for elt, elt_type in zip(target.elts, unpacked):
+                            self._bind(elt, elt_type, env, pinned)
+                    else:
+                        self._bind(target, value_type, env, pinned)
+            elif isinstance(stmt, ast.AugAssign):
+                current = env.get(stmt.target.id) if isinstance(stmt.target, ast.Name) else None
+                value_type = self._binop_type(stmt.op, current, self._expr_type(stmt.value, env))
+                self._bind(stmt.target, value_type, env, pinned)
+            elif isinstance(stmt, ast.AnnAssign):
+                if stmt.value is not None:
+                    self._expr_type(stmt.value, env)
+            elif isinstance(stmt, ast.Return):
+                if stmt.value is not None:
+                    returned = join_types(returned, self._expr_type(stmt.value, env))
+            elif isinstance(stmt, (ast.For, ast.AsyncFor)):
+                self._bind(stmt.target, self._iter_elem_type(stmt.iter, env), env, pinned)
+            elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+                for item in stmt.items:
+                    if item.optional_vars is not None:
+                        self._bind(item.optional_vars, None, env, pinned)
+            for field in ('body', 'orelse', 'finalbody'):
+                block = getattr(stmt, field, None)
+                if isinstance(block, list) and not isinstance(stmt, ast.FunctionDef):
+                    returned = join_types(returned, self._exec_block(block, env, pinned))
+            for handler in getattr(stmt, 'handlers', ()):
+                returned = join_types(returned, self._exec_block(handler.body, env, pinned))
+            for case in getattr(stmt, 'cases', ()):
+                returned = join_types(returned, self._exec_block(case.body, env, pinned))
+        return returned
+
+    def _bind(self, target: ast.AST, value_type: Optional[str], env: Dict[str, str], pinned: set):
+        if isinstance(target, ast.Name):
+            if target.id not in pinned and value_type and value_type != 'void':
+                env[target.id] = join_types(env.get(target.id), value_type)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind(elt, None, env, pinned)
+
+    def _iter_elem_type(self, node: ast.AST, env: Dict[str, str]) -> Optional[str]:
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'range':
+            return 'int32_t'
+        return self._elem_type(self._expr_type(node, env))
+
+    @staticmethod
+    def _elem_type(c_type: Optional[str]) -> Optional[str]:
+        if c_type in ('const char*', 'char*'):
+            return 'char'
+        if c_type and c_type.endswith('*'):
+            return c_type[:-1].strip()
+        return None
+
+    # -- expressions -----------------------------------------------------------
+
+    def _expr_type(self, node: ast.AST, env: Dict[str, str], annotate: bool = False) -> Optional[str]:
+        """C type of an expression; with annotate, store it as node.c_type"""
+        if annotate and hasattr(node, 'c_type'):
+            return node.c_type
+        c_type = self._compute_type(node, env, annotate)
+        if annotate and c_type:
+            node.c_type = c_type
+        return c_type
+
+    def _compute_type(self, node: ast.AST, env: Dict[str, str], annotate: bool) -> Optional[str]:
+        sub = lambda child: self._expr_type(child, env, annotate)  # noqa: E731
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, bool):
+                return 'bool'
+            if isinstance(value, int):
+                return 'int32_t' if -2 ** 31 <= value < 2 ** 31 else 'int64_t'
+            if isinstance(value, float):
+                return 'float'
+            if isinstance(value, str):
+                return 'const char*'
+            if isinstance(value, bytes):
+                return self.codegen._view_type('uint8_t')
+            return None
+        if isinstance(node, ast.Name):
+            return env.get(node.id) or self.globals.get(node.id)
+        if isinstance(node, ast.BinOp):
+            left, right = sub(node.left), sub(node.right)
+            matrix = self._matrix_type(node, [left, right])
+            if matrix:
+                return matrix
+            if not repeats_list(node):
+                elementwise = self._elementwise_type(node, [left, right])
+                if elementwise:
+                    return elementwise
+            result = self._binop_type(node.op, left, right)
+            value = eval_const_int(node, getattr(self.codegen, 'module_int_constants', {}))
+            if result == 'int32_t' and value is not None and not -2 ** 31 <= value < 2 ** 31:
+                # 1 << 31 is 2147483648 in Python
+                return 'uint32_t' if 0 <= value < 2 ** 32 else 'int64_t'
+            return result
+        if isinstance(node, ast.UnaryOp):
+            operand = sub(node.operand)
+            if isinstance(node.op, ast.Not):
+                return 'bool'
+            matrix = self._matrix_type(node, [operand])
+            if matrix:
+                return matrix
+            elementwise = self._elementwise_type(node, [operand])
+            if elementwise:
+                return elementwise
+            return arithmetic_type(operand, 'int32_t') if is_int_type(operand) else operand
+        if isinstance(node, ast.BoolOp):
+            types = [sub(value) for value in node.values]
+            return 'bool' if all(t == 'bool' for t in types) else self._join_all(types)
+        if isinstance(node, ast.Compare):
+            operands = [sub(node.left)] + [sub(comparator) for comparator in node.comparators]
+            return self._elementwise_type(node, operands) or 'bool'
+        if isinstance(node, ast.IfExp):
+            sub(node.test)
+            return join_types(sub(node.body), sub(node.orelse))
+        if isinstance(node, ast.Subscript):
+            sub(node.slice)
+            unpacked = self._unpack_types(node.value)
+            if unpacked is not None:
+                sub(node.value)
+                index = eval_const_int(node.slice, getattr(self.codegen, 'module_int_constants', {}))
+                return unpacked[index] if index is not None and -len(unpacked) <= index < len(unpacked) else None
+            table = self._const_dict(node.value)
+            if table is not None:
+                return table.c_type
+            container = self.codegen.containers.get(sub(node.value))
+            if container is not None:
+                return container.value_type
+            base = sub(node.value)
+            if base in self.codegen.matrices:
+                return self.codegen.matrices[base].elem_type
+            if isinstance(node.slice, ast.Slice):
+                return self._slice_type(base)
+            if base in self.codegen.views:
+                return self.codegen.views[base]
+            return self._elem_type(base)
+        if isinstance(node, ast.Call):
+            kind = matrix_call(node, getattr(self.codegen, 'numpy_names', ()))
+            matrix = self._matrix_call_type(node, kind, sub) if kind else None
+            if matrix:
+                return matrix
+            if isinstance(node.func, ast.Attribute):
+                container = self.codegen.containers.get(sub(node.func.value))
+                if container is not None:
+                    for arg in node.args:
+                        sub(arg)
+                    return container.method_type(node.func.attr)
+                if node.func.attr == 'copy' and sub(node.func.value) in self.codegen.views:
+                    return sub(node.func.value)
+            arg_types = [sub(arg) for arg in node.args]
+            for keyword in node.keywords:
+                sub(keyword.value)
+            return self._call_type(node, arg_types)
+        if isinstance(node, ast.Attribute):
+            matrix = self.codegen.matrices.get(sub(node.value))
+            if matrix is not None and node.attr == 'T':
+                return self.codegen._matrix_type(matrix.elem_type, transposed(matrix.shape))
+            if isinstance(node.value, ast.Name) and node.value.id == 'math':
+                return 'float' if node.attr in ('pi', 'e', 'tau', 'inf', 'nan') else None
+            return None
+        if isinstance(node, ast.JoinedStr):
+            for part in node.values:
+                if isinstance(part, ast.FormattedValue):
+                    sub(part.value)
+            return 'const char*'
+        if isinstance(node, (ast.List, ast.Tuple)):
+            elem = self._join_all([sub(elt) for elt in node.elts])
+            return f"{elem}*" if elem else None
+        if hasattr(ast, 'Index') and isinstance(node, ast.Index):
+            return sub(node.value)
+        return None
+
+    def _binop_type(self, op: ast.operator, left: Optional[str], right: Optional[str]) -> Optional[str]:
+        if isinstance(op, ast.Div) and not (is_fixed_type(left) or is_fixed_type(right)):
+            # Python true division always produces a float
+            return 'double' if 'double' in (left, right) else 'float'
+        if isinstance(op, ast.Add) and left in ('const char*', 'char*'):
+            return left
+        if isinstance(op, (ast.LShift, ast.RShift)):
+            return arithmetic_type(left, 'int32_t') if is_int_type(left) else left
+        return arithmetic_type(left, right)
+
+    def _elementwise_type(self, node: ast.AST, operand_types: List[Optional[str]]) -> Optional[str]:
+        """``T*`` for an operation on whole arrays (NumPy style), else None
+
+        ``==`` and ``!=`` between views keep their bytes meaning (one bool).
+        """
+        elems = [array_elem(c_type, self.codegen.views) for c_type in operand_types]
+        if all(elem is None for elem in elems):
+            return None
+        scalars = [elem or c_type for elem, c_type in zip(elems, operand_types)]
+        if isinstance(node, ast.Compare):
+            if not all(isinstance(op, ELEMENTWISE_COMPARES) for op in node.ops):
+                return None
+            if (any(isinstance(op, (ast.Eq, ast.NotEq)) for op in node.ops)
+                    and all(c_type in self.codegen.views for c_type in operand_types)):
+                return None
+            return 'bool*'
+        if isinstance(node, ast.UnaryOp):
+            operand = scalars[0]
+            result = arithmetic_type(operand, 'int32_t') if is_int_type(operand) else operand
+        else:
+            result = self._binop_type(node.op, *scalars)
+        return f"{result}*" if result else None
+
+    def _matrix_type(self, node: ast.AST, operand_types: List[Optional[str]]) -> Optional[str]:
+        """C type of arithmetic on Mat/Vec values (the element type for ``v @ w``), else None"""
+        matrices = [self.codegen.matrices.get(c_type) for c_type in operand_types]
+        if all(matrix is None for matrix in matrices):
+            return None
+        elems = [matrix.elem_type if matrix else c_type for matrix, c_type in zip(matrices, operand_types)]
+        try:
+            shape = result_shape(node.op, *[matrix.shape if matrix else None for matrix in matrices])
+        except ValueError:
+            return None  # reported by the code generator
+        if isinstance(node, ast.UnaryOp):
+            elem = arithmetic_type(elems[0], 'int32_t') if is_int_type(elems[0]) else elems[0]
+        elif isinstance(node.op, ast.MatMult):
+            elem = arithmetic_type(*elems)
+        else:
+            elem = self._binop_type(node.op, *elems)
+        return self.codegen._matrix_type(elem, shape) if shape else elem
+
+    def _matrix_call_type(self, node: ast.Call, kind: str, sub) -> Optional[str]:
+        """C type of np.linalg.inv(), .T-like calls, .copy() and NumPy fills of Mat/Vec values"""
+        arg_types = [sub(arg) for arg in node.args]
+        if kind in NUMPY_FILLS or kind == 'full':
+            shape = fill_shape(node, kind, getattr(self.codegen, 'module_int_constants', {}))
+            elem = 'float'  # NumPy's default dtype
+            if kind == 'full' and (is_int_type(arg_types[1]) or is_fixed_type(arg_types[1])):
+                elem = 'int32_t' if arg_types[1] == 'bool' else arg_types[1]
+            return self.codegen._matrix_type(elem, shape) if shape else None
+        operand = node.args[0] if node.args else node.func.value
+        matrix = self.codegen.matrices.get(sub(operand))
+        if matrix is None:
+            return None
+        if kind == 'transpose':
+            return self.codegen._matrix_type(matrix.elem_type, transposed(matrix.shape))
+        if kind == 'inv' and not is_float_type(matrix.elem_type):
+            return None  # reported by the code generator
+        return matrix.c_type
+
+    def _call_type(self, node: ast.Call, arg_types: List[Optional[str]]) -> Optional[str]:
+        func = node.func
+        if isinstance(func, ast.Subscript):
+            table = self._const_dict(func.value)
+            if table is not None and table.value_kind == 'handler':
+                return self._return_type(table.values[0])  # HANDLERS[key](...)
+            container = self.codegen._container_annotation(func)
+            if container is not None:
+                return container.c_type  # Dict[K, V, N]()
+            fmt = annotation_format(func)  # Fixed[I, F](value)
+            return fmt.c_type if fmt else None
+        if isinstance(func, ast.Name):
+            name = func.id
+            if name in NAMED_FORMATS:
+                return NAMED_FORMATS[name].c_type
+            if name in self.functions:
+                return self._return_type(name)
+            if name in self.imported:
+                return self.imported[name]
+            if name in BUILTIN_RESULTS:
+                return BUILTIN_RESULTS[name]
+            if name == 'abs':
+                return arg_types[0] if arg_types else None
+            if name in ('min', 'max'):
+                if len(arg_types) == 1:
+                    return array_elem(arg_types[0], self.codegen.views)
+                return self._join_all(arg_types)
+            if name == 'sum':
+                elem = array_elem(arg_types[0], self.codegen.views) if arg_types else None
+                if arg_types and arg_types[0] in self.codegen.matrices:
+                    elem = self.codegen.matrices[arg_types[0]].elem_type
+                return arithmetic_type(elem, 'int32_t') if elem else 'int32_t'
+            if name in ('any', 'all'):
+                return 'bool'
+            if name in ('bytes', 'bytearray'):
+                return self.codegen._view_type('uint8_t')
+            if name == 'memoryview':
+                return self._slice_type(arg_types[0]) if arg_types else None
+            return None
+        if isinstance(func, ast.Attribute) and self._const_dict(func.value) is not None:
+            return self._const_dict(func.value).c_type if func.attr == 'get' else None
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            module = func.value.id
+            if module == 'math':
+                if func.attr in MATH_INT_RESULTS:
+                    return 'int32_t'
+                if func.attr in MATH_BOOL_RESULTS:
+                    return 'bool'
+                return 'float'
+            if module == 'struct' and func.attr == 'calcsize':
+                return 'int32_t'
+            if is_from_bytes(node):
+                length = nominal_length(node.args[0], getattr(self.codegen, 'module_int_constants', {})) \
+                    if node.args else None
+                signed = next((k.value for k in node.keywords if k.arg == 'signed'), None)
+                return from_bytes_type(length or 4, isinstance(signed, ast.Constant) and signed.value is True)
+            if module in self.module_aliases:
+                return self.module_aliases[module].get(func.attr)
+        return None
+
+    def _unpack_types(self, node: ast.AST) -> Optional[List[str]]:
+        """C types of the values of struct.unpack(...) with a valid literal format"""
+        fmt = constant_format(node) if struct_call(node, 'unpack', 'unpack_from') else None
+        if fmt is None:
+            return None
+        try:
+            fields = values(parse_format(fmt)[1])
+        except ValueError:
+            return None  # reported by the code generator
+        return [field.c_type or self.codegen._view_type('uint8_t') for field in fields]
+
+    def _slice_type(self, base: Optional[str]) -> Optional[str]:
+        """A slice of an array or view is a view of its elements"""
+        if base in self.codegen.views:
+            return base
+        elem = self._elem_type(base)
+        if elem is None or base in ('const char*', 'char*'):
+            return None
+        return self.codegen._view_type(elem)
+
+    def _const_dict(self, node: ast.AST):
+        if isinstance(node, ast.Name):
+            return getattr(self.codegen, 'const_dicts', {}).get(node.id)
+        return None
+
+    @staticmethod
+    def _join_all(types: List[Optional[str]]) -> Optional[str]:
+        result = None
+        for c_type in types:
+            result = join_types(result, c_type)
+        return result
+
+
+def printf_conversion(c_type: Optional[str]) -> Tuple[str, Optional[str]]:
+    """printf conversion and argument cast for a value of the given C type"""
+    if c_type in ('const char*', 'char*'):
+        return '%s', None
+    if c_type == 'char':
+        return '%c', None
+    if c_type == 'float':
+        return '%g', 'double'  # explicit: printf arguments are promoted anyway
+    if c_type == 'double':
+        return '%g', None
+    if c_type == 'uint32_t':
+        return '%lu', 'unsigned long'
+    if c_type == 'int64_t':
+        return '%lld', 'long long'
+    if c_type == 'uint64_t':
+        return '%llu', 'unsigned long long'
+    return '%d', None
@@ -0,0 +1,222 @@
+"""
+Loop-invariant code motion, strength reduction and pointer increments
+
+For each while loop of a function this finds
+
+    hoisted    arithmetic on locals the loop does not assign, evaluated
+               once before the loop (``n * 2``, ``len(v) - 1``)
+    scaled     ``i * K`` for the induction variable i, kept in a variable
+               that steps by K * step next to ``i += step``
+    pointers   ``a[i]`` and ``a[i + c]``, read through a pointer that steps
+               with i
+
+The induction variable is a local whose only assignment in the loop is
+``i += step`` (or ``i = i + step``) as the last statement of the body, so
+every other statement of the body sees i and its derived values in step.
+The code generator declares the new variables before the loop and emits
+their increments after the last statement.
+"""
+import ast
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from py2mcu.analysis import eval_const_int
+from py2mcu.elementwise import is_array_expr
+from py2mcu.ranges import is_power_of_two
+
+# Operators that cannot trap, whatever the operand values
+_SAFE_OPS = (ast.Add, ast.Sub, ast.Mult, ast.BitAnd, ast.BitOr, ast.BitXor)
+# Operators that are only safe with a constant right operand (no division by zero, no bad shift count)
+_CONSTANT_RIGHT_OPS = (ast.Div, ast.FloorDiv, ast.Mod, ast.LShift, ast.RShift)
+
+
+class LoopPlan(NamedTuple):
+    """What moves out of one while loop"""
+    hoisted: List[ast.expr]                                  # invariant expressions, outermost first
+    index: Optional[str]                                     # induction variable
+    step: int
+    increment: Optional[ast.stmt]                            # the ``i += step`` statement
+    scaled: Dict[int, List[ast.BinOp]]                       # K -> ``i * K`` nodes
+    pointers: Dict[str, List[Tuple[ast.Subscript, int]]]     # array -> (``a[i + c]`` node, c)
+
+
+def _index_of(node: ast.Subscript) -> ast.AST:
+    value = node.slice
+    if hasattr(ast, 'Index') and isinstance(value, ast.Index):
+        value = value.value
+    return value
+
+
+def _stored_names(nodes: List[ast.AST]) -> List[str]:
+    return [child.id for node in nodes for child in ast.walk(node)
+            if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store)]
+
+
+def _children(node: ast.AST):
+    """Child nodes, not entering nested function or class definitions"""
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            yield child
+
+
+def _walk(node: ast.AST):
+    yield node
+    for child in _children(node):
+        yield from _walk(child)
+
+
+class LoopOptimizer:
+    """
+    Plans for the while loops of one function
+
+    Only locals take part: a global may be changed by any call and may be
+    volatile.  Expressions already claimed by an enclosing loop are left
+    to it, and loops the code generator rewrites as idioms are skipped.
+    Fully unrolled loops keep their plain indexes.
+    """
+
+    def __init__(self, codegen, func: ast.FunctionDef, constants: Dict[str, int]):
+        self.codegen = codegen
+        self.func = func
+        self.constants = constants
+        self.plans: Dict[int, LoopPlan] = {}
+        self._claimed: Set[int] = set()
+        declared_global = {name for node in ast.walk(func) if isinstance(node, ast.Global) for name in node.names}
+        self._locals = ({arg.arg for arg in func.args.args} | set(_stored_names([func]))) - declared_global
+
+    def run(self) -> 'LoopOptimizer':
+        for node in _walk(self.func):   # pre-order: enclosing loops first
+            if (isinstance(node, ast.While) and not node.orelse
+                    and id(node) not in self.codegen.loop_idioms):
+                plan = self._plan(node)
+                if plan is not None:
+                    self.plans[id(node)] = plan
+        return self
+
+    def _plan(self, loop: ast.While) -> Optional[LoopPlan]:
+        stored = _stored_names(loop.body)
+        hoisted: List[ast.expr] = []
+        for part in [loop.test] + loop.body:
+            self._collect_invariants(part, set(stored), hoisted)
+        index, step, increment = self._induction(loop, stored)
+        unroll = self.codegen.loop_unrolls.get(id(loop))
+        if unroll is not None and unroll.factor == 0:
+            index = None  # fully unrolled: the indexes fold to constants
+        scaled: Dict[int, List[ast.BinOp]] = {}
+        pointers: Dict[str, List[Tuple[ast.Subscript, int]]] = {}
+        if index is not None:
+            parts = [loop.test] + [stmt for stmt in loop.body if stmt is not increment]
+            for node in (child for part in parts for child in _walk(part)):
+                if id(node) in self._claimed:
+                    continue
+                factor = self._scaled_factor(node, index)
+                if factor is not None:
+                    scaled.setdefault(factor, []).append(node)
+                    self._claimed.add(id(node))
+                    continue
+                access = self._pointer_access(node, index, set(stored))
+                if access is not None:
+                    pointers.setdefault(node.value.id, []).append((node, access))
+                    self._claimed.add(id(node))
+        if not (hoisted or scaled or pointers):
+            return None
+        return LoopPlan(hoisted, index, step, increment, scaled, pointers)
+
+    # -- invariants -------------------------------------------------------------
+
+    def _collect_invariants(self, node: ast.AST, stored: Set[str], found: List[ast.expr]):
+        if id(node) in self._claimed or is_array_expr(node, self.codegen.views):
+            return  # an array expression is its own loop
+        if self._worth_hoisting(node, stored):
+            found.append(node)
+            self._claimed.add(id(node))
+            return
+        for child in _children(node):
+            self._collect_invariants(child, stored, found)
+
+    def _worth_hoisting(self, node: ast.AST, stored: Set[str]) -> bool:
+        """An operation on locals that the loop does not change and that cannot trap"""
+        if not isinstance(node, ast.BinOp) or getattr(node, 'folded_c', None) is not None:
+            return False
+        c_type = getattr(node, 'c_type', None)
+        if c_type == 'bool' or not (self.codegen._is_numeric_type(c_type)):
+            return False
+        if eval_const_int(node, self.constants) is not None:
+            return False  # constant: folded where it is used
+        names = [child for child in ast.walk(node) if isinstance(child, ast.Name)]
+        return any(name.id in self._locals for name in names) and self._invariant(node, stored)
+
+    def _invariant(self, node: ast.AST, stored: Set[str]) -> bool:
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, (int, float))
+        if isinstance(node, ast.Name):
+            if node.id in self.constants:
+                return True
+            return node.id in self._locals and node.id not in stored and self.codegen._is_numeric_type(
+                getattr(node, 'c_type', None))
+        if isinstance(node, ast.UnaryOp):
+            return isinstance(node.op, (ast.USub, ast.UAdd, ast.Invert)) and self._invariant(node.operand, stored)
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, _CONSTANT_RIGHT_OPS):
+                right = eval_const_int(node.right, self.constants)
+                if right is None or right == 0 or (isinstance(node.op, (ast.LShift, ast.RShift)) and right < 0):
+                    return False
+            elif not isinstance(node.op, _SAFE_OPS):
+                return False
+            return self._invariant(node.left, stored) and self._invariant(node.right, stored)
+        if isinstance(node, ast.Call):
+            # len() of a view is a field load; the view must not be rebound in the loop
+            return (isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1
+                    and not node.keywords and isinstance(node.args[0], ast.Name)
+                    and node.args[0].id in self._locals and node.args[0].id not in stored
+                    and self.codegen._is_view(node.args[0]))
+        return False
+
+    # -- induction variable -----------------------------------------------------
+
+    def _induction(self, loop: ast.While, stored: List[str]) -> Tuple[Optional[str], int, Optional[ast.stmt]]:
+        last = loop.body[-1]
+        if isinstance(last, ast.AugAssign):
+            target, op, step = last.target, last.op, last.value
+        elif (isinstance(last, ast.Assign) and len(last.targets) == 1 and isinstance(last.value, ast.BinOp)
+              and isinstance(last.targets[0], ast.Name) and isinstance(last.value.left, ast.Name)
+              and last.value.left.id == last.targets[0].id):
+            target, op, step = last.targets[0], last.value.op, last.value.right
+        else:
+            return None, 0, None
+        value = eval_const_int(step, self.constants)
+        if not isinstance(target, ast.Name) or not isinstance(op, (ast.Add, ast.Sub)) or not value:
+            return None, 0, None
+        name = target.id
+        if name not in self._locals or stored.count(name) != 1:
+            return None, 0, None
+        if not self.codegen._is_int_local(name):
+            return None, 0, None
+        return name, value if isinstance(op, ast.Add) else -value, last
+
+    def _scaled_factor(self, node: ast.AST, index: str) -> Optional[int]:
+        """K of ``i * K`` or ``K * i`` where a multiply is dearer than an add"""
+        if not (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult)):
+            return None
+        for mine, other in ((node.left, node.right), (node.right, node.left)):
+            if isinstance(mine, ast.Name) and mine.id == index:
+                factor = eval_const_int(other, self.constants)
+                if factor is not None and abs(factor) > 1 and not is_power_of_two(abs(factor)):
+                    return factor
+        return None
+
+    def _pointer_access(self, node: ast.AST, index: str, stored: Set[str]) -> Optional[int]:
+        """c of ``a[i + c]`` on a local array or a proven-in-range view index, else None"""
+        if not (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)):
+            return None
+        array = node.value
+        if array.id not in self._locals or array.id in stored or self.codegen._pointer_elem_type(node) is None:
+            return None
+        sub = _index_of(node)
+        if isinstance(sub, ast.Name) and sub.id == index:
+            return 0
+        if (isinstance(sub, ast.BinOp) and isinstance(sub.op, (ast.Add, ast.Sub))
+                and isinstance(sub.left, ast.Name) and sub.left.id == index):
+            offset = eval_const_int(sub.right, self.constants)
+            if offset is not None:
+                return offset if isinstance(sub.op, ast.Add) else -offset
+        return None
@@ -0,0 +1,248 @@
+"""
+Small fixed-size matrices and vectors: ``Mat[T, R, C]`` and ``Vec[T, N]``
+
+Each shape becomes one PY2MCU_MAT_DEFINE / PY2MCU_VEC_DEFINE instantiation
+of runtime/py2mcu_matrix.h, a struct that is held, passed and returned by
+value, so matrix code needs no heap.  Expressions on them (element-wise
+arithmetic, ``@``, ``.T``, ``np.linalg.inv``) are unrolled into
+straight-line code with one C expression per element.  On the PC the
+same source runs with NumPy arrays.
+"""
+import ast
+from typing import Dict, List, Optional, Set, Tuple
+
+from py2mcu.analysis import eval_const_int
+from py2mcu.containers import SHORT_NAMES
+from py2mcu.fixed import format_of_c_type
+
+# Largest matrix or vector the compiler unrolls (rows * columns)
+MAX_ELEMENTS = 64
+# Largest square matrix np.linalg.inv() is unrolled for
+MAX_INVERSE = 4
+
+# np.<name>(shape): every element the same constant (eye/identity: 1 on the diagonal)
+NUMPY_FILLS = {'zeros': 0, 'ones': 1, 'eye': 1, 'identity': 1}
+
+Shape = Tuple[int, ...]
+
+
+class MatrixType:
+    """One ``Mat[T, R, C]`` (shape (R, C)) or ``Vec[T, N]`` (shape (N,)) type"""
+
+    def __init__(self, elem_type: str, shape: Shape):
+        self.elem_type = elem_type
+        self.shape = shape
+
+    @property
+    def is_vector(self) -> bool:
+        return len(self.shape) == 1
+
+    @property
+    def name(self) -> str:
+        fmt = format_of_c_type(self.elem_type)
+        elem = fmt.name if fmt is not None else SHORT_NAMES[self.elem_type]
+        if self.is_vector:
+            return f"vec{self.shape[0]}_{elem}"
+        return f"mat{self.shape[0]}x{self.shape[1]}_{elem}"
+
+    @property
+    def c_type(self) -> str:
+        return f"{self.name}_t"
+
+    def define(self) -> str:
+        dims = ', '.join(str(n) for n in self.shape)
+        kind = 'VEC' if self.is_vector else 'MAT'
+        return f"PY2MCU_{kind}_DEFINE({self.name}, {self.elem_type}, {dims})"
+
+    def positions(self) -> List[Shape]:
+        """Element positions in row-major order"""
+        if self.is_vector:
+            return [(i,) for i in range(self.shape[0])]
+        return [(i, j) for i in range(self.shape[0]) for j in range(self.shape[1])]
+
+    def element(self, ref: str, pos: Tuple) -> str:
+        """C expression of the element at pos (ints or C index expressions) of the value ref"""
+        if self.is_vector:
+            return f"{ref}.v[{pos[0]}]"
+        return f"{ref}.m[{pos[0]}][{pos[1]}]"
+
+    def __repr__(self):
+        dims = ', '.join(str(n) for n in self.shape)
+        return f"{'Vec' if self.is_vector else 'Mat'}[{self.elem_type}, {dims}]"
+
+
+def is_element_type(c_type: Optional[str]) -> bool:
+    """A number type a Mat or Vec can hold (integers, float, double, fixed point; not bool)"""
+    return c_type != 'bool' and (c_type in SHORT_NAMES or format_of_c_type(c_type) is not None)
+
+
+def matrix_annotation(node: ast.AST, map_type, constants: Dict[str, int]) -> Optional[MatrixType]:
+    """Decode ``Mat[T, R, C]`` / ``Vec[T, N]``; None for other annotations
+
+    Raises ValueError for a malformed matrix annotation.
+    """
+    if not (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and node.value.id in ('Mat', 'Vec')):
+        return None
+    kind = node.value.id
+    args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+    if len(args) != (3 if kind == 'Mat' else 2):
+        raise ValueError(f"write {'Mat[T, rows, columns]' if kind == 'Mat' else 'Vec[T, length]'}")
+    shape = tuple(eval_const_int(arg, constants) for arg in args[1:])
+    if any(n is None or n < 1 for n in shape):
+        raise ValueError(f"{kind} dimensions must be positive constants")
+    elem_type = map_type(args[0])
+    if not is_element_type(elem_type):
+        raise ValueError(f"{kind} elements must be numbers, not {elem_type}")
+    matrix = MatrixType(elem_type, shape)
+    count = shape[0] * (shape[1] if len(shape) > 1 else 1)
+    if count > MAX_ELEMENTS:
+        raise ValueError(f"{matrix!r} has {count} elements; {kind} code is unrolled, "
+                         f"use Array[T, N] beyond {MAX_ELEMENTS}")
+    return matrix
+
+
+def shape_text(shape: Optional[Shape]) -> str:
+    """NumPy's spelling of a shape ('scalar' for None)"""
+    if shape is None:
+        return 'scalar'
+    return f"({shape[0]},)" if len(shape) == 1 else f"({shape[0]}, {shape[1]})"
+
+
+def result_shape(op: ast.AST, left: Optional[Shape], right: Optional[Shape] = None) -> Shape:
+    """Shape of ``left op right`` (or ``op left``) where None is a scalar; () for ``v @ w``
+
+    Raises ValueError where NumPy would raise or broadcast.
+    """
+    if isinstance(op, ast.MatMult):
+        if left is None or right is None:
+            raise ValueError("'@' needs two matrices or vectors")
+        inner_left = left[-1]
+        inner_right = right[0]
+        if inner_left != inner_right:
+            raise ValueError(f"'@' of shapes {shape_text(left)} and {shape_text(right)}: "
+                             f"{inner_left} columns against {inner_right} rows")
+        return left[:-1] + right[1:]
+    if left is not None and right is not None and left != right:
+        raise ValueError(f"operands have shapes {shape_text(left)} and {shape_text(right)}; "
+                         "Mat and Vec do not broadcast")
+    return left if left is not None else right
+
+
+def transposed(shape: Shape) -> Shape:
+    """Shape of ``.T`` (a vector is its own transpose, as in NumPy)"""
+    return shape if len(shape) == 1 else (shape[1], shape[0])
+
+
+def is_linalg(node: ast.AST, numpy: Set[str]) -> bool:
+    """``np.linalg``"""
+    return (isinstance(node, ast.Attribute) and node.attr == 'linalg'
+            and isinstance(node.value, ast.Name) and node.value.id in numpy)
+
+
+def matrix_call(node: ast.AST, numpy: Set[str]) -> Optional[str]:
+    """What a call does to matrices: 'inv', 'transpose', 'copy', a NumPy fill or 'full'; else None"""
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute):
+        return None
+    func = node.func
+    if is_linalg(func.value, numpy):
+        return 'inv' if func.attr == 'inv' and len(node.args) == 1 else None
+    if isinstance(func.value, ast.Name) and func.value.id in numpy:
+        if func.attr == 'transpose' and len(node.args) == 1:
+            return 'transpose'
+        if func.attr in NUMPY_FILLS and len(node.args) == 1:
+            return func.attr
+        if func.attr == 'full' and len(node.args) == 2:
+            return 'full'
+        return None
+    if func.attr in ('copy', 'transpose') and not node.args and not node.keywords:
+        return func.attr
+    return None
+
+
+def fill_shape(node: ast.Call, kind: str, constants: Dict[str, int]) -> Optional[Shape]:
+    """Shape of ``np.zeros((R, C))``, ``np.eye(N)``, ``np.full(N, v)`` ..., None if not constant"""
+    arg = node.args[0]
+    if kind in ('eye', 'identity'):
+        n = eval_const_int(arg, constants)
+        return (n, n) if n is not None and n > 0 else None
+    dims = arg.elts if isinstance(arg, ast.Tuple) else [arg]
+    shape = tuple(eval_const_int(dim, constants) for dim in dims)
+    if len(shape) > 2 or any(n is None or n < 1 for n in shape):
+        return None
+    return shape
+
+
+def fill_value(kind: str, pos: Shape):
+    """Constant element of a NumPy fill at pos"""
+    if kind in ('eye', 'identity'):
+        return 1 if pos[0] == pos[1] else 0
+    return NUMPY_FILLS[kind]
+
+
+def _terms_text(terms: List[Tuple[int, str]]) -> str:
+    """``a - b + c`` from (sign, product) terms"""
+    text = ''
+    for sign, product in terms:
+        if not text:
+            text = product if sign > 0 else f"-{product}"
+        else:
+            text += f" {'+' if sign > 0 else '-'} {product}"
+    return text
+
+
+def inverse_body(n: int, c_type: str, literal) -> Tuple[List[str], Dict[Shape, str]]:
+    """(statements, element expressions) of the inverse of the n x n matrix ``a``, by the adjugate
+
+    Cofactors are expanded into products of the elements (the 2 x 2 minors
+    a 4 x 4 matrix shares are computed once), then each is multiplied by
+    one reciprocal of the determinant.  A singular matrix (determinant 0)
+    calls PY2MCU_VALUE_ERROR(), where NumPy raises LinAlgError.  literal
+    gives the C literal of a number in c_type.
+    """
+    a = lambda i, j: f"a.m[{i}][{j}]"  # noqa: E731
+    lines: List[str] = []
+    minors: Dict[tuple, str] = {}
+
+    def minor2(rows: Tuple[int, int], cols: Tuple[int, int]) -> str:
+        (r0, r1), (c0, c1) = rows, cols
+        key = (rows, cols)
+        if key not in minors:
+            minors[key] = f"s{r0}{r1}_{c0}{c1}"
+            lines.append(f"const {c_type} {minors[key]} = "
+                         f"{a(r0, c0)} * {a(r1, c1)} - {a(r0, c1)} * {a(r1, c0)};")
+        return minors[key]
+
+    def determinant(rows: tuple, cols: tuple, sign: int) -> str:
+        """sign * det of the submatrix of rows and cols, as an expression"""
+        if len(rows) == 1:
+            return a(rows[0], cols[0]) if sign > 0 else f"-{a(rows[0], cols[0])}"
+        if len(rows) == 2:
+            (r0, r1), (c0, c1) = rows, cols
+            if n > 3:
+                name = minor2(rows, cols)
+                return name if sign > 0 else f"-{name}"
+            terms = [(sign, f"{a(r0, c0)} * {a(r1, c1)}"), (-sign, f"{a(r0, c1)} * {a(r1, c0)}")]
+            return _terms_text(sorted(terms, key=lambda term: -term[0]))
+        terms = []
+        for k, col in enumerate(cols):
+            rest = cols[:k] + cols[k + 1:]
+            sub = determinant(rows[1:], rest, 1)
+            terms.append((sign * (-1) ** k, f"{a(rows[0], col)} * {sub}"))
+        return _terms_text(terms)
+
+    indexes = tuple(range(n))
+    if n == 1:
+        det = a(0, 0)
+    else:
+        for i in indexes:
+            for j in indexes:
+                rows, cols = indexes[:i] + indexes[i + 1:], indexes[:j] + indexes[j + 1:]
+                lines.append(f"const {c_type} c{i}{j} = {determinant(rows, cols, (-1) ** (i + j))};")
+        det = ' + '.join(f"{a(0, j)} * c0{j}" for j in indexes)
+    lines.append(f"const {c_type} det = {det};")
+    lines += [f"if (det == {literal(0)}) {{", "    PY2MCU_VALUE_ERROR();", "}",
+              f"const {c_type} r = {literal(1)} / det;"]
+    if n == 1:
+        return lines, {(0, 0): 'r'}
+    return lines, {(j, i): f"c{i}{j} * r" for i in indexes for j in indexes}
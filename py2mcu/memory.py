@@ -0,0 +1,262 @@
+"""
+Static memory planning for heap-free (--no-heap) builds
+"""
+import ast
+from typing import Dict, List, Optional
+
+from py2mcu.analysis import (
+    build_call_graph,
+    collect_module_constants,
+    eval_const_int,
+    find_c_allocations,
+    function_has_c_body,
+    module_functions,
+    reachable_from,
+    recursive_functions,
+    returned_names,
+)
+from py2mcu.errors import CompileError
+from py2mcu.fixed import format_of_c_type
+from py2mcu.parser import extract_variable_modifiers
+from py2mcu.targets import get_target_info
+
+# sizeof() of the C types the code generator emits
+TYPE_SIZES = {
+    'bool': 1, 'char': 1,
+    'int8_t': 1, 'uint8_t': 1,
+    'int16_t': 2, 'uint16_t': 2,
+    'int32_t': 4, 'uint32_t': 4,
+    'int64_t': 8, 'uint64_t': 8,
+    'float': 4, 'double': 8,
+}
+
+# Overlay slots are aligned so any element type can live at any offset
+OVERLAY_ALIGN = 8
+
+
+def c_sizeof(c_type: str, pointer_size: int = 4) -> int:
+    """Best-effort sizeof() for a C type string"""
+    c_type = c_type.replace('const ', '').replace('volatile ', '').strip()
+    if c_type.endswith('*'):
+        return pointer_size
+    fmt = format_of_c_type(c_type)
+    if fmt is not None:
+        return fmt.bits // 8
+    return TYPE_SIZES.get(c_type, 4)
+
+
+def _align(value: int, alignment: int = OVERLAY_ALIGN) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+class MemoryPlanner:
+    """
+    Assign every list allocation to static storage
+
+    Buffers of functions reachable from ``main()`` share an overlay region:
+    two functions get disjoint slots only if one can be active while the
+    other runs (i.e. one is on the other's call chain).  Buffers that escape
+    through ``return`` and buffers of functions not reachable from ``main()``
+    (ISRs, functions called from hand-written C) get their own ``.bss`` slot.
+    """
+
+    def __init__(self, codegen, tree: ast.Module, ram_budget: Optional[int] = None):
+        self.codegen = codegen
+        self.tree = tree
+        self.filename = getattr(tree, '_filename', '<string>')
+        self.target_info = get_target_info(codegen.target)
+        self.ram_budget = ram_budget if ram_budget is not None else self.target_info['ram']
+        self.constants = collect_module_constants(tree)
+
+        # (function, variable) -> placement dict
+        self.buffers: Dict[tuple, Dict] = {}
+        self.frames: Dict[str, int] = {}        # overlay bytes per function
+        self.bss: Dict[str, int] = {}           # dedicated bytes per function
+        self.stack: Dict[str, int] = {}         # scalar locals/params per function
+        self.overlay_base: Dict[str, int] = {}
+        self.overlay_size = 0
+        self.globals_size = 0
+        self.stack_peak = 0
+
+    def plan(self) -> 'MemoryPlanner':
+        """Run the analysis; raises CompileError on anything truly dynamic"""
+        self._reject_c_allocations()
+
+        functions = module_functions(self.tree)
+        graph = build_call_graph(self.tree)
+        overlaid = reachable_from(graph, 'main')
+        recursive = recursive_functions(graph)
+
+        for name, func in functions.items():
+            self.frames[name] = 0
+            self.bss[name] = 0
+            self.stack[name] = self._stack_estimate(func)
+            if function_has_c_body(func):
+                continue
+            escaping = returned_names(func)
+            const_tables = self.codegen._find_const_lists(func)
+            for node in ast.walk(func):
+                if not (isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name)):
+                    continue
+                if not self.codegen._is_array_alloc(node) or node.target.id in const_tables:
+                    continue
+                self._place(func, node, overlay=(name in overlaid and node.target.id not in escaping))
+            if name in recursive and (self.frames[name] or self.bss[name]):
+                raise CompileError(
+                    f"recursive function '{name}' cannot own static buffers with --no-heap",
+                    func.lineno, self.filename)
+
+        self._assign_overlay_offsets(graph, overlaid)
+        self.globals_size = self._globals_estimate()
+        self.stack_peak = self._deepest_chain(graph, self.stack, 'main')
+        self._check_budget()
+        return self
+
+    def placement(self, function: str, name: str) -> Optional[Dict]:
+        """Return the placement of a list variable, or None if it is not planned"""
+        return self.buffers.get((function, name))
+
+    def _reject_c_allocations(self):
+        for call, lineno in find_c_allocations(self.tree):
+            raise CompileError(
+                f"'{call}()' in inline C allocates from the heap, which --no-heap forbids",
+                lineno, self.filename)
+
+    def _place(self, func: ast.FunctionDef, node: ast.AnnAssign, overlay: bool):
+        name = node.target.id
+        elem_type, size_node = self.codegen._list_allocation_info(node)
+        count = eval_const_int(size_node, self.constants) if size_node is not None else None
+        if count is None:
+            size_text = self.codegen._expr_to_c(size_node) if size_node is not None else '?'
+            raise CompileError(
+                f"list '{name}' in '{func.name}' has dynamic size '{size_text}'; "
+                f"--no-heap needs a compile-time constant length",
+                node.lineno, self.filename)
+        if count < 0:
+            raise CompileError(f"list '{name}' in '{func.name}' has negative size {count}",
+                               node.lineno, self.filename)
+
+        size = count * c_sizeof(elem_type, self.target_info['pointer_size'])
+        placement = {
+            'function': func.name,
+            'name': name,
+            'elem_type': elem_type,
+            'count': count,
+            'bytes': size,
+            'storage': 'overlay' if overlay else 'bss',
+            'offset': 0,
+            'lineno': node.lineno,
+        }
+        if overlay:
+            # offset is relative to the function's frame until bases are known
+            placement['offset'] = self.frames[func.name]
+            self.frames[func.name] += _align(size)
+        else:
+            self.bss[func.name] += size
+        self.buffers[(func.name, name)] = placement
+
+    def _assign_overlay_offsets(self, graph: Dict, overlaid: set):
+        """Place each frame after the frames of every caller on its chain"""
+        base = {name: 0 for name in overlaid}
+        for _ in range(len(base) + 1):
+            changed = False
+            for caller in overlaid:
+                for callee in graph[caller]:
+                    candidate = base[caller] + self.frames[caller]
+                    if candidate > base[callee]:
+                        base[callee] = candidate
+                        changed = True
+            if not changed:
+                break
+
+        self.overlay_base = base
+        for placement in self.buffers.values():
+            if placement['storage'] == 'overlay':
+                placement['offset'] += base[placement['function']]
+        self.overlay_size = max((base[f] + self.frames[f] for f in base), default=0)
+
+    def _deepest_chain(self, graph: Dict, weights: Dict[str, int], root: str) -> int:
+        """Largest sum of weights along any call chain starting at root"""
+        best: Dict[str, int] = {}
+
+        def visit(name: str, active: set) -> int:
+            if name in best:
+                return best[name]
+            if name in active:
+                return 0
+            active.add(name)
+            deepest = max((visit(callee, active) for callee in graph.get(name, ())), default=0)
+            active.discard(name)
+            best[name] = weights.get(name, 0) + deepest
+            return best[name]
+
+        return visit(root, set()) if root in graph else 0
+
+    def _stack_estimate(self, func: ast.FunctionDef) -> int:
+        """Bytes of parameters and scalar locals (lists are counted separately)"""
+        pointer_size = self.target_info['pointer_size']
+        seen = {}
+        for arg in func.args.args:
+            c_type = self.codegen._map_type(arg.annotation) if arg.annotation else 'int32_t'
+            seen[arg.arg] = c_sizeof(c_type, pointer_size)
+        if function_has_c_body(func):
+            return sum(seen.values())
+        for node in ast.walk(func):
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                if self.codegen._is_array_alloc(node):
+                    continue  # planned separately
+                c_type = self.codegen._map_type(node.annotation)
+                seen.setdefault(node.target.id, c_sizeof(c_type, pointer_size))
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        seen.setdefault(target.id, 4)
+        return sum(seen.values())
+
+    def _globals_estimate(self) -> int:
+        """RAM of module-level variables; @const arrays live in flash"""
+        pointer_size = self.target_info['pointer_size']
+        source = getattr(self.tree, '_source', '')
+        total = 0
+        for node in self.tree.body:
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                if node.target.id in self.codegen.define_names:
+                    continue
+                if self.codegen._is_array_alloc(node):
+                    if extract_variable_modifiers(source, node.lineno)['const']:
+                        continue
+                    elem_type, size_node = self.codegen._list_allocation_info(node)
+                    count = eval_const_int(size_node, self.constants) if size_node is not None else 0
+                    total += (count or 0) * c_sizeof(elem_type, pointer_size)
+                    continue
+                total += c_sizeof(self.codegen._map_type(node.annotation), pointer_size)
+        return total
+
+    def total_ram(self) -> int:
+        return sum(self.bss.values()) + self.overlay_size + self.globals_size + self.stack_peak
+
+    def _check_budget(self):
+        if self.ram_budget is not None and self.total_ram() > self.ram_budget:
+            raise CompileError(
+                f"static RAM footprint {self.total_ram()} B exceeds the "
+                f"{self.ram_budget} B budget of target '{self.codegen.target}'",
+                None, self.filename)
+
+    def report_lines(self) -> List[str]:
+        """Per-function RAM footprint and the total against the budget"""
+        lines = [f"{'function':<28}{'bss':>8}{'overlay':>16}{'stack':>8}"]
+        for name in self.frames:
+            overlay = '-'
+            if self.frames[name]:
+                overlay = f"{self.frames[name]} @ {self.overlay_base.get(name, 0)}"
+            lines.append(f"{name:<28}{self.bss[name]:>8}{overlay:>16}{self.stack[name]:>8}")
+
+        total = self.total_ram()
+        summary = (f"total: bss {sum(self.bss.values())} B + overlay {self.overlay_size} B"
+                   f" + globals {self.globals_size} B + stack {self.stack_peak} B = {total} B")
+        if self.ram_budget:
+            summary += f" of {self.ram_budget} B budget ({100.0 * total / self.ram_budget:.1f}%)"
+        else:
+            summary += " (no RAM budget for this target)"
+        lines.append(summary)
+        return lines
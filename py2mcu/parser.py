@@ -15,6 +15,10 @@ def parse_python_file(filepath: str) -> ast.Module:
     # by Python's parser.  This is especially useful for preserving C code
     # snippets embedded in string literals.
     tree._source = source
+    # Source name used to attribute generated allocations back to Python lines
+    tree._filename = Path(filepath).name
+    # Directory searched for imported modules during type inference
+    tree._source_dir = str(Path(filepath).resolve().parent)
     
     # Extract @#define annotations and attach to tree
     defines = extract_define_constants(source)
@@ -71,6 +75,24 @@ def extract_define_constants(source: str) -> List[Dict]:
     
     return defines
 
+def extract_unroll_pragma(source: str, lineno: int) -> Optional[int]:
+    """Unroll factor from a ``# @unroll(n)`` comment on the line above a loop
+
+    ``# @unroll 4`` is accepted too.  A bare ``# @unroll`` asks for full
+    unrolling and returns 0; no pragma returns None.
+    """
+    lines = source.split('\n')
+    if lineno < 2 or lineno > len(lines):
+        return None
+    comment_line = lines[lineno - 2].strip()
+    if not comment_line.startswith('#'):
+        return None
+    match = re.search(r'@unroll\b(?:\s*\(\s*(\d+)\s*\)|\s+(\d+))?', comment_line)
+    if match is None:
+        return None
+    count = match.group(1) or match.group(2)
+    return int(count) if count is not None else 0
+
 def extract_variable_modifiers(source: str, lineno: int) -> Dict[str, bool]:
     """Extract variable modifiers from comment above variable declaration.
     
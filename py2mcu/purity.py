@@ -0,0 +1,496 @@
+"""
+Purity analysis and common subexpression elimination
+
+A function of the module is
+
+    const   its result depends on its arguments only: it reads no memory
+            (list elements, module arrays and variables) except constants
+    pure    it may read memory but changes nothing the caller can see
+
+and neither when it stores through a pointer or into a module variable,
+allocates, prints, raises, may loop forever, reads a volatile variable or
+calls a function that is neither.  Recursive functions are settled as a
+fixpoint.  ``__C_CODE__`` bodies are opaque: they count as pure only with
+an ``@pure`` decorator, which is taken on trust.  A Python body marked
+``@pure`` is checked like any other.
+
+The code generator marks const and pure functions with
+``PY2MCU_CONST_FN``/``PY2MCU_PURE_FN`` (GCC's const and pure attributes)
+and, within a function, evaluates repeated calls to them and repeated
+arithmetic on the same locals once into a ``const`` temporary.
+"""
+import ast
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from py2mcu.analysis import eval_const_int, function_has_c_body, module_functions
+from py2mcu.errors import CompileError
+from py2mcu.floats import MATH_FUNCTIONS, MATH_MACROS
+from py2mcu.parser import extract_variable_modifiers
+
+CONST, PURE, IMPURE = 2, 1, 0
+KINDS = {CONST: 'const', PURE: 'pure'}
+ATTRIBUTES = {CONST: 'PY2MCU_CONST_FN', PURE: 'PY2MCU_PURE_FN'}
+
+# Builtins compiled to side-effect-free C on their scalar arguments
+_SCALAR_BUILTINS = {'abs', 'min', 'max', 'int', 'float', 'bool'}
+# Operators worth a temporary and safe to evaluate early (see loopopt)
+_SAFE_OPS = (ast.Add, ast.Sub, ast.Mult, ast.BitAnd, ast.BitOr, ast.BitXor)
+_CONSTANT_RIGHT_OPS = (ast.Div, ast.FloorDiv, ast.Mod, ast.LShift, ast.RShift)
+
+
+def has_pure_decorator(func: ast.FunctionDef) -> bool:
+    return any(isinstance(d, ast.Name) and d.id == 'pure' for d in func.decorator_list)
+
+
+def _body_nodes(node: ast.AST):
+    """Nodes of a function body, without annotations or nested definitions"""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            continue
+        if isinstance(node, ast.AnnAssign) and child is node.annotation:
+            continue
+        if isinstance(child, ast.arguments):
+            continue
+        yield child
+        yield from _body_nodes(child)
+
+
+def _function_nodes(func: ast.FunctionDef):
+    for stmt in func.body:
+        yield stmt
+        yield from _body_nodes(stmt)
+
+
+def _is_inline_c(node: ast.AST) -> bool:
+    return (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str) and '__C_CODE__' in node.value.value)
+
+
+class PurityAnalysis:
+    """const/pure kind of every function of the module"""
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.functions = module_functions(tree)
+        self.levels: Dict[str, int] = {}
+        self.reasons: Dict[str, str] = {}       # why a function is not const (pure) or not pure (impure)
+        self.volatile: Set[str] = set()
+        self.constant_globals: Set[str] = set()
+
+    def run(self) -> 'PurityAnalysis':
+        self._global_modifiers()
+        local: Dict[str, Tuple[int, Optional[str], List[Tuple[str, int]]]] = {}
+        for name, func in self.functions.items():
+            local[name] = self._local_level(name, func)
+        for name, (level, reason, _) in local.items():
+            self.levels[name] = level
+            if reason is not None:
+                self.reasons[name] = reason
+        changed = True
+        while changed:
+            changed = False
+            for name, (_, _, calls) in local.items():
+                for callee, line in calls:
+                    level = self.levels[callee]
+                    if level < self.levels[name]:
+                        self.levels[name] = level
+                        what = "calls" if level == IMPURE else "calls pure"
+                        self.reasons[name] = f"line {line}: {what} {callee}()"
+                        changed = True
+        for name, func in self.functions.items():
+            self._check_decorator(name, func)
+        return self
+
+    def kind(self, function: str) -> Optional[str]:
+        """'const', 'pure' or None"""
+        return KINDS.get(self.levels.get(function, IMPURE))
+
+    def attribute(self, func: ast.FunctionDef, return_type: str) -> Optional[str]:
+        """Attribute macro for the definition of func, None if it has none"""
+        if return_type == 'void' or func.name == 'main':
+            return None
+        return ATTRIBUTES.get(self.levels.get(func.name, IMPURE))
+
+    def call_level(self, node: ast.Call) -> int:
+        """Level of calling node itself, arguments aside"""
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            if (isinstance(func.value, ast.Name) and func.value.id == 'math'
+                    and (func.attr in MATH_FUNCTIONS or func.attr in MATH_MACROS)):
+                return CONST
+            return IMPURE
+        if not isinstance(func, ast.Name):
+            return IMPURE
+        if func.id in self.functions:
+            return self.levels.get(func.id, IMPURE)
+        if func.id in _SCALAR_BUILTINS:
+            # min()/max() of one list is a loop over memory
+            return CONST if len(node.args) != 1 or func.id not in ('min', 'max') else PURE
+        if func.id == 'len':
+            return PURE
+        return IMPURE
+
+    def report_lines(self) -> List[str]:
+        lines = []
+        for name, func in self.functions.items():
+            return_type = self.codegen._function_return_type(func)
+            if return_type == 'void' or name == 'main' or name in self._not_emitted():
+                continue
+            level = self.levels[name]
+            if level == CONST:
+                lines.append(f"{name}(): const")
+            elif level == PURE:
+                because = self.reasons.get(name)
+                lines.append(f"{name}(): pure" + (f" ({because})" if because else "")
+                             + (" (declared @pure)" if function_has_c_body(func) else ""))
+            else:
+                lines.append(f"{name}(): not pure: {self.reasons[name]}")
+        return lines
+
+    def _not_emitted(self) -> Set[str]:
+        return set(self.codegen.luts) | set(self.codegen.comptime_functions)
+
+    def _global_modifiers(self):
+        source = getattr(self.codegen, '_source_code', '')
+        for node in self.tree.body:
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                names = [node.target.id]
+            elif isinstance(node, ast.Assign):
+                names = [t.id for t in node.targets if isinstance(t, ast.Name)]
+            else:
+                continue
+            modifiers = extract_variable_modifiers(source, node.lineno)
+            if modifiers['volatile']:
+                self.volatile.update(names)
+            elif modifiers['const']:
+                self.constant_globals.update(names)
+
+    def _local_level(self, name: str, func: ast.FunctionDef) -> Tuple[int, Optional[str], List[Tuple[str, int]]]:
+        """(level, reason, calls to module functions) of func's own body"""
+        if function_has_c_body(func):
+            if has_pure_decorator(func):
+                return PURE, None, []
+            return IMPURE, "C body (mark it @pure if it has no side effects)", []
+        if name in self._not_emitted():
+            return CONST, None, []
+        codegen = self.codegen
+        declared_global = {n for node in _function_nodes(func) if isinstance(node, ast.Global) for n in node.names}
+        params = {arg.arg for arg in func.args.args}
+        stored = {node.id for node in _function_nodes(func) if isinstance(node, ast.Name)
+                  and isinstance(node.ctx, (ast.Store, ast.Del))}
+        local_names = (params | stored) - declared_global
+        constants = (set(codegen.module_int_constants) | set(codegen.define_names) | self.constant_globals
+                     | set(self.functions) | set(codegen.luts) | set(codegen.const_dicts))
+        skip = set()    # call targets and membership lists, checked with their call or test
+        level, reason = CONST, None
+        calls: List[Tuple[str, int]] = []
+        for node in _function_nodes(func):
+            line = getattr(node, 'lineno', func.lineno)
+            problem = None
+            if isinstance(node, ast.Call):
+                skip.add(id(node.func))
+                call = self.call_level(node)
+                if isinstance(node.func, ast.Name) and node.func.id in self.functions:
+                    calls.append((node.func.id, line))
+                elif call == IMPURE:
+                    problem = f"calls '{codegen._source_text(node.func)}'"
+                elif call == PURE and level == CONST:
+                    level, reason = PURE, f"line {line}: reads memory through {node.func.id}()"
+            elif isinstance(node, ast.Compare):
+                for op, comparator in zip(node.ops, node.comparators):
+                    if not isinstance(op, (ast.In, ast.NotIn)):
+                        continue
+                    if isinstance(comparator, (ast.List, ast.Tuple, ast.Set)):
+                        skip.add(id(comparator))
+                    elif level == CONST:
+                        level, reason = PURE, f"line {line}: searches '{codegen._source_text(comparator)}'"
+            elif isinstance(node, (ast.List, ast.ListComp, ast.Dict, ast.DictComp, ast.Set, ast.SetComp,
+                                   ast.GeneratorExp, ast.JoinedStr)) and id(node) not in skip:
+                problem = "allocates"
+            elif isinstance(node, (ast.Subscript, ast.Attribute)):
+                if isinstance(node.value, ast.Name) and node.value.id == 'math':
+                    skip.add(id(node.value))
+                if not isinstance(node.ctx, ast.Load):
+                    problem = f"stores into '{codegen._source_text(node.value)}'"
+                elif isinstance(node, ast.Subscript) and getattr(node.value, 'c_type', None) not in codegen.matrices \
+                        and level == CONST:
+                    level, reason = PURE, f"line {line}: reads '{codegen._source_text(node)}'"
+            elif isinstance(node, ast.Name) and id(node) not in skip:
+                if isinstance(node.ctx, ast.Store) and node.id in declared_global:
+                    problem = f"assigns module variable '{node.id}'"
+                elif node.id in self.volatile and node.id not in local_names:
+                    problem = f"reads volatile '{node.id}'"
+                elif node.id in local_names or node.id in constants:
+                    pass
+                elif node.id in codegen.types.globals:
+                    if level == CONST:
+                        level, reason = PURE, f"line {line}: reads module variable '{node.id}'"
+                elif node.id != 'math' and node.id not in getattr(codegen, 'numpy_names', ()):
+                    problem = f"reads '{node.id}', which is not defined in the module"
+            elif isinstance(node, (ast.Raise, ast.Assert)):
+                problem = "raises"
+            elif isinstance(node, (ast.Yield, ast.YieldFrom, ast.Await, ast.Try, ast.With)):
+                problem = f"uses '{type(node).__name__.lower()}'"
+            elif isinstance(node, ast.While) and self._always_true(node.test):
+                problem = "may never return"
+            elif _is_inline_c(node):
+                problem = "has inline C"
+            if problem is not None:
+                return IMPURE, f"line {line}: {problem}", calls
+        return level, reason, calls
+
+    def _always_true(self, test: ast.AST) -> bool:
+        if isinstance(test, ast.Constant):
+            return bool(test.value)
+        return eval_const_int(test, self.codegen.module_int_constants) not in (None, 0)
+
+    def _check_decorator(self, name: str, func: ast.FunctionDef):
+        if not has_pure_decorator(func):
+            return
+        filename = getattr(self.codegen, '_source_file', '<string>')
+        if self.codegen._function_return_type(func) == 'void':
+            raise CompileError(f"@pure function '{name}' must return a value", func.lineno, filename)
+        if self.levels[name] == IMPURE:
+            raise CompileError(f"@pure function '{name}' has side effects: {self.reasons[name]}",
+                               func.lineno, filename)
+
+
+# -- common subexpressions ------------------------------------------------------------
+
+class Temporary(NamedTuple):
+    """A value computed once before the statement of its first use"""
+    expr: ast.expr
+    uses: List[ast.expr]        # the expression itself first
+
+
+class _Entry:
+    def __init__(self, expr: ast.expr, reads: Set[str], memory: bool):
+        self.expr = expr
+        self.reads = reads
+        self.memory = memory
+        self.uses: List[Tuple[ast.expr, ast.stmt, Tuple[int, ...]]] = []   # (node, statement, enclosing candidates)
+
+
+class CommonSubexpressions:
+    """
+    Repeated pure calls and arithmetic of one function
+
+    Statements are scanned in order, and a nested block starts with what
+    its enclosing block has available (a loop body only with what the
+    loop does not change).  A use counts only where the statement always
+    evaluates it, and a statement with a call that has side effects
+    counts only if that call is the statement's own value.  Storing to a
+    local forgets the expressions that read it; storing through a
+    pointer, into a module variable or calling a function with side
+    effects forgets those that read memory; inline C forgets everything.
+    Unrolled loops and loops rewritten as idioms are left alone.
+    """
+
+    def __init__(self, codegen, func: ast.FunctionDef, purity: PurityAnalysis):
+        self.codegen = codegen
+        self.func = func
+        self.purity = purity
+        self.constants = codegen.module_int_constants
+        declared_global = {n for node in _function_nodes(func) if isinstance(node, ast.Global) for n in node.names}
+        stored = {node.id for node in _function_nodes(func) if isinstance(node, ast.Name)
+                  and isinstance(node.ctx, (ast.Store, ast.Del))}
+        self.declared_global = declared_global
+        self.locals = ({arg.arg for arg in func.args.args} | stored) - declared_global
+        self.claimed = self._loop_plan_nodes()
+        self.entries: List[_Entry] = []
+        self.temps: Dict[int, List[Temporary]] = {}     # id(statement) -> temporaries declared before it
+
+    def run(self) -> 'CommonSubexpressions':
+        self._block(self.func.body, {})
+        chosen: List[Tuple[_Entry, list]] = []
+        replaced: Set[int] = set()
+        for entry in sorted(self.entries, key=lambda e: -self._size(e.expr)):
+            uses = [use for use in entry.uses if not replaced.intersection(use[2])]
+            if len(uses) < 2:
+                continue
+            chosen.append((entry, uses))
+            replaced.update(id(node) for node, _, _ in uses[1:])
+        for entry, uses in sorted(chosen, key=lambda item: self._size(item[0].expr)):
+            statement = uses[0][1]
+            self.temps.setdefault(id(statement), []).append(Temporary(uses[0][0], [node for node, _, _ in uses]))
+        return self
+
+    # -- blocks ---------------------------------------------------------------------
+
+    def _block(self, stmts: List[ast.stmt], available: Dict[str, _Entry]):
+        for stmt in stmts:
+            self._statement(stmt, available)
+
+    def _statement(self, stmt: ast.stmt, available: Dict[str, _Entry]):
+        if _is_inline_c(stmt):
+            available.clear()
+            return
+        evaluated = self._evaluated_parts(stmt)
+        if evaluated and self._effects_allow_uses(stmt):
+            for part in evaluated:
+                self._find_uses(part, stmt, available, ())
+        if isinstance(stmt, ast.If):
+            self._block(stmt.body, dict(available))
+            self._block(stmt.orelse, dict(available))
+        elif isinstance(stmt, ast.While) and not stmt.orelse and self._plain_loop(stmt):
+            inside = dict(available)
+            self._kill(stmt, inside)
+            self._block(stmt.body, inside)
+        self._kill(stmt, available)
+
+    def _plain_loop(self, loop: ast.While) -> bool:
+        codegen = self.codegen
+        return id(loop) not in codegen.loop_idioms and id(loop) not in codegen.loop_unrolls
+
+    @staticmethod
+    def _evaluated_parts(stmt: ast.stmt) -> List[ast.expr]:
+        if isinstance(stmt, (ast.Expr, ast.Return, ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            return [stmt.value] if stmt.value is not None else []
+        if isinstance(stmt, ast.If):
+            return [stmt.test]
+        return []
+
+    def _effects_allow_uses(self, stmt: ast.stmt) -> bool:
+        """True unless a call with side effects may run before part of the statement"""
+        root = getattr(stmt, 'value', None) if not isinstance(stmt, ast.If) else None
+        scope = stmt.test if isinstance(stmt, ast.If) else stmt
+        for node in [scope] + list(_body_nodes(scope)):
+            if isinstance(node, ast.Call) and self._call_level(node) == IMPURE and node is not root:
+                return False
+            if isinstance(node, ast.NamedExpr):
+                return False
+        return True
+
+    def _call_level(self, node: ast.Call) -> int:
+        if isinstance(node.func, ast.Name) and node.func.id in self.codegen.luts:
+            return CONST
+        return self.purity.call_level(node)
+
+    def _kill(self, stmt: ast.stmt, available: Dict[str, _Entry]):
+        """Forget what stmt may change"""
+        stored, memory = set(), False
+        for node in [stmt] + list(_body_nodes(stmt)):
+            if _is_inline_c(node):
+                available.clear()
+                return
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                stored.add(node.id)
+                memory = memory or node.id in self.declared_global
+            elif isinstance(node, (ast.Subscript, ast.Attribute)) and not isinstance(node.ctx, ast.Load):
+                memory = True
+            elif isinstance(node, ast.Call) and self._call_level(node) == IMPURE:
+                memory = True
+        for key in [key for key, entry in available.items() if entry.reads & stored or (memory and entry.memory)]:
+            del available[key]
+
+    # -- candidates -----------------------------------------------------------------
+
+    def _find_uses(self, node: ast.AST, stmt: ast.stmt, available: Dict[str, _Entry], enclosing: Tuple[int, ...]):
+        if isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            return
+        info = self._candidate(node)
+        if info is not None:
+            key = ast.dump(node)
+            entry = available.get(key)
+            if entry is None:
+                entry = _Entry(node, *info)
+                available[key] = entry
+                self.entries.append(entry)
+            entry.uses.append((node, stmt, enclosing))
+            enclosing = enclosing + (id(node),)
+        # only the parts every evaluation of node evaluates
+        if isinstance(node, ast.BoolOp):
+            children = node.values[:1]
+        elif isinstance(node, ast.IfExp):
+            children = [node.test]
+        elif isinstance(node, ast.Compare):
+            children = [node.left, node.comparators[0]]
+        elif isinstance(node, ast.Call):
+            children = node.args
+        else:
+            children = list(ast.iter_child_nodes(node))
+        for child in children:
+            self._find_uses(child, stmt, available, enclosing)
+
+    def _candidate(self, node: ast.AST) -> Optional[Tuple[Set[str], bool]]:
+        """(names read, reads memory) if node is worth a temporary"""
+        if not isinstance(node, (ast.Call, ast.BinOp)) or id(node) in self.claimed:
+            return None
+        if getattr(node, 'folded_c', None) is not None or getattr(node, 'loop_c', None) is not None:
+            return None
+        c_type = getattr(node, 'c_type', None)
+        if not (self.codegen._is_numeric_type(c_type) or c_type == 'bool'):
+            return None
+        if eval_const_int(node, self.constants) is not None:
+            return None
+        stable = self._stable(node)
+        if stable is None:
+            return None
+        operations = sum(isinstance(child, (ast.BinOp, ast.Call)) for child in ast.walk(node))
+        calls = [child for child in ast.walk(node) if isinstance(child, ast.Call)
+                 and self._call_level(child) != IMPURE and not self._cheap_call(child)]
+        if not calls and operations < 2:
+            return None  # a single operation is cheaper than a variable
+        return stable
+
+    def _cheap_call(self, node: ast.Call) -> bool:
+        return isinstance(node.func, ast.Name) and node.func.id in _SCALAR_BUILTINS | {'len'}
+
+    def _stable(self, node: ast.AST) -> Optional[Tuple[Set[str], bool]]:
+        """Names node reads and whether it reads memory, if evaluating it twice gives the same value"""
+        if isinstance(node, ast.Constant):
+            return (set(), False) if isinstance(node.value, (int, float)) else None
+        if isinstance(node, ast.Name):
+            if node.id in self.locals:
+                return {node.id}, False
+            if node.id in self.purity.volatile:
+                return None
+            if node.id in self.constants or node.id in self.codegen.define_names:
+                return set(), False
+            return None
+        if isinstance(node, ast.UnaryOp):
+            return self._stable(node.operand) if isinstance(node.op, (ast.USub, ast.UAdd, ast.Invert)) else None
+        if isinstance(node, ast.BinOp):
+            c_type = getattr(node, 'c_type', None)
+            if not self.codegen._is_numeric_type(c_type):
+                return None
+            if isinstance(node.op, ast.Div) and c_type in ('float', 'double'):
+                pass  # no trap on a zero divisor
+            elif isinstance(node.op, _CONSTANT_RIGHT_OPS):
+                right = eval_const_int(node.right, self.constants)
+                if right is None or right == 0 or (isinstance(node.op, (ast.LShift, ast.RShift)) and right < 0):
+                    return None
+            elif not isinstance(node.op, _SAFE_OPS):
+                return None
+            return self._combine([node.left, node.right], memory=False)
+        if isinstance(node, ast.Call):
+            level = self._call_level(node)
+            if level == IMPURE or node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+                return None
+            return self._combine(node.args, memory=level == PURE)
+        return None
+
+    def _combine(self, parts: List[ast.AST], memory: bool) -> Optional[Tuple[Set[str], bool]]:
+        reads: Set[str] = set()
+        for part in parts:
+            stable = self._stable(part)
+            if stable is None:
+                return None
+            reads |= stable[0]
+            memory = memory or stable[1]
+        return reads, memory
+
+    @staticmethod
+    def _size(node: ast.AST) -> int:
+        return sum(1 for _ in ast.walk(node))
+
+    def _loop_plan_nodes(self) -> Set[int]:
+        """Expressions the loop optimizer already replaces"""
+        claimed = set()
+        for plan in self.codegen.loop_plans.values():
+            claimed.update(id(expr) for expr in plan.hoisted)
+            claimed.update(id(node) for group in plan.scaled.values() for node in group)
+            claimed.update(id(access) for group in plan.pointers.values() for access, _ in group)
+        return claimed
+
@@ -0,0 +1,574 @@
+"""
+Value-range (interval) analysis for integer locals
+"""
+import ast
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from py2mcu.analysis import c_snippets
+
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+# Value range of each C integer type the code generator knows
+TYPE_RANGES = {
+    'bool': (0, 1),
+    'int8_t': (-128, 127), 'uint8_t': (0, 255),
+    'int16_t': (-32768, 32767), 'uint16_t': (0, 65535),
+    'int32_t': (INT32_MIN, INT32_MAX), 'uint32_t': (0, 2 ** 32 - 1),
+}
+
+# Loop iterations before unstable bounds are widened to the int32 limits
+WIDEN_AFTER = 3
+
+Interval = Tuple[int, int]
+Env = Optional[Dict[str, Interval]]   # None: unreachable
+
+
+def _join(a: Optional[Interval], b: Optional[Interval]) -> Optional[Interval]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), max(a[1], b[1]))
+
+
+def _clamp(lo: int, hi: int) -> Interval:
+    """Values are stored in int32_t, so anything outside wraps: give up"""
+    if lo < INT32_MIN or hi > INT32_MAX:
+        return (INT32_MIN, INT32_MAX)
+    return (lo, hi)
+
+
+def _join_env(a: Env, b: Env) -> Env:
+    if a is None:
+        return dict(b) if b is not None else None
+    if b is None:
+        return dict(a)
+    return {name: _join(a.get(name), b.get(name)) for name in set(a) | set(b)}
+
+
+def _widen_env(old: Env, new: Env) -> Env:
+    if old is None or new is None:
+        return new
+    result = {}
+    for name, (lo, hi) in new.items():
+        prev = old.get(name)
+        if prev is None:
+            result[name] = (lo, hi)
+            continue
+        result[name] = (INT32_MIN if lo < prev[0] else lo, INT32_MAX if hi > prev[1] else hi)
+    return result
+
+
+def is_power_of_two(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0 and value & (value - 1) == 0
+
+
+class RangeAnalysis:
+    """
+    Interval analysis over one function
+
+    Candidates are ``int`` locals (annotated ``int`` or unannotated integer
+    assignments).  Parameters, globals and array elements contribute the
+    range of their C type; module constants are exact.  Loops are iterated
+    to a fixpoint with widening followed by one narrowing pass, and every
+    value a candidate can hold is collected.
+
+    Side results used by the code generator:
+        ranges:      candidate name -> interval of all values it can hold
+        arith_ranges: name -> interval of the arithmetic results it takes part in
+        nonneg_ops:  ids of ``//``/``%`` nodes whose left operand is >= 0
+        safe_indexes: ids of ``view[i]`` nodes whose index is always in range
+
+    ``i < len(v)`` facts are tracked as pseudo-variables that are (1, 1)
+    while the fact holds; assigning i or v resets them to (0, 0).
+    """
+
+    def __init__(self, codegen, func: ast.FunctionDef, constants: Dict[str, int]):
+        self.codegen = codegen
+        self.func = func
+        self.constants = constants
+        self.candidates: Set[str] = set()
+        self.elem_ranges: Dict[str, Interval] = {}
+        self.ranges: Dict[str, Interval] = {}
+        self.arith_ranges: Dict[str, Interval] = {}
+        self._binop_ranges: Dict[int, Interval] = {}
+        self.nonneg_ops: Set[int] = set()
+        self._rejected_ops: Set[int] = set()
+        self.safe_indexes: Set[int] = set()
+        self._unsafe_indexes: Set[int] = set()
+        self._facts: Dict[str, List[str]] = {}   # name -> facts it takes part in
+        self._recording = True
+        self._break_envs: List[List[Env]] = []
+        self._continue_envs: List[List[Env]] = []
+
+    def run(self) -> 'RangeAnalysis':
+        self._collect_candidates()
+        env: Env = {}
+        for arg in self.func.args.args:
+            env[arg.arg] = self._type_range(arg.annotation)
+        for facts in self._facts.values():
+            env.update((fact, (0, 0)) for fact in facts)
+        self._exec_block(self.func.body, env)
+        self.nonneg_ops -= self._rejected_ops
+        self.safe_indexes -= self._unsafe_indexes
+        for node in ast.walk(self.func):
+            if isinstance(node, ast.BinOp) and id(node) in self._binop_ranges:
+                for name in _operand_names(node):
+                    self.arith_ranges[name] = _join(self.arith_ranges.get(name), self._binop_ranges[id(node)])
+        return self
+
+    @staticmethod
+    def _fact(index: str, view: str) -> str:
+        return f"{index}<len({view})"
+
+    def _len_of(self, node: ast.AST) -> Optional[str]:
+        """v for ``len(v)`` of a named view, else None"""
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'len'
+                and len(node.args) == 1 and isinstance(node.args[0], ast.Name)
+                and self.codegen._is_view(node.args[0])):
+            return node.args[0].id
+        return None
+
+    # -- candidate selection -------------------------------------------------
+
+    def _collect_candidates(self):
+        params = {arg.arg for arg in self.func.args.args}
+        excluded = set(params)
+        for node in ast.walk(self.func):
+            if isinstance(node, (ast.Global, ast.Nonlocal)):
+                excluded.update(node.names)
+        # Variables touched by inline C can hold anything
+        c_text = '\n'.join(snippet.value for snippet in c_snippets(self.func))
+        for node in ast.walk(self.func):
+            if isinstance(node, ast.Name) and re.search(rf'\b{re.escape(node.id)}\b', c_text):
+                excluded.add(node.id)
+
+        for arg in self.func.args.args:
+            info = self.codegen._array_annotation(arg.annotation) if arg.annotation else None
+            if info is not None:
+                self.elem_ranges[arg.arg] = TYPE_RANGES.get(info[0] or 'int32_t', (INT32_MIN, INT32_MAX))
+
+        declared: Dict[str, bool] = {}
+        for node in ast.walk(self.func):
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                name = node.target.id
+                if self.codegen._array_annotation(node.annotation) is not None:
+                    self.elem_ranges[name] = TYPE_RANGES.get(self.codegen._array_elem_type(node),
+                                                             (INT32_MIN, INT32_MAX))
+                    excluded.add(name)
+                elif isinstance(node.annotation, ast.Name) and node.annotation.id == 'int':
+                    declared.setdefault(name, True)
+                else:
+                    excluded.add(name)
+            elif isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        declared.setdefault(target.id, True)
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.withitem)):
+                bound = node.target if isinstance(node, (ast.For, ast.AsyncFor)) else node.optional_vars
+                for target in ast.walk(bound) if bound is not None else ():
+                    if isinstance(target, ast.Name):
+                        excluded.add(target.id)
+
+        # Facts i < len(v) that loop and branch tests can establish
+        for node in ast.walk(self.func):
+            if isinstance(node, ast.Compare) and len(node.ops) == 1:
+                for index, length in ((node.left, node.comparators[0]), (node.comparators[0], node.left)):
+                    view = self._len_of(length)
+                    if isinstance(index, ast.Name) and view is not None:
+                        fact = self._fact(index.id, view)
+                        for name in (index.id, view):
+                            if fact not in self._facts.setdefault(name, []):
+                                self._facts[name].append(fact)
+
+        # Only locals whose inferred C type is int32_t can be narrowed
+        local_types = getattr(self.codegen, 'local_types', {})
+        excluded.update(name for name, c_type in local_types.items() if c_type != 'int32_t')
+        self.candidates = {name for name in declared if name not in excluded}
+
+    def _type_range(self, annotation: Optional[ast.AST]) -> Interval:
+        c_type = self.codegen._map_type(annotation) if annotation is not None else 'int32_t'
+        return TYPE_RANGES.get(c_type, (INT32_MIN, INT32_MAX))
+
+    # -- statements ----------------------------------------------------------
+
+    def _exec_block(self, stmts: List[ast.stmt], env: Env) -> Env:
+        for stmt in stmts:
+            if env is None:
+                break
+            env = self._exec(stmt, env)
+        return env
+
+    def _exec(self, stmt: ast.stmt, env: Dict[str, Interval]) -> Env:
+        if isinstance(stmt, ast.Assign):
+            value = self._eval(stmt.value, env)
+            for target in stmt.targets:
+                self._assign(target, value, env)
+            return env
+        if isinstance(stmt, ast.AnnAssign):
+            if stmt.value is not None:
+                self._assign(stmt.target, self._eval(stmt.value, env), env)
+            return env
+        if isinstance(stmt, ast.AugAssign):
+            current = ast.BinOp(left=ast.Name(id=stmt.target.id, ctx=ast.Load()), op=stmt.op,
+                                right=stmt.value) if isinstance(stmt.target, ast.Name) else None
+            value = self._eval(current, env) if current is not None else None
+            self._eval(stmt.value, env)
+            self._assign(stmt.target, value, env)
+            return env
+        if isinstance(stmt, ast.If):
+            self._eval(stmt.test, env)
+            body = self._exec_block(stmt.body, self._refine(env, stmt.test, True))
+            orelse = self._exec_block(stmt.orelse, self._refine(env, stmt.test, False))
+            return _join_env(body, orelse)
+        if isinstance(stmt, ast.While):
+            return self._exec_while(stmt, env)
+        if isinstance(stmt, ast.Return):
+            if stmt.value is not None:
+                self._eval(stmt.value, env)
+            return None
+        if isinstance(stmt, ast.Break):
+            if self._break_envs:
+                self._break_envs[-1].append(dict(env))
+            return None
+        if isinstance(stmt, ast.Continue):
+            if self._continue_envs:
+                self._continue_envs[-1].append(dict(env))
+            return None
+        if isinstance(stmt, ast.Expr):
+            self._eval(stmt.value, env)
+            return env
+        # Anything else (for, with, try, ...) may bind locals arbitrarily
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                self._assign(node, (INT32_MIN, INT32_MAX), env)
+        return env
+
+    def _assign(self, target: ast.AST, value: Optional[Interval], env: Dict[str, Interval]):
+        if not isinstance(target, ast.Name):
+            if isinstance(target, (ast.Tuple, ast.List)):
+                for elt in target.elts:
+                    self._assign(elt, None, env)  # a, b = struct.unpack(...): values not tracked
+            if isinstance(target, ast.Subscript):
+                self._eval(target.slice, env)
+                self._check_index(target, env)
+            return
+        for fact in self._facts.get(target.id, ()):
+            env[fact] = (0, 0)
+        if value is None:
+            # Not an integer expression (float, string, ...): not a candidate
+            self.candidates.discard(target.id)
+            self.ranges.pop(target.id, None)
+            value = (INT32_MIN, INT32_MAX)
+        value = _clamp(*value)
+        env[target.id] = value
+        if self._recording and target.id in self.candidates:
+            self.ranges[target.id] = _join(self.ranges.get(target.id), value)
+
+    def _exec_while(self, stmt: ast.While, env: Dict[str, Interval]) -> Env:
+        recording = self._recording
+        self._recording = False
+        header: Env = dict(env)
+        for iteration in range(50):
+            body_out = self._run_loop_body(stmt, header)
+            new = _join_env(env, body_out)
+            if iteration >= WIDEN_AFTER:
+                new = _widen_env(header, new)
+            if new == header:
+                break
+            header = new
+
+        # One narrowing pass recovers bounds implied by the loop test
+        narrowed = _join_env(env, self._run_loop_body(stmt, header))
+        if narrowed is not None and header is not None:
+            header = {name: narrowed.get(name, header[name]) for name in header}
+
+        # Final pass over the stable state records the values
+        self._recording = recording
+        self._break_envs.append([])
+        self._continue_envs.append([])
+        self._eval(stmt.test, header)
+        self._exec_block(stmt.body, self._refine(header, stmt.test, True))
+        breaks = self._break_envs.pop()
+        self._continue_envs.pop()
+
+        exit_env = self._refine(header, stmt.test, False)
+        for broken in breaks:
+            exit_env = _join_env(exit_env, broken)
+        if stmt.orelse:
+            exit_env = self._exec_block(stmt.orelse, exit_env)
+        return exit_env
+
+    def _run_loop_body(self, stmt: ast.While, header: Env) -> Env:
+        """Abstract state flowing back to the loop header after one iteration"""
+        self._break_envs.append([])
+        self._continue_envs.append([])
+        out = self._exec_block(stmt.body, self._refine(header, stmt.test, True))
+        self._break_envs.pop()
+        for env in self._continue_envs.pop():
+            out = _join_env(out, env)
+        return out
+
+    # -- conditions ----------------------------------------------------------
+
+    def _refine(self, env: Env, test: ast.AST, truth: bool) -> Env:
+        """Restrict env to the states where test evaluates to truth"""
+        if env is None:
+            return None
+        if isinstance(test, ast.Constant):
+            return dict(env) if bool(test.value) == truth else None
+        if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            return self._refine(env, test.operand, not truth)
+        if isinstance(test, ast.BoolOp):
+            conjunctive = isinstance(test.op, ast.And) == truth
+            if conjunctive:
+                for value in test.values:
+                    env = self._refine(env, value, truth)
+                return env
+            result: Env = None
+            for value in test.values:
+                result = _join_env(result, self._refine(env, value, truth))
+            return result
+        if isinstance(test, ast.Compare) and len(test.ops) == 1:
+            return self._refine_compare(env, test.left, test.ops[0], test.comparators[0], truth)
+        return dict(env)
+
+    _NEGATED = {ast.Lt: ast.GtE, ast.LtE: ast.Gt, ast.Gt: ast.LtE, ast.GtE: ast.Lt,
+                ast.Eq: ast.NotEq, ast.NotEq: ast.Eq}
+    _SWAPPED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE,
+                ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+    def _refine_compare(self, env, left, op, right, truth) -> Env:
+        op_type = type(op)
+        if op_type not in self._NEGATED:
+            return dict(env)
+        if not truth:
+            op_type = self._NEGATED[op_type]
+        env = dict(env)
+        left_range = self._eval(left, env)
+        right_range = self._eval(right, env)
+        if left_range is None or right_range is None:
+            return env
+        for name_node, other, kind in ((left, right_range, op_type),
+                                       (right, left_range, self._SWAPPED[op_type])):
+            if not (isinstance(name_node, ast.Name) and name_node.id in env):
+                continue
+            lo, hi = env[name_node.id]
+            if kind is ast.Lt:
+                hi = min(hi, other[1] - 1)
+            elif kind is ast.LtE:
+                hi = min(hi, other[1])
+            elif kind is ast.Gt:
+                lo = max(lo, other[0] + 1)
+            elif kind is ast.GtE:
+                lo = max(lo, other[0])
+            elif kind is ast.Eq:
+                lo, hi = max(lo, other[0]), min(hi, other[1])
+            if lo > hi:
+                return None
+            env[name_node.id] = (lo, hi)
+        for index, length, kind in ((left, right, op_type), (right, left, self._SWAPPED[op_type])):
+            view = self._len_of(length)
+            if kind is ast.Lt and isinstance(index, ast.Name) and view is not None:
+                env[self._fact(index.id, view)] = (1, 1)
+        return env
+
+    # -- expressions ---------------------------------------------------------
+
+    def _eval(self, node: Optional[ast.AST], env: Dict[str, Interval]) -> Optional[Interval]:
+        """Interval of an integer expression; None if it is not an integer"""
+        if node is None:
+            return None
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool):
+                return (int(node.value), int(node.value))
+            if isinstance(node.value, int):
+                return (node.value, node.value)
+            return None
+        if isinstance(node, ast.Name):
+            if node.id in env:
+                return env[node.id]
+            if node.id in self.constants:
+                value = self.constants[node.id]
+                return (value, value)
+            return (INT32_MIN, INT32_MAX)
+        if isinstance(node, ast.Subscript):
+            self._eval(node.slice, env)
+            if self.codegen._is_view(node.value):
+                self._eval(node.value, env)
+                self._check_index(node, env)
+                return TYPE_RANGES.get(self.codegen.views[node.value.c_type], (INT32_MIN, INT32_MAX))
+            if isinstance(node.value, ast.Name):
+                return self.elem_ranges.get(node.value.id, (INT32_MIN, INT32_MAX))
+            return (INT32_MIN, INT32_MAX)
+        if isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, env)
+            if operand is None:
+                return None
+            if isinstance(node.op, ast.USub):
+                return _clamp(-operand[1], -operand[0])
+            if isinstance(node.op, ast.Not):
+                return (0, 1)
+            if isinstance(node.op, ast.Invert):
+                return _clamp(~operand[1], ~operand[0])
+            return operand
+        if isinstance(node, ast.BinOp):
+            return self._eval_binop(node, env)
+        if isinstance(node, ast.BoolOp):
+            # Later operands only run when the earlier ones allow it
+            refined: Env = env
+            for value in node.values:
+                if refined is None:
+                    break
+                self._eval(value, refined)
+                refined = self._refine(refined, value, isinstance(node.op, ast.And))
+            return (0, 1)
+        if isinstance(node, ast.Compare):
+            for child in ast.iter_child_nodes(node):
+                self._eval(child, env)
+            return (0, 1)
+        if isinstance(node, ast.Slice):
+            for bound in (node.lower, node.upper, node.step):
+                self._eval(bound, env)
+            return None
+        if isinstance(node, ast.IfExp):
+            self._eval(node.test, env)
+            return _join(self._eval(node.body, env), self._eval(node.orelse, env))
+        if isinstance(node, ast.Call):
+            for arg in node.args:
+                self._eval(arg, env)
+            return self._call_range(node)
+        if isinstance(node, ast.JoinedStr):
+            for part in node.values:
+                if isinstance(part, ast.FormattedValue):
+                    self._eval(part.value, env)
+            return None
+        return (INT32_MIN, INT32_MAX)
+
+    def _check_index(self, node: ast.Subscript, env: Dict[str, Interval]):
+        """Record whether view[index] is in range in this state"""
+        if isinstance(node.slice, ast.Slice) or not self.codegen._is_view(node.value) or not self._recording:
+            return
+        interval = self._eval(node.slice, env)
+        length = self.codegen._view_length(node.value)
+        safe = False
+        if interval is not None:
+            lo, hi = interval
+            if length is not None:
+                safe = 0 <= lo and hi < length or -length <= lo and hi < 0
+            if (not safe and lo >= 0 and isinstance(node.slice, ast.Name) and isinstance(node.value, ast.Name)
+                    and env.get(self._fact(node.slice.id, node.value.id)) == (1, 1)):
+                safe = True
+        (self.safe_indexes if safe else self._unsafe_indexes).add(id(node))
+
+    def _call_range(self, node: ast.Call) -> Optional[Interval]:
+        folded = getattr(node, 'folded_c', None)
+        if folded is not None and re.fullmatch(r'-?\d+', folded):
+            return (int(folded), int(folded))  # evaluated at compile time
+        if (isinstance(node.func, ast.Name) and node.func.id == 'len' and len(node.args) == 1
+                and self.codegen._is_view(node.args[0])):
+            length = self.codegen._view_length(node.args[0])
+            return (length, length) if length is not None else (0, INT32_MAX)
+        if isinstance(node.func, ast.Name):
+            func = self.codegen.function_defs.get(node.func.id)
+            if func is not None:
+                return_type = self.codegen._map_type(func.returns) if func.returns else 'void'
+                if return_type == 'float':
+                    return None
+                return TYPE_RANGES.get(return_type, (INT32_MIN, INT32_MAX))
+            if node.func.id in ('float',):
+                return None
+        return (INT32_MIN, INT32_MAX)
+
+    def _eval_binop(self, node: ast.BinOp, env) -> Optional[Interval]:
+        result = self._binop_interval(node, env)
+        if result is not None and self._recording:
+            self._binop_ranges[id(node)] = _join(self._binop_ranges.get(id(node)), result)
+        return result
+
+    def _binop_interval(self, node: ast.BinOp, env) -> Optional[Interval]:
+        left = self._eval(node.left, env)
+        right = self._eval(node.right, env)
+        op = node.op
+        if isinstance(op, (ast.FloorDiv, ast.Mod)) and self._recording:
+            # Record whether the strength-reduced form would be exact
+            if left is not None and left[0] >= 0:
+                self.nonneg_ops.add(id(node))
+            else:
+                self._rejected_ops.add(id(node))
+        if left is None or right is None or isinstance(op, ast.Div):
+            return None
+        (a, b), (c, d) = left, right
+        if isinstance(op, ast.Add):
+            return _clamp(a + c, b + d)
+        if isinstance(op, ast.Sub):
+            return _clamp(a - d, b - c)
+        if isinstance(op, ast.Mult):
+            products = (a * c, a * d, b * c, b * d)
+            return _clamp(min(products), max(products))
+        if isinstance(op, ast.FloorDiv) and c == d and c > 0:
+            # C truncates, Python floors; the union of both covers either
+            return _clamp(min(a // c, -(-a // c)), max(b // c, -(-b // c)))
+        if isinstance(op, ast.Mod) and c == d and c > 0:
+            return (0, c - 1) if a >= 0 else (-(c - 1), c - 1)
+        if isinstance(op, ast.BitAnd) and (a >= 0 or c >= 0):
+            return (0, min(b if a >= 0 else d, d if c >= 0 else b))
+        if isinstance(op, ast.RShift) and a >= 0 and c >= 0:
+            return (a >> d, b >> c)
+        if isinstance(op, ast.LShift) and a >= 0 and c >= 0 and d < 31:
+            return _clamp(a << c, b << d)
+        return (INT32_MIN, INT32_MAX)
+
+
+def _operand_names(node: ast.AST) -> Set[str]:
+    """Names whose values node's arithmetic works on (not call arguments or indexes)"""
+    if isinstance(node, ast.Name):
+        return {node.id}
+    if isinstance(node, ast.BinOp):
+        return _operand_names(node.left) | _operand_names(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return _operand_names(node.operand)
+    if isinstance(node, ast.IfExp):
+        return _operand_names(node.body) | _operand_names(node.orelse)
+    return set()
+
+
+def fits_int16(interval: Interval) -> bool:
+    return -32768 <= interval[0] and interval[1] <= 32767
+
+
+def narrow_int_type(interval: Interval, word_bits: int, arith: Optional[Interval] = None) -> Optional[str]:
+    """Smallest safe C type for a local holding values in interval
+
+    Unsigned types are only used when they are narrower than ``int`` so that
+    arithmetic with signed values still promotes to signed ``int``.  On
+    targets with 32-bit or wider registers the ``int_fastN_t`` types are used
+    so the compiler keeps the native register width where that is cheaper.
+    ``int`` is 16 bits on 8- and 16-bit targets, so there a local is only
+    narrowed if the arithmetic it takes part in (arith) fits 16 bits too.
+    """
+    lo, hi = interval
+    if word_bits <= 16:
+        if arith is not None and not fits_int16(arith):
+            return None
+        if 0 <= lo and hi <= 255:
+            return 'uint8_t'
+        if -128 <= lo and hi <= 127:
+            return 'int8_t'
+        if -32768 <= lo and hi <= 32767:
+            return 'int16_t'
+        return None
+    if -128 <= lo and hi <= 127:
+        return 'int_fast8_t'
+    if -32768 <= lo and hi <= 32767:
+        return 'int_fast16_t'
+    return None
+
+
+def format_interval(interval: Interval) -> str:
+    lo, hi = interval
+    lo_text = '-inf' if lo <= INT32_MIN else str(lo)
+    hi_text = '+inf' if hi >= INT32_MAX else str(hi)
+    return f"[{lo_text}, {hi_text}]"
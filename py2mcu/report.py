@@ -0,0 +1,40 @@
+"""
+Optimization and resource report collected during compilation
+"""
+from typing import Dict, List
+
+
+class Report:
+    """Ordered collection of report lines grouped by section
+
+    Passes append human-readable lines with ``add()``; the CLI prints the
+    result of ``format()`` when ``--report`` is given.
+    """
+
+    def __init__(self):
+        self.sections: Dict[str, List[str]] = {}
+        self.warnings: List[str] = []
+
+    def add(self, section: str, line: str):
+        """Append a line to a section, creating the section on first use"""
+        self.sections.setdefault(section, []).append(line)
+
+    def warn(self, message: str):
+        """Record a diagnostic that the CLI always prints"""
+        self.warnings.append(message)
+
+    def lines(self, section: str) -> List[str]:
+        """Return the lines of one section (empty if it was never used)"""
+        return self.sections.get(section, [])
+
+    def clear(self):
+        self.sections = {}
+        self.warnings = []
+
+    def format(self) -> str:
+        """Render all sections as plain text"""
+        out: List[str] = []
+        for section, lines in self.sections.items():
+            out.append(f"== {section} ==")
+            out.extend(f"  {line}" for line in lines)
+        return '\n'.join(out)
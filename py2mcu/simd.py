@@ -0,0 +1,209 @@
+"""
+SIMD lowering of fused array loops
+
+The loops of array expressions (py2mcu/elementwise.py) get a vector main
+loop ahead of the scalar one.  The scalar loop finishes the elements left
+over and does all the work when the vector block is compiled out, so
+every build has the scalar fallback:
+
+    vector    GCC/Clang vector extensions, 16-byte vectors (PC).  The
+              expression is computed in lanes of its C type, so results
+              match the scalar loop: int16_t operands of an int32_t
+              expression are widened first.  When the operands and the
+              target have one integer type and the operations wrap
+              (+ - * & | ^ ~), the narrow type is used and more lanes fit.
+    dsp       Cortex-M4/M7 DSP extension: two 16-bit or four 8-bit lanes
+              in a 32-bit register (__SADD16, __QADD16, ...), __SMLAD for
+              16-bit dot products.
+
+Saturating fixed-point add, subtract and negate are vectorized too: with
+an overflow mask on PC, with __QADD16/__QSUB16 on the DSP.  Float sums
+keep their scalar loop (vectors would change the rounding).
+"""
+import ast
+import math
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from py2mcu.elementwise import array_elem, is_array_expr, is_array_leaf, repeats_list
+from py2mcu.fixed import format_of_c_type
+from py2mcu.idioms import short_name
+
+VECTOR_BYTES = 16
+LANE_TYPES = {'int8_t': 1, 'uint8_t': 1, 'int16_t': 2, 'uint16_t': 2, 'int32_t': 4, 'uint32_t': 4,
+              'int64_t': 8, 'float': 4}
+# Operations whose low bits do not depend on the high bits of the operands
+WRAPPING_OPS = (ast.Add, ast.Sub, ast.Mult, ast.BitAnd, ast.BitOr, ast.BitXor)
+WRAPPING_UNARY = (ast.USub, ast.UAdd, ast.Invert)
+
+# (operation, element type) -> packed DSP intrinsic on a 32-bit register
+DSP_INTRINSICS = {
+    ('add', 'int16_t'): '__SADD16', ('sub', 'int16_t'): '__SSUB16',
+    ('add', 'uint16_t'): '__UADD16', ('sub', 'uint16_t'): '__USUB16',
+    ('add', 'int8_t'): '__SADD8', ('sub', 'int8_t'): '__SSUB8',
+    ('add', 'uint8_t'): '__UADD8', ('sub', 'uint8_t'): '__USUB8',
+    ('add', 'saturating16'): '__QADD16', ('sub', 'saturating16'): '__QSUB16',
+}
+
+
+class SimdLoop(NamedTuple):
+    """Vector main loop of an array loop, compiled in under #if guard"""
+    guard: str              # PY2MCU_SIMD_VECTOR or PY2MCU_SIMD_DSP
+    lanes: int              # elements per iteration
+    prologue: List[str]     # before the loop (vector accumulators)
+    body: List[str]
+    epilogue: List[str]     # after the loop (horizontal sum)
+    note: str               # for the optimization report
+
+
+def vector_name(elem_type: str, lanes: int) -> str:
+    """Vector typedef name: py2mcu_v8_i16 is 8 int16_t lanes"""
+    return f"py2mcu_v{lanes}_{short_name(elem_type)}"
+
+
+def lane_type(value: ast.AST, target_type: str, views: Dict[str, str]) -> Optional[str]:
+    """C type of the vector lanes that compute value for a target_type array, None if it does not vectorize
+
+    The tree may only hold element-wise + - * (and / for floats), bitwise
+    operations and scalars without calls.
+    """
+    leaves = array_leaves(value, views)
+    if not leaves or target_type not in LANE_TYPES:
+        return None
+    leaf_types = {array_elem(leaf.c_type, views) for leaf in leaves}
+    if not leaf_types <= set(LANE_TYPES):
+        return None
+    expr_type = array_elem(value.c_type, views)
+    floats = expr_type == 'float'
+    if floats and target_type != 'float':
+        return None  # float to integer stores stay scalar
+    wrapping = True
+    for node in elementwise_nodes(value, views):
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Div) and floats:
+                wrapping = False
+            elif not isinstance(node.op, WRAPPING_OPS):
+                return None
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, WRAPPING_UNARY) or (floats and isinstance(node.op, ast.Invert)):
+                return None
+        else:
+            return None  # comparisons give -1 in a vector, abs() has no vector form
+    for scalar in scalar_operands(value, views):
+        c_type = getattr(scalar, 'c_type', None)
+        if c_type not in LANE_TYPES or any(isinstance(child, ast.Call) for child in ast.walk(scalar)):
+            return None
+    if wrapping and not floats and leaf_types == {target_type} and LANE_TYPES[target_type] < 4:
+        return target_type  # the low bits are all the target keeps
+    if expr_type in ('int32_t', 'uint32_t', 'float', 'int64_t'):
+        return expr_type
+    return None
+
+
+def saturating_pattern(value: ast.AST, target_type: str, views: Dict[str, str]) -> Optional[str]:
+    """'add', 'sub' or 'neg' for ``a + b``, ``a - b``, ``-a`` on fixed-point arrays of target_type"""
+    fmt = format_of_c_type(target_type)
+    if fmt is None or array_elem(getattr(value, 'c_type', None), views) != target_type:
+        return None
+    leaves = [child for child in ast.iter_child_nodes(value) if is_array_leaf(child, views)]
+    if any(array_elem(leaf.c_type, views) != target_type for leaf in leaves):
+        return None
+    if isinstance(value, ast.BinOp) and isinstance(value.op, (ast.Add, ast.Sub)) and len(leaves) == 2:
+        return 'add' if isinstance(value.op, ast.Add) else 'sub'
+    if isinstance(value, ast.UnaryOp) and isinstance(value.op, ast.USub) and len(leaves) == 1:
+        return 'neg'
+    return None
+
+
+def dsp_pattern(value: ast.AST, target_type: str, views: Dict[str, str]):
+    """(intrinsic, array operands, scalar operand or None) for a packed DSP store, else None"""
+    fmt = format_of_c_type(target_type)
+    if fmt is not None:
+        kind = saturating_pattern(value, target_type, views) if fmt.bits == 16 else None
+        if kind is None:
+            return None
+        leaves = [child for child in ast.iter_child_nodes(value) if is_array_leaf(child, views)]
+        if kind == 'neg':
+            return '__QSUB16', [None] + leaves, None  # 0 - a, saturating
+        return DSP_INTRINSICS[(kind, 'saturating16')], leaves, None
+    if isinstance(value, ast.UnaryOp) and isinstance(value.op, ast.USub) and is_array_leaf(value.operand, views):
+        intrinsic = DSP_INTRINSICS.get(('sub', target_type))
+        if intrinsic and array_elem(value.operand.c_type, views) == target_type:
+            return intrinsic, [None, value.operand], None
+        return None
+    if not (isinstance(value, ast.BinOp) and isinstance(value.op, (ast.Add, ast.Sub))):
+        return None
+    intrinsic = DSP_INTRINSICS.get(('add' if isinstance(value.op, ast.Add) else 'sub', target_type))
+    if intrinsic is None:
+        return None
+    left, right = value.left, value.right
+    arrays = [side for side in (left, right) if is_array_leaf(side, views)]
+    if any(array_elem(side.c_type, views) != target_type for side in arrays):
+        return None
+    if len(arrays) == 2:
+        return intrinsic, arrays, None
+    if len(arrays) == 1 and arrays[0] is left and getattr(right, 'c_type', None) in LANE_TYPES \
+            and right.c_type != 'float' and not any(isinstance(child, ast.Call) for child in ast.walk(right)):
+        return intrinsic, arrays, right
+    return None
+
+
+def guaranteed_alignment(base_alignment: int, offset, step_bytes: int, elem_size: int) -> int:
+    """Alignment in bytes of ``base + offset + k`` for every k the vector loop visits (k steps by step_bytes)"""
+    if not base_alignment or not isinstance(offset, int):
+        return elem_size
+    return math.gcd(math.gcd(base_alignment, step_bytes), offset * elem_size or base_alignment)
+
+
+def simd_operands(tree: ast.Module) -> Set[str]:
+    """Names used whole in arithmetic: the arrays worth aligned storage
+
+    Decided before types are known, so a scalar may be named too; only
+    arrays are declared aligned.
+    """
+    names = set()
+
+    def add(node: ast.AST):
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+            node = node.value
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.BinOp) and not repeats_list(node):
+            add(node.left)
+            add(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            add(node.operand)
+        elif isinstance(node, ast.Compare):
+            for operand in [node.left] + node.comparators:
+                add(operand)
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)) and isinstance(node.value, ast.BinOp) \
+                and not repeats_list(node.value):
+            for target in getattr(node, 'targets', None) or [node.target]:
+                add(target)
+    return names
+
+
+def array_leaves(node: ast.AST, views: Dict[str, str]) -> List[ast.AST]:
+    if is_array_leaf(node, views):
+        return [node]
+    if not is_array_expr(node, views):
+        return []
+    return [leaf for child in ast.iter_child_nodes(node) for leaf in array_leaves(child, views)]
+
+
+def elementwise_nodes(node: ast.AST, views: Dict[str, str]):
+    """Element-wise operations of an array expression"""
+    if is_array_expr(node, views):
+        yield node
+        for child in ast.iter_child_nodes(node):
+            yield from elementwise_nodes(child, views)
+
+
+def scalar_operands(node: ast.AST, views: Dict[str, str]):
+    """Largest scalar subexpressions of an array expression"""
+    for child in ast.iter_child_nodes(node):
+        if is_array_expr(child, views):
+            yield from scalar_operands(child, views)
+        elif isinstance(child, ast.expr) and not is_array_leaf(child, views):
+            yield child
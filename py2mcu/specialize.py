@@ -0,0 +1,396 @@
+"""
+Function specialization on constant arguments
+
+Helpers such as ``gpio_write(pin, value)`` are mostly called with literal
+arguments.  Only the int and bool parameters that an ``if``/``while``
+test or a conditional expression reads are considered.  For each
+combination of constant values for them that is hot (called from two
+places, or from a loop) this pass adds a clone of the function without
+those parameters:
+
+    gpio_write(13, True)   ->   gpio_write_13_1()
+
+In the clone the parameters are literals, so the ``if``/``while`` tests
+and conditional expressions they decide are folded to the branch taken.
+Inline C in the clone is kept as written.  A parameter the C code names
+becomes a local constant, so ``#ifdef`` blocks still see it and the C
+compiler folds what they contain.  A clone is made only if it folds at
+least one test.  Clones of clones are found in later rounds.
+
+Every clone adds code, so the statements of all clones are capped at a
+fraction of the module's statements: none at -O1, a quarter at -O2 and
+as many again at -O3.  The hottest combinations are cloned first.  The
+generic function stays for the other calls and for callers outside the
+module.
+"""
+import ast
+import copy
+import re
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from py2mcu.analysis import (build_call_graph, c_snippets, eval_const_int, function_has_c_body, module_functions,
+                             recursive_functions)
+from py2mcu.inference import convert_int, is_int_type
+from py2mcu.purity import IMPURE, PurityAnalysis
+
+# Fraction of the module's statements that clones may add, per -O level
+GROWTH = {2: 0.25, 3: 1.0}
+# Weight of a call site inside a loop against one outside loops
+LOOP_WEIGHT = 10
+# Heat a combination needs to be cloned: two call sites, or one in a loop
+MIN_HEAT = 2
+ROUNDS = 3
+
+Combination = Tuple[Tuple[str, object], ...]   # ((parameter, value), ...) in parameter order
+
+
+class CallSite(NamedTuple):
+    node: ast.Call
+    weight: int
+
+
+def growth_limit(optimize_level: int) -> float:
+    if optimize_level < 2:
+        return 0.0
+    return GROWTH.get(optimize_level, max(GROWTH.values()))
+
+
+def count_statements(func: ast.FunctionDef) -> int:
+    """Statements of func's body, ``global`` and ``pass`` aside"""
+    return sum(1 for node in ast.walk(func) if isinstance(node, ast.stmt) and node is not func
+               and not isinstance(node, (ast.Global, ast.Pass)))
+
+
+def _constant_argument(node: ast.AST, constants: Dict[str, int]):
+    """int or bool value of a call argument, None if it is not a constant"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+        return node.value
+    return eval_const_int(node, constants)
+
+
+def _truth(node: ast.AST, constants: Dict[str, int], effect_free) -> Optional[bool]:
+    """
+    Truth value of a test made of literals and known constants, None if unknown
+
+    ``and``/``or`` operands are evaluated in order, so a constant operand
+    decides the test only if effect_free(operand) holds for every operand
+    before it.  Otherwise the test is kept, and the operands that cannot
+    change its value and those after the deciding one, which never run,
+    are dropped from node in place.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, (bool, int)):
+        return bool(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        value = _truth(node.operand, constants, effect_free)
+        return None if value is None else not value
+    if isinstance(node, ast.BoolOp):
+        decisive = isinstance(node.op, ast.Or)      # True decides or, False decides and
+        kept = []
+        for value in node.values:
+            truth = _truth(value, constants, effect_free)
+            if truth is None:
+                kept.append(value)
+            elif truth == decisive:
+                if all(effect_free(operand) for operand in kept):
+                    return decisive
+                kept.append(value)
+                break
+        if not kept:
+            return not decisive
+        if len(kept) > 1:
+            node.values = kept
+        return None
+    if isinstance(node, ast.Compare):
+        operands = [_int_value(part, constants) for part in [node.left] + node.comparators]
+        if None in operands or any(type(op) not in _COMPARE for op in node.ops):
+            return None
+        return all(_COMPARE[type(op)](left, right) for op, left, right in zip(node.ops, operands, operands[1:]))
+    value = eval_const_int(node, constants)
+    return None if value is None else bool(value)
+
+
+def _int_value(node: ast.AST, constants: Dict[str, int]) -> Optional[int]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+        return int(node.value)
+    return eval_const_int(node, constants)
+
+
+_COMPARE = {
+    ast.Eq: lambda a, b: a == b, ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b, ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b, ast.GtE: lambda a, b: a >= b,
+}
+
+
+def _tests(func: ast.FunctionDef) -> List[ast.expr]:
+    """Tests of the if/while statements and conditional expressions in func"""
+    return [node.test for node in ast.walk(func) if isinstance(node, (ast.If, ast.While, ast.IfExp))]
+
+
+class _Substitute(ast.NodeTransformer):
+    """Parameters -> literals; conditional expressions with a known test -> their branch"""
+
+    def __init__(self, values: Dict[str, object], constants: Dict[str, int], effect_free):
+        self.values = values
+        self.constants = constants
+        self.effect_free = effect_free
+        self.folded = 0
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load) and node.id in self.values:
+            literal = ast.copy_location(ast.Constant(self.values[node.id]), node)
+            literal.c_type = getattr(node, 'c_type', None)
+            return literal
+        return node
+
+    def visit_IfExp(self, node: ast.IfExp):
+        self.generic_visit(node)
+        truth = _truth(node.test, self.constants, self.effect_free)
+        if truth is None:
+            return node
+        self.folded += 1
+        return node.body if truth else node.orelse
+
+
+class Specializer:
+    """Clones of the module's functions for hot constant arguments"""
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.constants = codegen.module_int_constants
+        self.clones: Dict[Tuple[str, Combination], str] = {}     # (function, combination) -> clone
+        self.origin: Dict[str, str] = {}                          # clone -> generic function
+        self.lines: List[str] = []
+        functions = module_functions(tree)
+        self.budget = int(growth_limit(codegen.optimize_level) * sum(count_statements(f) for f in functions.values()))
+        self.spent = 0
+        self.refused: Set[Tuple[str, Combination]] = set()
+        self.purity: Optional[PurityAnalysis] = None
+
+    def run(self) -> 'Specializer':
+        if self.budget <= 0:
+            return self
+        self.purity = PurityAnalysis(self.codegen, self.tree).run()
+        for _ in range(ROUNDS):
+            if not self._round():
+                break
+        return self
+
+    def report_lines(self) -> List[str]:
+        return self.lines
+
+    def _effect_free(self, node: ast.AST) -> bool:
+        """True if evaluating node has no side effects: folding it away loses nothing"""
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Call) and self.purity.call_level(sub) == IMPURE:
+                return False
+            if isinstance(sub, ast.NamedExpr) or (isinstance(sub, ast.Name) and sub.id in self.purity.volatile):
+                return False
+        return True
+
+    # -- one round ------------------------------------------------------------------
+
+    def _round(self) -> bool:
+        functions = module_functions(self.tree)
+        candidates = self._candidates(functions)
+        sites: Dict[Tuple[str, Combination], List[CallSite]] = {}
+        for caller, func in functions.items():
+            if caller in self.codegen.comptime_functions or caller in self.codegen.luts:
+                continue
+            for node, depth in self._calls(func.body, 0):
+                callee = node.func.id
+                if callee not in candidates or getattr(node, 'folded_c', None) is not None:
+                    continue
+                combination = self._combination(node, functions[callee], candidates[callee])
+                if combination:
+                    weight = LOOP_WEIGHT if depth else 1
+                    sites.setdefault((callee, combination), []).append(CallSite(node, weight))
+        made = False
+        ranked = sorted(sites.items(), key=lambda item: (-sum(site.weight for site in item[1]),
+                                                         item[1][0].node.lineno))
+        for key, calls in ranked:
+            if key not in self.clones:
+                heat = sum(site.weight for site in calls)
+                if heat < MIN_HEAT or key in self.refused or not self._clone(key, functions[key[0]], len(calls)):
+                    continue
+                made = True
+            for site in calls:
+                self._redirect(site.node, key)
+        return made
+
+    def _candidates(self, functions: Dict[str, ast.FunctionDef]) -> Dict[str, Dict[str, str]]:
+        """function -> {parameter: C type} of the int and bool parameters it tests and never assigns"""
+        recursive = recursive_functions(build_call_graph(self.tree))
+        result = {}
+        for name, func in functions.items():
+            args = func.args
+            if (name == 'main' or name in recursive or function_has_c_body(func) or func.decorator_list
+                    or args.vararg or args.kwarg or args.kwonlyargs or args.defaults
+                    or getattr(args, 'posonlyargs', None) or name in self.codegen.luts
+                    or name in self.codegen.comptime_functions):
+                continue
+            stored = {node.id for node in ast.walk(func) if isinstance(node, ast.Name)
+                      and not isinstance(node.ctx, ast.Load)}
+            stored |= {n for node in ast.walk(func) if isinstance(node, ast.Global) for n in node.names}
+            tested = {node.id for test in _tests(func) for node in ast.walk(test) if isinstance(node, ast.Name)}
+            params = {}
+            for c_type, param in self.codegen._param_list(func):
+                if param in tested and param not in stored and (c_type == 'bool' or is_int_type(c_type)):
+                    params[param] = c_type
+            if params:
+                result[name] = params
+        return result
+
+    def _calls(self, stmts: List[ast.stmt], depth: int):
+        """(call to a module function, enclosing loop depth), outside nested definitions"""
+        for stmt in stmts:
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            for field, value in ast.iter_fields(stmt):
+                items = value if isinstance(value, list) else [value]
+                if items and isinstance(items[0], ast.stmt):
+                    looped = field == 'body' and isinstance(stmt, (ast.While, ast.For))
+                    yield from self._calls(items, depth + 1 if looped else depth)
+                    continue
+                for item in items:
+                    if isinstance(item, ast.AST):
+                        for node in ast.walk(item):
+                            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+                                yield node, depth
+
+    def _combination(self, call: ast.Call, func: ast.FunctionDef, params: Dict[str, str]) -> Combination:
+        if any(isinstance(arg, ast.Starred) for arg in call.args) or any(kw.arg is None for kw in call.keywords):
+            return ()
+        names = [arg.arg for arg in func.args.args]
+        bound = dict(zip(names, call.args))
+        bound.update({kw.arg: kw.value for kw in call.keywords})
+        if len(call.args) > len(names) or set(bound) != set(names):
+            return ()
+        combination = []
+        for name in names:
+            if name in params:
+                value = _constant_argument(bound[name], self.constants)
+                if value is not None:
+                    # The clone sees what the parameter would hold: gpio(300) passes 44 to a uint8_t pin
+                    value = convert_int(int(value), params[name])
+                    combination.append((name, bool(value) if params[name] == 'bool' else value))
+        return tuple(combination)
+
+    # -- clones ---------------------------------------------------------------------
+
+    def _clone(self, key: Tuple[str, Combination], func: ast.FunctionDef, calls: int) -> bool:
+        name, combination = key
+        values = dict(combination)
+        clone = copy.deepcopy(func)
+        clone.name = self._clone_name(name, combination)
+        clone.args.args = [arg for arg in clone.args.args if arg.arg not in values]
+        substitute = _Substitute(values, {**self.constants, **{k: int(v) for k, v in values.items()}},
+                                 self._effect_free)
+        clone.body = [substitute.visit(stmt) for stmt in clone.body]
+        clone.body, decided = self._fold_block(clone.body)
+        folded = decided + substitute.folded
+        described = self._describe(name, combination)
+        if not folded:
+            return False
+        cost = count_statements(clone)     # the constants declared for inline C cost no code
+        if self.spent + cost > self.budget:
+            self.refused.add(key)
+            self.lines.append(f"{described}: {calls} call{'s' if calls > 1 else ''} kept on the generic function "
+                              f"(clone of {cost} statements over the code growth budget of {self.budget})")
+            return False
+        self._declare_named_in_c(func, clone, values)
+        if not clone.body:
+            clone.body = [ast.copy_location(ast.Pass(), func)]
+        self.spent += cost
+        self._insert(func, clone)
+        self.clones[key] = clone.name
+        self.origin[clone.name] = self.origin.get(name, name)
+        self.lines.append(f"{described}: {calls} call{'s' if calls > 1 else ''} -> {clone.name}() "
+                          f"({folded} test{'s' if folded > 1 else ''} folded, "
+                          f"{count_statements(func)} -> {cost} statements)")
+        return True
+
+    def _fold_block(self, stmts: List[ast.stmt]) -> Tuple[List[ast.stmt], int]:
+        """stmts with the if/while statements whose test is known replaced by what runs"""
+        result, decided = [], 0
+        constants = self.constants
+        for stmt in stmts:
+            if isinstance(stmt, ast.If):
+                truth = _truth(stmt.test, constants, self._effect_free)
+                if truth is not None:
+                    branch, count = self._fold_block(stmt.body if truth else stmt.orelse)
+                    result.extend(branch)
+                    decided += count + 1
+                    continue
+                stmt.body, count = self._fold_block(stmt.body)
+                stmt.orelse, more = self._fold_block(stmt.orelse)
+                decided += count + more
+                if not stmt.body:
+                    stmt.body = [ast.copy_location(ast.Pass(), stmt)]
+            elif isinstance(stmt, ast.While):
+                if _truth(stmt.test, constants, self._effect_free) is False:
+                    branch, count = self._fold_block(stmt.orelse)
+                    result.extend(branch)
+                    decided += count + 1
+                    continue
+                stmt.body, count = self._fold_block(stmt.body)
+                decided += count
+            result.append(stmt)
+        return result, decided
+
+    def _declare_named_in_c(self, func: ast.FunctionDef, clone: ast.FunctionDef, values: Dict[str, object]):
+        """Parameters that inline C refers to become local constants of the clone"""
+        snippets = [snippet.value for snippet in c_snippets(clone)]
+        types = dict((param, c_type) for c_type, param in self.codegen._param_list(func))
+        declarations = []
+        for param, value in values.items():
+            if any(re.search(rf'\b{re.escape(param)}\b', text) for text in snippets):
+                annotation = next(arg.annotation for arg in func.args.args if arg.arg == param)
+                target = ast.Name(id=param, ctx=ast.Store())
+                target.c_type = types[param]
+                literal = ast.Constant(value)
+                literal.c_type = types[param]
+                declaration = ast.AnnAssign(target=target, annotation=copy.deepcopy(annotation)
+                                            or ast.Name(id='int', ctx=ast.Load()), value=literal, simple=1)
+                for node in (declaration, target, literal):
+                    ast.copy_location(node, func)
+                declarations.append(declaration)
+        clone.body[:0] = declarations
+
+    def _clone_name(self, name: str, combination: Combination) -> str:
+        parts = [str(int(value)) if value >= 0 else f"m{-int(value)}" for _, value in combination]
+        clone = f"{name}_{'_'.join(parts)}"
+        taken = set(module_functions(self.tree)) | self.codegen.defined_names
+        while clone in taken:
+            clone += "_"
+        return clone
+
+    def _insert(self, func: ast.FunctionDef, clone: ast.FunctionDef):
+        """Place clone after func and its earlier clones"""
+        generic = self.origin.get(func.name, func.name)
+        position = self.tree.body.index(func) + 1
+        while position < len(self.tree.body) and isinstance(self.tree.body[position], ast.FunctionDef) \
+                and self.origin.get(self.tree.body[position].name) == generic:
+            position += 1
+        self.tree.body.insert(position, clone)
+        self.codegen.defined_names.add(clone.name)
+        types = self.codegen.types
+        types.functions[clone.name] = clone
+        types.locals[clone.name] = dict(types.locals.get(func.name, {}))
+        if func.name in types.returns:
+            types.returns[clone.name] = types.returns[func.name]
+
+    def _redirect(self, call: ast.Call, key: Tuple[str, Combination]):
+        """Call the clone with the arguments that are not part of the combination"""
+        name, combination = key
+        fixed = {param for param, _ in combination}
+        func = module_functions(self.tree)[name]
+        names = [arg.arg for arg in func.args.args]
+        call.args = [arg for param, arg in zip(names, call.args) if param not in fixed]
+        call.keywords = [kw for kw in call.keywords if kw.arg not in fixed]
+        call.func = ast.copy_location(ast.Name(id=self.clones[key], ctx=ast.Load()), call.func)
+
+    @staticmethod
+    def _describe(name: str, combination: Combination) -> str:
+        return f"{name}({', '.join(f'{param}={value}' for param, value in combination)})"
@@ -0,0 +1,147 @@
+"""
+Constant ``struct`` formats and ``int.from_bytes`` as direct byte loads/stores
+
+Every field becomes one call of a py2mcu_load_* / py2mcu_store_* helper
+from runtime/py2mcu_bytes.h.  The helpers assemble values byte by byte, so
+they are endian-correct and alignment-safe on every core; compilers turn
+them into single loads where the target allows unaligned access.
+"""
+import ast
+from typing import List, NamedTuple, Optional
+
+# Byte order prefixes with standard sizes and no padding (MCUs are little-endian)
+BYTE_ORDERS = {'<': 'le', '=': 'le', '>': 'be', '!': 'be'}
+
+# Format code -> (size, C type of the unpacked value)
+CODES = {
+    '?': (1, 'bool'), 'b': (1, 'int8_t'), 'B': (1, 'uint8_t'),
+    'h': (2, 'int16_t'), 'H': (2, 'uint16_t'),
+    'i': (4, 'int32_t'), 'I': (4, 'uint32_t'), 'l': (4, 'int32_t'), 'L': (4, 'uint32_t'),
+    'q': (8, 'int64_t'), 'Q': (8, 'uint64_t'),
+    'f': (4, 'float'), 'd': (8, 'double'),
+}
+
+# Unsigned storage type by size
+UNSIGNED = {1: 'uint8_t', 2: 'uint16_t', 4: 'uint32_t', 8: 'uint64_t'}
+LOAD_NAMES = {'float': 'f32', 'double': 'f64'}
+
+
+class Field(NamedTuple):
+    """One value of a struct format"""
+    code: str
+    offset: int
+    size: int
+    c_type: Optional[str]    # None for 's' (a view of `size` bytes) and 'x' (padding)
+
+
+def parse_format(fmt: str) -> tuple:
+    """(byte order suffix, fields, total size) of a struct format
+
+    Raises ValueError for formats that have no fixed layout on the target.
+    """
+    if not fmt or fmt[0] not in BYTE_ORDERS:
+        raise ValueError(f"struct format {fmt!r} needs an explicit byte order ('<', '>', '!' or '=')")
+    order = BYTE_ORDERS[fmt[0]]
+    fields: List[Field] = []
+    offset = 0
+    count = ''
+    for char in fmt[1:]:
+        if char.isdigit():
+            count += char
+            continue
+        if char.isspace() and not count:
+            continue
+        repeat = int(count) if count else 1
+        count = ''
+        if char in 'xs':
+            fields.append(Field(char, offset, repeat, None))
+            offset += repeat
+        elif char in CODES:
+            size, c_type = CODES[char]
+            for _ in range(repeat):
+                fields.append(Field(char, offset, size, c_type))
+                offset += size
+        else:
+            raise ValueError(f"struct format code {char!r} is not supported")
+    if count:
+        raise ValueError(f"struct format {fmt!r} ends with a repeat count")
+    return order, fields, offset
+
+
+def values(fields: List[Field]) -> List[Field]:
+    """The fields that pack and unpack a value (all but padding)"""
+    return [field for field in fields if field.code != 'x']
+
+
+def _first_byte(pointer: str) -> str:
+    return f"{pointer}[0]" if pointer.isidentifier() else f"({pointer})[0]"
+
+
+def load(field: Field, order: str, pointer: str) -> str:
+    """C expression reading field from the bytes at pointer"""
+    if field.code == '?':
+        return f"({_first_byte(pointer)} != 0)"
+    if field.size == 1:
+        return f"(({field.c_type}){_first_byte(pointer)})"
+    if field.c_type in LOAD_NAMES:
+        return f"py2mcu_load_{LOAD_NAMES[field.c_type]}{order}({pointer})"
+    value = f"py2mcu_load_u{field.size * 8}{order}({pointer})"
+    return value if field.c_type == UNSIGNED[field.size] else f"(({field.c_type}){value})"
+
+
+def store(field: Field, order: str, pointer: str, value: str) -> str:
+    """C statement writing value as field to the bytes at pointer"""
+    if field.code == '?':
+        return f"{_first_byte(pointer)} = (uint8_t)(({value}) != 0);"
+    if field.size == 1:
+        return f"{_first_byte(pointer)} = (uint8_t)({value});"
+    if field.c_type in LOAD_NAMES:
+        return f"py2mcu_store_{LOAD_NAMES[field.c_type]}{order}({pointer}, {value});"
+    return f"py2mcu_store_u{field.size * 8}{order}({pointer}, ({UNSIGNED[field.size]})({value}));"
+
+
+def from_bytes_type(length: int, signed: bool) -> str:
+    """C type of int.from_bytes() over length bytes"""
+    if length < 4 or (length == 4 and signed):
+        return 'int32_t'
+    if length == 4:
+        return 'uint32_t'
+    return 'int64_t' if signed or length < 8 else 'uint64_t'
+
+
+def from_bytes(length: int, order: str, signed: bool, pointer: str) -> str:
+    """C expression for int.from_bytes() of length bytes at pointer"""
+    c_type = from_bytes_type(length, signed)
+    if length in UNSIGNED:
+        raw = _first_byte(pointer) if length == 1 else f"py2mcu_load_u{length * 8}{order}({pointer})"
+        if signed:
+            return f"((int{length * 8}_t){raw})"
+        return raw if c_type == UNSIGNED[length] else f"(({c_type}){raw})"
+    raw = f"py2mcu_load_uint{order}({pointer}, {length})"
+    if signed:
+        sign = f"0x{1 << (length * 8 - 1):X}ull"
+        return f"(({c_type})(({raw} ^ {sign}) - {sign}))"
+    return f"(({c_type}){raw})"
+
+
+def struct_call(node: ast.AST, *names: str) -> Optional[str]:
+    """Name of the ``struct.<name>(...)`` function node calls, if one of names"""
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == 'struct'
+            and node.func.attr in names):
+        return node.func.attr
+    return None
+
+
+def constant_format(node: ast.Call) -> Optional[str]:
+    """The format string of a struct call, if it is a literal"""
+    if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+        return node.args[0].value
+    return None
+
+
+def is_from_bytes(node: ast.AST) -> bool:
+    """``int.from_bytes(...)``"""
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == 'int'
+            and node.func.attr == 'from_bytes')
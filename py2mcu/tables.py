@@ -0,0 +1,189 @@
+"""
+Compile-time lookup tables for ``@lut`` functions
+"""
+import ast
+import math
+from typing import Dict, List, Optional
+
+from py2mcu.analysis import collect_module_constants, eval_const_int
+from py2mcu.errors import CompileError
+from py2mcu.fixed import format_of_c_type
+from py2mcu.floats import float_literal
+from py2mcu.ranges import TYPE_RANGES
+
+# Table values per line in the generated initializer
+VALUES_PER_LINE = 12
+
+
+def lut_decorator(func: ast.FunctionDef) -> Optional[ast.Call]:
+    """The ``@lut(...)`` decorator of func, if any"""
+    for decorator in func.decorator_list:
+        if isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name) and decorator.func.id == 'lut':
+            return decorator
+    return None
+
+
+def lut_result_annotation(func: ast.FunctionDef) -> Optional[ast.AST]:
+    """Annotation giving the C type of func's result: ``dtype=`` for @lut functions"""
+    decorator = lut_decorator(func)
+    if decorator is not None:
+        for keyword in decorator.keywords:
+            if keyword.arg == 'dtype':
+                return keyword.value
+    return func.returns
+
+
+def round_half_away(value: float) -> int:
+    return int(math.floor(value + 0.5)) if value >= 0 else int(math.ceil(value - 0.5))
+
+
+def interpolate(table: list, start: int, step: int, x: int, integer: bool = True):
+    """Linear interpolation between table points, clamped to the table
+
+    Integer tables interpolate in integer arithmetic truncating toward zero,
+    like the generated C.
+    """
+    if x <= start:
+        return table[0]
+    index, frac = divmod(x - start, step)
+    if index >= len(table) - 1:
+        return table[-1]
+    low, high = table[index], table[index + 1]
+    if integer:
+        delta = (high - low) * frac
+        quotient = abs(delta) // step
+        return low + (quotient if delta >= 0 else -quotient)
+    return low + (high - low) * frac / step
+
+
+class LookupTable:
+    """Quantized values of one @lut function over its domain"""
+
+    def __init__(self, func: ast.FunctionDef, c_type: str, param_type: str, domain: range, interpolated: bool):
+        self.func = func
+        self.name = f"{func.name}_lut"
+        self.c_type = c_type
+        self.param_type = param_type
+        self.start = domain.start
+        self.step = domain.step
+        self.last = domain[-1]
+        self.interpolated = interpolated
+        self.values: List = []      # stored values (raw integers for fixed-point types)
+        self.literals: List[str] = []
+        self.max_error = 0.0
+        self.value_span = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def domain_text(self) -> str:
+        step = f", {self.step}" if self.step != 1 else ""
+        return f"range({self.start}, {self.last + 1}{step})"
+
+    def offset_expr(self, arg: str) -> str:
+        """Distance of argument expression arg from the first table point"""
+        if self.start == 0:
+            return arg
+        return f"({arg} - {self.start})" if self.start > 0 else f"({arg} + {-self.start})"
+
+    def index_expr(self, arg: str) -> str:
+        """Table index for argument expression arg (non-interpolated tables)"""
+        offset = self.offset_expr(arg)
+        return f"{offset} / {self.step}" if self.step != 1 else offset
+
+
+class LutBuilder:
+    """
+    Evaluate every ``@lut(domain=range(...), dtype=T, interpolate=False)``
+    function over its domain with CPython and quantize the results to T
+    """
+
+    def __init__(self, codegen, tree: ast.Module):
+        self.codegen = codegen
+        self.tree = tree
+        self.filename = getattr(tree, '_filename', '<string>')
+        self.constants = collect_module_constants(tree)
+
+    def run(self) -> Dict[str, LookupTable]:
+        tables = {}
+        for name, func in self.codegen.function_defs.items():
+            decorator = lut_decorator(func)
+            if decorator is not None:
+                tables[name] = self._build(func, decorator)
+        return tables
+
+    def _error(self, message: str, node: ast.AST) -> CompileError:
+        return CompileError(message, getattr(node, 'lineno', None), self.filename)
+
+    def _options(self, func: ast.FunctionDef, decorator: ast.Call):
+        options = {keyword.arg: keyword.value for keyword in decorator.keywords}
+        if decorator.args:
+            options.setdefault('domain', decorator.args[0])
+        domain_node = options.get('domain')
+        bounds = None
+        if (isinstance(domain_node, ast.Call) and isinstance(domain_node.func, ast.Name)
+                and domain_node.func.id == 'range' and 1 <= len(domain_node.args) <= 3):
+            bounds = [eval_const_int(arg, self.constants) for arg in domain_node.args]
+        if bounds is None or None in bounds:
+            raise self._error(f"@lut on '{func.name}' needs domain=range(...) with constant bounds", decorator)
+        domain = range(*bounds)
+        if len(domain) == 0 or domain.step < 0:
+            raise self._error(f"@lut on '{func.name}' has an empty or descending domain", decorator)
+        interpolated = isinstance(options.get('interpolate'), ast.Constant) and options['interpolate'].value is True
+        return domain, interpolated
+
+    def _build(self, func: ast.FunctionDef, decorator: ast.Call) -> LookupTable:
+        if len(func.args.args) != 1:
+            raise self._error(f"@lut function '{func.name}' must take exactly one argument", func)
+        domain, interpolated = self._options(func, decorator)
+        result = lut_result_annotation(func)
+        c_type = self.codegen._map_type(result) if result is not None else 'int32_t'
+        param = func.args.args[0].annotation
+        param_type = self.codegen._map_type(param) if param is not None else 'int32_t'
+        table = LookupTable(func, c_type, param_type, domain, interpolated)
+
+        evaluator = self.codegen.evaluator
+        exact = self._numbers(func, domain, evaluator.map(func.name, [(x,) for x in domain], func, '@lut'))
+        for x, value in zip(domain, exact):
+            stored, literal = self._quantize(table, value, x)
+            table.values.append(stored)
+            table.literals.append(literal)
+
+        # Accuracy over every integer argument the table answers for
+        if interpolated and domain.step > 1:
+            xs = range(table.start, table.last + 1)
+            exact = self._numbers(func, xs, evaluator.map(func.name, [(x,) for x in xs], func, '@lut'))
+            integer = c_type not in ('float', 'double')
+            approx = [self._real(table, interpolate(table.values, table.start, table.step, x, integer)) for x in xs]
+        else:
+            approx = [self._real(table, stored) for stored in table.values]
+        table.max_error = max(abs(a - e) for a, e in zip(approx, exact))
+        table.value_span = max(exact) - min(exact)
+        return table
+
+    def _numbers(self, func: ast.FunctionDef, xs, values) -> List[float]:
+        for x, value in zip(xs, values):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise self._error(f"@lut function {func.name}({x}) returned {value!r}, not a number", func)
+        return values
+
+    def _quantize(self, table: LookupTable, value: float, x: int):
+        """(stored value, C literal) of value in the table's element type"""
+        fmt = format_of_c_type(table.c_type)
+        if fmt is not None:
+            raw = fmt.from_float(value)
+            return raw, str(raw)
+        if table.c_type in ('float', 'double'):
+            return value, float_literal(value, double=table.c_type == 'double')
+        limits = TYPE_RANGES.get(table.c_type)
+        stored = round_half_away(value)
+        if limits is not None and not limits[0] <= stored <= limits[1]:
+            raise self._error(f"@lut function {table.func.name}({x}) = {value!r} does not fit {table.c_type}",
+                              table.func)
+        return stored, str(stored)
+
+    def _real(self, table: LookupTable, stored) -> float:
+        fmt = format_of_c_type(table.c_type)
+        return stored / fmt.scale if fmt is not None else stored
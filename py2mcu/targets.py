@@ -0,0 +1,37 @@
+"""
+Target platform properties used by analysis passes
+"""
+from typing import Dict, Any
+
+# 'ram' is the on-chip SRAM available to the application in bytes (None means
+# no budget is enforced); 'pointer_size' is sizeof(void*) on the target;
+# 'word_bits' is the native register width; 'fpu' is the widest float type
+# done in hardware ('single', 'double' or None for soft-float); 'arch' is
+# the CPU core (ARM Cortex-M cores can use CMSIS-DSP); 'simd' is how array
+# loops are vectorized at -O2 ('vector' for GCC vector extensions, 'dsp' for
+# the packed 16/8-bit instructions of the ARM DSP extension, None for none).
+TARGETS: Dict[str, Dict[str, Any]] = {
+    'pc': {'ram': None, 'pointer_size': 8, 'word_bits': 64, 'fpu': 'double', 'arch': None,
+           'simd': 'vector'},
+    'stm32f4': {'ram': 128 * 1024, 'pointer_size': 4, 'word_bits': 32, 'fpu': 'single', 'arch': 'cortex-m4',
+                'simd': 'dsp'},
+    'esp32': {'ram': 320 * 1024, 'pointer_size': 4, 'word_bits': 32, 'fpu': 'single', 'arch': 'xtensa-lx6',
+              'simd': None},
+    'rp2040': {'ram': 264 * 1024, 'pointer_size': 4, 'word_bits': 32, 'fpu': None, 'arch': 'cortex-m0+',
+               'simd': None},
+    'arduino': {'ram': 2 * 1024, 'pointer_size': 2, 'word_bits': 8, 'fpu': None, 'arch': 'avr',
+                'simd': None},
+}
+
+DEFAULT_TARGET: Dict[str, Any] = {'ram': None, 'pointer_size': 4, 'word_bits': 32, 'fpu': None, 'arch': None, 'simd': None}
+
+
+def get_target_info(target: str) -> Dict[str, Any]:
+    """Return the property dict for a (normalized) target name
+
+    Unknown targets get conservative 32-bit MCU defaults so that new boards
+    can be compiled for without editing this table.
+    """
+    info = dict(DEFAULT_TARGET)
+    info.update(TARGETS.get(target, {}))
+    return info
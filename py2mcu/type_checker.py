@@ -4,6 +4,9 @@ Type checker and inference engine
 import ast
 from typing import Dict, Optional, Any
 
+from py2mcu.errors import CompileError
+from py2mcu.fixed import annotation_format
+
 class TypeChecker(ast.NodeVisitor):
     """
     Static type checker for Python code
@@ -13,6 +16,19 @@ class TypeChecker(ast.NodeVisitor):
     def __init__(self):
         self.symbol_table: Dict[str, str] = {}
         self.current_function: Optional[str] = None
+        self.filename = '<string>'
+
+    def visit_Module(self, node: ast.Module):
+        self.filename = getattr(node, '_filename', '<string>')
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node: ast.Subscript):
+        """Reject Fixed[I, F] formats without a C storage type"""
+        try:
+            annotation_format(node)
+        except ValueError as exc:
+            raise CompileError(str(exc), node.lineno, self.filename)
+        self.generic_visit(node)
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
         """Check function definition"""
@@ -48,10 +64,16 @@ class TypeChecker(ast.NodeVisitor):
         if isinstance(node, ast.Name):
             return node.id
         elif isinstance(node, ast.Subscript):
-            # Handle List[int], etc.
+            # Handle list[uint8_t], Array[uint16_t, 512], etc.
             base = self._get_type_name(node.value)
-            # TODO: Extract generic parameters
-            return base
+            slice_node = node.slice
+            if hasattr(ast, 'Index') and isinstance(slice_node, ast.Index):
+                slice_node = slice_node.value
+            if isinstance(slice_node, ast.Tuple):
+                params = [self._get_type_name(elt) for elt in slice_node.elts]
+            else:
+                params = [self._get_type_name(slice_node)]
+            return f"{base}[{', '.join(params)}]"
         elif isinstance(node, ast.Constant):
             return str(node.value)
         else:
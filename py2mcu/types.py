@@ -0,0 +1,342 @@
+"""
+C type names usable as Python annotations
+
+Importing these keeps annotations such as ``x: uint8_t`` or
+``buf: Array[uint16_t, 512]`` valid when the program runs on the PC.
+The fixed-point types (``q15``, ``q31``, ``Fixed[I, F]``) simulate the
+generated saturating arithmetic bit-exactly.
+"""
+from py2mcu.fixed import NAMED_FORMATS, Q15, Q31, FixedFormat, format_for
+
+int8_t = int
+uint8_t = int
+int16_t = int
+uint16_t = int
+int32_t = int
+uint32_t = int
+int64_t = int
+uint64_t = int
+
+
+class ArrayType:
+    """Result of ``Array[T, N]``: element type and fixed length"""
+
+    def __init__(self, elem_type, length: int):
+        self.elem_type = elem_type
+        self.length = length
+
+    def __repr__(self):
+        name = getattr(self.elem_type, '__name__', self.elem_type)
+        return f"Array[{name}, {self.length}]"
+
+
+class Array:
+    """
+    Fixed-length typed array annotation
+
+    Usage:
+        samples: Array[uint16_t, 512] = [0] * 512
+
+    Compiles to ``uint16_t samples[512]``; as a parameter or return type it
+    becomes ``uint16_t*``.
+    """
+
+    def __class_getitem__(cls, params):
+        elem_type, length = params
+        return ArrayType(elem_type, length)
+
+
+class ViewType:
+    """Result of ``View[T]``: element type of a view"""
+
+    def __init__(self, elem_type):
+        self.elem_type = elem_type
+
+    def __repr__(self):
+        return f"View[{getattr(self.elem_type, '__name__', self.elem_type)}]"
+
+
+class View:
+    """
+    Zero-copy slice annotation
+
+    Usage:
+        def checksum(payload: View[uint8_t]) -> int: ...
+        checksum(packet[4:20])
+
+    Compiles to a (pointer, length) struct passed by value.  On the PC a
+    slice of a list is a copy; on the MCU the view shares the array's
+    elements, like a memoryview.
+    """
+
+    def __class_getitem__(cls, elem_type):
+        return ViewType(elem_type)
+
+
+class MatType:
+    """Result of ``Mat[T, R, C]`` / ``Vec[T, N]``: element type and shape"""
+
+    def __init__(self, elem_type, shape: tuple):
+        self.elem_type = elem_type
+        self.shape = shape
+
+    def __repr__(self):
+        name = getattr(self.elem_type, '__name__', self.elem_type)
+        kind = 'Vec' if len(self.shape) == 1 else 'Mat'
+        return f"{kind}[{name}, {', '.join(str(n) for n in self.shape)}]"
+
+
+class Mat:
+    """
+    Small fixed-size matrix annotation
+
+    Usage:
+        rotation: Mat[float, 3, 3] = np.eye(3)
+        def predict(p: Mat[float, 4, 4], f: Mat[float, 4, 4]) -> Mat[float, 4, 4]:
+            return f @ p @ f.T
+
+    Compiles to a struct held and passed by value; ``@``, ``.T``,
+    ``np.linalg.inv`` and element-wise arithmetic are unrolled into
+    straight-line code.  On the PC the values are NumPy arrays.
+    """
+
+    def __class_getitem__(cls, params):
+        elem_type, rows, cols = params
+        return MatType(elem_type, (rows, cols))
+
+
+class Vec:
+    """
+    Small fixed-size vector annotation
+
+    Usage:
+        gravity: Vec[float, 3] = np.array([0.0, 0.0, 9.81])
+    """
+
+    def __class_getitem__(cls, params):
+        elem_type, length = params
+        return MatType(elem_type, (length,))
+
+
+class _FixedValue:
+    """Fixed-point number simulated bit-exactly on the PC
+
+    Operands may be the same format, ints (converted, or used as a scale
+    factor for ``*`` and ``/``) or floats (rounded to the format).
+    """
+
+    __slots__ = ('raw',)
+    _format: FixedFormat = None
+
+    def __init__(self, value=0):
+        fmt = self._format
+        if isinstance(value, _FixedValue):
+            self.raw = value.raw if value._format == fmt else fmt.from_float(float(value))
+        elif isinstance(value, int):
+            self.raw = fmt.from_int(value)
+        else:
+            self.raw = fmt.from_float(float(value))
+
+    @classmethod
+    def from_raw(cls, raw: int) -> '_FixedValue':
+        value = cls.__new__(cls)
+        value.raw = cls._format.saturate(raw)
+        return value
+
+    def _raw_of(self, other):
+        if isinstance(other, _FixedValue):
+            if other._format != self._format:
+                raise TypeError(f"cannot mix {self._format.name} and {other._format.name}")
+            return other.raw
+        if isinstance(other, int):
+            return self._format.from_int(other)
+        if isinstance(other, float):
+            return self._format.from_float(other)
+        return None
+
+    def _result(self, raw: int) -> '_FixedValue':
+        return type(self).from_raw(raw)
+
+    def __add__(self, other):
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.add(self.raw, raw))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.sub(self.raw, raw))
+
+    def __rsub__(self, other):
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.sub(raw, self.raw))
+
+    def __mul__(self, other):
+        if isinstance(other, int) and not isinstance(other, bool):
+            return self._result(self._format.mul_int(self.raw, other))
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.mul(self.raw, raw))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, int) and not isinstance(other, bool):
+            return self._result(self._format.div_int(self.raw, other))
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.div(self.raw, raw))
+
+    def __rtruediv__(self, other):
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else self._result(self._format.div(raw, self.raw))
+
+    def __neg__(self):
+        return self._result(self._format.neg(self.raw))
+
+    def __abs__(self):
+        return self._result(self._format.neg(self.raw) if self.raw < 0 else self.raw)
+
+    def _compare(self, other, op):
+        raw = self._raw_of(other)
+        return NotImplemented if raw is None else op(self.raw, raw)
+
+    def __eq__(self, other):
+        return self._compare(other, lambda a, b: a == b)
+
+    def __lt__(self, other):
+        return self._compare(other, lambda a, b: a < b)
+
+    def __le__(self, other):
+        return self._compare(other, lambda a, b: a <= b)
+
+    def __gt__(self, other):
+        return self._compare(other, lambda a, b: a > b)
+
+    def __ge__(self, other):
+        return self._compare(other, lambda a, b: a >= b)
+
+    def __hash__(self):
+        return hash((self._format, self.raw))
+
+    def __float__(self):
+        return self._format.to_float(self.raw)
+
+    def __int__(self):
+        return self._format.to_int(self.raw)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({float(self)!r})"
+
+    def __str__(self):
+        # Same text as the generated printf("%g")
+        return f"{float(self):g}"
+
+    def __format__(self, spec):
+        return format(float(self), spec or 'g')
+
+
+class q15(_FixedValue):
+    """Q1.15: 16-bit signed fraction in [-1, 1)"""
+    __slots__ = ()
+    _format = Q15
+
+
+class q31(_FixedValue):
+    """Q1.31: 32-bit signed fraction in [-1, 1)"""
+    __slots__ = ()
+    _format = Q31
+
+
+class Fixed:
+    """
+    Fixed-point annotation with int_bits (including sign) and frac_bits
+
+    Usage:
+        gain: Fixed[16, 16] = Fixed[16, 16](1.5)
+    """
+
+    _classes: dict = {}
+
+    def __class_getitem__(cls, params):
+        int_bits, frac_bits = params
+        fmt = format_for(int_bits, frac_bits)
+        if fmt.name in NAMED_FORMATS:
+            return {'q15': q15, 'q31': q31}[fmt.name]
+        if fmt not in cls._classes:
+            cls._classes[fmt] = type(f"Fixed[{int_bits}, {frac_bits}]", (_FixedValue,),
+                                     {'__slots__': (), '_format': fmt})
+        return cls._classes[fmt]
+
+
+class _BoundedDict(dict):
+    """dict that refuses new keys beyond its capacity, like the generated table"""
+
+    capacity = 0
+
+    def __setitem__(self, key, value):
+        if key not in self and len(self) >= self.capacity:
+            raise OverflowError(f"{type(self).__name__} is full")
+        super().__setitem__(key, value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class _BoundedSet(set):
+    """set that refuses new members beyond its capacity"""
+
+    capacity = 0
+
+    def add(self, key):
+        if key not in self and len(self) >= self.capacity:
+            raise OverflowError(f"{type(self).__name__} is full")
+        super().add(key)
+
+
+class Dict:
+    """
+    Fixed-capacity dict with integer keys
+
+    Usage:
+        devices: Dict[uint16_t, uint32_t, 32] = {}
+        devices = Dict[uint16_t, uint32_t, 32]()
+
+    Compiles to a statically sized open-addressing hash table; inserting a
+    new key into a full table fails (OverflowError on the PC).
+    """
+
+    _classes: dict = {}
+
+    def __class_getitem__(cls, params):
+        key_type, value_type, capacity = params
+        if params not in cls._classes:
+            name = f"Dict[{_type_name(key_type)}, {_type_name(value_type)}, {capacity}]"
+            cls._classes[params] = type(name, (_BoundedDict,), {'capacity': capacity})
+        return cls._classes[params]
+
+
+class Set:
+    """
+    Fixed-capacity set of integers
+
+    Usage:
+        seen: Set[uint8_t, 64] = set()
+    """
+
+    _classes: dict = {}
+
+    def __class_getitem__(cls, params):
+        key_type, capacity = params
+        if params not in cls._classes:
+            cls._classes[params] = type(f"Set[{_type_name(key_type)}, {capacity}]", (_BoundedSet,),
+                                        {'capacity': capacity})
+        return cls._classes[params]
+
+
+def _type_name(c_type) -> str:
+    return getattr(c_type, '__name__', str(c_type))
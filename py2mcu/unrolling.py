@@ -0,0 +1,191 @@
+"""
+Loop unrolling
+
+A counted loop
+
+    i = start                 (optional: gives the trip count)
+    while i < stop:
+        <body>
+        i += step
+
+is unrolled n times when ``@unroll(n)`` decorates its function (innermost
+loops only) or a ``# @unroll(n)`` comment precedes it.  The copies run
+while at least n iterations remain; a remainder loop runs the rest.  With
+a constant trip count a short loop is unrolled fully without being asked
+(-O2); ``# @unroll`` asks for it explicitly and ``@unroll(1)`` or
+``# @unroll(1)`` prevents it.
+
+The body is emitted several times, so it may not declare anything the
+copies would declare again: no annotated assignments, nested loops or
+calls that need a temporary buffer.
+"""
+import ast
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from py2mcu.analysis import eval_const_int
+from py2mcu.idioms import is_invariant
+
+# Automatic full unrolling: at most this many iterations ...
+FULL_UNROLL_MAX_TRIPS = 8
+# ... and this many AST nodes in all copies of the body together
+FULL_UNROLL_MAX_NODES = 160
+
+# Calls whose code declares a temporary named after the source line
+_TEMPORARY_CALLS = ('bytes', 'bytearray', 'memoryview', 'pack_into', 'unpack', 'unpack_from', 'copy')
+
+
+class Unroll(NamedTuple):
+    """How one loop is unrolled"""
+    index: str
+    stop: ast.expr
+    step: int
+    increment: ast.stmt       # the ``i += step`` statement, last in the body
+    factor: int               # copies per iteration of the unrolled loop; 0: fully
+    trips: Optional[int]      # constant trip count, else None
+    explicit: bool            # asked for by a decorator or pragma
+
+
+def _stored_names(stmts: List[ast.stmt]) -> List[str]:
+    return [node.id for stmt in stmts for node in ast.walk(stmt)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)]
+
+
+def body_size(stmts: List[ast.stmt]) -> int:
+    """AST nodes in stmts: the measure of a body for automatic full unrolling"""
+    return sum(1 for stmt in stmts for _ in ast.walk(stmt))
+
+
+def _own_jumps(stmts: List[ast.stmt]) -> bool:
+    """True if a break or continue of these statements targets their loop"""
+    for stmt in stmts:
+        if isinstance(stmt, (ast.Break, ast.Continue)):
+            return True
+        if isinstance(stmt, (ast.While, ast.For, ast.AsyncFor)):
+            continue  # their jumps are their own
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(stmt, field, None)
+            if isinstance(block, list) and _own_jumps(block):
+                return True
+        if any(_own_jumps(handler.body) for handler in getattr(stmt, 'handlers', ())):
+            return True
+        if any(_own_jumps(case.body) for case in getattr(stmt, 'cases', ())):
+            return True
+    return False
+
+
+def why_not_copied(stmts: List[ast.stmt]) -> Optional[str]:
+    """Why a body cannot be emitted more than once, None if it can"""
+    if _own_jumps(stmts):
+        return "it breaks or continues"
+    for node in (child for stmt in stmts for child in ast.walk(stmt)):
+        if isinstance(node, (ast.While, ast.For, ast.AsyncFor)):
+            return "it contains a loop"
+        if isinstance(node, (ast.AnnAssign, ast.FunctionDef, ast.ClassDef, ast.Try, ast.With)):
+            return "it declares variables"
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+            if name in _TEMPORARY_CALLS:
+                return f"{name}() needs a temporary per copy"
+    return None
+
+
+def counted_loop(node: ast.While, before: Optional[ast.stmt],
+                 constants: Dict[str, int]) -> Optional[Tuple[str, ast.expr, int, ast.stmt, Optional[int]]]:
+    """(index, stop, step, increment, trips) of a counted loop, else None
+
+    trips is known when the statement before the loop sets the index to a
+    constant and stop is constant.
+    """
+    test = node.test
+    if (node.orelse or not node.body or not isinstance(test, ast.Compare) or len(test.ops) != 1
+            or not isinstance(test.ops[0], ast.Lt) or not isinstance(test.left, ast.Name)):
+        return None
+    index, stop = test.left.id, test.comparators[0]
+    last = node.body[-1]
+    if isinstance(last, ast.AugAssign) and isinstance(last.op, ast.Add):
+        target, step = last.target, last.value
+    elif (isinstance(last, ast.Assign) and len(last.targets) == 1 and isinstance(last.value, ast.BinOp)
+          and isinstance(last.value.op, ast.Add) and isinstance(last.value.left, ast.Name)
+          and last.value.left.id == index):
+        target, step = last.targets[0], last.value.right
+    else:
+        return None
+    step_value = eval_const_int(step, constants)
+    stored = _stored_names(node.body)
+    if (not isinstance(target, ast.Name) or target.id != index or not step_value or step_value < 0
+            or stored.count(index) != 1 or not is_invariant(stop, set(stored))):
+        return None
+    trips = None
+    stop_value = eval_const_int(stop, constants)
+    start = None
+    if isinstance(before, ast.Assign) and len(before.targets) == 1 and isinstance(before.targets[0], ast.Name):
+        if before.targets[0].id == index:
+            start = eval_const_int(before.value, constants)
+    elif (isinstance(before, ast.AnnAssign) and isinstance(before.target, ast.Name)
+          and before.target.id == index and before.value is not None):
+        start = eval_const_int(before.value, constants)
+    if start is not None and stop_value is not None:
+        trips = max(0, -(-(stop_value - start) // step_value))
+    return index, stop, step_value, last, trips
+
+
+def find_unrolls(func: ast.FunctionDef, factor: Optional[int], pragma: Callable[[int], Optional[int]],
+                 constants: Dict[str, int], auto: bool) -> Tuple[Dict[int, Unroll], List[str]]:
+    """id(while) -> Unroll for the loops of func, and notes on requests that were not honored
+
+    factor comes from ``@unroll(n)`` on func and applies to innermost
+    loops; pragma(lineno) reads the ``# @unroll`` comment of a loop.
+    """
+    found: Dict[int, Unroll] = {}
+    notes: List[str] = []
+
+    def consider(loop: ast.While, before: Optional[ast.stmt]):
+        innermost = not any(isinstance(child, (ast.While, ast.For)) for stmt in loop.body for child in ast.walk(stmt))
+        asked = pragma(loop.lineno)
+        if asked is None and innermost:
+            asked = factor
+        explicit = asked is not None
+        if asked == 1:
+            return
+        counted = counted_loop(loop, before, constants)
+        if counted is None:
+            if asked is not None:
+                notes.append(f"line {loop.lineno}: kept rolled (not a counted 'while i < n: ...; i += step' loop)")
+            return
+        index, stop, step, increment, trips = counted
+        if asked is None:
+            body = [stmt for stmt in loop.body if stmt is not increment]
+            if not (auto and trips is not None and trips <= FULL_UNROLL_MAX_TRIPS
+                    and trips * body_size(body) <= FULL_UNROLL_MAX_NODES):
+                return
+            asked = 0
+        if asked == 0 and trips is None:
+            notes.append(f"line {loop.lineno}: kept rolled (full unrolling needs a constant trip count)")
+            return
+        reason = why_not_copied(loop.body)
+        if reason is not None:
+            if explicit:
+                notes.append(f"line {loop.lineno}: kept rolled ({reason})")
+            return
+        if trips is not None and asked >= trips:
+            asked = 0
+        found[id(loop)] = Unroll(index, stop, step, increment, asked, trips, explicit)
+
+    def scan(stmts: List[ast.stmt]):
+        for k, stmt in enumerate(stmts):
+            if isinstance(stmt, ast.While):
+                consider(stmt, stmts[k - 1] if k else None)
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            for field in ('body', 'orelse', 'finalbody'):
+                block = getattr(stmt, field, None)
+                if isinstance(block, list):
+                    scan(block)
+            for handler in getattr(stmt, 'handlers', ()):
+                scan(handler.body)
+            for case in getattr(stmt, 'cases', ()):
+                scan(case.body)
+
+    scan(func.body)
+    return found, notes
@@ -0,0 +1,86 @@
+"""
+Zero-copy slices: ``buf[a:b]`` as a (pointer, length) view
+
+Each element type used in a slice or a ``View[T]`` annotation becomes one
+PY2MCU_VIEW_DEFINE instantiation of runtime/py2mcu_view.h.  ``bytes``,
+``bytearray`` and ``memoryview`` are views of uint8_t.
+"""
+import ast
+from typing import Dict, Optional, Tuple
+
+from py2mcu.analysis import eval_const_int
+from py2mcu.containers import SHORT_NAMES
+from py2mcu.fixed import format_of_c_type
+
+BYTE_TYPES = ('bytes', 'bytearray', 'memoryview')
+
+
+def view_name(elem_type: str) -> str:
+    """C name of the view of elem_type: view_u8, view_q15, ..."""
+    fmt = format_of_c_type(elem_type)
+    if fmt is not None:
+        return f"view_{fmt.name}"
+    return f"view_{SHORT_NAMES.get(elem_type, elem_type.replace('*', 'p').replace(' ', '_'))}"
+
+
+def view_annotation(node: ast.AST, map_type) -> Optional[str]:
+    """Element C type of a ``View[T]`` annotation, else None"""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == 'View':
+        return map_type(node.slice)
+    return None
+
+
+def slice_bounds(node: ast.Slice, constants: Dict[str, int]) -> Tuple[Optional[int], Optional[int]]:
+    """Constant start and stop of a slice (omitted start is 0); None where not constant"""
+    start = 0 if node.lower is None else eval_const_int(node.lower, constants)
+    stop = None if node.upper is None else eval_const_int(node.upper, constants)
+    return start, stop
+
+
+def constant_slice(node: ast.Slice, length: Optional[int], constants: Dict[str, int]) -> Optional[Tuple[int, int]]:
+    """(offset, length) of a slice known at compile time, else None
+
+    With an unknown sequence length only explicit non-negative bounds
+    qualify; they are taken as given (no clamping).
+    """
+    start, stop = slice_bounds(node, constants)
+    if start is None or (stop is None and node.upper is not None):
+        return None
+    if length is None:
+        if stop is None or start < 0 or stop < 0:
+            return None
+        return start, max(stop - start, 0)
+    picked = range(length)[start:stop]
+    return picked.start, len(picked)
+
+
+def bytes_literal(data: bytes) -> str:
+    """C string literal holding data (octal escapes cannot run into the next byte)"""
+    chars = []
+    for byte in data:
+        char = chr(byte)
+        if 0x20 <= byte < 0x7F and char not in '"\\?':
+            chars.append(char)
+        else:
+            chars.append(f"\\{byte:03o}")
+    return '"' + ''.join(chars) + '"'
+
+
+def nominal_length(node: ast.AST, constants: Dict[str, int]) -> Optional[int]:
+    """Byte count a slice or bytes literal asks for, from its syntax alone
+
+    ``buf[a:b]`` with constant non-negative bounds and ``buf[i:i + K]`` ask
+    for b - a and K elements.
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, bytes):
+        return len(node.value)
+    if not (isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice)) or node.slice.step is not None:
+        return None
+    lower, upper = node.slice.lower, node.slice.upper
+    start, stop = slice_bounds(node.slice, constants)
+    if start is not None and stop is not None and 0 <= start <= stop:
+        return stop - start
+    if (lower is not None and isinstance(upper, ast.BinOp) and isinstance(upper.op, ast.Add)
+            and ast.dump(upper.left) == ast.dump(lower)):
+        return eval_const_int(upper.right, constants)
+    return None
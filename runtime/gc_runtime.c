@@ -2,6 +2,157 @@
 #include "gc_runtime.h"
 #include <stdlib.h>
 
+#ifdef PY2MCU_ALLOC_STATS
+#include <stdio.h>
+#include <string.h>
+
+// Hosted builds (the PC simulator) print the statistics when the program
+// exits; on an MCU call gc_stats_dump() or read gc_stats() yourself.
+#if defined(TARGET_PC) || defined(__linux__) || defined(__APPLE__) || defined(_WIN32)
+#define PY2MCU_STATS_DUMP_AT_EXIT 1
+#endif
+
+// Every block carries a small header so gc_free() knows how many bytes go
+// away and which site they came from.  The union keeps the payload aligned
+// for any scalar type.
+typedef union {
+    struct {
+        size_t size;
+        uint32_t site;
+    } info;
+    long long align_ll;
+    double align_d;
+    void* align_p;
+} gc_block_header_t;
+
+#define GC_NO_SITE 0xFFFFFFFFu
+
+static gc_stats_t stats;
+#ifdef PY2MCU_STATS_DUMP_AT_EXIT
+static int dump_registered = 0;
+#endif
+
+static uint32_t gc_size_bucket(size_t size) {
+    uint32_t bucket = 0;
+    size_t limit = 1;
+    while (size > limit && bucket < PY2MCU_ALLOC_BUCKETS - 1) {
+        limit <<= 1;
+        bucket++;
+    }
+    return bucket;
+}
+
+static uint32_t gc_find_site(const char* file, int line) {
+    for (uint32_t i = 0; i < stats.site_count; i++) {
+        gc_alloc_site_t* site = &stats.sites[i];
+        if (site->line == line && (site->file == file || strcmp(site->file, file) == 0)) {
+            return i;
+        }
+    }
+    if (stats.site_count == PY2MCU_ALLOC_SITES) {
+        return GC_NO_SITE;
+    }
+    gc_alloc_site_t* site = &stats.sites[stats.site_count];
+    site->file = file;
+    site->line = line;
+    return stats.site_count++;
+}
+
+void* gc_malloc_at(size_t size, const char* file, int line) {
+    gc_block_header_t* block = (gc_block_header_t*)malloc(sizeof(gc_block_header_t) + size);
+    if (block == NULL) {
+        return NULL;
+    }
+
+#ifdef PY2MCU_STATS_DUMP_AT_EXIT
+    if (!dump_registered) {
+        atexit(gc_stats_dump);
+        dump_registered = 1;
+    }
+#endif
+
+    uint32_t site_index = gc_find_site(file, line);
+    block->info.size = size;
+    block->info.site = site_index;
+
+    stats.alloc_count++;
+    stats.bytes_live += size;
+    if (stats.bytes_live > stats.bytes_peak) {
+        stats.bytes_peak = stats.bytes_live;
+    }
+
+    if (site_index == GC_NO_SITE) {
+        stats.sites_dropped++;
+    } else {
+        gc_alloc_site_t* site = &stats.sites[site_index];
+        site->count++;
+        site->bytes += (uint32_t)size;
+        site->histogram[gc_size_bucket(size)]++;
+    }
+
+    return block + 1;
+}
+
+// The header maps gc_malloc() to gc_malloc_at(); keep a real symbol for
+// callers that take its address or were built without the header.
+void* (gc_malloc)(size_t size) {
+    return gc_malloc_at(size, "<unknown>", 0);
+}
+
+void gc_free(void* ptr) {
+    if (ptr == NULL) {
+        return;
+    }
+    gc_block_header_t* block = (gc_block_header_t*)ptr - 1;
+    stats.free_count++;
+    stats.bytes_live -= block->info.size;
+    free(block);
+}
+
+const gc_stats_t* gc_stats(void) {
+    return &stats;
+}
+
+void gc_stats_reset(void) {
+    // Live blocks stay accounted for so later frees do not underflow.
+    size_t live = stats.bytes_live;
+    memset(&stats, 0, sizeof(stats));
+    stats.bytes_live = live;
+    stats.bytes_peak = live;
+}
+
+void gc_stats_dump(void) {
+    printf("=== py2mcu allocation stats ===\n");
+    printf("allocations: %lu  frees: %lu\n",
+           (unsigned long)stats.alloc_count, (unsigned long)stats.free_count);
+    printf("bytes live: %lu  peak: %lu\n",
+           (unsigned long)stats.bytes_live, (unsigned long)stats.bytes_peak);
+    for (uint32_t i = 0; i < stats.site_count; i++) {
+        const gc_alloc_site_t* site = &stats.sites[i];
+        printf("%s:%d  count=%lu bytes=%lu\n", site->file, site->line,
+               (unsigned long)site->count, (unsigned long)site->bytes);
+        size_t limit = 1;
+        for (uint32_t b = 0; b < PY2MCU_ALLOC_BUCKETS; b++, limit <<= 1) {
+            if (site->histogram[b] == 0) {
+                continue;
+            }
+            if (b == PY2MCU_ALLOC_BUCKETS - 1) {
+                printf("    >%lu: %lu\n", (unsigned long)(limit >> 1),
+                       (unsigned long)site->histogram[b]);
+            } else {
+                printf("    <=%lu: %lu\n", (unsigned long)limit,
+                       (unsigned long)site->histogram[b]);
+            }
+        }
+    }
+    if (stats.sites_dropped) {
+        printf("untracked allocations (site table full): %lu\n",
+               (unsigned long)stats.sites_dropped);
+    }
+}
+
+#else
+
 void* gc_malloc(size_t size) {
     return malloc(size);
 }
@@ -9,3 +160,5 @@ void* gc_malloc(size_t size) {
 void gc_free(void* ptr) {
     free(ptr);
 }
+
+#endif // PY2MCU_ALLOC_STATS
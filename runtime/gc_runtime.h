@@ -5,8 +5,64 @@
 #include <stdint.h>
 #include <stdlib.h>
 
+// Functions the compiler found free of side effects.  A const function
+// depends on its arguments only; a pure function may also read memory.
+// Either lets the C compiler merge repeated calls with the same arguments.
+#if defined(__GNUC__) || defined(__clang__)
+#define PY2MCU_CONST_FN __attribute__((const))
+#define PY2MCU_PURE_FN __attribute__((pure))
+#else
+#define PY2MCU_CONST_FN
+#define PY2MCU_PURE_FN
+#endif
+
 // Memory allocation wrappers
 void* gc_malloc(size_t size);
 void gc_free(void* ptr);
 
+// Allocation instrumentation
+//
+// Build both the generated code and gc_runtime.c with -DPY2MCU_ALLOC_STATS
+// to record every allocation.  Generated code calls gc_malloc_at() with the
+// Python source file and line of the allocation; hand-written C that calls
+// gc_malloc() is attributed to its own __FILE__/__LINE__.
+#ifdef PY2MCU_ALLOC_STATS
+
+#ifndef PY2MCU_ALLOC_SITES
+#define PY2MCU_ALLOC_SITES 32      // Distinct call sites tracked
+#endif
+
+#define PY2MCU_ALLOC_BUCKETS 16    // Size classes: <=1, <=2, <=4, ... <=32768, larger
+
+typedef struct {
+    const char* file;
+    int line;
+    uint32_t count;                // Allocations made from this site
+    uint32_t bytes;                // Total bytes requested from this site
+    uint32_t histogram[PY2MCU_ALLOC_BUCKETS];
+} gc_alloc_site_t;
+
+typedef struct {
+    uint32_t alloc_count;          // Successful gc_malloc calls
+    uint32_t free_count;           // gc_free calls with a non-NULL pointer
+    size_t bytes_live;             // Bytes currently allocated
+    size_t bytes_peak;             // High-water mark of bytes_live
+    uint32_t site_count;           // Entries used in sites[]
+    uint32_t sites_dropped;        // Allocations from sites that did not fit
+    gc_alloc_site_t sites[PY2MCU_ALLOC_SITES];
+} gc_stats_t;
+
+void* gc_malloc_at(size_t size, const char* file, int line);
+const gc_stats_t* gc_stats(void);
+void gc_stats_reset(void);
+void gc_stats_dump(void);
+
+#define gc_malloc(size) gc_malloc_at((size), __FILE__, __LINE__)
+
+#else
+
+#define gc_malloc_at(size, file, line) gc_malloc(size)
+
+#endif // PY2MCU_ALLOC_STATS
+
 #endif // GC_RUNTIME_H
@@ -0,0 +1,114 @@
+// Byte-order helpers for py2mcu struct.unpack_from / pack_into / int.from_bytes
+//
+// Each helper reads or writes a value one byte at a time, so it works at
+// any alignment and gives the same result on little- and big-endian
+// cores.  GCC and Clang recognize the pattern and emit a single load or
+// store (plus a byte swap where needed) on targets with unaligned access.
+// Offsets into buffers of known length are checked with
+// py2mcu_checked_offset() from py2mcu_view.h.
+#ifndef PY2MCU_BYTES_H
+#define PY2MCU_BYTES_H
+
+#include <stdint.h>
+#include <string.h>
+
+#include "py2mcu_view.h"
+
+static inline uint16_t py2mcu_load_u16le(const uint8_t *p) {
+    return (uint16_t)(p[0] | (p[1] << 8));
+}
+
+static inline uint16_t py2mcu_load_u16be(const uint8_t *p) {
+    return (uint16_t)((p[0] << 8) | p[1]);
+}
+
+static inline uint32_t py2mcu_load_u32le(const uint8_t *p) {
+    return (uint32_t)p[0] | ((uint32_t)p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24);
+}
+
+static inline uint32_t py2mcu_load_u32be(const uint8_t *p) {
+    return ((uint32_t)p[0] << 24) | ((uint32_t)p[1] << 16) | ((uint32_t)p[2] << 8) | (uint32_t)p[3];
+}
+
+static inline uint64_t py2mcu_load_u64le(const uint8_t *p) {
+    return (uint64_t)py2mcu_load_u32le(p) | ((uint64_t)py2mcu_load_u32le(p + 4) << 32);
+}
+
+static inline uint64_t py2mcu_load_u64be(const uint8_t *p) {
+    return ((uint64_t)py2mcu_load_u32be(p) << 32) | (uint64_t)py2mcu_load_u32be(p + 4);
+}
+
+// Unsigned integer of n (1..8) bytes, for int.from_bytes() of odd lengths
+static inline uint64_t py2mcu_load_uintle(const uint8_t *p, uint32_t n) {
+    uint64_t value = 0;
+    while (n--) {
+        value = (value << 8) | p[n];
+    }
+    return value;
+}
+
+static inline uint64_t py2mcu_load_uintbe(const uint8_t *p, uint32_t n) {
+    uint64_t value = 0;
+    for (uint32_t i = 0; i < n; i++) {
+        value = (value << 8) | p[i];
+    }
+    return value;
+}
+
+static inline void py2mcu_store_u16le(uint8_t *p, uint16_t v) {
+    p[0] = (uint8_t)v;
+    p[1] = (uint8_t)(v >> 8);
+}
+
+static inline void py2mcu_store_u16be(uint8_t *p, uint16_t v) {
+    p[0] = (uint8_t)(v >> 8);
+    p[1] = (uint8_t)v;
+}
+
+static inline void py2mcu_store_u32le(uint8_t *p, uint32_t v) {
+    py2mcu_store_u16le(p, (uint16_t)v);
+    py2mcu_store_u16le(p + 2, (uint16_t)(v >> 16));
+}
+
+static inline void py2mcu_store_u32be(uint8_t *p, uint32_t v) {
+    py2mcu_store_u16be(p, (uint16_t)(v >> 16));
+    py2mcu_store_u16be(p + 2, (uint16_t)v);
+}
+
+static inline void py2mcu_store_u64le(uint8_t *p, uint64_t v) {
+    py2mcu_store_u32le(p, (uint32_t)v);
+    py2mcu_store_u32le(p + 4, (uint32_t)(v >> 32));
+}
+
+static inline void py2mcu_store_u64be(uint8_t *p, uint64_t v) {
+    py2mcu_store_u32be(p, (uint32_t)(v >> 32));
+    py2mcu_store_u32be(p + 4, (uint32_t)v);
+}
+
+// A struct 's' field: the bytes of src, truncated or zero-padded to n
+static inline void py2mcu_store_bytes(uint8_t *p, uint32_t n, const uint8_t *src, int32_t len) {
+    uint32_t count = len < 0 ? 0u : (uint32_t)len < n ? (uint32_t)len : n;
+    memcpy(p, src, count);
+    memset(p + count, 0, n - count);
+}
+
+// IEEE 754 values travel as their bit patterns
+#define PY2MCU_FLOAT_BYTES(bits, T, U, order)                                       \
+    static inline T py2mcu_load_f##bits##order(const uint8_t *p) {                  \
+        U raw = py2mcu_load_u##bits##order(p);                                      \
+        T value;                                                                    \
+        memcpy(&value, &raw, sizeof value);                                         \
+        return value;                                                               \
+    }                                                                               \
+    static inline void py2mcu_store_f##bits##order(uint8_t *p, T value) {           \
+        U raw;                                                                      \
+        memcpy(&raw, &value, sizeof raw);                                           \
+        py2mcu_store_u##bits##order(p, raw);                                        \
+    }
+
+PY2MCU_FLOAT_BYTES(32, float, uint32_t, le)
+PY2MCU_FLOAT_BYTES(32, float, uint32_t, be)
+PY2MCU_FLOAT_BYTES(64, double, uint64_t, le)
+PY2MCU_FLOAT_BYTES(64, double, uint64_t, be)
+
+#endif // PY2MCU_BYTES_H
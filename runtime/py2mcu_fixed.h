@@ -0,0 +1,66 @@
+// Saturating fixed-point arithmetic for py2mcu
+//
+// PY2MCU_FIXED_DEFINE(name, T, WIDE, F, MIN, MAX) declares the type name##_t
+// (stored in T with F fraction bits, saturating to [MIN, MAX]) and static
+// inline helpers.  WIDE must be twice as wide as T.  The semantics match
+// py2mcu/fixed.py bit for bit:
+//   - every result saturates to the range of T
+//   - multiplication truncates toward minus infinity (arithmetic shift)
+//   - division truncates toward zero; division by zero saturates
+//   - float conversion rounds half away from zero
+#ifndef PY2MCU_FIXED_H
+#define PY2MCU_FIXED_H
+
+#include <stdint.h>
+
+#define PY2MCU_FIXED_DEFINE(name, T, WIDE, F, MIN, MAX)                              \
+    typedef T name##_t;                                                               \
+    static inline name##_t name##_sat(WIDE v) {                                       \
+        return (name##_t)(v > (WIDE)(MAX) ? (MAX) : v < (WIDE)(MIN) ? (MIN) : v);     \
+    }                                                                                 \
+    static inline name##_t name##_add(name##_t a, name##_t b) {                       \
+        return name##_sat((WIDE)a + b);                                               \
+    }                                                                                 \
+    static inline name##_t name##_sub(name##_t a, name##_t b) {                       \
+        return name##_sat((WIDE)a - b);                                               \
+    }                                                                                 \
+    static inline name##_t name##_neg(name##_t a) {                                   \
+        return name##_sat(-(WIDE)a);                                                  \
+    }                                                                                 \
+    static inline name##_t name##_abs(name##_t a) {                                   \
+        return a < 0 ? name##_neg(a) : a;                                             \
+    }                                                                                 \
+    static inline name##_t name##_mul(name##_t a, name##_t b) {                       \
+        return name##_sat(((WIDE)a * b) >> (F));                                      \
+    }                                                                                 \
+    static inline name##_t name##_mul_int(name##_t a, int32_t n) {                    \
+        int64_t p = (int64_t)a * n;                                                   \
+        return (name##_t)(p > (MAX) ? (MAX) : p < (MIN) ? (MIN) : p);                 \
+    }                                                                                 \
+    static inline name##_t name##_div(name##_t a, name##_t b) {                       \
+        if (b == 0) return a >= 0 ? (MAX) : (MIN);                                    \
+        return name##_sat(((WIDE)a * ((WIDE)1 << (F))) / b);                          \
+    }                                                                                 \
+    static inline name##_t name##_div_int(name##_t a, int32_t n) {                    \
+        if (n == 0) return a >= 0 ? (MAX) : (MIN);                                    \
+        return name##_sat((WIDE)a / n);                                               \
+    }                                                                                 \
+    static inline name##_t name##_from_int(int32_t v) {                               \
+        int64_t p = (int64_t)v * ((int64_t)1 << (F));                                 \
+        return (name##_t)(p > (MAX) ? (MAX) : p < (MIN) ? (MIN) : p);                 \
+    }                                                                                 \
+    static inline int32_t name##_to_int(name##_t a) {                                 \
+        return (int32_t)(a / ((WIDE)1 << (F)));                                       \
+    }                                                                                 \
+    static inline name##_t name##_from_float(float v) {                               \
+        float s = v * (float)((WIDE)1 << (F));                                        \
+        if (s != s) return 0;                                                         \
+        if (s >= (float)(MAX)) return (MAX);                                          \
+        if (s <= (float)(MIN)) return (MIN);                                          \
+        return (name##_t)(WIDE)(s >= 0.0f ? s + 0.5f : s - 0.5f);                     \
+    }                                                                                 \
+    static inline float name##_to_float(name##_t a) {                                 \
+        return (float)a * (1.0f / (float)((WIDE)1 << (F)));                           \
+    }
+
+#endif // PY2MCU_FIXED_H
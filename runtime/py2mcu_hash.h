@@ -0,0 +1,56 @@
+// Hash functions for py2mcu dict tables
+//
+// These match py2mcu/constdict.py bit for bit, so seeds found at compile
+// time give the same slots on the target:
+//   - strings hash with 32-bit FNV-1a, integers hash as their 32-bit value
+//   - py2mcu_hash_mix is the MurmurHash3 finalizer
+//   - py2mcu_hash_reduce maps a hash to 0..n-1 (n < 65536) with one
+//     16x16-bit multiply, avoiding a division on cores without a divider
+//
+// The py2mcu_hash_fib* functions give the home slot of an integer key in a
+// table of 2^bits slots (Fibonacci hashing: one multiply and one shift).
+// py2mcu_hash_direct indexes by the key itself when the table has a slot
+// for every value of the key type.
+#ifndef PY2MCU_HASH_H
+#define PY2MCU_HASH_H
+
+#include <stdint.h>
+#include <string.h>
+
+static inline uint32_t py2mcu_hash_str(const char *s) {
+    uint32_t h = 2166136261u;
+    while (*s) {
+        h = (h ^ (uint8_t)*s++) * 16777619u;
+    }
+    return h;
+}
+
+static inline uint32_t py2mcu_hash_mix(uint32_t h) {
+    h ^= h >> 16;
+    h *= 0x85EBCA6Bu;
+    h ^= h >> 13;
+    h *= 0xC2B2AE35u;
+    return h ^ (h >> 16);
+}
+
+static inline uint32_t py2mcu_hash_seeded(uint32_t h, uint32_t seed) {
+    return py2mcu_hash_mix(h + (seed + 1u) * 0x9E3779B9u);
+}
+
+static inline uint32_t py2mcu_hash_reduce(uint32_t h, uint32_t n) {
+    return ((h >> 16) * n) >> 16;
+}
+
+static inline uint32_t py2mcu_hash_fib32(uint32_t key, uint32_t bits) {
+    return (key * 2654435769u) >> (32u - bits);
+}
+
+static inline uint32_t py2mcu_hash_fib64(uint64_t key, uint32_t bits) {
+    return py2mcu_hash_fib32((uint32_t)key ^ (uint32_t)(key >> 32), bits);
+}
+
+static inline uint32_t py2mcu_hash_direct(uint32_t key, uint32_t bits) {
+    return key & ((1u << bits) - 1u);
+}
+
+#endif // PY2MCU_HASH_H
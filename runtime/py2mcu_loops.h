@@ -0,0 +1,109 @@
+// Kernels for py2mcu's sum(), min(), max(), any(), all() and for the
+// fill, copy and reduction loops the compiler recognizes
+//
+// PY2MCU_SUM_DEFINE(name, T, Acc) adds n elements of T into Acc with four
+// independent accumulators, so consecutive adds do not wait for each
+// other.  Integer addition wraps the same way in any order, so the result
+// equals the sequential loop.  Floating-point sums use PY2MCU_FSUM_DEFINE,
+// which keeps Python's left-to-right order.
+//
+// min/max compare each element with the best so far in order, like
+// Python: the first of equal elements wins and a NaN never replaces the
+// best value.  name##_of() is the builtin over a whole sequence; an empty
+// one calls PY2MCU_VALUE_ERROR(), which traps by default.
+#ifndef PY2MCU_LOOPS_H
+#define PY2MCU_LOOPS_H
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#ifndef PY2MCU_VALUE_ERROR
+#define PY2MCU_VALUE_ERROR() __builtin_trap()
+#endif
+
+// dst[i] = src[i] for ascending i, as a copy loop does.  Where the loop
+// would read elements it already wrote (dst inside src, after its start)
+// the bytes are copied forward one by one; memmove handles every other case.
+static inline void py2mcu_copy_forward(void *dst, const void *src, size_t size) {
+    uint8_t *d = (uint8_t *)dst;
+    const uint8_t *s = (const uint8_t *)src;
+    if ((uintptr_t)d - (uintptr_t)s >= size || d == s) {
+        memmove(d, s, size);  // no overlap, or dst before src: same as the loop
+        return;
+    }
+    for (size_t i = 0; i < size; i++) {
+        d[i] = s[i];
+    }
+}
+
+#define PY2MCU_SUM_DEFINE(name, T, Acc)                                             \
+    static inline Acc name(const T *p, int32_t n) {                                 \
+        Acc s0 = 0, s1 = 0, s2 = 0, s3 = 0;                                         \
+        int32_t i = 0;                                                              \
+        for (; i + 4 <= n; i += 4) {                                                \
+            s0 += p[i];                                                             \
+            s1 += p[i + 1];                                                         \
+            s2 += p[i + 2];                                                         \
+            s3 += p[i + 3];                                                         \
+        }                                                                           \
+        for (; i < n; i++) {                                                        \
+            s0 += p[i];                                                             \
+        }                                                                           \
+        return (Acc)((Acc)(s0 + s1) + (Acc)(s2 + s3));                              \
+    }
+
+#define PY2MCU_FSUM_DEFINE(name, T, Acc)                                            \
+    static inline Acc name(const T *p, int32_t n) {                                 \
+        Acc sum = 0;                                                                \
+        for (int32_t i = 0; i < n; i++) {                                           \
+            sum += p[i];                                                            \
+        }                                                                           \
+        return sum;                                                                 \
+    }
+
+// op is > for max and < for min
+#define PY2MCU_BEST_DEFINE(name, T, Acc, op)                                        \
+    static inline Acc name(const T *p, int32_t n, Acc best) {                       \
+        for (int32_t i = 0; i < n; i++) {                                           \
+            if (p[i] op best) {                                                     \
+                best = p[i];                                                        \
+            }                                                                       \
+        }                                                                           \
+        return best;                                                                \
+    }                                                                               \
+    static inline Acc name##_of(const T *p, int32_t n) {                            \
+        if (n <= 0) {                                                               \
+            PY2MCU_VALUE_ERROR();                                                   \
+        }                                                                           \
+        return name(p + 1, n - 1, p[0]);                                            \
+    }
+
+// max(best, x) / min(best, x): the first of equal values wins, as in Python
+#define PY2MCU_PICK_DEFINE(name, T, op)                                             \
+    static inline T name(T best, T x) {                                             \
+        return x op best ? x : best;                                                \
+    }
+
+#define PY2MCU_ANY_DEFINE(name, T)                                                  \
+    static inline bool name(const T *p, int32_t n) {                                \
+        for (int32_t i = 0; i < n; i++) {                                           \
+            if (p[i] != 0) {                                                        \
+                return true;                                                        \
+            }                                                                       \
+        }                                                                           \
+        return false;                                                               \
+    }
+
+#define PY2MCU_ALL_DEFINE(name, T)                                                  \
+    static inline bool name(const T *p, int32_t n) {                                \
+        for (int32_t i = 0; i < n; i++) {                                           \
+            if (p[i] == 0) {                                                        \
+                return false;                                                       \
+            }                                                                       \
+        }                                                                           \
+        return true;                                                                \
+    }
+
+#endif // PY2MCU_LOOPS_H
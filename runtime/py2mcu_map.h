@@ -0,0 +1,149 @@
+// Fixed-capacity dict and set for py2mcu (no heap)
+//
+// PY2MCU_MAP_DEFINE(name, K, V, CAPACITY, BITS, HASH) declares name##_t, a
+// hash table from integer keys K to values V holding up to CAPACITY
+// entries in 2^BITS slots, and static inline operations on it.
+// PY2MCU_SET_DEFINE(name, K, CAPACITY, BITS, HASH) does the same for a set.
+// HASH(key, BITS) gives a key's home slot (see py2mcu_hash.h).
+//
+// Collisions use linear probing.  Removal shifts the following entries
+// back instead of leaving tombstones, so probe lengths only depend on the
+// current contents.  The compiler sizes the table so that a full table
+// is at most 75% occupied.
+//
+// Inserting a new key into a full table stores nothing, returns false
+// and invokes PY2MCU_CONTAINER_FULL(name), which does nothing unless the
+// application defines it (for example to log or trap).
+#ifndef PY2MCU_MAP_H
+#define PY2MCU_MAP_H
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
+
+#include "py2mcu_hash.h"
+
+#ifndef PY2MCU_CONTAINER_FULL
+#define PY2MCU_CONTAINER_FULL(name) ((void)0)
+#endif
+
+#define PY2MCU_SLOT_NEXT(i, BITS) (((i) + 1u) & ((1u << (BITS)) - 1u))
+
+// Slot of key, or -1 (shared by maps and sets)
+#define PY2MCU_TABLE_FIND(name, K, BITS, HASH)                                     \
+    static inline int32_t name##_find(const name##_t *t, K key) {                   \
+        uint32_t i = HASH(key, BITS);                                               \
+        while (t->used[i]) {                                                        \
+            if (t->keys[i] == key) return (int32_t)i;                               \
+            i = PY2MCU_SLOT_NEXT(i, BITS);                                          \
+        }                                                                           \
+        return -1;                                                                  \
+    }                                                                               \
+    static inline bool name##_contains(const name##_t *t, K key) {                  \
+        return name##_find(t, key) >= 0;                                            \
+    }                                                                               \
+    static inline void name##_clear(name##_t *t) {                                  \
+        memset(t->used, 0, sizeof(t->used));                                        \
+        t->count = 0;                                                               \
+    }
+
+// Empty slot i, moving back later entries of its probe run (MOVE(t, to, from))
+#define PY2MCU_TABLE_ERASE(name, BITS, HASH, MOVE)                                 \
+    static inline void name##_erase(name##_t *t, uint32_t i) {                      \
+        uint32_t mask = (1u << (BITS)) - 1u;                                        \
+        uint32_t j = i;                                                             \
+        for (;;) {                                                                  \
+            j = PY2MCU_SLOT_NEXT(j, BITS);                                          \
+            if (!t->used[j]) break;                                                 \
+            uint32_t home = HASH(t->keys[j], BITS);                                 \
+            /* the entry at j may move to i if i lies between home and j */         \
+            if (((j - home) & mask) >= ((j - i) & mask)) {                          \
+                MOVE(t, i, j);                                                      \
+                i = j;                                                              \
+            }                                                                       \
+        }                                                                           \
+        t->used[i] = 0;                                                             \
+        t->count--;                                                                 \
+    }
+
+#define PY2MCU_MAP_MOVE(t, to, from)                                               \
+    ((t)->keys[to] = (t)->keys[from], (t)->values[to] = (t)->values[from])
+#define PY2MCU_SET_MOVE(t, to, from) ((t)->keys[to] = (t)->keys[from])
+
+#define PY2MCU_MAP_DEFINE(name, K, V, CAPACITY, BITS, HASH)                        \
+    typedef struct {                                                                \
+        uint32_t count;                                                             \
+        uint8_t used[1u << (BITS)];                                                 \
+        K keys[1u << (BITS)];                                                       \
+        V values[1u << (BITS)];                                                     \
+    } name##_t;                                                                     \
+    PY2MCU_TABLE_FIND(name, K, BITS, HASH)                                          \
+    PY2MCU_TABLE_ERASE(name, BITS, HASH, PY2MCU_MAP_MOVE)                           \
+    static inline V name##_get(const name##_t *t, K key, V fallback) {              \
+        int32_t i = name##_find(t, key);                                            \
+        return i < 0 ? fallback : t->values[i];                                     \
+    }                                                                               \
+    static inline bool name##_set(name##_t *t, K key, V value) {                    \
+        uint32_t i = HASH(key, BITS);                                               \
+        while (t->used[i]) {                                                        \
+            if (t->keys[i] == key) {                                                \
+                t->values[i] = value;                                               \
+                return true;                                                        \
+            }                                                                       \
+            i = PY2MCU_SLOT_NEXT(i, BITS);                                          \
+        }                                                                           \
+        if (t->count >= (CAPACITY)) {                                               \
+            PY2MCU_CONTAINER_FULL(#name);                                           \
+            return false;                                                           \
+        }                                                                           \
+        t->used[i] = 1;                                                             \
+        t->keys[i] = key;                                                           \
+        t->values[i] = value;                                                       \
+        t->count++;                                                                 \
+        return true;                                                                \
+    }                                                                               \
+    static inline bool name##_remove(name##_t *t, K key) {                          \
+        int32_t i = name##_find(t, key);                                            \
+        if (i < 0) return false;                                                    \
+        name##_erase(t, (uint32_t)i);                                               \
+        return true;                                                                \
+    }                                                                               \
+    static inline V name##_pop(name##_t *t, K key, V fallback) {                    \
+        int32_t i = name##_find(t, key);                                            \
+        if (i < 0) return fallback;                                                 \
+        V value = t->values[i];                                                     \
+        name##_erase(t, (uint32_t)i);                                               \
+        return value;                                                               \
+    }
+
+#define PY2MCU_SET_DEFINE(name, K, CAPACITY, BITS, HASH)                           \
+    typedef struct {                                                                \
+        uint32_t count;                                                             \
+        uint8_t used[1u << (BITS)];                                                 \
+        K keys[1u << (BITS)];                                                       \
+    } name##_t;                                                                     \
+    PY2MCU_TABLE_FIND(name, K, BITS, HASH)                                          \
+    PY2MCU_TABLE_ERASE(name, BITS, HASH, PY2MCU_SET_MOVE)                           \
+    static inline bool name##_add(name##_t *t, K key) {                             \
+        uint32_t i = HASH(key, BITS);                                               \
+        while (t->used[i]) {                                                        \
+            if (t->keys[i] == key) return true;                                     \
+            i = PY2MCU_SLOT_NEXT(i, BITS);                                          \
+        }                                                                           \
+        if (t->count >= (CAPACITY)) {                                               \
+            PY2MCU_CONTAINER_FULL(#name);                                           \
+            return false;                                                           \
+        }                                                                           \
+        t->used[i] = 1;                                                             \
+        t->keys[i] = key;                                                           \
+        t->count++;                                                                 \
+        return true;                                                                \
+    }                                                                               \
+    static inline bool name##_remove(name##_t *t, K key) {                          \
+        int32_t i = name##_find(t, key);                                            \
+        if (i < 0) return false;                                                    \
+        name##_erase(t, (uint32_t)i);                                               \
+        return true;                                                                \
+    }
+
+#endif // PY2MCU_MAP_H
@@ -0,0 +1,22 @@
+// Small fixed-size matrices and vectors for py2mcu
+//
+// PY2MCU_MAT_DEFINE(name, T, R, C) declares name##_t holding R x C elements
+// of T (.m[row][column]); PY2MCU_VEC_DEFINE(name, T, N) declares name##_t
+// holding N elements (.v[i]).  Both are plain structs, assigned, passed and
+// returned by value: the compiler unrolls every operation on them into
+// straight-line code, so no loop or heap is involved.
+//
+// Inverting a singular matrix invokes PY2MCU_VALUE_ERROR() (NumPy raises
+// LinAlgError, a ValueError).  The default handler traps; an application
+// may define it to log and reset instead.
+#ifndef PY2MCU_MATRIX_H
+#define PY2MCU_MATRIX_H
+
+#ifndef PY2MCU_VALUE_ERROR
+#define PY2MCU_VALUE_ERROR() __builtin_trap()
+#endif
+
+#define PY2MCU_MAT_DEFINE(name, T, R, C) typedef struct { T m[R][C]; } name##_t;
+#define PY2MCU_VEC_DEFINE(name, T, N) typedef struct { T v[N]; } name##_t;
+
+#endif
@@ -0,0 +1,92 @@
+// SIMD support for py2mcu's vectorized array loops
+//
+// Every vector loop the compiler emits sits in an #if block and is followed
+// by the scalar loop, which finishes the remaining elements.  Defining
+// PY2MCU_NO_SIMD compiles the vector loops out and leaves the scalar ones.
+//
+//   PY2MCU_SIMD_VECTOR  GCC (9+) or Clang vector extensions
+//   PY2MCU_SIMD_DSP     ARM DSP extension (Cortex-M4/M7, __ARM_FEATURE_DSP):
+//                       __SADD16, __QADD16, __SMLAD, ... from CMSIS, or the
+//                       ACLE equivalents below when CMSIS is not included
+//
+// Vector loads and stores go through memcpy, which compilers turn into
+// single (unaligned) vector moves; the _ALIGNED loads tell the compiler the
+// address is aligned to the access size.
+#ifndef PY2MCU_SIMD_H
+#define PY2MCU_SIMD_H
+
+#include <stdint.h>
+#include <string.h>
+
+#if !defined(PY2MCU_NO_SIMD) && (defined(__clang__) || (defined(__GNUC__) && __GNUC__ >= 9))
+#define PY2MCU_SIMD_VECTOR 1
+#else
+#define PY2MCU_SIMD_VECTOR 0
+#endif
+
+#if !defined(PY2MCU_NO_SIMD) && defined(__ARM_FEATURE_DSP)
+#define PY2MCU_SIMD_DSP 1
+#else
+#define PY2MCU_SIMD_DSP 0
+#endif
+
+#if defined(__GNUC__) || defined(__clang__)
+#define PY2MCU_ALIGNED(n) __attribute__((aligned(n)))
+#else
+#define PY2MCU_ALIGNED(n)
+#endif
+
+#if PY2MCU_SIMD_VECTOR
+// typedef T name with lanes elements of T
+#define PY2MCU_VECTOR_DEFINE(name, T, lanes) typedef T name __attribute__((vector_size(sizeof(T) * (lanes))))
+#define PY2MCU_VLOAD(V, p) __extension__({ V v_; memcpy(&v_, (p), sizeof(V)); v_; })
+#define PY2MCU_VLOAD_ALIGNED(V, p) __extension__({ V v_; memcpy(&v_, __builtin_assume_aligned((p), sizeof(V)), sizeof(V)); v_; })
+#define PY2MCU_VSTORE(p, v) memcpy((p), &(v), sizeof(v))
+#define PY2MCU_VSTORE_ALIGNED(p, v) memcpy(__builtin_assume_aligned((p), sizeof(v)), &(v), sizeof(v))
+
+// Per 32-bit lane: lo(a) * lo(b) + hi(a) * hi(b) of the int16_t halves,
+// which __SMLAD adds to an accumulator on Cortex-M
+typedef int32_t py2mcu_pairs_i32 __attribute__((vector_size(16)));
+typedef int16_t py2mcu_pairs_i16 __attribute__((vector_size(16)));
+static inline py2mcu_pairs_i32 py2mcu_madd16(py2mcu_pairs_i32 a, py2mcu_pairs_i32 b) {
+#if defined(__SSE2__)
+    return (py2mcu_pairs_i32)__builtin_ia32_pmaddwd128((py2mcu_pairs_i16)a, (py2mcu_pairs_i16)b);
+#else
+    return ((a << 16) >> 16) * ((b << 16) >> 16) + (a >> 16) * (b >> 16);
+#endif
+}
+#else
+#define PY2MCU_VECTOR_DEFINE(name, T, lanes)
+#endif
+
+#if PY2MCU_SIMD_DSP
+#if !defined(__SADD16) && !defined(__CMSIS_GENERIC) && !defined(__CORE_CM4_H_GENERIC) && !defined(__CORE_CM7_H_GENERIC)
+#include <arm_acle.h>
+#define __SADD16(x, y) ((uint32_t)__sadd16((int16x2_t)(x), (int16x2_t)(y)))
+#define __SSUB16(x, y) ((uint32_t)__ssub16((int16x2_t)(x), (int16x2_t)(y)))
+#define __UADD16(x, y) ((uint32_t)__uadd16((uint16x2_t)(x), (uint16x2_t)(y)))
+#define __USUB16(x, y) ((uint32_t)__usub16((uint16x2_t)(x), (uint16x2_t)(y)))
+#define __SADD8(x, y) ((uint32_t)__sadd8((int8x4_t)(x), (int8x4_t)(y)))
+#define __SSUB8(x, y) ((uint32_t)__ssub8((int8x4_t)(x), (int8x4_t)(y)))
+#define __UADD8(x, y) ((uint32_t)__uadd8((uint8x4_t)(x), (uint8x4_t)(y)))
+#define __USUB8(x, y) ((uint32_t)__usub8((uint8x4_t)(x), (uint8x4_t)(y)))
+#define __QADD16(x, y) ((uint32_t)__qadd16((int16x2_t)(x), (int16x2_t)(y)))
+#define __QSUB16(x, y) ((uint32_t)__qsub16((int16x2_t)(x), (int16x2_t)(y)))
+#define __SMLAD(x, y, acc) ((uint32_t)__smlad((int16x2_t)(x), (int16x2_t)(y), (int32_t)(acc)))
+#endif
+// 32-bit loads and stores of packed lanes
+static inline uint32_t py2mcu_load32(const void *p) {
+    uint32_t v;
+    memcpy(&v, p, sizeof(v));
+    return v;
+}
+#define PY2MCU_LOAD32(p) py2mcu_load32(p)
+#define PY2MCU_LOAD32_ALIGNED(p) py2mcu_load32(__builtin_assume_aligned((p), 4))
+#define PY2MCU_STORE32(p, v) do { uint32_t v_ = (v); memcpy((p), &v_, sizeof(v_)); } while (0)
+#define PY2MCU_STORE32_ALIGNED(p, v) PY2MCU_STORE32(__builtin_assume_aligned((p), 4), v)
+// Two 16-bit lanes (four 8-bit lanes) holding the same value
+#define PY2MCU_PACK16(v) ((uint32_t)(uint16_t)(v) * 0x00010001u)
+#define PY2MCU_PACK8(v) ((uint32_t)(uint8_t)(v) * 0x01010101u)
+#endif
+
+#endif
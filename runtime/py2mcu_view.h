@@ -0,0 +1,92 @@
+// Zero-copy array views for py2mcu
+//
+// PY2MCU_VIEW_DEFINE(name, T) declares name##_t, a (pointer, length) view
+// of T elements that is passed by value, and static inline operations on
+// it.  A view never owns its elements: slicing only computes a pointer and
+// a length, and writes through a view change the array it was taken from.
+//
+// Slices clamp their bounds like Python (negative bounds count from the
+// end).  Indexing through name##_at() checks the index and invokes
+// PY2MCU_INDEX_ERROR(index, len) when it is out of range; the compiler
+// indexes .data directly where it proved the index in range.  The default
+// handler traps, since continuing would read or write outside the array;
+// an application may define it to log and reset instead.
+#ifndef PY2MCU_VIEW_H
+#define PY2MCU_VIEW_H
+
+#include <stdbool.h>
+#include <stdint.h>
+#include <string.h>
+
+#ifndef PY2MCU_INDEX_ERROR
+#define PY2MCU_INDEX_ERROR(index, len) __builtin_trap()
+#endif
+
+typedef struct {
+    int32_t start;
+    int32_t len;
+} py2mcu_range_t;
+
+static inline int32_t py2mcu_index(int32_t index, int32_t len) {
+    if ((uint32_t)index >= (uint32_t)len) {
+        PY2MCU_INDEX_ERROR(index, len);
+    }
+    return index;
+}
+
+// offset for reading or writing size bytes of a len-byte buffer
+static inline int32_t py2mcu_checked_offset(int32_t offset, int32_t size, int32_t len) {
+    if (offset < 0 || offset > len - size) {
+        PY2MCU_INDEX_ERROR(offset, len);
+    }
+    return offset;
+}
+
+// Python's slice clamping of [start:stop] for a sequence of len elements
+static inline py2mcu_range_t py2mcu_slice_range(int32_t start, int32_t stop, int32_t len) {
+    if (start < 0) {
+        start = start + len < 0 ? 0 : start + len;
+    } else if (start > len) {
+        start = len;
+    }
+    if (stop < 0) {
+        stop = stop + len < 0 ? 0 : stop + len;
+    } else if (stop > len) {
+        stop = len;
+    }
+    py2mcu_range_t range = {start, stop > start ? stop - start : 0};
+    return range;
+}
+
+#define PY2MCU_VIEW_DEFINE(name, T)                                                 \
+    typedef struct {                                                                \
+        T *data;                                                                    \
+        int32_t len;                                                                \
+    } name##_t;                                                                     \
+    static inline name##_t name##_slice(T *data, int32_t len, int32_t start,        \
+                                        int32_t stop) {                             \
+        py2mcu_range_t range = py2mcu_slice_range(start, stop, len);                \
+        name##_t view = {data + range.start, range.len};                            \
+        return view;                                                                \
+    }                                                                               \
+    static inline name##_t name##_span(T *data, int32_t start, int32_t stop) {      \
+        name##_t view = {data + start, stop > start ? stop - start : 0};            \
+        return view;                                                                \
+    }                                                                               \
+    static inline name##_t name##_subview(name##_t view, int32_t start,             \
+                                          int32_t stop) {                           \
+        return name##_slice(view.data, view.len, start, stop);                      \
+    }                                                                               \
+    static inline T *name##_at(name##_t view, int32_t index) {                      \
+        return &view.data[py2mcu_index(index, view.len)];                           \
+    }                                                                               \
+    static inline bool name##_equal(name##_t a, name##_t b) {                       \
+        return a.len == b.len && memcmp(a.data, b.data, sizeof(T) * (uint32_t)a.len) == 0; \
+    }                                                                               \
+    static inline name##_t name##_copy(name##_t view, T *storage) {                 \
+        memcpy(storage, view.data, sizeof(T) * (uint32_t)view.len);                 \
+        view.data = storage;                                                        \
+        return view;                                                                \
+    }
+
+#endif // PY2MCU_VIEW_H
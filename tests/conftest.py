@@ -0,0 +1,41 @@
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import pytest
+
+RUNTIME_DIR = os.path.join(os.path.dirname(__file__), '..', 'runtime')
+
+
+@pytest.fixture
+def run_c(tmp_path):
+    """Build generated C against the runtime with gcc and return its stdout."""
+    if shutil.which('gcc') is None:
+        pytest.skip('gcc not available')
+
+    def run(c_code, name='program', flags=(), check=True):
+        c_file = tmp_path / f"{name}.c"
+        c_file.write_text(c_code)
+        exe = tmp_path / name
+        build = subprocess.run(['gcc', *flags, '-I', RUNTIME_DIR, str(c_file),
+                                os.path.join(RUNTIME_DIR, 'gc_runtime.c'), '-o', str(exe), '-lm'],
+                               capture_output=True, text=True)
+        assert build.returncode == 0, f'Build failed: {build.stderr}'
+        return subprocess.run([str(exe)], capture_output=True, text=True, check=check, timeout=10).stdout
+
+    return run
+
+
+@pytest.fixture
+def run_python():
+    """Run a source's main() as plain Python and return what it printed."""
+    def run(source, prelude='', namespace=None):
+        namespace = {} if namespace is None else dict(namespace)
+        exec(prelude + source, namespace)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            namespace['main']()
+        return output.getvalue()
+
+    return run
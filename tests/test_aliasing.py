@@ -0,0 +1,116 @@
+import pytest
+from py2mcu.compiler import Compiler
+
+FILTERS = """
+history: list = [0] * 8
+
+def average(samples: list, size: int) -> int:
+    total = 0
+    i = 0
+    while i < size:
+        total += samples[i]
+        i += 1
+    return total // size
+
+def scale(out: list, data: list, k: int, n: int):
+    i = 0
+    while i < n:
+        out[i] = data[i] * k
+        i += 1
+
+def dot(a: list, b: list, n: int) -> int:
+    s = 0
+    i = 0
+    while i < n:
+        s += a[i] * b[i]
+        i += 1
+    return s
+
+def remember(x: list):
+    history[0] = x[0]
+
+def main():
+    a: list = [1, 2, 3, 4]
+    b: list = [0] * 4
+    scale(b, a, 3, 4)
+    print(average(b, 4), dot(a, a, 4))
+    remember(b)
+"""
+
+
+class TestAliasing:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32')
+
+    def test_distinct_arguments_get_restrict(self):
+        c_code = self.compiler.compile_string(FILTERS)
+        assert "void scale(int32_t* restrict out, const int32_t* restrict data, int32_t k, int32_t n) {" in c_code
+        assert "int32_t average(const int32_t* restrict samples, int32_t size) {" in c_code
+
+    def test_shared_reads_keep_restrict(self):
+        c_code = self.compiler.compile_string(FILTERS)
+        # dot(a, a, 4) only reads, so both parameters may point to the same list
+        assert "int32_t dot(const int32_t* restrict a, const int32_t* restrict b, int32_t n) {" in c_code
+
+    def test_shared_writes_are_reported(self):
+        c_code = self.compiler.compile_string(FILTERS + """
+def smooth(buf: list, n: int):
+    scale(buf, buf, 2, n)
+
+def run():
+    c: list = [0] * 4
+    smooth(c, 4)
+""")
+        assert "void scale(int32_t* out, const int32_t* data, int32_t k, int32_t n) {" in c_code
+        assert "void smooth(int32_t* restrict buf, int32_t n) {" in c_code
+        report = self.compiler.codegen.report.sections['Aliasing']
+        assert any(line.startswith("scale(): 'out' may alias: line ") and line.endswith("'out' and 'data' both get 'buf'")
+                   for line in report)
+
+    def test_module_arrays_the_function_uses(self):
+        c_code = self.compiler.compile_string(FILTERS + """
+def tick():
+    remember(history)
+""")
+        assert "void remember(const int32_t* x) {" in c_code
+        report = self.compiler.codegen.report.sections['Aliasing']
+        assert any(line.endswith("'history' is a module array remember() also uses") for line in report)
+
+    def test_parameters_passed_on_stay_restrict(self):
+        c_code = self.compiler.compile_string("""
+def fill(dst: list, src: list, n: int):
+    i = 0
+    while i < n:
+        dst[i] = src[i]
+        i += 1
+
+def twice(dst: list, src: list, n: int):
+    fill(dst, src, n)
+    fill(dst, src, n)
+
+def main():
+    a: list = [1, 2, 3]
+    b: list = [0] * 3
+    twice(b, a, 3)
+""")
+        assert "void fill(int32_t* restrict dst, const int32_t* restrict src, int32_t n) {" in c_code
+        assert "void twice(int32_t* restrict dst, const int32_t* restrict src, int32_t n) {" in c_code
+
+    def test_unknown_callers_keep_plain_pointers(self):
+        c_code = self.compiler.compile_string("""
+def clear(buf: list, n: int):
+    i = 0
+    while i < n:
+        buf[i] = 0
+        i += 1
+""")
+        assert "void clear(int32_t* buf, int32_t n) {" in c_code
+        assert "clear(): 'buf' may alias: no calls in this module" in self.compiler.codegen.report.sections['Aliasing']
+
+    def test_O0_keeps_plain_pointers(self):
+        c_code = Compiler(target='stm32', optimize=0).compile_string(FILTERS)
+        assert "void scale(int32_t* out, int32_t* data, int32_t k, int32_t n) {" in c_code
+
+    def test_qualified_code_compiles_cleanly(self, run_c):
+        c_code = Compiler(target='pc').compile_string(FILTERS)
+        assert run_c(c_code, "filters", flags=['-std=c99', '-Werror=discarded-qualifiers']) == "7 30\n"
@@ -0,0 +1,101 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+PROTOCOL = """
+import struct
+
+MAGIC = b"\\x55\\xaaPY"
+TX = bytearray(16)
+
+def header(frame: bytes) -> int:
+    kind, length, seq = struct.unpack_from('<BHI', frame, 4)
+    return kind + length + seq
+
+def encode(out: bytearray, seq: int, temp: float, flag: bool) -> int:
+    struct.pack_into('>HfxB?', out, 0, seq, temp, 7, flag)
+    return struct.calcsize('>HfxB?')
+
+def word(buf: bytes, at: int) -> int:
+    return int.from_bytes(buf[at:at + 2], 'little', signed=True)
+"""
+
+
+class TestBytesCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_bytes_types_are_byte_views(self):
+        c_code = self.compiler.compile_string(PROTOCOL)
+        assert '#include "py2mcu_bytes.h"' in c_code
+        assert "int32_t header(view_u8_t frame)" in c_code
+        assert 'const view_u8_t MAGIC = {(uint8_t*)"U\\252PY", 4};' in c_code
+        assert "static uint8_t TX_storage[16];" in c_code
+        assert "view_u8_t TX = {TX_storage, 16};" in c_code
+
+    def test_unpack_is_one_load_per_field(self):
+        c_code = self.compiler.compile_string(PROTOCOL)
+        assert "uint8_t *unpack8 = frame.data + py2mcu_checked_offset(4, 7, frame.len);" in c_code
+        assert "uint8_t kind = ((uint8_t)unpack8[0]);" in c_code
+        assert "uint16_t length = py2mcu_load_u16le(unpack8 + 1);" in c_code
+        assert "uint32_t seq = py2mcu_load_u32le(unpack8 + 3);" in c_code
+
+    def test_pack_into_stores_and_zeroes_padding(self):
+        c_code = self.compiler.compile_string(PROTOCOL)
+        assert "py2mcu_store_u16be(pack12, (uint16_t)(seq));" in c_code
+        assert "py2mcu_store_f32be(pack12 + 2, temp);" in c_code
+        assert "memset(pack12 + 6, 0, 1);" in c_code
+        assert "(pack12 + 8)[0] = (uint8_t)((flag) != 0);" in c_code
+        assert "return 9;" in c_code
+
+    def test_from_bytes_reads_the_slice_in_place(self):
+        c_code = self.compiler.compile_string(PROTOCOL)
+        assert "((int16_t)py2mcu_load_u16le(buf.data + py2mcu_checked_offset(at, 2, buf.len)))" in c_code
+
+    def test_constant_offsets_are_checked_at_compile_time(self):
+        source = ("import struct\ndef f() -> int:\n    buf = bytearray(8)\n"
+                  "    return struct.unpack_from('<I', buf, 2)[0]\n")
+        c_code = self.compiler.compile_string(source)
+        assert "uint8_t buf_buf3[8] = {0};" in c_code
+        assert "py2mcu_load_u32le(buf.data + 2)" in c_code
+        with pytest.raises(CompileError, match="do not fit"):
+            self.compiler.compile_string(source.replace("'<I', buf, 2", "'<I', buf, 6"))
+
+    def test_format_needs_explicit_byte_order(self):
+        source = "import struct\ndef f(buf: bytes) -> int:\n    return struct.unpack_from('I', buf, 0)[0]\n"
+        with pytest.raises(CompileError, match="explicit byte order"):
+            self.compiler.compile_string(source)
+
+    def test_unsupported_format_code(self):
+        source = "import struct\ndef f(buf: bytes) -> int:\n    return struct.unpack_from('<e', buf, 0)[0]\n"
+        with pytest.raises(CompileError, match="not supported"):
+            self.compiler.compile_string(source)
+
+    def test_from_bytes_needs_constant_length(self):
+        source = "def f(buf: bytes) -> int:\n    return int.from_bytes(buf, 'little')\n"
+        with pytest.raises(CompileError, match="constant length"):
+            self.compiler.compile_string(source)
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = PROTOCOL + """
+def main():
+    frame = bytearray(20)
+    struct.pack_into('<4sBHI', frame, 0, MAGIC, 3, 513, 400000)
+    print(header(frame), 1 if frame[0:4] == MAGIC else 0, len(frame))
+    n = encode(TX, 258, 1.5, True)
+    seq, temp, _, flag = struct.unpack('>HfxB?', TX[0:n])
+    print(n, seq, temp, 1 if flag else 0, TX[6], TX[7], TX[8])
+    print(word(frame, 5), int.from_bytes(frame[6:9], 'big'), int.from_bytes(frame[8:11], 'little', signed=True))
+    struct.pack_into('<hqd', frame, 0, -2, -5000000000, -0.25)
+    small, big, value = struct.unpack_from('<hqd', frame)
+    print(small, big, value, int.from_bytes(frame[2:10], 'little', signed=True))
+    view = memoryview(frame)
+    tag = struct.unpack_from('>4s', view, 4)[0]
+    print(len(tag), struct.unpack_from('>i', view, 7)[0], int.from_bytes(b"\\x01\\x02", 'big'))
+    copy = bytes(frame[4:8])
+    frame[4] = 99
+    print(copy[0], frame[4], len(copy), 1 if copy != frame[4:8] else 0)
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "bytes")
+
+        assert c_output == run_python(source)
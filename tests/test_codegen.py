@@ -225,3 +225,153 @@ class TestTargets:
         assert '#define TARGET_PC 1' in c1
         assert '#define TARGET_PC 1' in c2
         assert '#define TARGET_PC 1' in c3
+
+
+class TestAllocationSites:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def test_allocation_tagged_with_python_line(self):
+        source = """
+def foo() -> None:
+    arr: list = [0] * 10
+    arr[1] = 2
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'gc_malloc_at(sizeof(int32_t) * 10, "<string>", 3)' in c_code
+
+
+class TestListLiterals:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def test_read_only_literal_is_const_table(self):
+        source = """
+def foo() -> int:
+    data: list = [1, 2, 3, 4, 5]
+    return data[4]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'static const int32_t data[5] = {1, 2, 3, 4, 5};' in c_code
+        assert 'gc_malloc' not in c_code
+
+    def test_mutated_literal_copies_const_template(self):
+        source = """
+def foo() -> int:
+    data: list = [10, 20, 30]
+    data[1] = 0
+    return data[1]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'static const int32_t data_init[3] = {10, 20, 30};' in c_code
+        assert 'memcpy(data, data_init, sizeof(data_init));' in c_code
+        assert 'for (int _i' not in c_code
+
+    def test_zero_fill_uses_memset(self):
+        source = """
+def foo() -> None:
+    buf: list = [0] * 16
+    buf[0] = 1
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'memset(buf, 0, sizeof(int32_t) * 16);' in c_code
+
+    def test_runtime_elements_are_kept(self):
+        source = """
+def foo(a: int, b: int) -> list:
+    result: list = [a, b]
+    return result
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'result[0] = a;' in c_code
+        assert 'result[1] = b;' in c_code
+
+    def test_static_alloc_uses_brace_initializer(self):
+        source = """
+@static_alloc
+def foo() -> int:
+    buf: list = [0] * 8
+    vals: list = [3, 4]
+    buf[0] = vals[1]
+    vals[0] = 1
+    return buf[0]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'int32_t buf[8] = {0};' in c_code
+        assert 'int32_t vals[2] = {3, 4};' in c_code
+
+
+class TestTypedArrays:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def test_list_element_type_param(self):
+        source = """
+def fill(buf: list[uint8_t], n: int) -> None:
+    buf[0] = 1
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'void fill(uint8_t* buf, int32_t n)' in c_code
+
+    def test_list_element_type_return(self):
+        source = """
+def make() -> list[uint16_t]:
+    out: list[uint16_t] = [0] * 4
+    out[0] = 1
+    return out
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'uint16_t* make(void)' in c_code
+        assert 'gc_malloc_at(sizeof(uint16_t) * 4' in c_code
+
+    def test_array_local_is_fixed_c_array(self):
+        source = """
+def foo() -> None:
+    samples: Array[uint16_t, 512] = [0] * 512
+    samples[0] = 1
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'uint16_t samples[512] = {0};' in c_code
+
+    def test_array_declaration_without_value(self):
+        source = """
+def foo() -> None:
+    raw: Array[uint8_t, 3]
+    raw[0] = 1
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'uint8_t raw[3];' in c_code
+
+    def test_array_param_decays_to_pointer(self):
+        source = """
+def total(buf: Array[uint16_t, 16]) -> int:
+    return buf[0]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'int32_t total(const uint16_t* buf)' in c_code  # read-only: const
+
+    def test_indexing_infers_element_type(self):
+        source = """
+def foo(buf: list[uint8_t]) -> None:
+    v = buf[0]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'uint8_t v = buf[0];' in c_code
+
+    def test_module_level_const_array(self):
+        source = """
+# @const
+GAMMA: Array[uint8_t, 4] = [0, 10, 80, 255]
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'static const uint8_t GAMMA[4] = {0, 10, 80, 255};' in c_code
+
+    def test_array_length_mismatch(self):
+        from py2mcu.errors import CompileError
+        source = """
+def foo() -> None:
+    a: Array[uint8_t, 4] = [1, 2]
+    a[0] = 3
+"""
+        with pytest.raises(CompileError):
+            self.compiler.compile_string(source)
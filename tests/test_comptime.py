@@ -0,0 +1,168 @@
+import pytest
+import py2mcu.comptime
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+SOURCE = """
+import math
+
+F_CPU = 16000000
+counter = 0
+
+@comptime
+def crc_poly(bits: int) -> int:
+    poly = 0
+    for b in bits:
+        poly = poly | (1 << b)
+    return poly
+
+def baud_divisor(clock: int, baud: int) -> uint16_t:
+    return clock // (16 * baud) - 1
+
+def cutoff(fc: float) -> float:
+    return math.tan(math.pi * fc / 1000.0)
+
+def tick() -> int:
+    global counter
+    counter = counter + 1
+    return counter
+
+DIVISOR = baud_divisor(F_CPU, 9600)
+
+def main():
+    poly = crc_poly((0, 2, 5))
+    k = cutoff(50.0)
+    d = baud_divisor(F_CPU, poly)
+    t = tick()
+"""
+
+NEGATIVE = """
+def m(v: int) -> int:
+    return v % 8
+
+def q(v: int) -> int:
+    return v // 4
+
+def rem(v: int) -> int:
+    t = v
+    t %= 5
+    return t
+
+def scaled(v: int) -> int:
+    return v * 65536 // 65536
+
+def main():
+    x = -13
+    print(m(-13), m(x), q(-13), q(x), rem(-13), rem(x))
+    print(scaled(40000))
+"""
+
+
+class TestCompileTimeEvaluation:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32f4')
+
+    def test_comptime_call_becomes_constant(self):
+        c_code = self.compiler.compile_string(SOURCE)
+        assert " poly = 37;" in c_code
+        assert "crc_poly(" not in c_code
+
+    def test_pure_calls_with_constant_arguments_are_folded(self):
+        c_code = self.compiler.compile_string(SOURCE)
+        assert "const uint16_t DIVISOR = 103;" in c_code
+        assert "float k = 0.15838444032453627f;" in c_code
+
+    def test_other_calls_are_kept(self):
+        c_code = self.compiler.compile_string(SOURCE)
+        assert "baud_divisor(F_CPU, poly);" in c_code
+        assert "int32_t t = tick();" in c_code
+
+    def test_report(self):
+        self.compiler.compile_string(SOURCE)
+        assert "line 25: baud_divisor(F_CPU, 9600) = 103" in self.compiler.report.lines('Compile-time evaluation')
+
+    def test_automatic_folding_needs_O1(self):
+        c_code = Compiler(target='stm32f4', optimize='0').compile_string(SOURCE)
+        assert "DIVISOR = baud_divisor(F_CPU, 9600);" in c_code
+        assert " poly = 37;" in c_code
+
+    def test_comptime_needs_constant_arguments(self):
+        source = "@comptime\ndef sq(x: int) -> int:\n    return x * x\n\ndef f(n: int) -> int:\n    return sq(n)\n"
+        with pytest.raises(CompileError, match="<string>:6: error: @comptime function 'sq' needs compile-time"):
+            self.compiler.compile_string(source)
+
+    def test_result_must_fit_return_type(self):
+        source = "@comptime\ndef big() -> uint8_t:\n    return 300\n\ndef f() -> int:\n    return big()\n"
+        with pytest.raises(CompileError, match="big\\(\\) = 300 is not a uint8_t constant"):
+            self.compiler.compile_string(source)
+
+    def test_float_result_must_be_finite(self):
+        c_code = self.compiler.compile_string("def f(a: float, b: float) -> float:\n    return a * 10.0 ** 40\n\n"
+                                              "def g() -> float:\n    return f(2.0, 3.0)\n")
+        assert "return f(2.0f, 3.0f);" in c_code
+        source = "@comptime\ndef huge() -> float:\n    return 2e40\n\ndef f() -> float:\n    return huge()\n"
+        with pytest.raises(CompileError, match="huge\\(\\) = 2e\\+40 is not a float constant"):
+            self.compiler.compile_string(source)
+
+    def test_only_referenced_module_variables_are_evaluated(self):
+        self.compiler.compile_string(SOURCE + "\nSTARTUP = tick()\n")
+        namespace = self.compiler.codegen.evaluator.namespace
+        assert namespace['F_CPU'] == 16000000
+        assert 'STARTUP' not in namespace and 'counter' not in namespace
+
+    def test_builtins_are_restricted(self):
+        source = "@comptime\ndef name() -> int:\n    return len(open('/etc/hostname').read())\n\n" \
+                 "def f() -> int:\n    return name()\n"
+        with pytest.raises(CompileError, match="name\\(\\) failed: NameError: name 'open' is not defined"):
+            self.compiler.compile_string(source)
+        source = "@comptime\ndef sneaky() -> int:\n    return len(().__class__.__mro__)\n\n" \
+                 "def f() -> int:\n    return sneaky()\n"
+        with pytest.raises(CompileError, match="sneaky\\(\\) failed: NameError"):
+            self.compiler.compile_string(source)
+
+    def test_time_limit(self, monkeypatch):
+        monkeypatch.setattr(py2mcu.comptime, 'TIME_LIMIT', 0.05)
+        source = "@comptime\ndef spin() -> int:\n    while True:\n        pass\n\ndef f() -> int:\n    return spin()\n"
+        with pytest.raises(CompileError, match="spin\\(\\) failed: EvaluationTimeout"):
+            self.compiler.compile_string(source)
+
+    def test_folding_uses_c_int_arithmetic(self):
+        c_code = self.compiler.compile_string(NEGATIVE)
+        # C's / and % truncate toward zero: -13 % 8 == -5 and -13 // 4 == -3 on the target
+        assert 'printf("%d %d %d %d %d %d\\n", -5, m(x), -3, q(x), -3, rem(x));' in c_code
+
+    def test_int32_overflow_is_not_folded(self):
+        c_code = self.compiler.compile_string(NEGATIVE)
+        assert "scaled(40000)" in c_code
+        assert not any(line.startswith("line 19: scaled(")
+                       for line in self.compiler.report.lines('Compile-time evaluation'))
+
+    def test_arguments_are_converted_to_parameter_types(self):
+        c_code = self.compiler.compile_string("def f(x: uint8_t) -> int:\n    return x + 1\n\n"
+                                              "def g() -> int:\n    return f(300)\n")
+        # the call stores 300 in a uint8_t: x is 44 on the target
+        assert "return 45;" in c_code
+
+    def test_functions_taking_slices_are_not_folded(self):
+        c_code = self.compiler.compile_string("""
+def first(k: int) -> int:
+    d: list = [1, 2, 3]
+    w = d[0:2]
+    w[0] = k
+    return d[0]
+
+def g() -> int:
+    return first(7)
+""")
+        # w is a view of d in C, so the result is 7 there and 1 in Python
+        assert "return first(7);" in c_code
+
+    def test_comptime_keeps_python_semantics(self):
+        c_code = self.compiler.compile_string("@comptime\ndef m(v: int) -> int:\n    return v % 8\n\n"
+                                              "def f() -> int:\n    return m(-13)\n")
+        assert "return 3;" in c_code
+
+    def test_folded_and_runtime_results_agree(self, run_c):
+        c_code = Compiler(target='pc').compile_string(NEGATIVE)
+        first = run_c(c_code, "negative", flags=['-std=c99', '-Wall', '-Werror']).splitlines()[0]
+        assert first == "-5 -5 -3 -3 -3 -3"
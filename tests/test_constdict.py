@@ -0,0 +1,121 @@
+import pytest
+from py2mcu import types
+from py2mcu.compiler import Compiler
+from py2mcu.constdict import hash_str, perfect_hash, slot_of
+from py2mcu.errors import CompileError
+
+REGISTERS = """
+REGISTERS: dict[str, uint16_t] = {"CTRL": 0x00, "STATUS": 0x04, "DATA": 0x08, "BAUD": 0x0C, "IRQ": 0x10}
+
+def address(name: str) -> int:
+    return REGISTERS.get(name, 0xFFFF)
+
+def status() -> int:
+    return REGISTERS["STATUS"]
+"""
+
+HANDLERS = """
+def ping(x: int) -> int:
+    return x + 1
+
+def reset(x: int) -> int:
+    return 0
+
+HANDLERS = {"ping": ping, "reset": reset}
+
+def dispatch(name: str, x: int) -> int:
+    if name in HANDLERS:
+        return HANDLERS[name](x)
+    return -1
+"""
+
+
+class TestPerfectHash:
+    def test_every_key_gets_its_own_slot(self):
+        for n in (1, 2, 7, 64, 500):
+            keys = [f"cmd{i}" for i in range(n)]
+            seeds = perfect_hash([hash_str(key) for key in keys])
+            assert sorted(slot_of(key, seeds, n) for key in keys) == list(range(n))
+
+    def test_fnv1a(self):
+        assert hash_str("") == 0x811C9DC5
+        assert hash_str("a") == 0xE40C292C
+
+
+class TestConstDictCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_tables_and_lookup(self):
+        c_code = self.compiler.compile_string(REGISTERS)
+        assert '#include "py2mcu_hash.h"' in c_code
+        assert "static const char* const REGISTERS_keys[5] = {" in c_code
+        assert "static const uint16_t REGISTERS_values[5] = {" in c_code
+        assert "static int32_t REGISTERS_find(const char* key) {" in c_code
+        assert "return strcmp(key, REGISTERS_keys[i]) == 0 ? (int32_t)i : -1;" in c_code
+        assert "return REGISTERS_get(name, 65535);" in c_code
+
+    def test_constant_key_is_folded(self):
+        c_code = self.compiler.compile_string(REGISTERS)
+        assert "int32_t status(void) {\n    return 4;" in c_code
+
+    def test_missing_constant_key(self):
+        source = REGISTERS + "\ndef f() -> int:\n    return REGISTERS['NOPE']\n"
+        with pytest.raises(CompileError, match="KeyError: 'NOPE'"):
+            self.compiler.compile_string(source)
+
+    def test_report(self):
+        self.compiler.compile_string(REGISTERS)
+        line = self.compiler.report.lines('Constant dicts')[0]
+        assert line.startswith("REGISTERS: 5 keys, 3 hash buckets, ")
+
+    def test_int_keys_use_narrow_tables(self):
+        source = "CODES = {1: 10, 7: 70, -3: 30}\n\ndef f(x: int) -> int:\n    return CODES[x] + len(CODES)\n"
+        c_code = self.compiler.compile_string(source)
+        assert "static const int8_t CODES_keys[3] = {" in c_code
+        assert "uint32_t h = (uint32_t)key;" in c_code
+        assert "return (CODES_get(x, 0) + 3);" in c_code
+
+    def test_handlers_become_function_pointers(self):
+        c_code = self.compiler.compile_string(HANDLERS)
+        assert "typedef int32_t (*HANDLERS_fn)(int32_t);" in c_code
+        assert "static const HANDLERS_fn HANDLERS_values[2] = {" in c_code
+        assert "if ((HANDLERS_find(name) >= 0)) {" in c_code
+        assert "return HANDLERS_get(name, NULL)(x);" in c_code
+
+    def test_avr_tables_live_in_progmem(self):
+        c_code = Compiler(target='arduino').compile_string(HANDLERS)
+        assert "static const char* const HANDLERS_keys[2] PROGMEM = {" in c_code
+        assert "((HANDLERS_fn)pgm_read_ptr(&HANDLERS_values[i]))" in c_code
+
+    def test_modified_dict_is_rejected(self):
+        source = "TABLE = {1: 2}\n\ndef f() -> None:\n    TABLE[3] = 4\n"
+        with pytest.raises(CompileError, match="dict 'TABLE' is modified"):
+            self.compiler.compile_string(source)
+
+    def test_non_constant_value_is_rejected(self):
+        source = "def g() -> int:\n    return 1\n\nTABLE = {1: g() + 1}\n"
+        with pytest.raises(CompileError, match="values must be constants"):
+            self.compiler.compile_string(source)
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = REGISTERS + HANDLERS + """
+CODES = {1: "one", 7: "seven", -3: "minus three", 1000: "thousand"}
+
+def main():
+    names: list[str] = ["CTRL", "IRQ", "DATA", "ctrl", ""]
+    k = 0
+    while k < 5:
+        print(address(names[k]), names[k] in REGISTERS)
+        k = k + 1
+    i = -4
+    while i < 1001:
+        if i in CODES:
+            print(i, CODES[i])
+        i = i + 1
+    print(dispatch("ping", 41), dispatch("reset", 5), dispatch("zzz", 1), status())
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "constdict")
+
+        python_output = run_python(source, namespace={'uint16_t': types.uint16_t})
+        assert c_output == python_output.replace("True", "1").replace("False", "0")
@@ -0,0 +1,131 @@
+import pytest
+from py2mcu import Dict, Set, types
+from py2mcu.compiler import Compiler
+from py2mcu.containers import fill_slots, probe_length, table_bits
+from py2mcu.errors import CompileError
+
+DEVICES = """
+devices: Dict[uint16_t, uint32_t, 8] = {}
+
+def attach(addr: uint16_t, serial: uint32_t) -> bool:
+    if addr in devices or len(devices) < 8:
+        devices[addr] = serial
+        return True
+    return False
+
+def size(table: Dict[uint16_t, uint32_t, 8]) -> int:
+    return len(table)
+"""
+
+
+class TestTableModel:
+    def test_full_table_stays_under_max_load(self):
+        assert table_bits(8) == 4
+        assert table_bits(12) == 4
+        assert table_bits(13) == 5
+
+    def test_probe_lengths(self):
+        keys = list(range(0, 600, 7))
+        slots = fill_slots(keys, 'uint32_t', table_bits(len(keys)))
+        assert sorted(slots.values()) == keys
+        assert all(probe_length(slots, key, 'uint32_t', 7) >= 1 for key in keys)
+
+    def test_small_keys_index_directly(self):
+        slots = fill_slots([3, 200, 17], 'uint8_t', 8)
+        assert slots == {3: 3, 200: 200, 17: 17}
+
+
+class TestBoundedTypes:
+    def test_dict_raises_when_full(self):
+        table = Dict[types.uint8_t, types.uint8_t, 2]()
+        table[1] = 10
+        table[2] = 20
+        table[1] = 11
+        with pytest.raises(OverflowError):
+            table[3] = 30
+        assert Dict[types.uint8_t, types.uint8_t, 2] is type(table)
+
+    def test_set_raises_when_full(self):
+        members = Set[types.uint8_t, 1]()
+        members.add(5)
+        members.add(5)
+        with pytest.raises(OverflowError):
+            members.add(6)
+
+
+class TestContainerCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_map_definition_and_operations(self):
+        c_code = self.compiler.compile_string(DEVICES)
+        assert '#include "py2mcu_map.h"' in c_code
+        assert "PY2MCU_MAP_DEFINE(map_u16_u32_8, uint16_t, uint32_t, 8, 4, py2mcu_hash_fib32)" in c_code
+        assert "map_u16_u32_8_t devices;" in c_code
+        assert "map_u16_u32_8_contains(&devices, addr)" in c_code
+        assert "map_u16_u32_8_set(&devices, addr, serial);" in c_code
+
+    def test_parameters_are_passed_by_pointer(self):
+        c_code = self.compiler.compile_string(DEVICES)
+        assert "int32_t size(map_u16_u32_8_t* table)" in c_code
+        assert "table->count" in c_code
+
+    def test_byte_set_is_indexed_directly(self):
+        source = "def f(x: uint8_t) -> bool:\n    seen: Set[uint8_t, 200] = set()\n    seen.add(x)\n    return x in seen\n"
+        c_code = self.compiler.compile_string(source)
+        assert "PY2MCU_SET_DEFINE(set_u8_200, uint8_t, 200, 9, py2mcu_hash_direct)" in c_code
+        assert "set_u8_200_clear(&seen);" in c_code
+        assert "set_u8_200_add(&seen, x);" in c_code
+
+    def test_report(self):
+        self.compiler.compile_string(DEVICES)
+        assert "map_u16_u32_8: 8 entries in 16 slots" in self.compiler.report.format()
+
+    def test_initial_entries_are_rejected(self):
+        with pytest.raises(CompileError, match="empty"):
+            self.compiler.compile_string("table: Dict[uint8_t, uint8_t, 4] = {1: 2}\n")
+
+    def test_float_keys_are_rejected(self):
+        with pytest.raises(CompileError, match="keys must be integers"):
+            self.compiler.compile_string("table: Set[float, 4] = set()\n")
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = DEVICES + """
+table: Dict[uint16_t, uint32_t, 48] = {}
+members: Set[uint16_t, 48] = set()
+
+def main():
+    i = 0
+    while i < 40:
+        attach(i * 37 % 1000, i * 11)
+        i = i + 1
+    print(len(devices), devices[37], devices.get(9999, 5), 74 in devices, size(devices))
+    del devices[37]
+    print(len(devices), 37 in devices, devices.get(111, 0))
+    seed = 12345
+    step = 0
+    checksum = 0
+    while step < 20000:
+        seed = (seed * 1103515245 + 12345) % 2147483648
+        key = (seed >> 8) % 97
+        action = (seed >> 20) % 4
+        if action == 0:
+            if key in table or len(table) < 48:
+                table[key] = step
+                members.add(key)
+        elif action == 1:
+            if key in table:
+                del table[key]
+                members.discard(key)
+        else:
+            checksum = (checksum + table.get(key, 7) + len(table) * 3) % 1000003
+            if (key in members) != (key in table):
+                checksum = checksum + 1000000
+        step = step + 1
+    table[5] += 3
+    print(checksum, len(table), len(members), table[5])
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "containers")
+
+        python_output = run_python(source, "from py2mcu import Dict, Set\nfrom py2mcu.types import uint16_t, uint32_t\n")
+        assert c_output == python_output.replace("True", "1").replace("False", "0")
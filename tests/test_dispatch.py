@@ -0,0 +1,200 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+DISPATCHER = """
+CMD_PING = 1  # @#define
+CMD_RESET = 9
+
+def handle(cmd: int) -> int:
+    if cmd == CMD_PING:
+        return 10
+    elif cmd == 2 or cmd == 3:
+        return 20
+    elif cmd in (4, 5):
+        return 30
+    elif cmd == CMD_RESET:
+        return 40
+    else:
+        return -1
+"""
+
+
+class TestIfChains:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_chain_becomes_switch(self):
+        c_code = self.compiler.compile_string(DISPATCHER)
+        assert "switch (cmd) {" in c_code
+        assert "case CMD_PING: {" in c_code
+        assert "case 2:\n        case 3: {" in c_code
+        assert "case 9 /* CMD_RESET */: {" in c_code
+        assert "default: {\n            return -1;\n        }" in c_code
+        assert "if (" not in c_code.split("int32_t handle")[1]
+
+    def test_short_chain_stays_if(self):
+        source = """
+def f(x: int) -> int:
+    if x == 1:
+        return 5
+    elif x == 2:
+        return 6
+    return 0
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "switch" not in c_code
+        assert "if ((x == 1)) {" in c_code
+
+    def test_duplicate_values_keep_first_branch(self):
+        source = """
+def f(x: int) -> int:
+    if x == 1 or x == 2:
+        return 5
+    elif x == 2 or x == 3 or x == 4:
+        return 6
+    return 0
+"""
+        c_code = self.compiler.compile_string(source)
+        assert c_code.count("case 2:") == 1
+        assert "case 3:\n        case 4: {" in c_code
+
+    def test_break_keeps_if_chain(self):
+        source = """
+def f(x: int) -> int:
+    n = 0
+    while n < 10:
+        if x == 1:
+            break
+        elif x == 2:
+            n = n + 2
+        elif x == 3:
+            n = n + 3
+        n = n + 1
+    return n
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "switch" not in c_code
+        assert "break;" in c_code
+
+    def test_mixed_subjects_stay_if(self):
+        source = """
+def f(x: int, y: int) -> int:
+    if x == 1:
+        return 1
+    elif y == 2:
+        return 2
+    elif x == 3:
+        return 3
+    return 0
+"""
+        assert "switch" not in self.compiler.compile_string(source)
+
+
+class TestMatch:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_match_becomes_switch(self):
+        source = """
+def f(x: int) -> int:
+    r = 0
+    match x:
+        case 0:
+            r = 1
+        case 1 | 2:
+            r = 2
+        case _:
+            r = 3
+    return r
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "switch (x) {" in c_code
+        assert "case 1:\n        case 2: {\n            r = 2;\n            break;\n        }" in c_code
+        assert "default: {" in c_code
+
+    def test_break_in_match_uses_if_chain(self):
+        source = """
+def f() -> int:
+    i = 0
+    while i < 10:
+        match i:
+            case 5:
+                break
+        i = i + 1
+    return i
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "switch" not in c_code
+        assert "if ((match_subject == 5)) {\n                break;" in c_code
+
+    def test_capture_pattern_is_rejected(self):
+        source = """
+def f(x: int) -> int:
+    match x:
+        case y:
+            return y
+    return 0
+"""
+        with pytest.raises(CompileError, match="capture pattern 'y'"):
+            self.compiler.compile_string(source)
+
+    def test_non_integer_subject_is_rejected(self):
+        source = """
+def f(x: float) -> int:
+    match x:
+        case 1:
+            return 1
+    return 0
+"""
+        with pytest.raises(CompileError, match="match needs an integer subject"):
+            self.compiler.compile_string(source)
+
+
+class TestMembership:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_small_values_use_bit_mask(self):
+        c_code = self.compiler.compile_string("def f(x: int) -> bool:\n    return x in (1, 4, 9)\n")
+        assert "static inline bool py2mcu_in_mask(uint32_t value, uint32_t mask)" in c_code
+        assert "return py2mcu_in_mask(x, 0x212u);" in c_code
+
+    def test_large_values_use_equality_chain(self):
+        c_code = self.compiler.compile_string("def f(x: int) -> bool:\n    return x not in [100, 7, 200]\n")
+        assert "return !((x == 7) || (x == 100) || (x == 200));" in c_code
+        assert "py2mcu_in_mask" not in c_code
+
+    def test_values_outside_the_type_never_match(self):
+        source = "def f(x: uint8_t) -> bool:\n    return x in (-1, 300, 40)\n"
+        assert "return ((x == 40));" in self.compiler.compile_string(source)
+
+    def test_non_constant_container_is_rejected(self):
+        source = "def f(x: int, y: int) -> bool:\n    return x in (1, y)\n"
+        with pytest.raises(CompileError, match="constant tuple"):
+            self.compiler.compile_string(source)
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = DISPATCHER + """
+def classify(x: int) -> int:
+    match x:
+        case 0 | 1:
+            return 1
+        case 7:
+            return 2
+        case _:
+            if x in (3, 12, 31):
+                return 3
+            if x in (40, 1000):
+                return 4
+            return 0
+
+def main():
+    i = -2
+    while i < 1002:
+        print(handle(i), classify(i))
+        i = i + 1
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "dispatch")
+
+        assert c_output == run_python(source)
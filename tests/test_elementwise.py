@@ -0,0 +1,107 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+SIGNALS = """
+import numpy as np
+
+def mix(out: Array[float, 8], a: Array[float, 8], b: Array[float, 8], gain: float):
+    out[:] = a * gain + b
+
+def add(out: Array[float, 8], a: Array[float, 8], b: Array[float, 8]):
+    out[:] = a + b
+    out *= 0.5
+
+def energy(x: Array[float, 8], y: Array[float, 8]) -> float:
+    return np.dot(x, y)
+
+def count_above(x: Array[int16_t, 8], t: int) -> int:
+    return sum(x > t)
+
+def peak(x: View[int16_t], offset: int) -> int:
+    return max(abs(x - offset))
+"""
+
+MAIN = """
+def main():
+    a: Array[float, 8] = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0], dtype=np.float32)
+    b: Array[float, 8] = np.ones(8, dtype=np.float32)
+    out: Array[float, 8] = np.zeros(8, dtype=np.float32)
+    mix(out, a, b, 2.0)
+    print(int(out[0]), int(out[7]))
+    s = a - b
+    s[2:4] = 0
+    print(int(s[1]), int(s[2]), int(s[4]), int(energy(a, b)))
+    v: Array[int16_t, 8] = np.array([3, -9, 4, 1, -5, 9, 2, -6], dtype=np.int16)
+    print(count_above(v, 1), peak(v, 1), peak(v[2:5], 0))
+    d: Array[int16_t, 8] = v * 2 - 1
+    d += v
+    print(d[0], d[1], d[7])
+"""
+
+
+class TestElementwiseCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_expression_is_one_loop(self):
+        c_code = self.compiler.compile_string(SIGNALS)
+        assert "for (int32_t k5 = 0; k5 < 8; k5++) {" in c_code
+        assert "out[k5] = ((a[k5] * gain) + b[k5]);" in c_code
+        assert "out[k9] = (out[k9] * 0.5f);" in c_code
+
+    def test_reductions_become_fused_helpers(self):
+        c_code = self.compiler.compile_string(SIGNALS)
+        assert "static inline int32_t py2mcu_sum15(const int16_t *x, int32_t t) {" in c_code
+        assert "        acc += (x[k] > t);" in c_code
+        assert "return py2mcu_max18(x, offset);" in c_code
+        assert "    if (x.len == 0) PY2MCU_VALUE_ERROR();" in c_code
+        assert "        int32_t x_ = abs((x.data[k] - offset));" in c_code
+
+    def test_cmsis_dsp_on_arm_targets(self):
+        c_code = self.compiler.compile_string(SIGNALS)
+        assert '#ifdef PY2MCU_USE_CMSIS_DSP\n#include "arm_math.h"\n#endif' in c_code
+        assert "#ifdef PY2MCU_USE_CMSIS_DSP\n    arm_add_f32(a, b, out, 8);\n#else" in c_code
+        assert "    arm_scale_f32(out, 0.5f, out, 8);" in c_code
+        assert "    arm_dot_prod_f32(x, y, 8, &acc);" in c_code
+        assert "arm_" not in Compiler(target='pc').compile_string(SIGNALS)
+
+    def test_numpy_allocation_and_new_arrays(self):
+        source = ("import numpy as np\n\ndef f() -> int:\n    a: Array[int16_t, 4] = np.array([1, 2, 3, 4], dtype=np.int16)\n"
+                  "    b: Array[int16_t, 4] = np.zeros(4, dtype=np.int16)\n    c = a * 3 - b\n    c[1:3] = 0\n    return c[3]\n")
+        c_code = self.compiler.compile_string(source)
+        assert "int16_t a[4] = {1, 2, 3, 4};" in c_code
+        assert "int16_t b[4] = {0};" in c_code
+        assert "int32_t c[4];" in c_code
+        assert "c[k7 + 1] = 0;" in c_code
+
+    def test_report_lists_fused_loops(self):
+        self.compiler.compile_string(SIGNALS)
+        report = self.compiler.report.format()
+        assert "add: line 8: 'out' computed in one loop over 8 elements, arm_add_f32 with PY2MCU_USE_CMSIS_DSP" in report
+        assert "peak: line 18: max() fused into py2mcu_max18() over x.len elements" in report
+
+    def test_mismatched_lengths_are_rejected(self):
+        source = "def f(a: Array[int32_t, 4], b: Array[int32_t, 5]) -> int:\n    return sum(a + b)\n"
+        with pytest.raises(CompileError, match=r"different lengths \(4, 5\)"):
+            self.compiler.compile_string(source)
+
+    def test_overlapping_store_is_rejected(self):
+        source = "def f(a: Array[int32_t, 4]):\n    a[1:4] = a[0:3] + 1\n"
+        with pytest.raises(CompileError, match="copy it first"):
+            self.compiler.compile_string(source)
+
+    def test_rebinding_a_parameter_is_rejected(self):
+        source = "def f(a: Array[int32_t, 4]):\n    a = a * 2\n"
+        with pytest.raises(CompileError, match=r"write 'a\[:\] = \.\.\.'"):
+            self.compiler.compile_string(source)
+
+    def test_generated_c_output(self, run_c):
+        c_output = run_c(Compiler(target='pc').compile_string(SIGNALS + MAIN), "elementwise")
+        assert c_output == "3 17\n1 0 4 36\n4 10 5\n8 -28 -19\n"
+
+    def test_numpy_runs_the_same_source(self, run_python):
+        pytest.importorskip('numpy')
+        python_output = run_python(SIGNALS + MAIN, "from py2mcu import Array, View\nfrom py2mcu.types import int16_t\n")
+        assert python_output == "3 17\n1 0 4 36\n4 10 5\n8 -28 -19\n"
+
@@ -0,0 +1,89 @@
+import pytest
+from py2mcu import Fixed, q15, q31
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+from py2mcu.fixed import Q15, format_for
+
+KERNEL = """
+def mac(x: q15, c: q15, acc: q15) -> q15:
+    return acc + x * c
+
+def halve(x: Fixed[16, 16], n: int) -> Fixed[16, 16]:
+    return x * n / 2 - 0.75
+"""
+
+
+class TestFixedCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_formats_are_defined_once(self):
+        c_code = self.compiler.compile_string(KERNEL)
+        assert '#include "py2mcu_fixed.h"' in c_code
+        assert c_code.count("PY2MCU_FIXED_DEFINE(q15, int16_t, int32_t, 15, INT16_MIN, INT16_MAX)") == 1
+        assert "PY2MCU_FIXED_DEFINE(fix16_16, int32_t, int64_t, 16, INT32_MIN, INT32_MAX)" in c_code
+
+    def test_saturating_operations(self):
+        c_code = self.compiler.compile_string(KERNEL)
+        assert "q15_t mac(q15_t x, q15_t c, q15_t acc)" in c_code
+        assert "return q15_add(acc, q15_mul(x, c));" in c_code
+        assert "fix16_16_sub(fix16_16_div_int(fix16_16_mul_int(x, n), 2), ((fix16_16_t)49152))" in c_code
+
+    def test_constants_are_converted_at_compile_time(self):
+        source = """
+def f() -> q15:
+    taps: list[q15] = [q15(0.5), q15(-0.25)]
+    y: q15 = 0.1
+    return taps[0] + y
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "static const q15_t taps[2] = {((q15_t)16384), ((q15_t)-8192)};" in c_code
+        assert "q15_t y = ((q15_t)3277);" in c_code
+
+    def test_conversions(self):
+        source = """
+def f(x: q15, n: int, v: float) -> float:
+    a: q15 = n
+    b: q15 = v
+    print(x)
+    return float(a) + float(b)
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "q15_t a = q15_from_int(n);" in c_code
+        assert "q15_t b = q15_from_float(v);" in c_code
+        assert 'printf("%g\\n", (double)q15_to_float(x));' in c_code
+
+    def test_invalid_width(self):
+        with pytest.raises(CompileError, match="<string>:1: error: Fixed\\[20, 4\\]"):
+            self.compiler.compile_string("def f(x: Fixed[20, 4]) -> None:\n    pass\n")
+
+
+class TestFixedSimulation:
+    def test_python_semantics(self):
+        assert float(q15(0.5) * q15(0.75)) == 0.375
+        assert float(q15(0.9) + q15(0.9)) == Q15.max / Q15.scale
+        assert q15(-1.0).raw == Q15.min
+        assert Fixed[1, 15] is q15
+        assert int(Fixed[16, 16](-2.5)) == -2
+        assert (q31(0.25) / 2).raw == 1 << 28
+
+    def test_format_registry(self):
+        assert format_for(16, 16).c_type == 'fix16_16_t'
+        assert format_for(1, 15) is Q15
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = """
+def main():
+    acc = q15(0.0)
+    i = 0
+    while i < 40:
+        x = q15(0.02) * i - q15(0.6)
+        acc = acc * q15(0.875) + x * q15(0.3)
+        print(acc)
+        i = i + 1
+    big = Fixed[16, 16](300.5)
+    print(big * 200, big / Fixed[16, 16](0.0), int(-big), big / 3)
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "fixed")
+
+        assert c_output == run_python(source, namespace={'q15': q15, 'Fixed': Fixed})
@@ -0,0 +1,78 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+from py2mcu.floats import exact_reciprocal, float_literal
+
+
+MIXED_SOURCE = """
+def energy(x: float) -> float:
+    y: double = x * 2.0
+    return y
+"""
+
+
+class TestFloatDiscipline:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32f4')
+
+    def test_literals_are_single_precision(self):
+        c_code = self.compiler.compile_string("def f(x: float) -> float:\n    return x * 0.5 + 1.0\n")
+        assert "(x * 0.5f)" in c_code
+        assert "1.0f" in c_code
+
+    def test_math_functions_use_float_variants(self):
+        source = """
+import math
+
+def f(x: float) -> float:
+    return math.sqrt(x) + math.sin(x) + math.fabs(x)
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "#include <math.h>" in c_code
+        assert "sqrtf(x)" in c_code
+        assert "sinf(x)" in c_code
+        assert "fabsf(x)" in c_code
+
+    def test_floor_returns_int(self):
+        c_code = self.compiler.compile_string("import math\n\ndef f(x: float) -> int:\n    return math.floor(x)\n")
+        assert "((int32_t)floorf(x))" in c_code
+
+    def test_division_by_power_of_two_becomes_multiply(self):
+        c_code = self.compiler.compile_string("def f(x: float) -> float:\n    return x / 4.0\n")
+        assert "(x * 0.25f)" in c_code
+
+    def test_reciprocal_of_inexact_constant_only_on_soft_float_at_O3(self):
+        source = "def f(x: float) -> float:\n    return x / 3.0\n"
+        assert "(x / 3.0f)" in Compiler(target='stm32f4', optimize='3').compile_string(source)
+        assert "(x * 0.3333333333333333f)" in Compiler(target='rp2040', optimize='3').compile_string(source)
+
+    def test_double_promotion_warns(self):
+        self.compiler.compile_string(MIXED_SOURCE)
+        assert any("promotes float to double" in w for w in self.compiler.report.warnings)
+
+    def test_double_promotion_error(self):
+        compiler = Compiler(target='stm32f4', double_promotion='error')
+        with pytest.raises(CompileError, match="<string>:3: error: .*promotes float to double"):
+            compiler.compile_string(MIXED_SOURCE)
+
+    def test_double_context_literal_has_no_suffix(self):
+        c_code = self.compiler.compile_string("def f(y: double) -> double:\n    return y * 0.1\n")
+        assert "(y * 0.1)" in c_code
+        assert not self.compiler.report.warnings
+
+    def test_literal_out_of_float_range(self):
+        with pytest.raises(CompileError, match=r"<string>:2: error: float literal 1e\+40 is out of range for float"):
+            self.compiler.compile_string("def f(x: float) -> float:\n    return x * 1e40\n")
+        c_code = self.compiler.compile_string("def f(y: double) -> double:\n    return y * 1e40\n")
+        assert "(y * 1e+40)" in c_code
+
+    def test_soft_float_report(self):
+        compiler = Compiler(target='rp2040')
+        compiler.compile_string("def f(x: float) -> float:\n    return x * x + 1.0\n")
+        assert "f: 2 soft-float operations" in compiler.report.format()
+
+    def test_helpers(self):
+        assert float_literal(2.0) == "2.0f"
+        assert float_literal(1e-05, double=True) == "1e-05"
+        assert exact_reciprocal(8.0) == 0.125
+        assert exact_reciprocal(3.0) is None
@@ -0,0 +1,111 @@
+from py2mcu.compiler import Compiler
+from py2mcu.inference import arithmetic_type, join_types
+
+BRANCHES = """
+total: int = 0
+
+def pick(c: bool, n: int) -> float:
+    global total
+    if c:
+        q = 1
+        n = n + 1
+    else:
+        q = 2.5
+    while n < 4:
+        n += 1
+        last = n
+    total = n
+    return q + last
+
+def main():
+    a = pick(True, 0)
+    b = pick(False, 2)
+    print(a, b, total)
+"""
+
+class TestTypeInference:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def test_float_arithmetic_declares_float(self):
+        source = """
+def f(a: int) -> None:
+    x = a * 1.5
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "float x = (a * 1.5f);" in c_code
+
+    def test_later_float_assignment_widens_declaration(self):
+        source = """
+def f(n: int) -> None:
+    acc = 0
+    i = 0
+    while i < n:
+        acc = acc + 0.5
+        i = i + 1
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "float acc = 0;" in c_code
+
+    def test_call_uses_callee_return_type(self):
+        source = """
+def gain(x: int) -> float:
+    return x * 2.5
+
+def f(n: int) -> None:
+    g = gain(n)
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "float g = gain(n);" in c_code
+
+    def test_unannotated_return_type_is_inferred(self):
+        source = """
+def third(a: int):
+    return a / 3
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "float third(int32_t a)" in c_code
+        assert "return ((float)a / 3);" in c_code
+
+    def test_fstring_formats_follow_types(self):
+        source = """
+def main():
+    name = "adc"
+    v = 3.3
+    n: uint32_t = 7
+    print(f"{name} {v} {v:.2f} {n}")
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'printf("%s %g %.2f %lu\\n", name, (double)v, (double)v, (unsigned long)n);' in c_code
+
+    def test_print_arguments_follow_types(self):
+        source = """
+def main():
+    v = 1.25
+    print("value", v)
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'printf("value %g\\n", (double)v);' in c_code
+
+    def test_branch_locals_are_declared_before_the_if(self):
+        c_code = self.compiler.compile_string(BRANCHES)
+        assert ("    float q;\n    if (c) {\n        q = 1;\n        n = (n + 1);\n"
+                "    } else {\n        q = 2.5f;\n    }\n") in c_code
+        assert "    int32_t last;\n    while ((n < 4)) {\n        n += 1;\n        last = n;\n" in c_code
+        assert "    total = n;\n" in c_code
+
+    def test_branch_locals_run(self, run_c, run_python):
+        assert run_c(Compiler(target='pc').compile_string(BRANCHES), "branches") == run_python(BRANCHES)
+
+    def test_imported_function_return_type(self, tmp_path):
+        (tmp_path / "helper.py").write_text("def volts(raw: int) -> float:\n    return raw * 0.01\n")
+        main = tmp_path / "app.py"
+        main.write_text("from helper import volts\n\ndef main():\n    v = volts(100)\n")
+        c_code = self.compiler.compile_file(str(main))
+        assert "float v = volts(100);" in c_code
+
+    def test_join_and_promotion(self):
+        assert join_types('uint8_t', 'int8_t') == 'int16_t'
+        assert join_types('int32_t', 'float') == 'float'
+        assert arithmetic_type('uint8_t', 'uint8_t') == 'int32_t'
+        assert arithmetic_type('uint32_t', 'int32_t') == 'uint32_t'
@@ -3,6 +3,7 @@ import subprocess
 import sys
 import tempfile
 import pytest
+from .conftest import RUNTIME_DIR
 
 
 DEMOS = [
@@ -15,7 +16,6 @@ DEMOS = [
 ]
 
 EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'examples')
-RUNTIME_DIR = os.path.join(os.path.dirname(__file__), '..', 'runtime')
 
 
 class TestDemosCompilation:
@@ -83,6 +83,28 @@ class TestDemoExecution:
         assert 'Demo 5' in result.stdout
 
 
+class TestAllocationStats:
+    def test_stats_dumped_at_exit(self):
+        c_file = '/tmp/py2mcu_test/demo4_memory.c'
+        if not os.path.exists(c_file):
+            pytest.skip(f'C file not found: {c_file}')
+
+        exe = '/tmp/py2mcu_test/demo4_memory_stats'
+        result = subprocess.run(
+            ['gcc', '-DPY2MCU_ALLOC_STATS', '-I', RUNTIME_DIR, c_file,
+             os.path.join(RUNTIME_DIR, 'gc_runtime.c'), '-o', exe],
+            capture_output=True,
+            text=True
+        )
+        assert result.returncode == 0, f'Build failed: {result.stderr}'
+
+        result = subprocess.run([exe], capture_output=True, text=True, timeout=10)
+        assert result.returncode == 0, f'Execution failed: {result.stderr}'
+        assert 'py2mcu allocation stats' in result.stdout
+        assert 'demo4_memory.py:49  count=101 bytes=40400' in result.stdout
+        assert 'peak: 80800' in result.stdout
+
+
 class TestTargetPlatforms:
     @pytest.mark.parametrize('target', ['pc', 'stm32f4', 'esp32', 'rp2040'])
     def test_compile_all_targets(self, target):
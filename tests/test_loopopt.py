@@ -0,0 +1,93 @@
+import pytest
+from py2mcu.compiler import Compiler
+
+KERNELS = """
+def scale(out: Array[int32_t, 16], src: Array[int16_t, 17], n: int, gain: int, offset: int):
+    i = 0
+    while i < n:
+        out[i] = src[i] * (gain * 3 + offset) + src[i + 1] - i * 12
+        i += 1
+
+def grid(g: Array[int32_t, 100], rows: int, cols: int) -> int:
+    acc = 0
+    r = 0
+    while r < rows:
+        c = 0
+        while c < cols - 1:
+            acc += g[r * 10 + c] * (rows + cols)
+            c += 1
+        r += 1
+    return acc
+
+def checksum(payload: View[uint8_t]) -> int:
+    total = 0
+    i = 0
+    while i < len(payload):
+        total = total ^ payload[i]
+        i = i + 1
+    return total
+"""
+
+
+class TestLoopOptimizations:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_invariants_are_hoisted(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "const int32_t inv4 = ((gain * 3) + offset);" in c_code
+        assert "const int32_t inv11_0 = (cols - 1);" in c_code
+        assert "while ((c < inv11_0)) {" in c_code
+
+    def test_index_multiplies_become_adds(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "int32_t i_x12_4 = i * 12;" in c_code
+        assert "i_x12_4 += 12;" in c_code
+        assert "int32_t r_x10_11 = r * 10;" in c_code
+        assert "g[(r_x10_11 + c)]" in c_code
+
+    def test_array_accesses_step_a_pointer(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "int32_t *out_p4 = out + i;" in c_code
+        assert "const int16_t *src_p4 = src + i;" in c_code
+        assert "(*out_p4) = ((((*src_p4) * inv4) + src_p4[1]) - i_x12_4);" in c_code
+        assert "src_p4 += 1;" in c_code
+        assert "const uint8_t *payload_p22 = payload.data + i;" in c_code
+
+    def test_report_lists_what_moved(self):
+        self.compiler.compile_string(KERNELS)
+        report = self.compiler.report.format()
+        assert "scale: line 4: hoisted '((gain * 3) + offset)' as inv4" in report
+        assert "scale: line 4: 'i * 12' strength-reduced to i_x12_4 += 12" in report
+        assert "checksum: line 22: 'payload[i]' through pointer payload_p22" in report
+
+    def test_globals_and_division_stay_in_the_loop(self):
+        source = ("LIMIT = 0\n\ndef bump():\n    global LIMIT\n    LIMIT += 1\n\n"
+                  "def f(a: int, b: int) -> int:\n    acc = 0\n    i = 0\n    while i < 10:\n"
+                  "        acc += (LIMIT + a) + a // b\n        i += 1\n    return acc\n")
+        c_code = self.compiler.compile_string(source)
+        assert "inv" not in c_code
+
+    def test_not_applied_below_o2(self):
+        c_code = Compiler(target='rp2040', optimize='1').compile_string(KERNELS)
+        assert "inv4" not in c_code
+        assert "out_p4" not in c_code
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = KERNELS + """
+def main():
+    out: Array[int32_t, 16] = [0] * 16
+    src: Array[int16_t, 17] = [3, -1, 4, 1, -5, 9, 2, -6, 5, 3, -5, 8, 9, 7, -9, 3, 2]
+    scale(out, src, 16, 7, -2)
+    print(out[0], out[5], out[15])
+    g: Array[int32_t, 100] = [0] * 100
+    k = 0
+    while k < 100:
+        g[k] = k * 3 - 40
+        k += 1
+    print(grid(g, 7, 9), grid(g, 0, 4), checksum(b"\\x12\\x34\\xff"))
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "loopopt")
+
+        assert c_output == run_python(source, "from py2mcu import Array, View\n"
+                                              "from py2mcu.types import int16_t, int32_t, uint8_t\n")
@@ -0,0 +1,136 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+LOOPS = """
+def clear(buf: Array[int32_t, 16]):
+    i = 0
+    while i < 16:
+        buf[i] = 0
+        i += 1
+
+def copy_in(dst: Array[int16_t, 8], src: Array[int16_t, 8], n: int):
+    i = 0
+    while i < n:
+        dst[i] = src[i]
+        i = i + 1
+
+def total(samples: View[int16_t]) -> int:
+    acc: int32_t = 0
+    i = 0
+    while i < len(samples):
+        acc += samples[i]
+        i += 1
+    return acc
+
+def peak(samples: View[int16_t]) -> int:
+    best: int32_t = -40000
+    i = 0
+    while i < len(samples):
+        if samples[i] > best:
+            best = samples[i]
+        i += 1
+    return best
+
+def same(a: Array[uint8_t, 8], b: Array[uint8_t, 8]) -> int:
+    result = 1
+    i = 0
+    while i < 8:
+        if a[i] != b[i]:
+            result = 0
+            break
+        i += 1
+    return result
+
+def stats(data: View[uint8_t]) -> int:
+    return sum(data) + max(data) - min(data) + (1 if any(data) else 0)
+"""
+
+
+class TestLoopIdiomCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_fill_and_copy_become_library_calls(self):
+        c_code = self.compiler.compile_string(LOOPS)
+        assert '#include "py2mcu_loops.h"' in c_code
+        assert "memset(buf + i, 0, sizeof(int32_t) * (uint32_t)(16 - i));" in c_code
+        assert "py2mcu_copy_forward(dst + i, src + i, sizeof(int16_t) * (uint32_t)(n - i));" in c_code
+        assert "i = n;" in c_code
+
+    def test_fresh_array_copy_is_memcpy(self):
+        source = ("def f(src: Array[int16_t, 8]) -> int:\n    tmp: Array[int16_t, 8] = [0] * 8\n    i = 0\n"
+                  "    while i < 8:\n        tmp[i] = src[i]\n        i += 1\n    return tmp[7]\n")
+        c_code = self.compiler.compile_string(source)
+        assert "memcpy(tmp + i, src + i, sizeof(int16_t) * (uint32_t)(8 - i));" in c_code
+
+    def test_reductions_use_kernels(self):
+        c_code = self.compiler.compile_string(LOOPS)
+        assert "PY2MCU_SUM_DEFINE(py2mcu_sum_i32_i16, int16_t, int32_t)" in c_code
+        assert "acc = (acc + py2mcu_sum_i32_i16(samples.data + i, samples.len - i));" in c_code
+        assert "PY2MCU_BEST_DEFINE(py2mcu_max_i32_i16, int16_t, int32_t, >)" in c_code
+        assert "best = py2mcu_max_i32_i16(samples.data + i, samples.len - i, best);" in c_code
+
+    def test_compare_loop_is_memcmp(self):
+        c_code = self.compiler.compile_string(LOOPS)
+        assert "if (i < 8 && memcmp(a + i, b + i, sizeof(uint8_t) * (uint32_t)(8 - i)) != 0) {" in c_code
+
+    def test_builtins_over_views(self):
+        c_code = self.compiler.compile_string(LOOPS)
+        assert "py2mcu_sum_i32_u8(data.data, data.len)" in c_code
+        assert "py2mcu_max_u8_u8_of(data.data, data.len)" in c_code
+        assert "py2mcu_any_u8(data.data, data.len)" in c_code
+
+    def test_min_max_of_values(self):
+        c_code = self.compiler.compile_string("def f(a: int, b: int, c: int) -> int:\n    return max(a, b, c)\n")
+        assert "PY2MCU_PICK_DEFINE(py2mcu_max2_i32, int32_t, >)" in c_code
+        assert "py2mcu_max2_i32(py2mcu_max2_i32(a, b), c)" in c_code
+
+    def test_report_lists_rewritten_loops(self):
+        self.compiler.compile_string(LOOPS)
+        report = self.compiler.report.format()
+        assert "clear: line 4: fill loop -> memset" in report
+        assert "total: line 17: sum loop -> py2mcu_sum_i32_i16" in report
+
+    def test_float_reduction_loop_keeps_its_order(self):
+        source = ("def f(x: View[float]) -> float:\n    acc = 0.0\n    i = 0\n    while i < len(x):\n"
+                  "        acc += x[i]\n        i += 1\n    return acc\n")
+        c_code = self.compiler.compile_string(source)
+        assert "while ((i < x.len))" in c_code
+
+    def test_no_rewrite_without_optimization(self):
+        c_code = Compiler(target='rp2040', optimize='0').compile_string(LOOPS)
+        assert "memset(buf" not in c_code
+        assert "py2mcu_copy_forward" not in c_code
+
+    def test_sum_of_array_of_unknown_length(self):
+        source = "def f(a: list[int]) -> int:\n    return sum(a)\n"
+        with pytest.raises(CompileError, match="pass a slice"):
+            self.compiler.compile_string(source)
+
+    def test_sum_of_unannotated_parameter_is_a_plain_call(self):
+        c_code = self.compiler.compile_string("def f(samples) -> int:\n    return sum(samples)\n")
+        assert "return sum(samples);" in c_code
+        with pytest.raises(CompileError, match="takes an array or a view"):
+            self.compiler.compile_string("def f(samples: int) -> int:\n    return sum(samples)\n")
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = LOOPS + """
+def main():
+    buf: Array[int32_t, 16] = [5] * 16
+    clear(buf)
+    a: Array[int16_t, 8] = [1, -2, 3, -4, 5, -6, 7, 300]
+    b: Array[int16_t, 8] = [0] * 8
+    copy_in(b, a, 8)
+    print(buf[3], b[7], total(b[0:8]), peak(a[0:8]), sum(a), max(a), min(a), max(3, 9, 4), min(2.5, 1.5))
+    copy_in(a, a, 8)
+    x: Array[uint8_t, 8] = [1, 2, 3, 4, 5, 6, 7, 8]
+    y: Array[uint8_t, 8] = [1, 2, 3, 4, 5, 6, 7, 8]
+    print(same(x, y), stats(x[0:8]), sum(a, 10), a[7])
+    y[6] = 0
+    print(same(x, y), 1 if all(y[0:8]) else 0, total(a[2:5]), peak(a[7:8]))
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "loops")
+
+        assert c_output == run_python(source, "from py2mcu import Array, View\n"
+                                              "from py2mcu.types import int16_t, int32_t, uint8_t\n")
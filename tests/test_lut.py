@@ -0,0 +1,87 @@
+import pytest
+from py2mcu import lut
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+from py2mcu.tables import interpolate
+
+SINE = """
+import math
+
+@lut(domain=range(0, 64), dtype=int16_t)
+def sine(i: int) -> int:
+    return 32767 * math.sin(2 * math.pi * i / 64)
+
+def f(i: int) -> int:
+    return sine(i)
+"""
+
+SQRT = """
+import math
+
+@lut(domain=range(0, 1025, 64), dtype=uint16_t, interpolate=True)
+def root(raw: int) -> int:
+    return 100 * math.sqrt(raw)
+"""
+
+
+class TestLookupTables:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32f4')
+
+    def test_table_is_static_const(self):
+        c_code = self.compiler.compile_string(SINE)
+        assert "static const int16_t sine_lut[64] = {" in c_code
+        assert "    0, 3212, 6393, 9512," in c_code
+        assert "int16_t sine(" not in c_code
+
+    def test_calls_become_indexed_loads(self):
+        c_code = self.compiler.compile_string(SINE)
+        assert "return sine_lut[i];" in c_code
+
+    def test_report_size_and_accuracy(self):
+        self.compiler.compile_string(SINE)
+        line = self.compiler.report.lines('Lookup tables')[0]
+        assert line.startswith("sine: 64 x int16_t = 128 bytes flash, max error 0.4")
+
+    def test_interpolated_accessor(self):
+        c_code = self.compiler.compile_string(SQRT)
+        assert "static const uint16_t root_lut[17] = {" in c_code
+        assert "static inline uint16_t root(int32_t raw) {" in c_code
+        assert "if (raw >= 1024) return root_lut[16];" in c_code
+        assert "every 64 interpolated" in self.compiler.report.lines('Lookup tables')[0]
+
+    def test_avr_tables_live_in_progmem(self):
+        c_code = Compiler(target='arduino').compile_string(SINE)
+        assert "#include <avr/pgmspace.h>" in c_code
+        assert "static const int16_t sine_lut[64] PROGMEM = {" in c_code
+        assert "((int16_t)pgm_read_word(&sine_lut[i]))" in c_code
+
+    def test_value_out_of_range(self):
+        source = "@lut(domain=range(0, 4), dtype=uint8_t)\ndef f(x: int) -> int:\n    return x * 100\n"
+        with pytest.raises(CompileError, match="<string>:2: error: @lut function f\\(3\\) = 300 does not fit uint8_t"):
+            self.compiler.compile_string(source)
+
+    def test_evaluation_error_is_reported(self):
+        source = "@lut(domain=range(0, 4), dtype=int16_t)\ndef f(x: int) -> int:\n    return 10 // x\n"
+        with pytest.raises(CompileError, match="f\\(0\\) failed: ZeroDivisionError"):
+            self.compiler.compile_string(source)
+
+    def test_domain_must_be_constant(self):
+        source = "@lut(domain=[1, 2], dtype=int16_t)\ndef f(x: int) -> int:\n    return x\n"
+        with pytest.raises(CompileError, match="needs domain=range"):
+            self.compiler.compile_string(source)
+
+
+class TestLookupSimulation:
+    def test_python_decorator_matches_table(self):
+        @lut(domain=range(0, 1025, 64), interpolate=True)
+        def root(raw):
+            return 100 * raw ** 0.5
+
+        assert root(64) == 800
+        assert root(100) == interpolate(root._lut_table, 0, 64, 100)
+        assert root(5000) == root._lut_table[-1]
+
+    def test_integer_interpolation_truncates_toward_zero(self):
+        assert interpolate([10, 0], 0, 4, 1) == 8
+        assert interpolate([0, 10], 0, 4, 1) == 2
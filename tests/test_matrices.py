@@ -0,0 +1,160 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+KALMAN = """
+import numpy as np
+
+def predict(p: Mat[float, 3, 3], f: Mat[float, 3, 3], q: Mat[float, 3, 3]) -> Mat[float, 3, 3]:
+    return f @ p @ f.T + q
+
+def gain(p: Mat[float, 2, 2], r: Mat[float, 2, 2]) -> Mat[float, 2, 2]:
+    s: Mat[float, 2, 2] = p + r
+    return p @ np.linalg.inv(s)
+"""
+
+MAIN = """
+def main():
+    p: Mat[float, 3, 3] = np.eye(3)
+    f: Mat[float, 3, 3] = [[1.0, 0.5, 0.0], [0.0, 1.0, 0.5], [0.0, 0.0, 1.0]]
+    q = np.eye(3) * 0.25
+    p = predict(p, f, q)
+    print(p[0, 0], p[0, 1], p[2, 2])
+    k = gain([[2.0, 1.0], [1.0, 3.0]], np.eye(2))
+    print(int(k[0, 0] * 1100 + 0.5), int(k[1, 1] * 1100 + 0.5))
+    v: Vec[float, 3] = [1.0, 2.0, 4.0]
+    w = f @ v
+    print(int(v @ w), int(w[1]), int((v * 2.0 - w)[0]))
+    v += w
+    print(int(v[0]), int(v[-1]))
+    m4: Mat[float, 4, 4] = [[4.0, 1.0, 0.0, 0.5], [1.0, 3.0, 0.5, 0.0], [0.0, 0.5, 2.0, 0.0], [0.5, 0.0, 0.0, 1.0]]
+    e = m4 @ np.linalg.inv(m4)
+    print(int(e[0, 0] * 1000 + 0.5), int(e[1, 2] * 1000 + 0.5), int(e[3, 3] * 1000 + 0.5))
+    t = f.T.copy()
+    print(int(t[0, 1]), t[1, 0])
+"""
+
+OUTPUT = "1.5 0.5 1.25\n700 800\n26 4 0\n3 8\n1000 0 1000\n0 0.5\n"
+
+
+class TestMatrixCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32')
+
+    def test_types_are_structs_passed_by_value(self):
+        c_code = self.compiler.compile_string(KALMAN)
+        assert '#include "py2mcu_matrix.h"' in c_code
+        assert "PY2MCU_MAT_DEFINE(mat3x3_f32, float, 3, 3)" in c_code
+        assert "mat3x3_f32_t predict(mat3x3_f32_t p, mat3x3_f32_t f, mat3x3_f32_t q) {" in c_code
+        assert "malloc" not in c_code
+
+    def test_products_are_unrolled(self):
+        c_code = self.compiler.compile_string(KALMAN)
+        # f @ p is computed once, then multiplied by f.T without a copy of the transpose
+        assert ("const mat3x3_f32_t tmp5 = {{\n        {((f.m[0][0] * p.m[0][0]) + (f.m[0][1] * p.m[1][0]) "
+                "+ (f.m[0][2] * p.m[2][0]))") in c_code
+        assert "(((tmp5.m[0][0] * f.m[1][0]) + (tmp5.m[0][1] * f.m[1][1]) + (tmp5.m[0][2] * f.m[1][2])) + q.m[0][1])" \
+            in c_code
+        assert "return (mat3x3_f32_t){{" in c_code
+        assert "for (" not in c_code
+        report = self.compiler.codegen.report.sections['Matrices']
+        assert "predict(): line 5: 54 multiply-adds unrolled" in report
+
+    def test_inverse_is_an_unrolled_helper(self):
+        c_code = self.compiler.compile_string(KALMAN)
+        assert "static inline mat2x2_f32_t py2mcu_inv_mat2x2_f32(mat2x2_f32_t a) {" in c_code
+        assert "    const float det = a.m[0][0] * c00 + a.m[0][1] * c01;" in c_code
+        assert "        PY2MCU_VALUE_ERROR();" in c_code
+        assert "    const float r = 1.0f / det;" in c_code
+        assert "const mat2x2_f32_t tmp9 = py2mcu_inv_mat2x2_f32(s);" in c_code
+
+    def test_4x4_inverse_shares_minors(self):
+        c_code = self.compiler.compile_string(
+            "import numpy as np\n"
+            "def inverse(m: Mat[double, 4, 4]) -> Mat[double, 4, 4]:\n"
+            "    return np.linalg.inv(m)\n")
+        assert "static inline mat4x4_f64_t py2mcu_inv_mat4x4_f64(mat4x4_f64_t a) {" in c_code
+        assert "    const double s23_23 = a.m[2][2] * a.m[3][3] - a.m[2][3] * a.m[3][2];" in c_code
+        assert "    if (det == 0.0) {" in c_code
+        assert "return py2mcu_inv_mat4x4_f64(m);" in c_code
+
+    def test_vectors_elements_and_dot(self):
+        c_code = self.compiler.compile_string("""
+import numpy as np
+def dot(v: Vec[float, 3], w: Vec[float, 3]) -> float:
+    return np.dot(v, w)
+
+def scale(v: Vec[float, 3], k: float) -> Vec[float, 3]:
+    u = v * k
+    u[-1] = 0.0
+    return u
+""")
+        assert "return ((v.v[0] * w.v[0]) + (v.v[1] * w.v[1]) + (v.v[2] * w.v[2]));" in c_code
+        assert "vec3_f32_t u = {{(v.v[0] * k), (v.v[1] * k), (v.v[2] * k)}};" in c_code
+        assert "u.v[2] = 0.0f;" in c_code
+
+    def test_fixed_point_elements_saturate(self):
+        c_code = self.compiler.compile_string("""
+def mix(a: Vec[q15, 2], m: Mat[q15, 2, 2]) -> Vec[q15, 2]:
+    return m @ a
+""")
+        assert "PY2MCU_VEC_DEFINE(vec2_q15, q15_t, 2)" in c_code
+        assert "q15_add(q15_mul(m.m[0][0], a.v[0]), q15_mul(m.m[0][1], a.v[1]))" in c_code
+
+    def test_globals_need_constant_values(self):
+        c_code = self.compiler.compile_string("""
+import numpy as np
+
+# @const
+ROT: Mat[float, 2, 2] = [[0.0, -1.0], [1.0, 0.0]]
+state: Vec[int16_t, 4] = np.zeros(4)
+""")
+        assert "static const mat2x2_f32_t ROT = {{{0.0f, -1.0f}, {1.0f, 0.0f}}};" in c_code
+        assert "static vec4_i16_t state = {{0, 0, 0, 0}};" in c_code
+
+
+class TestMatrixErrors:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def compile_error(self, source: str) -> str:
+        with pytest.raises(CompileError) as error:
+            self.compiler.compile_string("import numpy as np\n" + source)
+        return str(error.value)
+
+    def test_shapes_must_match(self):
+        message = self.compile_error("def f(a: Mat[float, 2, 3], b: Mat[float, 2, 3]):\n    c = a @ b\n")
+        assert "'@' of shapes (2, 3) and (2, 3): 3 columns against 2 rows" in message
+        message = self.compile_error("def f(a: Mat[float, 2, 2], b: Vec[float, 2]):\n    c = a + b\n")
+        assert "Mat and Vec do not broadcast" in message
+
+    def test_numpy_aliasing_is_rejected(self):
+        message = self.compile_error("def f(a: Mat[float, 2, 2]):\n    b = a\n")
+        assert "write 'b = a.copy()'" in message
+        message = self.compile_error("def f(a: Mat[float, 2, 2]):\n    a[0, 0] = 1.0\n")
+        assert "passed by value" in message
+
+    def test_indexes_are_checked(self):
+        assert "index 2 is out of range" in self.compile_error(
+            "def f(a: Mat[float, 2, 2]) -> float:\n    return a[2, 0]\n")
+        assert "one element at a time: m[i, j]" in self.compile_error(
+            "def f(a: Mat[float, 2, 2]) -> float:\n    return a[0]\n")
+
+    def test_inverse_limits(self):
+        assert "needs float or double elements" in self.compile_error(
+            "def f(a: Mat[int, 2, 2]):\n    b = np.linalg.inv(a)\n")
+        assert "unrolled up to 4 x 4" in self.compile_error(
+            "def f(a: Mat[float, 5, 5]):\n    b = np.linalg.inv(a)\n")
+
+    def test_large_matrices_are_refused(self):
+        assert "use Array[T, N] beyond 64" in self.compile_error("def f(a: Mat[float, 9, 9]):\n    pass\n")
+
+
+class TestMatrixExecution:
+    def test_generated_c_matches_numpy(self, run_c):
+        c_output = run_c(Compiler(target='pc').compile_string(KALMAN + MAIN), "matrices")
+        assert c_output == OUTPUT
+
+    def test_numpy_runs_the_same_source(self, run_python):
+        pytest.importorskip('numpy')
+        assert run_python(KALMAN + MAIN, "from py2mcu import Mat, Vec\n") == OUTPUT
@@ -0,0 +1,107 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+
+OVERLAY_SOURCE = """
+N: int = 8
+
+def fill() -> int:
+    a: list = [0] * N
+    a[3] = 1
+    return a[3]
+
+def outer() -> int:
+    b: list = [0] * 4
+    b[1] = fill()
+    return b[1]
+
+def sibling() -> int:
+    c: list = [0] * 2
+    c[0] = 1
+    return c[0]
+
+def make() -> list:
+    d: list = [0] * 5
+    return d
+
+def main() -> None:
+    outer()
+    sibling()
+    make()
+"""
+
+
+class TestNoHeap:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc', no_heap=True)
+
+    def test_no_gc_malloc(self):
+        c_code = self.compiler.compile_string(OVERLAY_SOURCE)
+        assert 'gc_malloc' not in c_code
+        assert 'py2mcu_overlay' in c_code
+
+    def test_caller_and_callee_do_not_overlap(self):
+        self.compiler.compile_string(OVERLAY_SOURCE)
+        plan = self.compiler.codegen.memory_plan
+        outer = plan.placement('outer', 'b')
+        fill = plan.placement('fill', 'a')
+        assert fill['offset'] >= outer['offset'] + outer['bytes']
+
+    def test_siblings_share_overlay(self):
+        self.compiler.compile_string(OVERLAY_SOURCE)
+        plan = self.compiler.codegen.memory_plan
+        assert plan.placement('sibling', 'c')['offset'] == plan.placement('outer', 'b')['offset']
+
+    def test_returned_list_goes_to_bss(self):
+        c_code = self.compiler.compile_string(OVERLAY_SOURCE)
+        assert 'static int32_t d[5];' in c_code
+
+    def test_dynamic_size_is_an_error(self):
+        source = """
+def foo(n: int) -> None:
+    buf: list = [0] * n
+"""
+        with pytest.raises(CompileError) as excinfo:
+            self.compiler.compile_string(source)
+        assert excinfo.value.lineno == 3
+        assert "dynamic size 'n'" in str(excinfo.value)
+
+    def test_inline_c_malloc_is_an_error(self):
+        source = '''
+def foo() -> None:
+    """__C_CODE__
+    int32_t* p = malloc(16);
+    """
+    pass
+'''
+        with pytest.raises(CompileError) as excinfo:
+            self.compiler.compile_string(source)
+        assert excinfo.value.lineno == 4
+
+    def test_ram_budget_exceeded(self):
+        compiler = Compiler(target='stm32f4', no_heap=True, ram_budget=64)
+        source = """
+def main() -> None:
+    buf: list = [0] * 100
+    buf[0] = 1
+"""
+        with pytest.raises(CompileError) as excinfo:
+            compiler.compile_string(source)
+        assert 'exceeds the 64 B budget' in str(excinfo.value)
+
+    def test_report_lists_functions(self):
+        self.compiler.compile_string(OVERLAY_SOURCE)
+        lines = self.compiler.report.lines('RAM footprint')
+        assert any(line.startswith('outer') for line in lines)
+        assert lines[-1].startswith('total:')
+
+    def test_const_table_takes_no_ram(self):
+        source = """
+def main() -> None:
+    table: list = [1, 2, 3]
+    print(table[1])
+"""
+        c_code = self.compiler.compile_string(source)
+        assert 'static const int32_t table[3] = {1, 2, 3};' in c_code
+        assert self.compiler.codegen.memory_plan.placement('main', 'table') is None
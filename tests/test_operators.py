@@ -0,0 +1,100 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+
+def compile_function(body: str, params: str = "x: int, y: int", returns: str = "int") -> str:
+    source = f"def f({params}) -> {returns}:\n" + "".join(f"    {line}\n" for line in body.splitlines())
+    return Compiler(target='stm32f4').compile_string(source)
+
+
+class TestBitwiseOperators:
+    def test_shifts_and_masks(self):
+        c_code = compile_function("return ((x << 3) | (y >> 1)) & ~0xF0 ^ x")
+        assert "return ((((x << 3) | (y >> 1)) & (~240)) ^ x);" in c_code
+
+    def test_literal_shift_past_int_is_unsigned(self):
+        c_code = compile_function("m = 1 << 31\nreturn y", )
+        assert "uint32_t m = (1u << 31);" in c_code
+
+    def test_constant_shift_count_is_checked(self):
+        with pytest.raises(CompileError, match="shift count 32 is outside 0..31 for int32_t"):
+            compile_function("return x << 32")
+
+    def test_mixed_signedness_comparison(self):
+        c_code = compile_function("return x < y", params="x: int, y: uint32_t", returns="bool")
+        assert "((int64_t)x < (int64_t)y)" in c_code
+
+
+class TestBooleanOperators:
+    def test_conditions(self):
+        c_code = compile_function("if not x and (y > 0 or x < 0):\n    return 1\nreturn 0")
+        assert "if (((!x) && ((y > 0) || (x < 0)))) {" in c_code
+
+    def test_or_as_value_returns_operand(self):
+        c_code = compile_function("return x or y")
+        assert "return (x ? x : y);" in c_code
+        c_code = compile_function("return x and y")
+        assert "return (x ? y : x);" in c_code
+
+    def test_or_value_needs_simple_operand(self):
+        with pytest.raises(CompileError, match="'or' on non-bool values"):
+            compile_function("return (x + 1) or y")
+
+    def test_conditional_expression(self):
+        c_code = compile_function("return x if x > y else -y")
+        assert "return ((x > y) ? x : -y);" in c_code
+
+    def test_chained_comparison(self):
+        c_code = compile_function("return 0 <= x < y", returns="bool")
+        assert "return ((0 <= x) && (x < y));" in c_code
+
+    def test_double_negation(self):
+        c_code = compile_function("return - -x")
+        assert "return -(-x);" in c_code
+
+
+class TestAugmentedAssignment:
+    def test_compound_operators(self):
+        c_code = compile_function("x += y\nx <<= 2\nx &= 0xFF\nx //= 3\nreturn x")
+        for line in ("x += y;", "x <<= 2;", "x &= 255;", "x /= 3;"):
+            assert line in c_code
+
+    def test_volatile_register_read_modify_write(self):
+        source = """
+# @volatile
+GPIO_ODR: uint32_t = 0
+
+def led_on(pin: int) -> None:
+    global GPIO_ODR
+    GPIO_ODR |= 1 << pin
+"""
+        c_code = Compiler(target='stm32f4').compile_string(source)
+        assert "static volatile uint32_t GPIO_ODR = 0;" in c_code
+        assert "    GPIO_ODR |= (1 << pin);" in c_code
+
+    def test_true_division_of_int_parameter(self):
+        with pytest.raises(CompileError, match="'/=' makes an int variable a float"):
+            compile_function("x /= 2\nreturn x")
+
+    def test_fixed_point_target_saturates(self):
+        c_code = compile_function("x += y\nreturn x", params="x: q15, y: q15", returns="q15")
+        assert "x = q15_add(x, y);" in c_code
+
+    def test_results_match_python(self, run_c):
+        source = """
+def main():
+    n = -17
+    n >>= 2
+    k = 5
+    k <<= 3
+    k -= 1
+    k %= 7
+    b = 0x5A
+    b ^= 0xFF
+    b |= 1 << 8
+    mask = 1 << 31
+    print(n, k, b, mask, ~k, - -k, k if k > 3 else -k, 0 < k < 10 and n < 0)
+"""
+        output = run_c(Compiler(target='pc').compile_string(source), "ops")
+        assert output == "-5 4 421 2147483648 -5 4 4 1\n"
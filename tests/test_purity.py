@@ -0,0 +1,181 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+CONTROL = """
+TABLE: list = [3, 1, 4, 1, 5, 9, 2, 6]
+# @volatile
+sensor: int = 0
+total: int = 0
+
+def read_table(idx: int) -> int:
+    return TABLE[idx & 7]
+
+def square(x: int) -> int:
+    return x * x
+
+def sample() -> int:
+    return sensor
+
+def accumulate(x: int) -> int:
+    global total
+    total += x
+    return total
+
+@pure
+def half(x: int) -> int:
+    \"\"\"
+    __C_CODE__
+    return x / 2;
+    \"\"\"
+
+def control(idx: int, gain: int, out: list) -> int:
+    a = read_table(idx) * gain
+    if read_table(idx) > 3:
+        out[0] = read_table(idx)
+    b = square(gain) + (idx * gain + 1)
+    c = (idx * gain + 1) * 2 + half(idx) + half(idx)
+    return a + b + c
+
+def main():
+    out: list = [0] * 2
+    print(control(3, 2, out), control(5, 1, out))
+    print(out[0], accumulate(4))
+"""
+
+
+class TestPurity:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32')
+
+    def test_const_and_pure_attributes(self):
+        c_code = self.compiler.compile_string(CONTROL)
+        assert "PY2MCU_CONST_FN int32_t square(int32_t x) {" in c_code
+        assert "PY2MCU_PURE_FN int32_t read_table(int32_t idx) {" in c_code
+        assert "PY2MCU_PURE_FN int32_t half(int32_t x) {" in c_code
+        report = self.compiler.codegen.report.sections['Purity']
+        assert "square(): const" in report
+        assert "read_table(): pure (line 8: reads 'TABLE[idx & 7]')" in report
+        assert "half(): pure (declared @pure)" in report
+
+    def test_side_effects_are_reported(self):
+        c_code = self.compiler.compile_string(CONTROL)
+        assert "\nint32_t sample(void) {" in c_code
+        assert "\nint32_t accumulate(int32_t x) {" in c_code
+        report = self.compiler.codegen.report.sections['Purity']
+        assert "sample(): not pure: line 14: reads volatile 'sensor'" in report
+        assert "accumulate(): not pure: line 18: assigns module variable 'total'" in report
+        assert "control(): not pure: line 31: stores into 'out'" in report
+
+    def test_c_bodies_need_the_decorator(self):
+        c_code = self.compiler.compile_string("""
+def twice(x: int) -> int:
+    \"\"\"
+    __C_CODE__
+    return 2 * x;
+    \"\"\"
+""")
+        assert "\nint32_t twice(int32_t x) {" in c_code
+        assert ("twice(): not pure: C body (mark it @pure if it has no side effects)"
+                in self.compiler.codegen.report.sections['Purity'])
+
+    def test_decorated_python_body_is_checked(self):
+        with pytest.raises(CompileError) as error:
+            self.compiler.compile_string("@pure\ndef show(x: int) -> int:\n    print(x)\n    return x\n")
+        assert "@pure function 'show' has side effects: line 3: calls 'print'" in str(error.value)
+
+    def test_calls_are_settled_through_the_call_graph(self):
+        c_code = self.compiler.compile_string("""
+def odd(n: int) -> bool:
+    return n != 0 and even(n - 1)
+
+def even(n: int) -> bool:
+    return n == 0 or odd(n - 1)
+
+def norm(a: int, b: int) -> int:
+    return even(a) + odd(b)
+
+def logged(x: int) -> int:
+    return norm(x, x) + accumulate(x)
+
+def accumulate(x: int) -> int:
+    print(x)
+    return x
+""")
+        assert "PY2MCU_CONST_FN bool odd(int32_t n) {" in c_code
+        assert "PY2MCU_CONST_FN int32_t norm(int32_t a, int32_t b) {" in c_code
+        assert "logged(): not pure: line 12: calls accumulate()" in self.compiler.codegen.report.sections['Purity']
+
+
+class TestCommonSubexpressions:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32')
+
+    def test_repeated_pure_calls_are_evaluated_once(self):
+        c_code = self.compiler.compile_string(CONTROL)
+        assert ("    const int32_t cse29 = read_table(idx);\n"
+                "    int32_t a = (cse29 * gain);\n"
+                "    if ((cse29 > 3)) {\n"
+                "        out[0] = cse29;\n") in c_code
+        assert "    const int32_t cse33 = half(idx);\n    int32_t c = (((cse32 * 2) + cse33) + cse33);" in c_code
+        report = self.compiler.codegen.report.sections['Common subexpressions']
+        assert "control: line 29: 'read_table(idx)' evaluated once as cse29 (3 uses)" in report
+        assert "control: line 32: 'idx * gain + 1' evaluated once as cse32 (2 uses)" in report
+
+    def test_writes_and_side_effects_end_a_value(self):
+        c_code = self.compiler.compile_string("""
+TABLE: list = [3, 1, 4, 1]
+
+def read_table(idx: int) -> int:
+    return TABLE[idx & 3]
+
+def step(i: int, buf: list) -> int:
+    a = read_table(i)
+    buf[0] = 7
+    b = read_table(i)
+    print(i)
+    c = read_table(i)
+    i += 1
+    return a + b + c + read_table(i)
+""")
+        assert "cse" not in c_code
+        assert "return (((a + b) + c) + read_table(i));" in c_code
+
+    def test_conditional_uses_do_not_count(self):
+        c_code = self.compiler.compile_string("""
+def square(x: int) -> int:
+    return x * x
+
+def pick(a: int, b: int) -> int:
+    if a > 0 and square(b) > 2:
+        return square(b)
+    r = square(a) if a else square(a)
+    return r + square(b)
+""")
+        assert "cse" not in c_code
+
+    def test_values_available_in_a_loop_body(self):
+        c_code = self.compiler.compile_string("""
+def square(x: int) -> int:
+    return x * x
+
+def fill(buf: list, n: int, k: int):
+    s = square(k)
+    i = 0
+    while i < n:
+        buf[i] = square(k) + i
+        i += 1
+""")
+        assert "    const int32_t cse6 = square(k);\n    int32_t s = cse6;" in c_code
+        assert "(*buf_p8) = (cse6 + i);" in c_code
+
+    def test_levels(self):
+        o1 = Compiler(target='stm32', optimize=1).compile_string(CONTROL)
+        assert "PY2MCU_CONST_FN int32_t square(int32_t x) {" in o1
+        assert "cse" not in o1
+        o0 = Compiler(target='stm32', optimize=0).compile_string(CONTROL)
+        assert "PY2MCU_" not in o0 and "cse" not in o0
+
+    def test_generated_c_runs(self, run_c):
+        c_code = Compiler(target='pc').compile_string(CONTROL)
+        assert run_c(c_code, "control", flags=['-std=c99', '-Wall', '-Werror']) == "29 32\n9 4\n"
@@ -0,0 +1,104 @@
+from py2mcu.compiler import Compiler
+from py2mcu.ranges import narrow_int_type
+
+
+RANGE_SOURCE = """
+SIZE: int = 64
+
+def total(samples: list[int], n: int) -> int:
+    acc: int = 0
+    i = 0
+    while i < SIZE:
+        acc = acc + samples[i]
+        i = i + 1
+    return acc // 4
+
+def walk(n: int) -> int:
+    j = 0
+    while j < n:
+        j = j + 1
+    return j
+
+def bucket(x: int) -> int:
+    k = 0
+    while k < 100:
+        k = k + 1
+    return k // 16 + k % 8
+"""
+
+
+class TestRangeAnalysis:
+    def test_bounded_counter_is_narrowed(self):
+        c_code = Compiler(target='pc').compile_string(RANGE_SOURCE)
+        assert "int_fast8_t i = 0;" in c_code
+
+    def test_counter_bounded_by_parameter_stays_int32(self):
+        c_code = Compiler(target='pc').compile_string(RANGE_SOURCE)
+        assert "int32_t j = 0;" in c_code
+
+    def test_exact_types_on_small_targets(self):
+        c_code = Compiler(target='arduino').compile_string(RANGE_SOURCE)
+        assert "uint8_t i = 0;" in c_code
+
+    def test_wide_arithmetic_keeps_int32_on_small_targets(self):
+        compiler = Compiler(target='arduino')
+        c_code = compiler.compile_string("""
+def scale(n: int) -> int:
+    k = 0
+    if n > 0 and n <= 200:
+        k = n
+    return k * 1000
+
+def pack() -> int:
+    t = 0
+    i = 0
+    while i < 200:
+        t = t + (i << 8)
+        i += 1
+    return t
+""")
+        # int is 16 bits on AVR: uint8_t k would make k * 1000 overflow
+        assert "int32_t k = 0;" in c_code
+        assert "int32_t i = 0;" in c_code
+        assert ("scale: k [0, 200] kept as int32_t (used in arithmetic reaching [0, 200000], wider than 16-bit int)"
+                in compiler.report.lines('Integer ranges'))
+
+    def test_nonnegative_division_becomes_shift_and_mask(self):
+        c_code = Compiler(target='pc').compile_string(RANGE_SOURCE)
+        assert "return ((k >> 4) + (k & 7));" in c_code
+
+    def test_possibly_negative_division_is_kept(self):
+        c_code = Compiler(target='pc').compile_string(RANGE_SOURCE)
+        assert "return (acc / 4);" in c_code
+
+    def test_report_lists_unproven_widenings(self):
+        compiler = Compiler(target='pc')
+        compiler.compile_string(RANGE_SOURCE)
+        report = compiler.report.format()
+        assert "total: i [0, 64] -> int_fast8_t" in report
+        assert "walk: j [0, +inf] kept as int32_t" in report
+        assert "'(acc / 4)' kept as division" in report
+
+    def test_disabled_at_O0(self):
+        c_code = Compiler(target='pc', optimize='0').compile_string(RANGE_SOURCE)
+        assert "int32_t i = 0;" in c_code
+        assert "(k / 16)" in c_code
+
+    def test_narrowed_print_argument_is_cast(self):
+        source = """
+def main():
+    i = 0
+    while i < 10:
+        print(i)
+        i = i + 1
+"""
+        c_code = Compiler(target='pc').compile_string(source)
+        assert 'printf("%d\\n", (int)i);' in c_code
+
+    def test_narrow_int_type(self):
+        assert narrow_int_type((0, 200), 8) == 'uint8_t'
+        assert narrow_int_type((-5, 5), 16) == 'int8_t'
+        assert narrow_int_type((0, 200), 32) == 'int_fast16_t'
+        assert narrow_int_type((0, 70000), 32) is None
+        assert narrow_int_type((0, 200), 8, arith=(0, 200000)) is None
+        assert narrow_int_type((0, 200), 32, arith=(0, 200000)) == 'int_fast16_t'
@@ -0,0 +1,182 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+KERNELS = """
+TAPS = 8
+
+def fir(out: Array[int32_t, 16], x: Array[int16_t, 23], h: Array[int16_t, 8]):
+    i = 0
+    while i < 16:
+        out[i] = sum(x[i:i + TAPS] * h)
+        i += 1
+
+def dot(a: Array[int16_t, 21], b: Array[int16_t, 21]) -> int:
+    return sum(a * b)
+
+def mixq(out: Array[q15, 12], a: Array[q15, 12], b: Array[q15, 12]):
+    out[:] = a + b
+
+def negq(out: Array[q15, 12], a: Array[q15, 12]):
+    out[:] = -a
+
+def scale(out: Array[float, 10], a: Array[int16_t, 10], g: float):
+    out[:] = a * g
+
+def offset(out: Array[int16_t, 11], a: Array[int16_t, 11], b: Array[int16_t, 11], c: int):
+    out[:] = a - b
+    out += c
+"""
+
+MAIN = """
+def main():
+    x: Array[int16_t, 23] = [3, -1, 4, 1, -5, 9, 2, -6, 5, 3, -5, 8, 9, 7, -9, 3, 2, 1, 1, 30000, -30000, 7, 8]
+    h: Array[int16_t, 8] = [2, -3, 5, 7, 1, 0, -2, 4]
+    out: Array[int32_t, 16] = [0] * 16
+    fir(out, x, h)
+    print(out[0], out[7], out[15])
+    print(dot(x[0:21], x[2:23]))
+    qa: Array[q15, 12] = [q15(0.9)] * 12
+    qb: Array[q15, 12] = [q15(0.5)] * 12
+    qo: Array[q15, 12] = [q15(0.0)] * 12
+    qb[3] = q15(-0.9)
+    qa[5] = q15(-1.0)
+    mixq(qo, qa, qb)
+    print(qo[0], qo[3], qo[11])
+    negq(qo, qa)
+    print(qo[0], qo[5])
+    f: Array[float, 10] = [0.0] * 10
+    scale(f, x[0:10], 0.5)
+    print(int(f[1] * 10), int(f[9] * 10))
+    o: Array[int16_t, 11] = [0] * 11
+    offset(o, x[0:11], x[12:23], 40000)
+    sums: Array[int16_t, 11] = o + x[0:11]
+    print(o[0], o[8], o[10], sums[2])
+"""
+
+EXPECTED = "3 -89 30030\n-30135\n0.999969 0 0.999969\n-0.899994 0.999969\n-5 15\n-25542 4469 -25549 -25519\n"
+
+# Portable stand-ins for the DSP intrinsics, so the packed loops run on the host
+DSP_SHIM = """
+#include <stdint.h>
+static inline uint32_t pack(int32_t lo, int32_t hi) { return (uint16_t)lo | ((uint32_t)(uint16_t)hi << 16); }
+static inline int32_t sat(int32_t v) { return v > 32767 ? 32767 : v < -32768 ? -32768 : v; }
+#define LO(x) ((int16_t)(x))
+#define HI(x) ((int16_t)((x) >> 16))
+#define __SADD16(x, y) pack(LO(x) + LO(y), HI(x) + HI(y))
+#define __SSUB16(x, y) pack(LO(x) - LO(y), HI(x) - HI(y))
+#define __QADD16(x, y) pack(sat(LO(x) + LO(y)), sat(HI(x) + HI(y)))
+#define __QSUB16(x, y) pack(sat(LO(x) - LO(y)), sat(HI(x) - HI(y)))
+#define __SMLAD(x, y, a) ((uint32_t)((int32_t)(a) + LO(x) * LO(y) + HI(x) * HI(y)))
+"""
+
+
+class TestVectorExtensions:
+    def setup_method(self):
+        self.compiler = Compiler(target='pc')
+
+    def test_store_has_vector_and_scalar_loops(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert '#include "py2mcu_simd.h"\n#if PY2MCU_SIMD_VECTOR\n' in c_code
+        assert "PY2MCU_VECTOR_DEFINE(py2mcu_v8_f32, float, 8);" in c_code
+        assert ("#if PY2MCU_SIMD_VECTOR\n        for (; k20 + 8 <= 10; k20 += 8) {\n"
+                "            py2mcu_v8_f32 k20_0 = __builtin_convertvector(PY2MCU_VLOAD(py2mcu_v8_i16, a + k20), "
+                "py2mcu_v8_f32);\n            py2mcu_v8_f32 k20_r = (k20_0 * g);\n") in c_code
+        assert "#endif\n        for (; k20 < 10; k20++) {\n            out[k20] = (a[k20] * g);" in c_code
+
+    def test_wrapping_integer_ops_use_narrow_lanes(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "py2mcu_v8_i16 k23_r = (k23_0 - k23_1);" in c_code
+        assert "py2mcu_v8_i16 k24_r = (k24_0 + ((int16_t)(c)));" in c_code
+
+    def test_saturating_fixed_point_is_clamped(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "py2mcu_v8_i16 k14_r = (py2mcu_v8_i16)((py2mcu_v8_u16)k14_0 + (py2mcu_v8_u16)k14_1);" in c_code
+        assert "py2mcu_v8_i16 k14_m = ((k14_0 ^ k14_r) & (k14_1 ^ k14_r)) < 0;" in c_code
+        assert "k14_r = (k14_r & ~k14_m) | (((k14_0 >> 15) ^ 32767) & k14_m);" in c_code
+        assert "py2mcu_v8_i16 k17_m = k17_0 == (-32767 - 1);" in c_code
+
+    def test_int16_dot_products_multiply_pairs(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "static inline int32_t py2mcu_sum7(const int16_t *h, const int16_t *x, int32_t i) {" in c_code
+        assert "        py2mcu_v4_i32 k_0 = PY2MCU_VLOAD(py2mcu_v4_i32, x + k + i);" in c_code
+        assert "        k_acc += py2mcu_madd16(k_0, k_1);" in c_code
+        assert "        acc += k_acc[k_lane];\n    }\n#else\n    for (; k < 8; k++) {" in c_code
+        assert "    }\n#endif\n    for (; k < 21; k++) {" in c_code
+
+    def test_integer_sums_use_vector_accumulators(self):
+        source = "def f(a: Array[int32_t, 6], b: Array[int32_t, 6]) -> int:\n    return sum(a * b + 1)\n"
+        c_code = self.compiler.compile_string(source)
+        assert "    py2mcu_v4_i32 k_acc = {0};" in c_code
+        assert "        k_acc += ((k_0 * k_1) + 1);" in c_code
+
+    def test_float_sums_keep_their_order(self):
+        source = "def f(a: Array[float, 8], b: Array[float, 8]) -> float:\n    return sum(a * b)\n"
+        assert "PY2MCU_SIMD" not in self.compiler.compile_string(source)
+
+    def test_arrays_declared_here_are_aligned(self):
+        c_code = self.compiler.compile_string(KERNELS + MAIN)
+        assert "int16_t x[23] PY2MCU_ALIGNED(16) = {3, -1," in c_code
+        assert "int16_t sums[11] PY2MCU_ALIGNED(16);" in c_code
+        assert "PY2MCU_VLOAD_ALIGNED(py2mcu_v8_i16, x + k47);" in c_code
+        assert "PY2MCU_VSTORE_ALIGNED(sums + k47, k47_r);" in c_code
+
+    def test_report_lists_lanes_and_alignment(self):
+        self.compiler.compile_string(KERNELS + MAIN)
+        report = self.compiler.report.format()
+        assert "mixq: line 14: 'out' 8 x int16_t lanes saturating (GCC vectors), 0 of 3 accesses aligned" in report
+        assert "main: line 47: 'sums' 8 x int16_t lanes (GCC vectors), 3 of 3 accesses aligned" in report
+        assert "dot: line 11: sum() in py2mcu_sum11() 8 x int16_t lanes in pairs (GCC vectors), 0 of 2 loads aligned" in report
+
+    def test_comparisons_stay_scalar(self):
+        source = "def f(out: Array[int16_t, 8], a: Array[int16_t, 8]):\n    out[:] = a > 0\n"
+        assert "PY2MCU_SIMD" not in self.compiler.compile_string(source)
+
+    def test_no_simd_below_o2_or_without_vector_unit(self):
+        assert "PY2MCU_SIMD" not in Compiler(target='pc', optimize='1').compile_string(KERNELS)
+        assert "PY2MCU_ALIGNED" not in Compiler(target='rp2040').compile_string(KERNELS + MAIN)
+
+    def test_window_must_have_constant_width(self):
+        source = "def f(x: Array[int16_t, 8], i: int, j: int) -> int:\n    return sum(x[i:j] * 2)\n"
+        with pytest.raises(CompileError, match=r"x\[i:i \+ N\]"):
+            self.compiler.compile_string(source)
+
+    @pytest.mark.parametrize('cflags', [[], ['-DPY2MCU_NO_SIMD']])
+    def test_generated_c_output(self, cflags, run_c):
+        assert run_c(self.compiler.compile_string(KERNELS + MAIN), "simd", flags=['-O2', *cflags]) == EXPECTED
+
+
+class TestDspIntrinsics:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32f4')
+
+    def test_packed_add_and_subtract(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert ("#if PY2MCU_SIMD_DSP\n        for (; k23 + 2 <= 11; k23 += 2) {\n"
+                "            uint32_t k23_0 = PY2MCU_LOAD32(a + k23);\n") in c_code
+        assert "PY2MCU_STORE32(out + k23, __SSUB16(k23_0, k23_1));" in c_code
+        assert "PY2MCU_STORE32(out + k24, __SADD16(k24_0, PY2MCU_PACK16(c)));" in c_code
+
+    def test_saturating_q15_uses_qadd16(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "PY2MCU_STORE32(out + k14, __QADD16(k14_0, k14_1));" in c_code
+        assert "PY2MCU_STORE32(out + k17, __QSUB16(0, k17_1));" in c_code
+
+    def test_dot_product_uses_smlad(self):
+        c_code = self.compiler.compile_string(KERNELS)
+        assert "acc = (int32_t)__SMLAD(PY2MCU_LOAD32(x + k + i), PY2MCU_LOAD32(h + k), (uint32_t)acc);" in c_code
+
+    def test_float_arrays_have_no_packed_form(self):
+        assert "for (int32_t k20 = 0; k20 < 10; k20++) {" in self.compiler.compile_string(KERNELS)
+
+    def test_arrays_are_word_aligned(self):
+        c_code = self.compiler.compile_string(KERNELS + MAIN)
+        assert "int16_t x[23] PY2MCU_ALIGNED(4) = {3, -1," in c_code
+        assert "PY2MCU_STORE32_ALIGNED(sums + k47, __SADD16(k47_0, k47_1));" in c_code
+
+    def test_packed_loops_match_scalar_code(self, tmp_path, run_c):
+        shim = tmp_path / "dsp_shim.h"
+        shim.write_text(DSP_SHIM)
+        c_code = self.compiler.compile_string(KERNELS + MAIN)
+        flags = ['-O2', '-D__ARM_FEATURE_DSP', '-include', str(shim)]
+        assert run_c(c_code, "dsp", flags=flags, check=False) == EXPECTED
@@ -0,0 +1,207 @@
+import pytest
+from py2mcu.compiler import Compiler
+
+GPIO = """
+# @volatile
+porta: int = 0
+# @volatile
+portb: int = 0
+
+def gpio_write(pin: int, value: bool):
+    global porta, portb
+    if pin < 8:
+        if value:
+            porta |= 1 << pin
+        else:
+            porta &= ~(1 << pin)
+    else:
+        if value:
+            portb |= 1 << (pin - 8)
+        else:
+            portb &= ~(1 << (pin - 8))
+
+def blink(n: int):
+    i = 0
+    while i < n:
+        gpio_write(13, True)
+        gpio_write(13, False)
+        i += 1
+
+def main():
+    gpio_write(2, True)
+    blink(3)
+    gpio_write(13, True)
+    print(porta, portb)
+"""
+
+SHORT_CIRCUIT = """
+count: int = 0
+lit: int = 0
+
+def note() -> bool:
+    global count
+    count += 1
+    return True
+
+def tick() -> int:
+    global count
+    count += 1
+    return count
+
+def square(x: int) -> int:
+    return x * x
+
+def gpio(pin: int):
+    global lit
+    if note() and pin == 13:
+        lit += 1
+    if square(pin) > 0 and pin != 5:
+        lit += 10
+    lit += 1
+
+def sel(mode: int):
+    while tick() < 100 and mode == 2:
+        pass
+
+def main():
+    i = 0
+    while i < 2:
+        gpio(5)
+        i += 1
+    sel(3)
+    sel(3)
+    print(lit, count)
+"""
+
+NARROW_PIN = """
+count: int = 0
+
+def gpio(pin: uint8_t, v: int):
+    global count
+    if pin > 200:
+        count += 1
+    else:
+        count += 3
+
+def main():
+    i = 0
+    while i < 3:
+        gpio(300, i)
+        i += 1
+    print(count)
+"""
+
+
+class TestSpecialization:
+    def setup_method(self):
+        self.compiler = Compiler(target='stm32')
+
+    def test_hot_constant_calls_get_a_folded_clone(self):
+        c_code = self.compiler.compile_string(GPIO)
+        assert "void gpio_write_13_1(void) {\n    portb |= (1 << (13 - 8));\n}" in c_code
+        assert "void gpio_write_13_0(void) {\n    portb &= (~(1 << (13 - 8)));\n}" in c_code
+        assert "void gpio_write(int32_t pin, bool value) {" in c_code
+        report = self.compiler.codegen.report.sections['Specialization']
+        assert "gpio_write(pin=13, value=True): 2 calls -> gpio_write_13_1() (2 tests folded, 7 -> 1 statements)" in report
+
+    def test_calls_are_redirected(self):
+        c_code = self.compiler.compile_string(GPIO)
+        assert "        gpio_write_13_1();\n        gpio_write_13_0();\n" in c_code
+        assert "    blink(3);\n    gpio_write_13_1();\n" in c_code
+        # called once outside a loop: not worth a clone
+        assert "    gpio_write(2, true);\n" in c_code
+        assert "gpio_write_2" not in c_code
+
+    def test_variable_arguments_stay_in_the_clone(self):
+        c_code = self.compiler.compile_string("""
+def show(x: int, verbose: bool):
+    if verbose:
+        print(x, x)
+    else:
+        print(x)
+
+def main():
+    show(3, False)
+    show(4, False)
+    show(5, True)
+""")
+        assert "void show_0(int32_t x) {\n    printf(\"%d\\n\", x);\n}" in c_code
+        assert "    show_0(3);\n    show_0(4);\n    show(5, true);\n" in c_code
+
+    def test_inline_c_sees_the_constant(self):
+        c_code = self.compiler.compile_string("""
+def led(pin: int, on: bool):
+    if pin < 0:
+        return
+    \"\"\"
+    __C_CODE__
+    #ifdef BOARD_LED_INVERTED
+    led_write(pin, !on);
+    #else
+    led_write(pin, on);
+    #endif
+    \"\"\"
+
+def main():
+    while True:
+        led(4, True)
+""")
+        assert "void led_4(bool on) {\n    int32_t pin = 4;\n#ifdef BOARD_LED_INVERTED\n" in c_code
+        assert "        led_4(true);\n" in c_code
+
+    def test_code_growth_is_capped(self):
+        source = """
+def configure(mode: int, base: list):
+    if mode == 1:
+        base[0] = 1
+    base[1] = 2
+    base[2] = 3
+    base[3] = 4
+    base[4] = 5
+    base[5] = 6
+
+def main():
+    regs: list = [0] * 8
+    configure(1, regs)
+    configure(1, regs)
+"""
+        c_code = self.compiler.compile_string(source)
+        assert "configure_1" not in c_code
+        assert ("configure(mode=1): 2 calls kept on the generic function "
+                "(clone of 6 statements over the code growth budget of 2)"
+                in self.compiler.codegen.report.sections['Specialization'])
+        assert "void configure_1(int32_t* restrict base) {" in Compiler(target='stm32', optimize=3).compile_string(source)
+
+    def test_tests_after_side_effects_are_kept(self):
+        c_code = self.compiler.compile_string(SHORT_CIRCUIT)
+        # note() runs before pin == 13 decides the test; square() has no side effects
+        assert "void gpio_5(void) {\n    if ((note() && (5 == 13))) {\n        lit += 1;\n    }\n    lit += 1;\n}" in c_code
+        assert "PY2MCU_CONST_FN void gpio_5" not in c_code
+
+    def test_loop_tests_after_side_effects_are_kept(self):
+        c_code = self.compiler.compile_string(SHORT_CIRCUIT)
+        assert "sel_3" not in c_code
+        assert "    while (((tick() < 100) && (mode == 2))) {" in c_code
+
+    def test_arguments_are_converted_to_the_parameter_type(self):
+        c_code = self.compiler.compile_string(NARROW_PIN)
+        # a uint8_t pin given 300 holds 44, so pin > 200 is false in the clone
+        assert "void gpio_44(int32_t v) {\n    count += 3;\n}" in c_code
+        assert "        gpio_44(i);\n" in c_code
+
+    def test_O1_keeps_generic_calls(self):
+        c_code = Compiler(target='stm32', optimize=1).compile_string(GPIO)
+        assert "gpio_write_" not in c_code
+
+    def test_generated_c_runs(self, run_c):
+        c_code = Compiler(target='pc').compile_string(GPIO)
+        assert run_c(c_code, "gpio", flags=['-std=c99', '-Wall', '-Werror']) == "4 32\n"
+
+    def test_short_circuit_side_effects_run(self, run_c):
+        c_code = Compiler(target='pc').compile_string(SHORT_CIRCUIT)
+        assert run_c(c_code, "short", flags=['-std=c99', '-Wall', '-Werror']) == "2 4\n"
+
+    def test_clone_agrees_with_O0(self, run_c):
+        outputs = [run_c(Compiler(target='pc', optimize=level).compile_string(NARROW_PIN), f"pin{level}", flags=['-std=c99'])
+                   for level in (0, 2)]
+        assert outputs == ["9\n", "9\n"]
@@ -0,0 +1,22 @@
+from py2mcu.parser import parse_python_string
+from py2mcu.type_checker import TypeChecker
+
+
+def check(source: str) -> TypeChecker:
+    checker = TypeChecker()
+    checker.visit(parse_python_string(source))
+    return checker
+
+
+class TestGenericAnnotations:
+    def test_plain_type(self):
+        checker = check("x: uint8_t = 1")
+        assert checker.symbol_table['x'] == 'uint8_t'
+
+    def test_list_element_type(self):
+        checker = check("def f(buf: list[uint8_t]) -> None:\n    pass")
+        assert checker.symbol_table['buf'] == 'list[uint8_t]'
+
+    def test_array_type_and_length(self):
+        checker = check("samples: Array[uint16_t, 512] = [0] * 512")
+        assert checker.symbol_table['samples'] == 'Array[uint16_t, 512]'
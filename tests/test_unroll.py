@@ -0,0 +1,95 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+FILTERS = """
+from py2mcu import unroll
+
+@unroll(4)
+def fir(out: Array[int32_t, 16], x: Array[int16_t, 19], h: Array[int16_t, 4], n: int):
+    i = 0
+    while i < n:
+        acc = x[i] * h[0] + x[i + 1] * h[1] + x[i + 2] * h[2] + x[i + 3] * h[3]
+        out[i] = acc >> 2
+        i += 1
+
+def energy(x: Array[int16_t, 19]) -> int:
+    e = 0
+    k = 0
+    while k < 4:
+        e += x[k] * x[k]
+        k += 1
+    return e
+
+def odd(x: Array[int16_t, 19], n: int) -> int:
+    s = 0
+    j = 1
+    # @unroll(2)
+    while j < n:
+        s = s + x[j]
+        j += 2
+    return s
+"""
+
+
+class TestUnrollCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_decorator_unrolls_with_remainder(self):
+        c_code = self.compiler.compile_string(FILTERS)
+        assert "int32_t acc;" in c_code
+        assert "while (((i + 3) < n)) {" in c_code
+        assert c_code.count("(*out_p7) = (acc >> 2);") == 5
+        assert c_code.count("while ((i < n)) {") == 1
+
+    def test_pragma_unrolls_one_loop(self):
+        c_code = self.compiler.compile_string(FILTERS)
+        assert "while (((j + 2) < n)) {" in c_code
+        assert c_code.count("j += 2;") == 3
+
+    def test_short_constant_loop_is_fully_unrolled(self):
+        c_code = self.compiler.compile_string(FILTERS)
+        assert "while ((k < 4))" not in c_code
+        assert c_code.count("e += (x[k] * x[k]);") == 4
+
+    def test_report_shows_code_size(self):
+        self.compiler.compile_string(FILTERS)
+        report = self.compiler.report.format()
+        assert "fir: line 7: unrolled x4 with a remainder loop (7 -> 29 C lines)" in report
+        assert "energy: line 15: fully unrolled, 4 iterations (automatic) (4 -> 8 C lines)" in report
+
+    def test_unroll_one_keeps_loop_rolled(self):
+        c_code = self.compiler.compile_string(FILTERS.replace("    k = 0\n", "    k = 0\n    # @unroll(1)\n"))
+        assert "while ((k < 4)) {" in c_code
+
+    def test_requests_that_cannot_be_honored_are_reported(self):
+        source = ("def f(x: Array[int16_t, 8], n: int) -> int:\n    s = 0\n    i = 0\n    # @unroll\n"
+                  "    while i < n:\n        s += x[i]\n        i += 1\n    return s\n")
+        self.compiler.compile_string(source)
+        assert "f: line 5: kept rolled (full unrolling needs a constant trip count)" in self.compiler.report.format()
+
+    def test_no_automatic_unrolling_below_o2(self):
+        c_code = Compiler(target='rp2040', optimize='1').compile_string(FILTERS)
+        assert "while ((k < 4)) {" in c_code
+        assert "while (((i + 3) < n)) {" in c_code
+
+    def test_factor_must_be_constant(self):
+        source = "from py2mcu import unroll\n\n@unroll(0)\ndef f():\n    pass\n"
+        with pytest.raises(CompileError, match="positive constant"):
+            self.compiler.compile_string(source)
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = FILTERS + """
+def main():
+    x: Array[int16_t, 19] = [3, -1, 4, 1, -5, 9, 2, -6, 5, 3, -5, 8, 9, 7, -9, 3, 2, 1, 1]
+    h: Array[int16_t, 4] = [2, -3, 5, 7]
+    out: Array[int32_t, 16] = [0] * 16
+    fir(out, x, h, 15)
+    print(out[0], out[3], out[14], out[15], energy(x))
+    fir(out, x, h, 2)
+    print(out[0], out[1], odd(x, 19), odd(x, 4), odd(x, 0))
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "unroll")
+
+        assert c_output == run_python(source, "from py2mcu import Array\nfrom py2mcu.types import int16_t, int32_t\n")
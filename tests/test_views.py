@@ -0,0 +1,102 @@
+import pytest
+from py2mcu.compiler import Compiler
+from py2mcu.errors import CompileError
+
+PACKET = """
+def checksum(payload: View[uint8_t]) -> int:
+    total = 0
+    i = 0
+    while i < len(payload):
+        total = total ^ payload[i]
+        i = i + 1
+    return total
+
+def word(data: View[uint8_t], at: int) -> int:
+    return data[at] | (data[at + 1] << 8)
+
+def parse(packet: Array[uint8_t, 32]) -> int:
+    header = packet[0:4]
+    body = packet[4:]
+    return header[0] + header[-1] + checksum(body) + len(body)
+"""
+
+
+class TestViewCodegen:
+    def setup_method(self):
+        self.compiler = Compiler(target='rp2040')
+
+    def test_constant_slices_are_pointer_arithmetic(self):
+        c_code = self.compiler.compile_string(PACKET)
+        assert '#include "py2mcu_view.h"' in c_code
+        assert "PY2MCU_VIEW_DEFINE(view_u8, uint8_t)" in c_code
+        assert "view_u8_t header = ((view_u8_t){packet, 4});" in c_code
+        assert "view_u8_t body = ((view_u8_t){packet + 4, 28});" in c_code
+        assert "memcpy" not in c_code
+
+    def test_views_are_passed_by_value(self):
+        c_code = self.compiler.compile_string(PACKET)
+        assert "int32_t checksum(view_u8_t payload)" in c_code
+        assert "(i < payload.len)" in c_code
+
+    def test_proven_indexes_are_unchecked(self):
+        compiler = Compiler(target='rp2040', optimize='1')  # -O2 reads payload through a loop pointer
+        c_code = compiler.compile_string(PACKET)
+        assert "total = (total ^ payload.data[i]);" in c_code
+        assert "header.data[0] + header.data[3]" in c_code
+        assert "(*view_u8_at(data, at))" in c_code
+        report = compiler.report.format()
+        assert "checksum: 1 of 1 view accesses unchecked" in report
+        assert "word: line 11: 'data[at]' checked (index not proven in range)" in report
+
+    def test_no_elision_without_optimization(self):
+        c_code = Compiler(target='rp2040', optimize='0').compile_string(PACKET)
+        assert "(*view_u8_at(payload, i))" in c_code
+
+    def test_runtime_bounds_are_clamped(self):
+        source = "def f(buf: Array[uint8_t, 16], n: int) -> int:\n    part = buf[n:]\n    return len(part)\n"
+        c_code = self.compiler.compile_string(source)
+        assert "view_u8_slice(buf, 16, n, 16)" in c_code
+        assert "part.len" in c_code
+
+    def test_copy_of_constant_length_uses_the_stack(self):
+        source = ("def f(buf: Array[uint8_t, 16]) -> int:\n    head = buf[0:4].copy()\n"
+                  "    buf[0] = 9\n    return head[0]\n")
+        c_code = self.compiler.compile_string(source)
+        assert "uint8_t head_copy2[4];" in c_code
+        assert "view_u8_t head = view_u8_copy(((view_u8_t){buf, 4}), head_copy2);" in c_code
+
+    def test_unknown_length_needs_explicit_stop(self):
+        source = "def f(buf: list[uint8_t]) -> int:\n    rest = buf[2:]\n    return len(rest)\n"
+        with pytest.raises(CompileError, match="is not known"):
+            self.compiler.compile_string(source)
+
+    def test_step_is_rejected(self):
+        source = "def f(buf: Array[uint8_t, 16]) -> int:\n    odd = buf[1::2]\n    return len(odd)\n"
+        with pytest.raises(CompileError, match="step"):
+            self.compiler.compile_string(source)
+
+    def test_sliced_constant_list_stays_writable(self):
+        source = "def f() -> int:\n    table: list[uint8_t] = [1, 2, 3, 4]\n    tail = table[1:3]\n    return tail[0]\n"
+        c_code = self.compiler.compile_string(source)
+        assert "static const uint8_t table[4]" not in c_code
+
+    def test_generated_c_matches_python(self, run_c, run_python):
+        source = PACKET + """
+def main():
+    packet: Array[uint8_t, 32] = [0] * 32
+    k = 0
+    while k < 32:
+        packet[k] = k * 7 % 256
+        k = k + 1
+    print(parse(packet), checksum(packet[10:20]), word(packet[2:6], 1))
+    n = 5
+    part = packet[n:n + 3]
+    window = part[1:]
+    print(len(part), part[0], window[0], len(window), len(packet[30:40]), len(packet[20:10]))
+    print(len(packet[-3:]), packet[-3:][0], checksum(packet[:-30]))
+    snapshot = packet[8:16].copy()
+    print(len(snapshot), snapshot[-1], checksum(snapshot))
+"""
+        c_output = run_c(Compiler(target='pc').compile_string(source), "views")
+
+        assert c_output == run_python(source, "from py2mcu import Array, View\nfrom py2mcu.types import uint8_t\n")